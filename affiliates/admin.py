@@ -1,6 +1,8 @@
 from django.contrib import admin
-from .models import AffiliateLink, ProductAssociation
+from .models import AffiliateLink, ProductAssociation, AffiliateClickEvent, PurchaseIntentEvent
 from django_q.tasks import async_task
+from ecommerce_platform.exports import streaming_export_response
+from ecommerce_platform.admin_pagination import FastChangelistMixin
 
 def requeue_selected_links(modeladmin, request, queryset):
     """Admin action to requeue affiliate links for processing"""
@@ -25,6 +27,7 @@ class AffiliateLinkAdmin(admin.ModelAdmin):
     raw_id_fields = ('product',)
     readonly_fields = ('created_at', 'updated_at')
     actions = [requeue_selected_links]
+    list_select_related = ('product',)
     
     def product_name(self, obj):
         return obj.product.name if obj.product else "No Product"
@@ -51,6 +54,41 @@ class AffiliateLinkAdmin(admin.ModelAdmin):
         }),
     )
 
+def export_click_events(modeladmin, request, queryset):
+    """Admin action to stream selected click events as CSV"""
+    return streaming_export_response('click_events', queryset=queryset)
+
+export_click_events.short_description = "Export selected click events to CSV"
+
+@admin.register(AffiliateClickEvent)
+class AffiliateClickEventAdmin(FastChangelistMixin, admin.ModelAdmin):
+    list_display = ('id', 'user', 'affiliate_link', 'source', 'target_domain', 'clicked_at', 'is_active')
+    list_filter = ('source', 'is_active', 'clicked_at')
+    search_fields = ('user__email', 'session_id', 'target_domain')
+    raw_id_fields = ('user', 'affiliate_link')
+    readonly_fields = ('clicked_at',)
+    actions = [export_click_events]
+    list_select_related = ('user', 'affiliate_link', 'affiliate_link__product')
+    ordering = ('-clicked_at', '-id')
+
+@admin.register(PurchaseIntentEvent)
+class PurchaseIntentEventAdmin(FastChangelistMixin, admin.ModelAdmin):
+    list_display = ('id', 'user_email', 'product_name', 'intent_stage', 'confidence_level', 'detected_at', 'has_created_projection')
+    list_filter = ('intent_stage', 'confidence_level', 'has_created_projection', 'detected_at')
+    search_fields = ('click_event__user__email', 'click_event__session_id')
+    raw_id_fields = ('click_event',)
+    list_select_related = ('click_event__user', 'click_event__affiliate_link__product')
+    ordering = ('-detected_at', '-id')
+    
+    def user_email(self, obj):
+        return obj.click_event.user.email
+    user_email.short_description = "User"
+    user_email.admin_order_field = 'click_event__user__email'
+    
+    def product_name(self, obj):
+        return obj.click_event.affiliate_link.product.name
+    product_name.short_description = "Product"
+
 @admin.register(ProductAssociation)
 class ProductAssociationAdmin(admin.ModelAdmin):
     list_display = (
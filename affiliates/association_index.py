@@ -0,0 +1,163 @@
+"""
+Token index over ProductAssociation search terms.
+
+"Do we already know this search?" used to be an ``iexact`` query, then an
+OR of ``original_search_term__icontains`` per word, neither of which can use
+the btree index on the column. Each association now has one
+ProductAssociationToken row per normalized word of its search term, plus
+an exact-match token ('=' + the whole normalized term). A lookup is a
+single indexed ``token IN (...)`` query grouped by association and ranked
+by (exact match, tokens matched, search_count, confidence_score).
+
+Hot terms are answered from a per-process LRU for
+ASSOCIATION_LOOKUP_CACHE_SECONDS. Saving an association clears this
+process's LRU; other processes catch up when their entries expire.
+
+Tokens are kept current by signals (affiliates/signals.py). Rows created
+with bulk_create get theirs from index_missing_association_tokens().
+"""
+
+import re
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Count, Q
+
+from ecommerce_platform.cache import LocalLRU
+
+from .models import ProductAssociation, ProductAssociationToken
+
+EXACT_PREFIX = '='
+MIN_TOKEN_LENGTH = 3
+
+_WORD = re.compile(r'[a-z0-9]+')
+
+_lookups = LocalLRU(getattr(settings, 'ASSOCIATION_LOOKUP_CACHE_SIZE', 2048))
+
+
+def normalize_search_term(search_term):
+    """Lower case with single spaces: the key for exact matches"""
+    return ' '.join((search_term or '').lower().split())
+
+
+def _stem(word):
+    # 'cables' and 'cable' are the same search; leave 'glass', 'ps'
+    if len(word) > MIN_TOKEN_LENGTH and word.endswith('s') and not word.endswith('ss'):
+        return word[:-1]
+    return word
+
+
+def word_tokens(search_term):
+    """Distinct normalized words of at least MIN_TOKEN_LENGTH characters"""
+    words = _WORD.findall((search_term or '').lower())
+    return sorted({_stem(word) for word in words if len(word) >= MIN_TOKEN_LENGTH})
+
+
+def exact_token(search_term):
+    return (EXACT_PREFIX + normalize_search_term(search_term))[:256]
+
+
+def search_term_tokens(search_term):
+    """Every token stored for an association with this search term"""
+    return [exact_token(search_term)] + word_tokens(search_term)
+
+
+def index_association_tokens(association):
+    """Replace the association's tokens with those of its current search term"""
+    with transaction.atomic():
+        ProductAssociationToken.objects.filter(association=association).delete()
+        ProductAssociationToken.objects.bulk_create([
+            ProductAssociationToken(association=association, token=token)
+            for token in search_term_tokens(association.original_search_term)
+        ])
+    clear_lookup_cache()
+
+
+def index_missing_association_tokens(association_model=ProductAssociation, token_model=ProductAssociationToken,
+                                     batch_size=1000):
+    """
+    Tokenize associations that have no tokens yet (bulk-created rows).
+
+    The models are parameters so migrations can pass their historical ones.
+
+    Returns:
+        Number of associations indexed
+    """
+    indexed = 0
+    last_pk = 0
+    while True:
+        batch = list(
+            association_model.objects.filter(pk__gt=last_pk, tokens__isnull=True)
+            .order_by('pk').values_list('pk', 'original_search_term')[:batch_size]
+        )
+        if not batch:
+            break
+        token_model.objects.bulk_create([
+            token_model(association_id=pk, token=token)
+            for pk, search_term in batch
+            for token in search_term_tokens(search_term)
+        ], ignore_conflicts=True)
+        indexed += len(batch)
+        last_pk = batch[-1][0]
+    if indexed:
+        clear_lookup_cache()
+    return indexed
+
+
+def clear_lookup_cache():
+    _lookups.clear()
+
+
+def find_associations(search_term, limit=5):
+    """
+    Active associations for a search term, best first.
+
+    Exact matches of the whole term win; without one, associations sharing
+    words with a term of two or more words are returned, ranked by how many
+    words they share.
+
+    Returns:
+        List of ProductAssociation with target_product (and its manufacturer) loaded
+    """
+    normalized = normalize_search_term(search_term)
+    if not normalized:
+        return []
+
+    key = (normalized, limit)
+    cached = _lookups.get(key, None)
+    if cached is not None:
+        return list(cached)
+
+    exact = exact_token(normalized)
+    words = word_tokens(normalized)
+    # Single-word terms only count when matched exactly
+    tokens = [exact] + words if len(normalized.split()) >= 2 else [exact]
+
+    # Score on the narrow token join, grouped by id only; then load the winners
+    scores = list(
+        ProductAssociationToken.objects.filter(token__in=tokens, association__is_active=True)
+        .values('association_id')
+        .annotate(
+            exact_match=Count('pk', filter=Q(token=exact)),
+            tokens_matched=Count('pk'),
+        )
+        .order_by(
+            '-exact_match', '-tokens_matched',
+            '-association__search_count', '-association__confidence_score', 'association_id',
+        )
+        .values_list('association_id', 'exact_match')[:limit]
+    )
+    if scores and scores[0][1]:
+        scores = [(pk, exact_match) for pk, exact_match in scores if exact_match]
+
+    loaded = ProductAssociation.objects.select_related(
+        'target_product', 'target_product__manufacturer'
+    ).in_bulk([pk for pk, _ in scores])
+    ranked = []
+    for pk, exact_match in scores:
+        if pk in loaded:
+            loaded[pk].exact_match = bool(exact_match)
+            ranked.append(loaded[pk])
+
+    _lookups.set(key, ranked, getattr(settings, 'ASSOCIATION_LOOKUP_CACHE_SECONDS', 30))
+    return list(ranked)
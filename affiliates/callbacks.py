@@ -0,0 +1,278 @@
+"""
+Puppeteer callbacks: accepted in the request, processed in the background.
+
+The callback views used to do all the work inline: manufacturer, product,
+affiliate link, offer and association writes plus Redis status updates,
+while the worker's HTTP client waited. A burst of callbacks tied up web
+workers and timed the worker out. Now a callback request only:
+
+1. validates the JSON payload,
+2. stores it as a PuppeteerCallback row (unique per kind and task id, so a
+   repeated callback is a no-op),
+3. acknowledges the task's queue message (affiliates/task_queue.py),
+4. answers 202.
+
+process_callback() then runs the old handler (process_*_callback in
+views.py) in one transaction, under a row lock so duplicate kicks can't
+process a callback twice. It is queued with django-q once the row commits.
+The handlers write task statuses, release single-flight leases and publish
+notifications through AfterCommitRedis, so pollers never see a result whose
+rows rolled back (a 500 discards them with the handler's savepoint).
+process_pending_callbacks(), scheduled every minute, catches rows whose
+kick was lost and retries failures up to PUPPETEER_CALLBACK_MAX_ATTEMPTS.
+With PUPPETEER_CALLBACKS_ASYNC off (local development without a qcluster)
+the callback is processed right after it is stored.
+
+Both steps record their duration in Redis lists, reported as p50/p95 by
+callback_timing() and ``manage.py puppeteer_queue``.
+"""
+
+import json
+import logging
+import time
+from datetime import timedelta
+
+import redis
+from django.conf import settings
+from django.db import transaction
+from django.http import HttpResponse
+from django.utils import timezone
+
+from .models import PuppeteerCallback
+from .task_queue import ack_task
+
+logger = logging.getLogger('affiliate_tasks')
+
+TIMING_KEY_PREFIX = 'puppeteer_callback_timing:'
+TIMING_SAMPLES = 1000
+TIMING_PATHS = ('accept', 'process')
+
+
+def _redis():
+    from .tasks import get_redis_connection
+    return redis.Redis(**get_redis_connection())
+
+
+class AfterCommitRedis:
+    """
+    Wraps a Redis client so its writes run once the current transaction commits.
+
+    Reads go straight through. Outside a transaction on_commit runs the write
+    immediately, so the handlers behave as before when called directly.
+    """
+
+    DEFERRED_COMMANDS = frozenset({'set', 'delete', 'publish', 'eval'})
+
+    def __init__(self, r):
+        self._r = r
+
+    def __getattr__(self, name):
+        command = getattr(self._r, name)
+        if name not in self.DEFERRED_COMMANDS:
+            return command
+
+        def deferred(*args, **kwargs):
+            transaction.on_commit(lambda: command(*args, **kwargs))
+        return deferred
+
+
+def record_timing(r, path, elapsed_ms):
+    """Keep the latest TIMING_SAMPLES durations of a path ('accept' or 'process')"""
+    pipe = r.pipeline(transaction=False)
+    pipe.lpush(f"{TIMING_KEY_PREFIX}{path}", round(elapsed_ms, 2))
+    pipe.ltrim(f"{TIMING_KEY_PREFIX}{path}", 0, TIMING_SAMPLES - 1)
+    pipe.execute()
+
+
+def callback_timing(r=None):
+    """
+    Recent callback durations.
+
+    Returns:
+        dict: path -> {count, p50_ms, p95_ms}
+    """
+    r = r or _redis()
+    timing = {}
+    for path in TIMING_PATHS:
+        samples = sorted(float(sample) for sample in r.lrange(f"{TIMING_KEY_PREFIX}{path}", 0, -1))
+        timing[path] = {
+            'count': len(samples),
+            'p50_ms': samples[len(samples) // 2] if samples else 0.0,
+            'p95_ms': samples[min(len(samples) - 1, int(len(samples) * 0.95))] if samples else 0.0,
+        }
+    return timing
+
+
+def _validation_error(data):
+    if not isinstance(data, dict):
+        return "JSON object required"
+    for field in ('error', 'affiliateUrl', 'taskId'):
+        if data.get(field) is not None and not isinstance(data[field], str):
+            return f"{field} must be a string"
+    for field in ('productData', 'selectedProduct'):
+        if data.get(field) is not None and not isinstance(data[field], dict):
+            return f"{field} must be an object"
+    return None
+
+
+def receive_callback(request, kind, task_id=None):
+    """
+    Validate and store a worker callback, then answer without processing it.
+
+    Args:
+        kind: 'affiliate', 'standalone' or 'search'
+        task_id: From the URL; search callbacks carry it as taskId in the body
+    """
+    started = time.perf_counter()
+    if request.method != 'POST':
+        return HttpResponse("POST method required", status=405)
+
+    try:
+        data = json.loads(request.body)
+    except ValueError:
+        return HttpResponse("Invalid JSON", status=400)
+    problem = _validation_error(data)
+    if problem:
+        return HttpResponse(problem, status=400)
+
+    task_id = task_id or data.get('taskId')
+    if not task_id:
+        logger.error(f"No task_id provided in {kind} callback")
+        return HttpResponse("task_id required", status=400)
+    if len(task_id) > 64:
+        return HttpResponse("task_id too long", status=400)
+
+    callback, created = PuppeteerCallback.objects.get_or_create(
+        kind=kind, task_id=task_id, defaults={'payload': data}
+    )
+    if created:
+        callback_id = callback.id
+        transaction.on_commit(lambda: _kick(callback_id))
+
+    try:
+        r = _redis()
+        # Stored durably: the queued task is done whatever processing makes of it
+        ack_task(r, task_id)
+        record_timing(r, 'accept', (time.perf_counter() - started) * 1000)
+    except redis.RedisError as e:
+        logger.warning(f"⚠️ Could not ack {kind} task {task_id}: {str(e)}")
+
+    if not created:
+        logger.info(f"Duplicate {kind} callback for task {task_id} ignored")
+        return HttpResponse("Already received", status=200)
+    logger.info(f"📥 Accepted {kind} callback for task {task_id}")
+    return HttpResponse("Accepted", status=202)
+
+
+def _kick(callback_id):
+    if not getattr(settings, 'PUPPETEER_CALLBACKS_ASYNC', True):
+        process_callback(callback_id)
+        return
+    try:
+        from django_q.tasks import async_task
+        async_task('affiliates.callbacks.process_callback', callback_id, group='puppeteer_callbacks')
+    except Exception as e:
+        # process_pending_callbacks picks the row up
+        logger.warning(f"Could not queue callback processing for #{callback_id}: {str(e)}")
+
+
+def _run_handler(callback):
+    from . import views
+
+    if callback.kind == 'affiliate':
+        return views.process_affiliate_callback(callback.task_id, callback.payload)
+    if callback.kind == 'standalone':
+        return views.process_standalone_callback(callback.task_id, callback.payload)
+    return views.process_search_callback({**callback.payload, 'taskId': callback.task_id})
+
+
+def process_callback(callback_id):
+    """
+    Apply one stored callback; a no-op unless it is still PENDING.
+
+    Returns:
+        int: The handler's status (what the worker used to get back), or
+        None when there was nothing to do
+    """
+    with transaction.atomic():
+        callback = PuppeteerCallback.objects.select_for_update().filter(pk=callback_id).first()
+        if callback is None or callback.status != 'PENDING':
+            return None
+
+        started = time.perf_counter()
+        try:
+            with transaction.atomic():
+                status, message = _run_handler(callback)
+                if status >= 500:
+                    # Leave no half-written product behind for the retry
+                    transaction.set_rollback(True)
+        except Exception as e:
+            # Count it as a failed attempt, or the row would be retried forever
+            logger.error(f"Error processing {callback.kind} callback {callback.task_id}: {str(e)}", exc_info=True)
+            status, message = 500, f"Error: {str(e)}"
+        elapsed_ms = (time.perf_counter() - started) * 1000
+
+        callback.attempts += 1
+        callback.result_status = status
+        callback.result_message = str(message)[:2000]
+        callback.processing_ms = round(elapsed_ms)
+        if status < 500:
+            callback.status = 'DONE'
+        elif callback.attempts >= getattr(settings, 'PUPPETEER_CALLBACK_MAX_ATTEMPTS', 3):
+            callback.status = 'FAILED'
+        if callback.status != 'PENDING':
+            callback.processed_at = timezone.now()
+        callback.save(update_fields=[
+            'attempts', 'result_status', 'result_message', 'processing_ms', 'status', 'processed_at',
+        ])
+
+    try:
+        record_timing(_redis(), 'process', elapsed_ms)
+    except redis.RedisError:
+        pass
+    logger.info(
+        f"{'✅' if status < 500 else '❌'} Processed {callback.kind} callback {callback.task_id}: "
+        f"{status} {message} in {elapsed_ms:.0f}ms"
+    )
+    return status
+
+
+def process_pending_callbacks(batch_size=100, older_than_seconds=30):
+    """
+    Process callbacks still PENDING `older_than_seconds` after they arrived
+    (a lost kick, or a retry after a failure).
+
+    Returns:
+        int: Number of callbacks processed
+    """
+    cutoff = timezone.now() - timedelta(seconds=older_than_seconds)
+    callback_ids = list(
+        PuppeteerCallback.objects.filter(status='PENDING', received_at__lte=cutoff)
+        .order_by('received_at').values_list('id', flat=True)[:batch_size]
+    )
+    for callback_id in callback_ids:
+        process_callback(callback_id)
+    return len(callback_ids)
+
+
+def schedule_callback_processor():
+    """
+    Schedule process_pending_callbacks to run every minute
+
+    Returns:
+        str: Scheduled task ID, or None when already scheduled
+    """
+    from django_q.tasks import schedule
+    from django_q.models import Schedule
+
+    if Schedule.objects.filter(name='process_pending_puppeteer_callbacks').exists():
+        return None
+    task_id = schedule(
+        'affiliates.callbacks.process_pending_callbacks',
+        schedule_type=Schedule.MINUTES,
+        minutes=1,
+        name='process_pending_puppeteer_callbacks',
+        repeats=-1  # Repeat indefinitely
+    )
+    logger.info(f"📅 Scheduled Puppeteer callback processor: {task_id}")
+    return task_id
@@ -0,0 +1,267 @@
+"""
+Deadlines for Puppeteer tasks, swept in bulk from one Redis sorted set.
+
+Each queued task used to create its own one-off django-q Schedule row
+(``safety_check_search_{task_id}``, ``safety_check_affiliate_{task_id}``)
+to check an hour later whether its callback ever arrived. Under load that
+is thousands of rows the qcluster scheduler scans every tick. Now
+scheduling a check is one ``ZADD``::
+
+    puppeteer:deadlines   member '{kind}:{task_id}', score = unix deadline
+
+and sweep_deadlines(), scheduled every minute, pops due members in batches
+and expires the ones still waiting for their callback, a kind at a time
+with pipelined reads and writes. Members are claimed with ZREM, so
+overlapping sweeps never handle a task twice; if a handler raises, the
+claimed members are added back, still due, for the next sweep. Tasks that
+completed are simply dropped: callbacks don't need to touch the set.
+
+Kinds: 'search' (generate_affiliate_url_from_search), 'affiliate'
+(generate_amazon_affiliate_url) and 'standalone'
+(generate_standalone_amazon_affiliate_url).
+"""
+
+import json
+import logging
+import time
+
+import redis
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+
+from .models import AffiliateLink
+
+logger = logging.getLogger('affiliate_tasks')
+
+DEADLINES_KEY = 'puppeteer:deadlines'
+SEARCH = 'search'
+AFFILIATE = 'affiliate'
+STANDALONE = 'standalone'
+TIMEOUT_ERROR = "Generation timed out after 1 hour"
+SEARCH_TIMEOUT_ERROR = "Search task timed out after 1 hour"
+
+# Legacy per-task schedules migrate_safety_check_schedules() converts
+LEGACY_SCHEDULE_KINDS = {
+    'affiliates.tasks.check_stalled_search_task': SEARCH,
+    'affiliates.tasks.check_stalled_affiliate_task': AFFILIATE,
+    'affiliates.tasks.check_stalled_standalone_task': STANDALONE,
+}
+
+
+def _redis():
+    from .tasks import get_redis_connection
+    return redis.Redis(**get_redis_connection())
+
+
+def add_deadline(r, kind, task_id, seconds=None):
+    """Expire task_id (unless its callback arrived) after `seconds` (default STALLED_TASK_TIMEOUT_SECONDS)"""
+    seconds = seconds or getattr(settings, 'STALLED_TASK_TIMEOUT_SECONDS', 3600)
+    r.zadd(DEADLINES_KEY, {f"{kind}:{task_id}": time.time() + seconds})
+
+
+def _values(r, keys):
+    pipe = r.pipeline(transaction=False)
+    for key in keys:
+        pipe.get(key)
+    return pipe.execute()
+
+
+def expire_search_tasks(r, task_ids):
+    """Record a timeout for searches with no status yet; returns the number expired"""
+    from .single_flight import finish_flight
+
+    statuses = _values(r, [f"search_task_status:{task_id}" for task_id in task_ids])
+    stalled = [task_id for task_id, status in zip(task_ids, statuses) if not status]
+    if not stalled:
+        return 0
+
+    pending = _values(r, [f"pending_search_task:{task_id}" for task_id in stalled])
+    pipe = r.pipeline(transaction=False)
+    for task_id, pending_task in zip(stalled, pending):
+        error_data = {
+            "status": "error",
+            "error": SEARCH_TIMEOUT_ERROR,
+            "searchTerm": json.loads(pending_task).get('searchTerm') if pending_task else None,
+            "timestamp": timezone.now().isoformat()
+        }
+        pipe.set(f"search_task_status:{task_id}", json.dumps(error_data), ex=3600)
+        # Older clients read the safety check's key
+        pipe.set(f"search_result:{task_id}", json.dumps(error_data), ex=3600)
+        pipe.delete(f"pending_search_task:{task_id}")
+    pipe.execute()
+
+    for task_id in stalled:
+        finish_flight(r, task_id, error=SEARCH_TIMEOUT_ERROR)
+    return len(stalled)
+
+
+def expire_affiliate_tasks(r, task_ids):
+    """Mark links whose affiliate task never called back as failed; returns the number expired"""
+    link_ids = _values(r, [f"pending_affiliate_task:{task_id}" for task_id in task_ids])
+    stalled = [(task_id, int(link_id)) for task_id, link_id in zip(task_ids, link_ids) if link_id]
+    if not stalled:
+        return 0
+
+    AffiliateLink.objects.filter(pk__in=[link_id for _, link_id in stalled]).update(
+        affiliate_url="ERROR: Generation timed out",
+        updated_at=timezone.now(),
+    )
+    # update() skips the post_save that bumps the public catalog version
+    from products.catalog_version import bump_catalog_version
+    transaction.on_commit(bump_catalog_version)
+
+    pipe = r.pipeline(transaction=False)
+    for task_id, link_id in stalled:
+        pipe.set(f"affiliate_task_status:{task_id}", json.dumps({
+            "affiliate_link_id": link_id,
+            "status": "error",
+            "affiliate_url": None,
+            "error": TIMEOUT_ERROR,
+            "timestamp": timezone.now().isoformat()
+        }), ex=3600)
+        pipe.delete(f"pending_affiliate_task:{task_id}")
+    pipe.execute()
+    return len(stalled)
+
+
+def expire_standalone_tasks(r, task_ids):
+    """Record a timeout for standalone ASIN tasks still pending; returns the number expired"""
+    from .single_flight import finish_flight
+
+    asins = _values(r, [f"pending_standalone_task:{task_id}" for task_id in task_ids])
+    stalled = [task_id for task_id, asin in zip(task_ids, asins) if asin]
+    if not stalled:
+        return 0
+
+    pipe = r.pipeline(transaction=False)
+    for task_id in stalled:
+        pipe.set(f"standalone_task_status:{task_id}", json.dumps({
+            "status": "error",
+            "affiliate_url": None,
+            "error": TIMEOUT_ERROR,
+            "timestamp": timezone.now().isoformat()
+        }), ex=3600)
+        pipe.delete(f"pending_standalone_task:{task_id}")
+    pipe.execute()
+
+    for task_id in stalled:
+        finish_flight(r, task_id, error=TIMEOUT_ERROR)
+    return len(stalled)
+
+
+EXPIRE_HANDLERS = {
+    SEARCH: expire_search_tasks,
+    AFFILIATE: expire_affiliate_tasks,
+    STANDALONE: expire_standalone_tasks,
+}
+
+
+def _claim_due(r, now, batch_size):
+    """Remove up to batch_size due members; returns those this sweep removed"""
+    due = r.zrangebyscore(DEADLINES_KEY, '-inf', now, start=0, num=batch_size)
+    if not due:
+        return []
+    pipe = r.pipeline(transaction=False)
+    for member in due:
+        pipe.zrem(DEADLINES_KEY, member)
+    return [member for member, removed in zip(due, pipe.execute()) if removed]
+
+
+def sweep_deadlines(r=None, batch_size=500, max_batches=100, now=None):
+    """
+    Expire tasks whose deadline passed without a callback.
+
+    Returns:
+        dict: due (deadlines popped) and expired (tasks marked as timed out) counts
+    """
+    r = r or _redis()
+    now = now or time.time()
+    counts = {'due': 0, 'expired': 0}
+    for _ in range(max_batches):
+        claimed = _claim_due(r, now, batch_size)
+        if not claimed:
+            break
+        counts['due'] += len(claimed)
+
+        by_kind = {}
+        for member in claimed:
+            kind, _, task_id = member.partition(':')
+            by_kind.setdefault(kind, []).append(task_id)
+        kinds = list(by_kind)
+        for position, kind in enumerate(kinds):
+            handler = EXPIRE_HANDLERS.get(kind)
+            if handler is None:
+                logger.warning(f"⚠️ Dropping {len(by_kind[kind])} deadlines of unknown kind '{kind}'")
+                continue
+            try:
+                counts['expired'] += handler(r, by_kind[kind])
+            except Exception:
+                # Put this kind's and the unhandled kinds' deadlines back, still due
+                unhandled = [f"{k}:{task_id}" for k in kinds[position:] for task_id in by_kind[k]]
+                r.zadd(DEADLINES_KEY, {member: now for member in unhandled})
+                logger.error(f"❌ Expiring {kind} tasks failed, {len(unhandled)} deadlines put back", exc_info=True)
+                raise
+
+    if counts['expired']:
+        logger.warning(f"⏰ Expired {counts['expired']} stalled Puppeteer tasks ({counts['due']} deadlines due)")
+    return counts
+
+
+def deadline_stats(r=None, now=None):
+    """Scheduled deadlines and how many are overdue"""
+    r = r or _redis()
+    now = now or time.time()
+    return {
+        'scheduled': r.zcard(DEADLINES_KEY),
+        'overdue': r.zcount(DEADLINES_KEY, '-inf', now),
+    }
+
+
+def migrate_safety_check_schedules(r=None):
+    """
+    Move pending one-off safety-check Schedule rows onto the sorted set.
+
+    Returns:
+        int: Number of Schedule rows converted (and deleted)
+    """
+    from django_q.models import Schedule
+
+    r = r or _redis()
+    migrated = 0
+    rows = Schedule.objects.filter(func__in=LEGACY_SCHEDULE_KINDS, schedule_type=Schedule.ONCE)
+    for schedule in rows.iterator():
+        try:
+            task_id = json.loads(schedule.args)[0]
+        except (TypeError, ValueError, IndexError):
+            # fix_scheduled_tasks era rows: a bare task id
+            task_id = (schedule.args or '').strip('"\' ')
+        if task_id:
+            deadline = schedule.next_run.timestamp() if schedule.next_run else time.time()
+            r.zadd(DEADLINES_KEY, {f"{LEGACY_SCHEDULE_KINDS[schedule.func]}:{task_id}": deadline})
+        schedule.delete()
+        migrated += 1
+    return migrated
+
+
+def schedule_deadline_sweeper():
+    """
+    Schedule sweep_deadlines to run every minute
+
+    Returns:
+        str: Scheduled task ID, or None when already scheduled
+    """
+    from django_q.tasks import schedule
+    from django_q.models import Schedule
+
+    if Schedule.objects.filter(name='sweep_puppeteer_deadlines').exists():
+        return None
+    task_id = schedule(
+        'affiliates.deadlines.sweep_deadlines',
+        schedule_type=Schedule.MINUTES,
+        minutes=1,
+        name='sweep_puppeteer_deadlines',
+        repeats=-1  # Repeat indefinitely
+    )
+    logger.info(f"📅 Scheduled Puppeteer deadline sweeper: {task_id}")
+    return task_id
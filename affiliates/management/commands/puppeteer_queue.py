@@ -0,0 +1,107 @@
+from django.core.management.base import BaseCommand
+
+from affiliates.callbacks import callback_timing, process_pending_callbacks, schedule_callback_processor
+from affiliates.deadlines import (
+    deadline_stats, migrate_safety_check_schedules, schedule_deadline_sweeper, sweep_deadlines,
+)
+from affiliates.task_queue import (
+    LANES, queue_stats, redeliver_stalled_tasks, requeue_dead_letters, schedule_redelivery,
+)
+
+
+class Command(BaseCommand):
+    help = 'Show Puppeteer task queue depth and age; redeliver, expire or requeue tasks'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--redeliver',
+            action='store_true',
+            help='Redeliver tasks past the visibility timeout now (normally scheduled every minute)',
+        )
+        parser.add_argument(
+            '--requeue-dead',
+            type=int,
+            metavar='N',
+            help='Move up to N dead-lettered tasks back to their lanes',
+        )
+        parser.add_argument(
+            '--sweep',
+            action='store_true',
+            help='Expire tasks past their deadline now (normally scheduled every minute)',
+        )
+        parser.add_argument(
+            '--migrate-safety-checks',
+            action='store_true',
+            help='Move per-task safety_check_* Schedule rows onto the deadline sorted set',
+        )
+        parser.add_argument(
+            '--schedule',
+            action='store_true',
+            help='Create the every-minute redelivery, deadline sweep and callback schedules if they do not exist',
+        )
+        parser.add_argument(
+            '--process-callbacks',
+            action='store_true',
+            help='Process stored callbacks still pending now (normally scheduled every minute)',
+        )
+
+    def handle(self, *args, **options):
+        if options['schedule']:
+            schedules = (
+                ('task redelivery', schedule_redelivery),
+                ('deadline sweep', schedule_deadline_sweeper),
+                ('callback processor', schedule_callback_processor),
+            )
+            for name, schedule in schedules:
+                task_id = schedule()
+                if task_id:
+                    self.stdout.write(self.style.SUCCESS(f"📅 Scheduled Puppeteer {name}: {task_id}"))
+                else:
+                    self.stdout.write(f"📅 Puppeteer {name} is already scheduled")
+
+        if options['migrate_safety_checks']:
+            migrated = migrate_safety_check_schedules()
+            self.stdout.write(self.style.SUCCESS(f"⏰ Moved {migrated} safety-check schedules to the deadline set"))
+
+        if options['redeliver']:
+            counts = redeliver_stalled_tasks()
+            self.stdout.write(self.style.SUCCESS(
+                f"🔁 Redelivered {counts['redelivered']} tasks, dead-lettered {counts['dead_lettered']}"
+            ))
+
+        if options['sweep']:
+            counts = sweep_deadlines()
+            self.stdout.write(self.style.SUCCESS(
+                f"⏰ {counts['due']} deadlines due, {counts['expired']} stalled tasks expired"
+            ))
+
+        if options['process_callbacks']:
+            processed = process_pending_callbacks(older_than_seconds=0)
+            self.stdout.write(self.style.SUCCESS(f"📥 Processed {processed} pending callbacks"))
+
+        if options['requeue_dead']:
+            requeued = requeue_dead_letters(limit=options['requeue_dead'])
+            self.stdout.write(self.style.SUCCESS(f"📬 Requeued {requeued} dead-lettered tasks"))
+
+        stats = queue_stats()
+        self.stdout.write(f"{'lane':<12} {'depth':>7} {'waiting':>8} {'in flight':>10} {'oldest':>9}")
+        for lane in LANES:
+            lane_stats = stats[lane]
+            self.stdout.write(
+                f"{lane:<12} {lane_stats['depth']:>7} {lane_stats['waiting']:>8} "
+                f"{lane_stats['in_flight']:>10} {lane_stats['oldest_age_seconds']:>8.0f}s"
+            )
+        dead = stats['dead_letters']
+        line = f"{'dead':<12} {dead['depth']:>7} {'':>8} {'':>10} {dead['oldest_age_seconds']:>8.0f}s"
+        self.stdout.write(self.style.WARNING(line) if dead['depth'] else line)
+
+        deadlines = deadline_stats()
+        self.stdout.write(f"\n⏰ {deadlines['scheduled']} task deadlines scheduled, {deadlines['overdue']} overdue")
+
+        timing = callback_timing()
+        for path, label in (('accept', 'callback accept'), ('process', 'callback processing')):
+            path_timing = timing[path]
+            self.stdout.write(
+                f"⏱️ {label}: p50 {path_timing['p50_ms']:.1f}ms, p95 {path_timing['p95_ms']:.1f}ms "
+                f"({path_timing['count']} samples)"
+            )
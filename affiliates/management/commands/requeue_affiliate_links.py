@@ -1,10 +1,8 @@
 from django.core.management.base import BaseCommand
-from affiliates.tasks import requeue_pending_affiliate_links
-from django.db import models
-from affiliates.models import AffiliateLink
+from affiliates.requeue import clear_checkpoint, get_checkpoint, pending_links, run_requeue
 
 class Command(BaseCommand):
-    help = 'Requeue affiliate links that are missing their affiliate URLs'
+    help = 'Requeue affiliate links that are missing their affiliate URLs (rate-limited, most popular first, resumable)'
 
     def add_arguments(self, parser):
         parser.add_argument(
@@ -22,39 +20,74 @@ class Command(BaseCommand):
             action='store_true',
             help='Only count links, do not requeue',
         )
+        parser.add_argument(
+            '--rate',
+            type=int,
+            help='Target tasks per second (default AFFILIATE_REQUEUE_RATE_PER_SECOND)',
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            help='Links per page (default AFFILIATE_REQUEUE_BATCH_SIZE)',
+        )
+        parser.add_argument(
+            '--max-backlog',
+            type=int,
+            help='Pause while the bulk lane holds this many tasks (default AFFILIATE_REQUEUE_MAX_BACKLOG)',
+        )
+        parser.add_argument(
+            '--restart',
+            action='store_true',
+            help='Discard the saved checkpoint and start from the most popular link',
+        )
 
     def handle(self, *args, **options):
         platform = options.get('platform')
         limit = options.get('limit')
         dry_run = options.get('dry_run')
-        
+
         if dry_run:
             # Just count and report
-            queryset = AffiliateLink.objects.filter(
-                models.Q(affiliate_url='') | 
-                models.Q(affiliate_url__startswith='ERROR:')
-            )
-            
-            if platform:
-                queryset = queryset.filter(platform=platform)
-                
-            count = queryset.count()
+            count = pending_links(platform).count()
             self.stdout.write(f"Found {count} affiliate links to requeue")
-            
+
             if platform:
                 self.stdout.write(f"Platform filter: {platform}")
-            
+
             if limit:
                 self.stdout.write(f"Would process only {min(limit, count)} links due to limit={limit}")
+
+            checkpoint = get_checkpoint(platform)
+            if checkpoint and not options['restart']:
+                self.stdout.write(
+                    f"▶️ Would resume after link {checkpoint['id']} (priority {checkpoint['priority']}), "
+                    f"{checkpoint['dispatched']} already requeued as of {checkpoint['updated_at']}"
+                )
         else:
+            if options['restart']:
+                clear_checkpoint(platform)
+
             # Actually requeue
-            results = requeue_pending_affiliate_links(platform, limit)
-            
+            results = run_requeue(
+                platform=platform,
+                limit=limit,
+                rate=options.get('rate'),
+                batch_size=options.get('batch_size'),
+                max_backlog=options.get('max_backlog'),
+            )
+
+            if results['resumed']:
+                self.stdout.write("▶️ Resumed from the saved checkpoint")
             self.stdout.write(self.style.SUCCESS(
                 f"Requeued {results['success']} affiliate links, with {results['errors']} errors"
             ))
-            
-            if results['total_found'] > results['processed']:
+
+            if results['stopped'] == 'backpressure':
+                self.stdout.write(self.style.WARNING(
+                    "⏸️ Stopped: the bulk lane stayed full. Run again to resume from the checkpoint"
+                ))
+            elif results['stopped'] == 'limit':
                 self.stdout.write(
-                    f"Note: Only processed {results['processed']} out of {results['total_found']} found links"
-                ) 
\ No newline at end of file
+                    f"Note: Only processed {results['processed']} out of {results['total_found']} found links; "
+                    f"run again to continue from the checkpoint"
+                )
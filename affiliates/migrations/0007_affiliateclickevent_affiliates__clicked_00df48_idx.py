@@ -0,0 +1,17 @@
+# Generated by Django 4.2.7 on 2026-10-18 21:08
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('affiliates', '0006_affiliateclickevent_purchaseintentevent_and_more'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='affiliateclickevent',
+            index=models.Index(fields=['clicked_at', 'id'], name='affiliates__clicked_00df48_idx'),
+        ),
+    ]
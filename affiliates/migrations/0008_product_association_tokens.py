@@ -0,0 +1,37 @@
+# Generated by Django 4.2.7 on 2026-10-18 21:53
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+def index_existing_search_terms(apps, schema_editor):
+    """Tokenize the search terms of existing associations"""
+    from affiliates.association_index import index_missing_association_tokens
+
+    index_missing_association_tokens(
+        apps.get_model('affiliates', 'ProductAssociation'),
+        apps.get_model('affiliates', 'ProductAssociationToken'),
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('affiliates', '0007_affiliateclickevent_affiliates__clicked_00df48_idx'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ProductAssociationToken',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('token', models.CharField(max_length=256)),
+                ('association', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='tokens', to='affiliates.productassociation')),
+            ],
+        ),
+        migrations.AddConstraint(
+            model_name='productassociationtoken',
+            constraint=models.UniqueConstraint(fields=('token', 'association'), name='unique_association_token'),
+        ),
+        migrations.RunPython(index_existing_search_terms, migrations.RunPython.noop),
+    ]
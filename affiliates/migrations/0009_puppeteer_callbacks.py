@@ -0,0 +1,36 @@
+# Generated by Django 4.2.7 on 2026-10-18 22:05
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('affiliates', '0008_product_association_tokens'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PuppeteerCallback',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('kind', models.CharField(choices=[('affiliate', 'Affiliate link'), ('standalone', 'Standalone ASIN'), ('search', 'Amazon search')], max_length=20)),
+                ('task_id', models.CharField(max_length=64)),
+                ('payload', models.JSONField(default=dict)),
+                ('status', models.CharField(choices=[('PENDING', 'Pending'), ('DONE', 'Done'), ('FAILED', 'Failed')], default='PENDING', max_length=10)),
+                ('attempts', models.PositiveSmallIntegerField(default=0)),
+                ('result_status', models.PositiveSmallIntegerField(blank=True, null=True)),
+                ('result_message', models.TextField(blank=True)),
+                ('processing_ms', models.PositiveIntegerField(blank=True, null=True)),
+                ('received_at', models.DateTimeField(auto_now_add=True)),
+                ('processed_at', models.DateTimeField(blank=True, null=True)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['status', 'received_at'], name='affiliates__status_83446b_idx')],
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='puppeteercallback',
+            constraint=models.UniqueConstraint(fields=('kind', 'task_id'), name='unique_puppeteer_callback'),
+        ),
+    ]
@@ -290,6 +290,74 @@ class ProductAssociation(models.Model):
             return 0.0
         return (self.conversion_count / self.click_count) * 100
 
+class ProductAssociationToken(models.Model):
+    """Normalized search-term token of a ProductAssociation (affiliates/association_index.py)"""
+
+    association = models.ForeignKey(
+        ProductAssociation,
+        on_delete=models.CASCADE,
+        related_name='tokens'
+    )
+    # A word of the search term, or '=' + the whole normalized term for exact matches
+    token = models.CharField(max_length=256)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=['token', 'association'],
+                name='unique_association_token'
+            )
+        ]
+
+    def __str__(self):
+        return f"{self.token} → {self.association_id}"
+
+class PuppeteerCallback(models.Model):
+    """
+    A Puppeteer worker callback, stored as received and processed by
+    affiliates.callbacks.process_callback outside the HTTP request.
+    One row per (kind, task_id), so repeated callbacks are no-ops.
+    """
+
+    KINDS = [
+        ('affiliate', 'Affiliate link'),
+        ('standalone', 'Standalone ASIN'),
+        ('search', 'Amazon search'),
+    ]
+    STATUSES = [
+        ('PENDING', 'Pending'),
+        ('DONE', 'Done'),
+        ('FAILED', 'Failed'),
+    ]
+
+    kind = models.CharField(max_length=20, choices=KINDS)
+    task_id = models.CharField(max_length=64)
+    payload = models.JSONField(default=dict)
+
+    status = models.CharField(max_length=10, choices=STATUSES, default='PENDING')
+    attempts = models.PositiveSmallIntegerField(default=0)
+    # What the inline handler used to answer the worker with
+    result_status = models.PositiveSmallIntegerField(null=True, blank=True)
+    result_message = models.TextField(blank=True)
+    processing_ms = models.PositiveIntegerField(null=True, blank=True)
+
+    received_at = models.DateTimeField(auto_now_add=True)
+    processed_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=['kind', 'task_id'],
+                name='unique_puppeteer_callback'
+            )
+        ]
+        indexes = [
+            models.Index(fields=['status', 'received_at']),
+        ]
+
+    def __str__(self):
+        return f"{self.kind} callback {self.task_id} ({self.status})"
+
 class AffiliateClickEvent(models.Model):
     """Track affiliate link clicks detected by the browser extension"""
     
@@ -375,6 +443,7 @@ class AffiliateClickEvent(models.Model):
             models.Index(fields=['affiliate_link', 'clicked_at']),
             models.Index(fields=['session_id']),
             models.Index(fields=['target_domain']),
+            models.Index(fields=['clicked_at', 'id']),
         ]
     
     def __str__(self):
@@ -642,47 +711,29 @@ class PurchaseIntentEvent(models.Model):
     
     def create_referral_disbursements(self, wallet_transaction, commission_amount):
         """Create referral disbursements for user's active codes (locked at purchase time)"""
-        from users.models import UserReferralCode, ReferralDisbursement
+        from users.models import ReferralDisbursement
         from users.services import ReferralCodeService
         
-        # Get user's active codes at purchase time
-        active_codes = UserReferralCode.objects.filter(
-            user=self.user,
-            is_active=True
-        ).select_related('referral_code', 'referral_code__promotion')
-        
-        # Filter codes that are within valid promotion timeline
-        valid_codes = []
-        for user_code in active_codes:
-            promotion = user_code.referral_code.promotion
-            if (promotion and promotion.is_active and 
-                promotion.is_purchase_period_open()):
-                valid_codes.append(user_code)
+        # Precomputed allocation for the user's codes with open promotion windows
+        allocation = ReferralCodeService.get_purchase_allocation(self.user)
         
-        if not valid_codes:
+        if not allocation.codes:
             print(f"[DEBUG] No valid referral codes for user {self.user.id}")
             return
         
-        # Calculate allocations for valid codes only (locked at purchase time)
-        allocations = ReferralCodeService.calculate_user_allocations(self.user)
-        
-        print(f"[DEBUG] Creating disbursements for {len(valid_codes)} valid codes")
-        
         # Create disbursement records (immutable)
-        for user_code in valid_codes:
-            code_id = user_code.referral_code.id
-            if code_id in allocations.get('codes', {}):
-                disbursement_amount = commission_amount * (Decimal(str(allocations['codes'][code_id])) / Decimal('100'))
-                
-                disbursement = ReferralDisbursement.objects.create(
-                    wallet_transaction=wallet_transaction,
-                    referral_code=user_code.referral_code,
-                    recipient_user=user_code.referral_code.owner,
-                    amount=disbursement_amount,
-                    allocation_percentage=allocations['codes'][code_id],
-                    status='pending'
-                )
-                
-                print(f"[DEBUG] Created disbursement {disbursement.id}: ${disbursement_amount} to {user_code.referral_code.owner.email}")
+        disbursements = []
+        for code in allocation.codes:
+            percentage = Decimal(code['percentage'])
+            disbursements.append(ReferralDisbursement(
+                wallet_transaction=wallet_transaction,
+                referral_code_id=code['referral_code_id'],
+                recipient_user_id=code['recipient_user_id'],
+                amount=commission_amount * (percentage / Decimal('100')),
+                allocation_percentage=percentage.quantize(Decimal('0.01')),
+                status='pending'
+            ))
+        
+        ReferralDisbursement.objects.bulk_create(disbursements)
         
-        print(f"[DEBUG] Created {len(valid_codes)} referral disbursements for user {self.user.id}")
\ No newline at end of file
+        print(f"[DEBUG] Created {len(disbursements)} referral disbursements for user {self.user.id}")
\ No newline at end of file
@@ -0,0 +1,225 @@
+"""
+Rate-limited bulk requeue of affiliate links still missing their URL.
+
+requeue_pending_affiliate_links() used to load every pending link and
+queue one task per link in a tight loop, flooding the Puppeteer worker.
+run_requeue() instead:
+
+- pages through pending links not already in flight with keyset iteration, most popular first
+  (link clicks plus the product's future_demand_count, then id), so a run
+  never re-reads skipped rows with OFFSET;
+- queues each page with pipelined Redis writes (pending keys and deadlines
+  in one round trip, the bulk lane stream through task_queue.enqueue_tasks);
+- holds a target rate (AFFILIATE_REQUEUE_RATE_PER_SECOND) and pauses while
+  the bulk lane already holds AFFILIATE_REQUEUE_MAX_BACKLOG tasks, giving
+  up after AFFILIATE_REQUEUE_MAX_WAIT_SECONDS;
+- checkpoints its cursor in Redis after every page, so a stopped run
+  (Ctrl-C, deploy, backpressure timeout) resumes where it left off.
+
+Popularity can change during a run; a link that moves ahead of the cursor
+is picked up by the next run.
+"""
+
+import json
+import logging
+import time
+import uuid
+from datetime import timedelta
+
+import redis
+from django.conf import settings
+from django.db import models
+from django.utils import timezone
+
+from .deadlines import AFFILIATE, add_deadline
+from .models import AffiliateLink
+from .task_queue import BULK, STREAMS, enqueue_tasks
+
+logger = logging.getLogger('affiliate_tasks')
+
+CHECKPOINT_KEY_PREFIX = 'affiliate_requeue:checkpoint:'
+CHECKPOINT_SECONDS = 7 * 86400
+
+
+def _redis():
+    from .tasks import get_redis_connection
+    return redis.Redis(**get_redis_connection())
+
+
+def pending_links(platform=None):
+    """
+    Links missing their affiliate URL, annotated with priority, in dispatch order.
+
+    Links already dispatched are left alone until their task's deadline
+    (STALLED_TASK_TIMEOUT_SECONDS) has passed.
+    """
+    in_flight_since = timezone.now() - timedelta(seconds=getattr(settings, 'STALLED_TASK_TIMEOUT_SECONDS', 3600))
+    queryset = AffiliateLink.objects.filter(
+        models.Q(affiliate_url='') |
+        models.Q(affiliate_url__startswith='ERROR:')
+    ).exclude(is_processing=True, processing_started_at__gte=in_flight_since)
+    if platform:
+        queryset = queryset.filter(platform=platform)
+    return queryset.annotate(
+        priority=models.F('clicks') + models.F('product__future_demand_count')
+    ).order_by('-priority', 'id')
+
+
+def _checkpoint_key(platform):
+    return f"{CHECKPOINT_KEY_PREFIX}{platform or 'all'}"
+
+
+def get_checkpoint(platform=None, r=None):
+    """The saved cursor ({priority, id, dispatched, errors, updated_at}), or None"""
+    r = r or _redis()
+    checkpoint = r.get(_checkpoint_key(platform))
+    return json.loads(checkpoint) if checkpoint else None
+
+
+def clear_checkpoint(platform=None, r=None):
+    r = r or _redis()
+    r.delete(_checkpoint_key(platform))
+
+
+def _save_checkpoint(r, platform, cursor, results):
+    r.set(_checkpoint_key(platform), json.dumps({
+        'priority': cursor[0],
+        'id': cursor[1],
+        'dispatched': results['success'],
+        'errors': results['errors'],
+        'updated_at': timezone.now().isoformat(),
+    }), ex=CHECKPOINT_SECONDS)
+
+
+def _after(queryset, cursor):
+    priority, link_id = cursor
+    return queryset.filter(
+        models.Q(priority__lt=priority) |
+        models.Q(priority=priority, id__gt=link_id)
+    )
+
+
+def _dispatch(r, links):
+    """Queue affiliate tasks for a page of amazon links on the bulk lane"""
+    base_url = getattr(settings, 'BASE_URL', 'http://localhost:8000')
+    tasks = []
+    pipe = r.pipeline(transaction=False)
+    for link in links:
+        task_id = str(uuid.uuid4())
+        pipe.set(f"pending_affiliate_task:{task_id}", link.id, ex=86400)  # 24hr expiry
+        add_deadline(pipe, AFFILIATE, task_id)
+        tasks.append({
+            "type": "amazon_affiliate",
+            "taskType": "amazon_affiliate",
+            "asin": link.platform_id,
+            "taskId": task_id,
+            "callbackUrl": f"{base_url}/api/affiliate/callback/{task_id}/"
+        })
+    pipe.execute()
+    enqueue_tasks(r, tasks, lane=BULK)
+
+    AffiliateLink.objects.filter(pk__in=[link.id for link in links]).update(
+        is_processing=True,
+        processing_started_at=timezone.now(),
+    )
+
+
+def _wait_for_room(r, max_backlog, max_wait, sleep, clock):
+    """
+    Wait until the bulk lane is below max_backlog.
+
+    Returns:
+        int: Free slots in the lane, or 0 when max_wait ran out
+    """
+    deadline = clock() + max_wait
+    while True:
+        room = max_backlog - r.xlen(STREAMS[BULK])
+        if room > 0:
+            return room
+        if clock() >= deadline:
+            return 0
+        logger.info(f"⏸️ Bulk lane holds {max_backlog - room} tasks, pausing requeue")
+        sleep(min(5, max(0.0, deadline - clock())))
+
+
+def run_requeue(platform=None, limit=None, r=None, rate=None, batch_size=None, max_backlog=None,
+                max_wait=None, restart=False, sleep=time.sleep, clock=time.monotonic):
+    """
+    Requeue pending affiliate links on the bulk lane, most popular first.
+
+    Args:
+        platform (str, optional): Filter by platform (e.g., 'amazon')
+        limit (int, optional): Stop after this many links in this run
+        rate: Target tasks per second (default AFFILIATE_REQUEUE_RATE_PER_SECOND)
+        batch_size: Links per page and pipeline (default AFFILIATE_REQUEUE_BATCH_SIZE)
+        max_backlog: Pause while the bulk lane holds this many tasks (default AFFILIATE_REQUEUE_MAX_BACKLOG)
+        max_wait: Seconds to wait for room before stopping (default AFFILIATE_REQUEUE_MAX_WAIT_SECONDS)
+        restart: Ignore a saved checkpoint and start from the most popular link
+
+    Returns:
+        dict: total_found, processed, success, errors, plus stopped
+        ('done', 'limit' or 'backpressure') and resumed (bool)
+    """
+    r = r or _redis()
+    rate = rate or getattr(settings, 'AFFILIATE_REQUEUE_RATE_PER_SECOND', 5)
+    batch_size = batch_size or getattr(settings, 'AFFILIATE_REQUEUE_BATCH_SIZE', 100)
+    max_backlog = max_backlog or getattr(settings, 'AFFILIATE_REQUEUE_MAX_BACKLOG', 1000)
+    max_wait = max_wait if max_wait is not None else getattr(settings, 'AFFILIATE_REQUEUE_MAX_WAIT_SECONDS', 600)
+
+    queryset = pending_links(platform)
+    results = {"total_found": queryset.count(), "processed": 0, "success": 0, "errors": 0,
+               "stopped": 'done', "resumed": False}
+
+    checkpoint = None if restart else get_checkpoint(platform, r=r)
+    cursor = None
+    if checkpoint:
+        cursor = (checkpoint['priority'], checkpoint['id'])
+        results['resumed'] = True
+        logger.info(f"▶️ Resuming requeue after link {cursor[1]} (priority {cursor[0]})")
+    logger.info(f"Starting requeue: platform={platform}, limit={limit}, {results['total_found']} pending, {rate}/s")
+
+    started = clock()
+    while True:
+        if limit and results['processed'] >= limit:
+            results['stopped'] = 'limit'
+            break
+        room = _wait_for_room(r, max_backlog, max_wait, sleep, clock)
+        if not room:
+            results['stopped'] = 'backpressure'
+            logger.warning(f"⏸️ Bulk lane stayed full for {max_wait}s, stopping requeue (checkpoint saved)")
+            break
+
+        size = min(batch_size, room, limit - results['processed'] if limit else batch_size)
+        page = _after(queryset, cursor) if cursor else queryset
+        links = list(page.only('id', 'platform', 'platform_id', 'clicks')[:size])
+        if not links:
+            clear_checkpoint(platform, r=r)
+            break
+
+        amazon_links = [link for link in links if link.platform == 'amazon']
+        for link in links:
+            if link.platform != 'amazon':
+                logger.warning(f"Unsupported platform: {link.platform}")
+        try:
+            if amazon_links:
+                _dispatch(r, amazon_links)
+            results['success'] += len(amazon_links)
+            results['errors'] += len(links) - len(amazon_links)
+        except Exception as e:
+            logger.error(f"Error requeuing {len(amazon_links)} affiliate links: {str(e)}", exc_info=True)
+            results['errors'] += len(links)
+        results['processed'] += len(links)
+
+        cursor = (links[-1].priority, links[-1].id)
+        if len(links) < size:
+            clear_checkpoint(platform, r=r)
+            break
+        _save_checkpoint(r, platform, cursor, results)
+
+        # Hold the target rate: the next page waits until this one is "paid for"
+        ahead = results['processed'] / rate - (clock() - started)
+        if ahead > 0:
+            sleep(ahead)
+
+    logger.info(f"Completed requeue: {results}")
+    return results
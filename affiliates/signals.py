@@ -0,0 +1,19 @@
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from .association_index import clear_lookup_cache, index_association_tokens
+from .models import ProductAssociation
+
+
+@receiver(post_save, sender=ProductAssociation)
+def index_association_search_term(sender, instance, created, update_fields=None, **kwargs):
+    if created or update_fields is None or 'original_search_term' in update_fields:
+        index_association_tokens(instance)
+    else:
+        # search_count, confidence or is_active changed the ranking
+        clear_lookup_cache()
+
+
+@receiver(post_delete, sender=ProductAssociation)
+def forget_association(sender, instance, **kwargs):
+    clear_lookup_cache()
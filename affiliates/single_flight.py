@@ -0,0 +1,121 @@
+"""
+Single-flight leases for Puppeteer scrapes.
+
+Every Amazon search or standalone ASIN request used to mint its own task id
+and publish its own scrape, so ten users searching the same product at once
+cost ten scrapes (and ten safety-check Schedule rows). Now the first caller
+takes a lease on the normalized search term or ASIN with an atomic
+``SET NX EX``; everyone arriving while the lease is held gets the leader's
+task id back and polls the same ``*_task_status:{task_id}`` key.
+
+Keys::
+
+    single_flight:{flight}           task id of the scrape in flight
+    single_flight_task:{task_id}     flight key, so callbacks can release it
+    single_flight_failed:{flight}    last error, for SINGLE_FLIGHT_FAILURE_SECONDS
+
+The callbacks call finish_flight() with the task id. The lease is deleted
+only if that task still holds it, and an error is cached for a short time
+so a term Amazon can't find isn't re-scraped on every request. A lease whose
+callback never arrives simply expires after SINGLE_FLIGHT_LEASE_SECONDS,
+which by default outlasts the task queue's redeliveries; each redelivery
+also refreshes the lease (refresh_flight()), so joiners keep polling the
+task that is still being retried instead of starting a second scrape.
+"""
+
+import json
+import logging
+
+from django.conf import settings
+from django.utils import timezone
+
+from .association_index import normalize_search_term
+
+logger = logging.getLogger('affiliate_tasks')
+
+LEASE_PREFIX = 'single_flight:'
+TASK_PREFIX = 'single_flight_task:'
+FAILED_PREFIX = 'single_flight_failed:'
+
+_RELEASE_LEASE_SCRIPT = """
+if redis.call('get', KEYS[1]) == ARGV[1] then
+    return redis.call('del', KEYS[1])
+end
+return 0
+"""
+
+
+def _lease_seconds():
+    return getattr(settings, 'SINGLE_FLIGHT_LEASE_SECONDS', 1200)
+
+
+def search_flight_key(search_term, search_type='part_number'):
+    return f"search:{search_type}:{normalize_search_term(search_term)}"
+
+
+def asin_flight_key(asin):
+    return f"asin:{(asin or '').strip().upper()}"
+
+
+def recent_failure(r, flight_key):
+    """The cached error of the last failed scrape for this key, or None"""
+    failed = r.get(f"{FAILED_PREFIX}{flight_key}")
+    return json.loads(failed) if failed else None
+
+
+def join_or_lead(r, flight_key, task_id, lease_seconds=None):
+    """
+    Take the lease for flight_key with task_id, or join the scrape holding it.
+
+    Returns:
+        tuple: (task_id to poll, True if the caller leads and must queue the task)
+    """
+    lease_seconds = lease_seconds or _lease_seconds()
+    lease_key = f"{LEASE_PREFIX}{flight_key}"
+    # Twice: the holder may finish between our SET and GET
+    for _ in range(2):
+        if r.set(lease_key, task_id, nx=True, ex=lease_seconds):
+            r.set(f"{TASK_PREFIX}{task_id}", flight_key, ex=lease_seconds)
+            return task_id, True
+        in_flight = r.get(lease_key)
+        if in_flight:
+            return in_flight, False
+    # Still contended: scrape rather than fail the caller
+    logger.warning(f"⚠️ Could not lease or join '{flight_key}', publishing without single-flight")
+    return task_id, True
+
+
+def refresh_flight(r, task_id, lease_seconds=None):
+    """
+    Give task_id's lease another lease_seconds, if it still holds one.
+
+    Returns:
+        bool: True if the lease was extended
+    """
+    lease_seconds = lease_seconds or _lease_seconds()
+    flight_key = r.get(f"{TASK_PREFIX}{task_id}")
+    if not flight_key or r.get(f"{LEASE_PREFIX}{flight_key}") != task_id:
+        return False
+    r.expire(f"{LEASE_PREFIX}{flight_key}", lease_seconds)
+    r.expire(f"{TASK_PREFIX}{task_id}", lease_seconds)
+    return True
+
+
+def finish_flight(r, task_id, error=None):
+    """
+    Release task_id's lease, caching error (if any) as a recent failure.
+
+    Safe to call for tasks that never held a lease.
+    """
+    flight_key = r.get(f"{TASK_PREFIX}{task_id}")
+    if not flight_key:
+        return
+    r.eval(_RELEASE_LEASE_SCRIPT, 1, f"{LEASE_PREFIX}{flight_key}", task_id)
+    r.delete(f"{TASK_PREFIX}{task_id}")
+    if error:
+        r.set(f"{FAILED_PREFIX}{flight_key}", json.dumps({
+            'task_id': task_id,
+            'error': str(error),
+            'timestamp': timezone.now().isoformat(),
+        }), ex=getattr(settings, 'SINGLE_FLIGHT_FAILURE_SECONDS', 300))
+        logger.info(f"🚫 Caching failed scrape for '{flight_key}': {error}")
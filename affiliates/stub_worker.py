@@ -0,0 +1,85 @@
+"""
+Stand-in for the Puppeteer worker, for tests and local development.
+
+Reads tasks from the queue lanes like the real worker (task_queue.read_next)
+and POSTs a canned result to each task's callbackUrl path, using the same
+payload shapes as the worker:
+
+    amazon_affiliate    {affiliateUrl, productData: {price}}
+    amazon_standalone   {affiliateUrl, productData: {title, price, ...}}
+    amazon_search       {taskId, affiliateUrl, productData: {asin, title, price, ...}}
+
+Pass respond= to return other payloads (an {'error': ...} dict to simulate a
+failed scrape, or None to drop the task without calling back, which leaves
+it for redelivery).
+"""
+
+import hashlib
+from urllib.parse import urlparse
+
+from .task_queue import read_next
+
+
+def _stub_asin(seed):
+    return 'B0' + hashlib.md5(seed.encode()).hexdigest()[:8].upper()
+
+
+def default_response(task):
+    """The callback payload of a successful scrape for this task"""
+    task_type = task.get('taskType') or task.get('type')
+    if task_type == 'amazon_search':
+        asin = _stub_asin(task['searchTerm'])
+        return {
+            'taskId': task['taskId'],
+            'affiliateUrl': f"https://amzn.to/{asin.lower()}",
+            'productData': {
+                'asin': asin,
+                'title': f"{task['searchTerm']} (stub)",
+                'price': '$19.99',
+                'image': '',
+                'url': f"https://www.amazon.com/dp/{asin}",
+            },
+        }
+
+    asin = task.get('asin', '')
+    payload = {
+        'affiliateUrl': f"https://amzn.to/{asin.lower()}",
+        'productData': {'price': '19.99'},
+    }
+    if task_type == 'amazon_standalone':
+        payload['productData'].update({'title': f"Stub product {asin}", 'description': '', 'image': ''})
+    return payload
+
+
+class StubPuppeteerWorker:
+    """
+    Args:
+        r: Redis connection the queue lives on
+        client: Anything with Django test Client's post(path, data, content_type=)
+        respond: task dict -> callback payload, or None to drop the task
+    """
+
+    def __init__(self, r, client, consumer='stub-worker', respond=default_response):
+        self.r = r
+        self.client = client
+        self.consumer = consumer
+        self.respond = respond
+
+    def run_once(self, concurrency=10):
+        """
+        Take up to `concurrency` tasks, interactive lane first, and call back.
+
+        Returns:
+            list of (lane, task, HTTP status or None when dropped)
+        """
+        results = []
+        for lane, _, task in read_next(self.r, self.consumer, count=concurrency):
+            payload = self.respond(task)
+            if payload is None:
+                results.append((lane, task, None))
+                continue
+            response = self.client.post(
+                urlparse(task['callbackUrl']).path, data=payload, content_type='application/json'
+            )
+            results.append((lane, task, response.status_code))
+        return results
@@ -0,0 +1,297 @@
+"""
+Durable Puppeteer task queue on Redis Streams.
+
+Tasks used to go out with ``PUBLISH affiliate_tasks``: if no worker was
+subscribed at that moment the task was gone, and nobody noticed until a
+one-off safety-check schedule ran an hour later. Tasks are now appended to
+a stream per priority lane and read through the ``puppeteer`` consumer
+group, so they wait for a worker and are tracked until acknowledged.
+
+Lanes, read in this order (a worker only takes bulk work when no
+interactive task is waiting)::
+
+    puppeteer:tasks:interactive   user-facing searches and standalone ASINs
+    puppeteer:tasks:bulk          requeue_pending_affiliate_links
+    puppeteer:tasks:dead          dead letters, for inspection and requeue
+
+Message fields: ``task`` (the JSON the worker used to receive on the
+channel), ``task_id``, ``attempt`` and ``enqueued_at``.
+
+Worker contract: ``XREADGROUP GROUP puppeteer <consumer> COUNT <free slots>
+STREAMS <lane> >`` lane by lane (read_next() below), run the task and POST
+its callbackUrl as before. The callback views acknowledge the message
+(ack_task), so a task counts as done once its result has reached Django,
+whichever worker ran it.
+
+A task whose callback hasn't arrived PUPPETEER_VISIBILITY_TIMEOUT_SECONDS
+after delivery is re-appended to its lane by redeliver_stalled_tasks()
+(scheduled every minute), up to PUPPETEER_MAX_ATTEMPTS attempts; after that
+it moves to the dead-letter stream. Acknowledged messages are deleted, so a
+lane's length is its backlog: waiting plus in flight.
+"""
+
+import json
+import logging
+import time
+
+import redis
+from django.conf import settings
+
+logger = logging.getLogger('affiliate_tasks')
+
+GROUP = 'puppeteer'
+INTERACTIVE = 'interactive'
+BULK = 'bulk'
+LANES = (INTERACTIVE, BULK)
+STREAMS = {
+    INTERACTIVE: 'puppeteer:tasks:interactive',
+    BULK: 'puppeteer:tasks:bulk',
+}
+DEAD_LETTER_STREAM = 'puppeteer:tasks:dead'
+TASK_MESSAGE_PREFIX = 'puppeteer_task_message:'
+
+# How long task -> message references live; far longer than any task
+TASK_MESSAGE_SECONDS = 7 * 86400
+
+_groups_created = set()
+
+
+def _redis():
+    from .tasks import get_redis_connection
+    return redis.Redis(**get_redis_connection())
+
+
+def ensure_groups(r):
+    """Create the lane streams and their consumer group (once per process and server)"""
+    for stream in STREAMS.values():
+        if stream in _groups_created:
+            continue
+        try:
+            r.xgroup_create(stream, GROUP, id='0', mkstream=True)
+        except redis.ResponseError as e:
+            if 'BUSYGROUP' not in str(e):
+                raise
+        _groups_created.add(stream)
+
+
+def enqueue_task(r, task, lane=INTERACTIVE, attempt=1):
+    """
+    Append a Puppeteer task to its lane.
+
+    Args:
+        task: The task message (must include taskId)
+        lane: INTERACTIVE or BULK
+
+    Returns:
+        str: Stream message id
+    """
+    return enqueue_tasks(r, [task], lane=lane, attempt=attempt)[0]
+
+
+def enqueue_tasks(r, tasks, lane=INTERACTIVE, attempt=1):
+    """
+    Append several tasks to a lane in two pipelined round trips.
+
+    Returns:
+        list: Stream message ids, in task order
+    """
+    if lane not in STREAMS:
+        raise ValueError(f"Unknown Puppeteer task lane: {lane}")
+    ensure_groups(r)
+
+    pipe = r.pipeline(transaction=False)
+    for task in tasks:
+        pipe.xadd(STREAMS[lane], {
+            'task': json.dumps(task),
+            'task_id': task['taskId'],
+            'attempt': attempt,
+            'enqueued_at': time.time(),
+        }, maxlen=getattr(settings, 'PUPPETEER_STREAM_MAXLEN', 100000), approximate=True)
+    message_ids = pipe.execute()
+
+    pipe = r.pipeline(transaction=False)
+    for task, message_id in zip(tasks, message_ids):
+        pipe.set(f"{TASK_MESSAGE_PREFIX}{task['taskId']}", f"{lane} {message_id}", ex=TASK_MESSAGE_SECONDS)
+        if getattr(settings, 'PUPPETEER_PUBSUB_FALLBACK', False):
+            # Workers still on the channel during a rollout; a worker on both would run the task twice
+            pipe.publish('affiliate_tasks', json.dumps(task))
+    pipe.execute()
+    return message_ids
+
+
+def ack_task(r, task_id):
+    """
+    Acknowledge and delete a task's message once its callback arrived.
+
+    Returns:
+        bool: False when the task has no outstanding message (already acked
+        or never queued through the stream)
+    """
+    reference = r.get(f"{TASK_MESSAGE_PREFIX}{task_id}")
+    if not reference:
+        return False
+    lane, message_id = reference.split(' ', 1)
+    stream = STREAMS.get(lane)
+    if stream:
+        r.xack(stream, GROUP, message_id)
+        r.xdel(stream, message_id)
+    r.delete(f"{TASK_MESSAGE_PREFIX}{task_id}")
+    return True
+
+
+def read_next(r, consumer, count=1, block_ms=None):
+    """
+    Claim up to `count` new tasks for `consumer`, interactive lane first.
+
+    What a worker does; used by the stub worker and documents the contract.
+
+    Returns:
+        list of (lane, message_id, task dict)
+    """
+    ensure_groups(r)
+    claimed = []
+    for lane in LANES:
+        if len(claimed) >= count:
+            break
+        response = r.xreadgroup(GROUP, consumer, {STREAMS[lane]: '>'}, count=count - len(claimed))
+        for _, messages in response or []:
+            for message_id, fields in messages:
+                claimed.append((lane, message_id, json.loads(fields['task'])))
+    if not claimed and block_ms:
+        # Nothing waiting: block on both lanes at once
+        response = r.xreadgroup(GROUP, consumer, {STREAMS[lane]: '>' for lane in LANES}, count=count, block=block_ms)
+        lanes_by_stream = {stream: lane for lane, stream in STREAMS.items()}
+        for stream, messages in response or []:
+            for message_id, fields in messages:
+                claimed.append((lanes_by_stream[stream], message_id, json.loads(fields['task'])))
+    return claimed
+
+
+def _dead_letter(r, lane, message_id, fields, reason):
+    r.xadd(DEAD_LETTER_STREAM, {
+        **fields,
+        'lane': lane,
+        'reason': reason,
+        'dead_at': time.time(),
+    }, maxlen=getattr(settings, 'PUPPETEER_STREAM_MAXLEN', 100000), approximate=True)
+
+    from .single_flight import finish_flight
+    task_id = fields.get('task_id')
+    if task_id:
+        r.delete(f"{TASK_MESSAGE_PREFIX}{task_id}")
+        finish_flight(r, task_id, error=reason)
+    logger.error(f"☠️ Dead-lettered Puppeteer task {task_id} ({lane}): {reason}")
+
+
+def redeliver_stalled_tasks(r=None, visibility_timeout=None, max_attempts=None, batch_size=100):
+    """
+    Re-append tasks delivered longer than the visibility timeout ago without
+    a callback; dead-letter those out of attempts.
+
+    Returns:
+        dict: redelivered and dead_lettered counts
+    """
+    from .single_flight import refresh_flight
+
+    r = r or _redis()
+    ensure_groups(r)
+    timeout_ms = 1000 * (visibility_timeout or getattr(settings, 'PUPPETEER_VISIBILITY_TIMEOUT_SECONDS', 300))
+    max_attempts = max_attempts or getattr(settings, 'PUPPETEER_MAX_ATTEMPTS', 3)
+
+    counts = {'redelivered': 0, 'dead_lettered': 0}
+    for lane in LANES:
+        stream = STREAMS[lane]
+        for entry in r.xpending_range(stream, GROUP, '-', '+', batch_size):
+            if entry['time_since_delivered'] < timeout_ms:
+                continue
+            message_id = entry['message_id']
+            messages = r.xrange(stream, min=message_id, max=message_id)
+            if messages:
+                fields = messages[0][1]
+                attempt = int(fields.get('attempt', 1))
+                if attempt >= max_attempts:
+                    _dead_letter(r, lane, message_id, fields, f"No callback after {attempt} attempts")
+                    counts['dead_lettered'] += 1
+                else:
+                    enqueue_task(r, json.loads(fields['task']), lane=lane, attempt=attempt + 1)
+                    refresh_flight(r, fields.get('task_id'))
+                    counts['redelivered'] += 1
+                    logger.warning(
+                        f"🔁 Redelivering Puppeteer task {fields.get('task_id')} ({lane}), attempt {attempt + 1}"
+                    )
+            r.xack(stream, GROUP, message_id)
+            r.xdel(stream, message_id)
+
+    if counts['redelivered'] or counts['dead_lettered']:
+        logger.info(f"📬 Puppeteer queue sweep: {counts}")
+    return counts
+
+
+def requeue_dead_letters(r=None, limit=100):
+    """Move dead-lettered tasks back to their lanes with a fresh attempt count"""
+    r = r or _redis()
+    requeued = 0
+    for message_id, fields in r.xrange(DEAD_LETTER_STREAM, count=limit):
+        lane = fields.get('lane') if fields.get('lane') in STREAMS else BULK
+        enqueue_task(r, json.loads(fields['task']), lane=lane)
+        r.xdel(DEAD_LETTER_STREAM, message_id)
+        requeued += 1
+    return requeued
+
+
+def _message_age_seconds(message_id, now):
+    return max(0.0, now - int(message_id.split('-', 1)[0]) / 1000)
+
+
+def queue_stats(r=None):
+    """
+    Depth and age per lane.
+
+    Returns:
+        dict: lane -> {depth, in_flight, waiting, oldest_age_seconds},
+        plus 'dead_letters' -> {depth, oldest_age_seconds}
+    """
+    r = r or _redis()
+    ensure_groups(r)
+    now = time.time()
+    stats = {}
+    for lane in LANES:
+        stream = STREAMS[lane]
+        depth = r.xlen(stream)
+        in_flight = r.xpending(stream, GROUP)['pending']
+        oldest = r.xrange(stream, count=1)
+        stats[lane] = {
+            'depth': depth,
+            'in_flight': in_flight,
+            'waiting': max(0, depth - in_flight),
+            'oldest_age_seconds': round(_message_age_seconds(oldest[0][0], now), 1) if oldest else 0.0,
+        }
+    oldest_dead = r.xrange(DEAD_LETTER_STREAM, count=1)
+    stats['dead_letters'] = {
+        'depth': r.xlen(DEAD_LETTER_STREAM),
+        'oldest_age_seconds': round(_message_age_seconds(oldest_dead[0][0], now), 1) if oldest_dead else 0.0,
+    }
+    return stats
+
+
+def schedule_redelivery():
+    """
+    Schedule redeliver_stalled_tasks to run every minute
+
+    Returns:
+        str: Scheduled task ID
+    """
+    from django_q.tasks import schedule
+    from django_q.models import Schedule
+
+    if Schedule.objects.filter(name='redeliver_puppeteer_tasks').exists():
+        return None
+    task_id = schedule(
+        'affiliates.task_queue.redeliver_stalled_tasks',
+        schedule_type=Schedule.MINUTES,
+        minutes=1,
+        name='redeliver_puppeteer_tasks',
+        repeats=-1  # Repeat indefinitely
+    )
+    logger.info(f"📅 Scheduled Puppeteer task redelivery: {task_id}")
+    return task_id
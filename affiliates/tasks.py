@@ -16,6 +16,13 @@ from django_q.brokers import get_broker
 from django_q.conf import Conf
 from urllib.parse import urlparse
 
+from affiliates.deadlines import (
+    AFFILIATE, SEARCH, STANDALONE, add_deadline,
+    expire_affiliate_tasks, expire_search_tasks, expire_standalone_tasks,
+)
+from affiliates.task_queue import BULK, INTERACTIVE, enqueue_task
+from affiliates.single_flight import asin_flight_key, finish_flight, join_or_lead, recent_failure, search_flight_key
+
 # Set up dedicated logger
 logger = logging.getLogger('affiliate_tasks')
 
@@ -38,8 +45,11 @@ def get_redis_connection():
             redis_kwargs['password'] = os.getenv('REDIS_PASSWORD')
         return redis_kwargs
 
-def generate_amazon_affiliate_url(affiliate_link_id, asin):
-    """Generate an Amazon affiliate URL via puppeteer worker with callback URL"""
+def generate_amazon_affiliate_url(affiliate_link_id, asin, lane=INTERACTIVE):
+    """Generate an Amazon affiliate URL via puppeteer worker with callback URL
+
+    lane: Puppeteer queue lane, BULK for mass requeues so they don't delay user-facing tasks
+    """
     logger.info(f"Starting generate_amazon_affiliate_url: affiliate_link_id={affiliate_link_id}, asin={asin}")
     try:
         # Get Redis connection
@@ -66,20 +76,12 @@ def generate_amazon_affiliate_url(affiliate_link_id, asin):
             "callbackUrl": callback_url
         }
         
-        # Publish to the channel that puppeteer worker is listening on
-        publish_result = r.publish("affiliate_tasks", json.dumps(task_data))
-        logger.info(f"Published to Redis channel 'affiliate_tasks': {publish_result} clients received")
+        # Queue for the puppeteer workers (durable until the callback acknowledges it)
+        message_id = enqueue_task(r, task_data, lane=lane)
+        logger.info(f"Queued Puppeteer task {task_id} on the {lane} lane: message {message_id}")
         
-        # Schedule a safety check
-        schedule_time = timezone.now() + datetime.timedelta(hours=1)
-        
-        Schedule.objects.create(
-            name=f"safety_check_affiliate_{task_id}",
-            func='affiliates.tasks.check_stalled_affiliate_task',
-            args=json.dumps([task_id]),
-            schedule_type=Schedule.ONCE,
-            next_run=schedule_time
-        )
+        # Expire the task if no callback arrives (affiliates/deadlines.py)
+        add_deadline(r, AFFILIATE, task_id)
         
         return True
     except Exception as e:
@@ -211,48 +213,12 @@ def debug_affiliate_links():
     return True
 
 def check_stalled_affiliate_task(task_id):
-    """Safety check for stalled affiliate tasks"""
+    """Safety check for one stalled affiliate task (Schedule rows from before the deadline sweeper)"""
     logger.info(f"Safety check for task_id: {task_id}")
-    
     try:
-        # Redis connection with proper fallbacks
-        redis_kwargs = {
-            'host': getattr(settings, 'REDIS_HOST', 'localhost'),
-            'port': getattr(settings, 'REDIS_PORT', 6379),
-            'decode_responses': True
-        }
-        
-        # Only add password if it exists in settings
-        if hasattr(settings, 'REDIS_PASSWORD') and settings.REDIS_PASSWORD:
-            redis_kwargs['password'] = settings.REDIS_PASSWORD
-            
-        r = redis.Redis(**redis_kwargs)
-        
-        # Check if the task is still pending
-        affiliate_link_id = r.get(f"pending_affiliate_task:{task_id}")
-        if not affiliate_link_id:
+        r = redis.Redis(**get_redis_connection())
+        if not expire_affiliate_tasks(r, [task_id]):
             logger.info(f"No pending task found for task_id: {task_id}, assuming completed")
-            return
-        
-        # The task is stalled, mark it as failed
-        affiliate_link = AffiliateLink.objects.get(pk=affiliate_link_id)
-        affiliate_link.affiliate_url = "ERROR: Generation timed out"
-        affiliate_link.save()
-        
-        # Add error data for clients polling the status
-        result_data = {
-            "affiliate_link_id": affiliate_link.id,
-            "status": "error",
-            "affiliate_url": None,
-            "error": "Generation timed out after 1 hour",
-            "timestamp": timezone.now().isoformat()
-        }
-        r.set(f"affiliate_task_status:{task_id}", json.dumps(result_data), ex=3600)
-        
-        # Clean up Redis
-        r.delete(f"pending_affiliate_task:{task_id}")
-        
-        logger.warning(f"Marked stalled task {task_id} as failed after timeout")
     except Exception as e:
         logger.error(f"Error checking stalled task: {str(e)}", exc_info=True)
 
@@ -274,10 +240,13 @@ def generate_standalone_amazon_affiliate_url(asin):
     SAFETY CHECKS ADDED:
     - Check if affiliate link already exists with complete URL
     - Check if processing is already in progress
+    - Share one in-flight task per ASIN across concurrent callers (single-flight lease)
     - Update processing state properly
     """
     logger.info(f"🔍 SAFETY CHECK: Starting affiliate URL generation for ASIN: {asin}")
     
+    r = None
+    task_id = None
     try:
         # STEP 1: Check if affiliate link already exists and is complete
         existing_link = AffiliateLink.objects.filter(
@@ -311,12 +280,22 @@ def generate_standalone_amazon_affiliate_url(asin):
                     existing_link.is_processing = False
                     existing_link.save(update_fields=['is_processing'])
         
-        # STEP 2: Generate task and update processing state
-        task_id = str(uuid.uuid4())
-        logger.info(f"🚀 PROCEEDING: Generating affiliate URL for ASIN: {asin} with task_id: {task_id}")
-        
+        # STEP 2: Lead a new task for this ASIN, or attach to the one in flight
         redis_kwargs = get_redis_connection()
         r = redis.Redis(**redis_kwargs)
+        
+        flight_key = asin_flight_key(asin)
+        failure = recent_failure(r, flight_key)
+        if failure:
+            logger.info(f"🚫 DUPLICATE PREVENTED: ASIN {asin} failed recently ({failure['error']}), not re-scraping")
+            return None, False
+        
+        task_id, leader = join_or_lead(r, flight_key, str(uuid.uuid4()))
+        if not leader:
+            logger.info(f"🔗 JOINED: ASIN {asin} already in flight as task_id: {task_id}")
+            return task_id, True
+        
+        logger.info(f"🚀 PROCEEDING: Generating affiliate URL for ASIN: {asin} with task_id: {task_id}")
         r.set(f"pending_standalone_task:{task_id}", asin, ex=86400)
         
         # STEP 3: Update processing state if link exists
@@ -327,7 +306,7 @@ def generate_standalone_amazon_affiliate_url(asin):
             existing_link.save(update_fields=['is_processing', 'processing_started_at'])
             logger.info(f"🔄 UPDATED: Set processing state for existing link {existing_link.id}")
         
-        # STEP 4: Create and publish task
+        # STEP 4: Create and queue task
         base_url = getattr(settings, 'BASE_URL', 'http://localhost:8000')
         callback_url = f"{base_url}/api/affiliate/standalone/{task_id}/"
         
@@ -340,8 +319,9 @@ def generate_standalone_amazon_affiliate_url(asin):
             "callbackUrl": callback_url
         }
         
-        publish_result = r.publish("affiliate_tasks", json.dumps(task_data))
-        logger.info(f"✅ PUBLISHED: Task to Redis channel 'affiliate_tasks': {publish_result} clients received")
+        message_id = enqueue_task(r, task_data, lane=INTERACTIVE)
+        logger.info(f"✅ QUEUED: Puppeteer task {task_id} on the interactive lane: message {message_id}")
+        add_deadline(r, STANDALONE, task_id)
         
         return task_id, True
         
@@ -350,46 +330,20 @@ def generate_standalone_amazon_affiliate_url(asin):
         return None, False
     except Exception as e:
         logger.error(f"❌ Unexpected error in affiliate URL generation: {str(e)}", exc_info=True)
+        if r is not None and task_id:
+            try:
+                finish_flight(r, task_id)
+            except redis.RedisError:
+                pass
         return None, False
 
 def check_stalled_standalone_task(task_id, asin):
-    """Safety check for stalled standalone affiliate tasks"""
+    """Safety check for one stalled standalone task (Schedule rows from before the deadline sweeper)"""
     logger.info(f"Safety check for standalone task_id: {task_id}")
-    
     try:
-        # Redis connection with proper fallbacks
-        redis_kwargs = {
-            'host': getattr(settings, 'REDIS_HOST', 'localhost'),
-            'port': getattr(settings, 'REDIS_PORT', 6379),
-            'decode_responses': True
-        }
-        
-        # Only add password if it exists in settings
-        if hasattr(settings, 'REDIS_PASSWORD') and settings.REDIS_PASSWORD:
-            redis_kwargs['password'] = settings.REDIS_PASSWORD
-            
-        r = redis.Redis(**redis_kwargs)
-        
-        # Check if the task is still pending
-        stored_asin = r.get(f"pending_standalone_task:{task_id}")
-        if not stored_asin:
+        r = redis.Redis(**get_redis_connection())
+        if not expire_standalone_tasks(r, [task_id]):
             logger.info(f"No pending standalone task found for task_id: {task_id}, assuming completed")
-            return
-        
-        # The task is stalled, mark it as failed
-        # Add error data for clients polling the status
-        result_data = {
-            "status": "error",
-            "affiliate_url": None,
-            "error": "Generation timed out after 1 hour",
-            "timestamp": timezone.now().isoformat()
-        }
-        r.set(f"standalone_task_status:{task_id}", json.dumps(result_data), ex=3600)
-        
-        # Clean up Redis
-        r.delete(f"pending_standalone_task:{task_id}")
-        
-        logger.warning(f"Marked stalled standalone task {task_id} for ASIN {asin} as failed after timeout")
     except Exception as e:
         logger.error(f"Error checking stalled standalone task: {str(e)}", exc_info=True)
 
@@ -407,19 +361,33 @@ def generate_affiliate_url_from_search(search_term, search_type='part_number'):
         search_term (str): The term to search for (part number, product name, etc.)
         search_type (str): Type of search - 'part_number', 'product_name', or 'general'
     
+    Concurrent searches for the same term share one scrape: callers that
+    arrive while it is in flight get its task_id (see affiliates/single_flight.py).
+    
     Returns:
         tuple: (task_id, success_boolean)
     """
     logger.info(f"🔍 Creating Amazon search task: '{search_term}' (type: {search_type})")
     
+    r = None
+    task_id = None
     try:
-        # Generate unique task ID
-        task_id = str(uuid.uuid4())
-        
         # Get Redis connection
         redis_kwargs = get_redis_connection()
         r = redis.Redis(**redis_kwargs)
         
+        flight_key = search_flight_key(search_term, search_type)
+        failure = recent_failure(r, flight_key)
+        if failure:
+            logger.info(f"🚫 Amazon search for '{search_term}' failed recently ({failure['error']}), not re-scraping")
+            return None, False
+        
+        # Lead a new scrape, or attach to the one already in flight
+        task_id, leader = join_or_lead(r, flight_key, str(uuid.uuid4()))
+        if not leader:
+            logger.info(f"🔗 Amazon search for '{search_term}' already in flight: joined task_id={task_id}")
+            return task_id, True
+        
         # Create search task message for Puppeteer worker
         message = {
             'taskType': 'amazon_search',
@@ -436,59 +404,34 @@ def generate_affiliate_url_from_search(search_term, search_type='part_number'):
             'timestamp': timezone.now().isoformat()
         }), ex=3600)
         
-        # Publish to the affiliate_tasks channel that Puppeteer worker is listening to
-        publish_result = r.publish('affiliate_tasks', json.dumps(message))
-        logger.info(f"✅ Amazon search task queued: task_id={task_id}, clients_notified={publish_result}")
-        
-        # Schedule a safety check in case the task stalls
-        schedule_time = timezone.now() + datetime.timedelta(hours=1)
-        Schedule.objects.create(
-            name=f"safety_check_search_{task_id}",
-            func='affiliates.tasks.check_stalled_search_task',
-            args=json.dumps([task_id, search_term]),
-            schedule_type=Schedule.ONCE,
-            next_run=schedule_time
-        )
+        # Queue for the Puppeteer workers on the interactive lane
+        message_id = enqueue_task(r, message, lane=INTERACTIVE)
+        logger.info(f"✅ Amazon search task queued: task_id={task_id}, message={message_id}")
+        
+        # Expire the task in case it stalls (affiliates/deadlines.py)
+        add_deadline(r, SEARCH, task_id)
         
         return task_id, True
         
     except Exception as e:
         logger.error(f"❌ Failed to queue Amazon search task for '{search_term}': {str(e)}", exc_info=True)
+        if r is not None and task_id:
+            # Let the next caller try again rather than join a task that was never queued
+            try:
+                finish_flight(r, task_id)
+            except redis.RedisError:
+                pass
         return None, False
 
 def check_stalled_search_task(task_id, search_term):
     """
-    Safety check for stalled search tasks
+    Safety check for one stalled search task (Schedule rows from before the deadline sweeper)
     """
     logger.info(f"🔍 Safety check for search task {task_id} (term: '{search_term}')")
-    
     try:
-        redis_kwargs = get_redis_connection()
-        r = redis.Redis(**redis_kwargs)
-        
-        # Check if task is still pending
-        pending_task = r.get(f"pending_search_task:{task_id}")
-        if pending_task:
-            logger.warning(f"⚠️ Search task {task_id} appears stalled after 1 hour")
-            
-            # Check if result exists
-            result = r.get(f"search_result:{task_id}")
-            if not result:
-                logger.warning(f"⚠️ No result found for stalled search task {task_id}")
-                # Could implement retry logic here if needed
-                
-                # Store error result for any clients polling
-                error_data = {
-                    "status": "error",
-                    "error": "Search task timed out after 1 hour",
-                    "searchTerm": search_term,
-                    "timestamp": timezone.now().isoformat()
-                }
-                r.set(f"search_result:{task_id}", json.dumps(error_data), ex=3600)
-                
-        else:
+        r = redis.Redis(**get_redis_connection())
+        if not expire_search_tasks(r, [task_id]):
             logger.info(f"✅ Search task {task_id} completed (no longer pending)")
-            
     except Exception as e:
         logger.error(f"❌ Error in safety check for search task {task_id}: {str(e)}")
 
@@ -543,6 +486,8 @@ def requeue_pending_affiliate_links(platform=None, limit=None):
     """
     Find all AffiliateLinks with empty affiliate_url or error messages and resubmit them to the queue
     
+    Rate-limited, most popular first and resumable; see affiliates/requeue.py.
+    
     Args:
         platform (str, optional): Filter by platform (e.g., 'amazon')
         limit (int, optional): Limit number of links to process
@@ -550,59 +495,8 @@ def requeue_pending_affiliate_links(platform=None, limit=None):
     Returns:
         dict: Results summary with counts
     """
-    logger.info(f"Starting requeue_pending_affiliate_links: platform={platform}, limit={limit}")
-    
-    # Find all affiliate links with empty affiliate URLs or error messages
-    queryset = AffiliateLink.objects.filter(
-        models.Q(affiliate_url='') | 
-        models.Q(affiliate_url__startswith='ERROR:')
-    )
-    
-    if platform:
-        queryset = queryset.filter(platform=platform)
-    
-    total_count = queryset.count()
-    logger.info(f"Found {total_count} affiliate links to requeue")
-    
-    if limit:
-        queryset = queryset[:limit]
-        logger.info(f"Processing only {limit} links due to limit parameter")
-    
-    success_count = 0
-    error_count = 0
-    
-    for link in queryset:
-        try:
-            logger.info(f"Requeuing affiliate link {link.id} for {link.platform} with platform_id {link.platform_id}")
-            
-            if link.platform == 'amazon':
-                # Use our new webhook-based generation function
-                result = generate_amazon_affiliate_url(link.id, link.platform_id)
-                
-                if result:
-                    success_count += 1
-                    # Update note to indicate requeuing
-                    link.notes = f"Requeued on {timezone.now().strftime('%Y-%m-%d %H:%M:%S')}"
-                    link.save(update_fields=['notes'])
-                else:
-                    error_count += 1
-            else:
-                logger.warning(f"Unsupported platform: {link.platform}")
-                error_count += 1
-                
-        except Exception as e:
-            logger.error(f"Error requeuing affiliate link {link.id}: {str(e)}", exc_info=True)
-            error_count += 1
-    
-    results = {
-        "total_found": total_count,
-        "processed": success_count + error_count,
-        "success": success_count,
-        "errors": error_count
-    }
-    
-    logger.info(f"Completed requeue_pending_affiliate_links: {results}")
-    return results
+    from .requeue import run_requeue
+    return run_requeue(platform=platform, limit=limit)
 
 class Command(BaseCommand):
     help = 'Clear problematic scheduled tasks that are causing invalid decimal literal errors'
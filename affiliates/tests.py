@@ -1,3 +1,4 @@
+import json
 from django.test import TestCase
 from decimal import Decimal
 from users.models import User
@@ -101,4 +102,631 @@ class TestAffiliateCommissionCalculationReplicatingProd(TestCase):
         expected = Decimal('34.99') * Decimal('0.04') * Decimal('0.15')
         expected = expected.quantize(Decimal('0.01'))
         self.assertEqual(commission, expected)
-        self.assertNotEqual(commission, Decimal('0.00'))
\ No newline at end of file
+        self.assertNotEqual(commission, Decimal('0.00'))
+
+class TestAssociationTokenLookup(TestCase):
+    def setUp(self):
+        from affiliates.association_index import clear_lookup_cache
+        from affiliates.models import ProductAssociation
+
+        clear_lookup_cache()
+        self.addCleanup(clear_lookup_cache)
+        manufacturer = Manufacturer.objects.create(name='Dell', slug='dell')
+        products = [
+            Product.objects.create(name=f'P{i}', slug=f'p{i}', manufacturer=manufacturer, part_number=f'P-{i}')
+            for i in range(4)
+        ]
+
+        def associate(target, term, search_count=1):
+            return ProductAssociation.objects.create(
+                target_product=target, original_search_term=term, search_count=search_count,
+            )
+
+        self.exact = associate(products[0], 'Dell XPS Keyboard', search_count=2)
+        self.two_words = associate(products[1], 'xps keyboards backlit', search_count=1)
+        self.one_word = associate(products[2], 'dell monitor', search_count=50)
+        self.single = associate(products[3], 'keyboard')
+
+    def test_exact_term_wins_then_words_shared(self):
+        from affiliates.views import get_existing_associations, should_skip_amazon_search
+
+        self.assertEqual(get_existing_associations('  dell xps   KEYBOARD'), [self.exact])
+        # Ranked by words shared before popularity; plurals match
+        self.assertEqual(
+            get_existing_associations('xps keyboard for dell'), [self.exact, self.two_words, self.one_word, self.single]
+        )
+        # A single word needs an exact match
+        self.assertEqual(get_existing_associations('xps'), [])
+        self.assertEqual(get_existing_associations('Keyboard'), [self.single])
+
+        self.assertEqual(should_skip_amazon_search('dell xps keyboard'), (True, [self.exact]))
+
+    def test_hot_terms_served_from_lru_until_an_association_changes(self):
+        from affiliates.association_index import find_associations
+
+        find_associations('dell xps keyboard')
+        with self.assertNumQueries(0):
+            self.assertEqual(find_associations('Dell XPS keyboard'), [self.exact])
+
+        self.exact.is_active = False
+        self.exact.save()
+        self.assertEqual(find_associations('dell xps keyboard')[0], self.two_words)
+
+        self.two_words.original_search_term = 'wireless mouse'
+        self.two_words.save(update_fields=['original_search_term'])
+        self.assertNotIn(self.two_words, find_associations('xps keyboards backlit'))
+        self.assertEqual(find_associations('mouse wireless'), [self.two_words])
+
+    def test_bulk_created_associations_are_backfilled(self):
+        from affiliates.association_index import find_associations, index_missing_association_tokens
+        from affiliates.models import ProductAssociation
+
+        ProductAssociation.objects.bulk_create([
+            ProductAssociation(target_product=self.exact.target_product, original_search_term='usb hub',
+                               association_type='accessory'),
+        ])
+        self.assertEqual(find_associations('usb hub'), [])
+        self.assertEqual(index_missing_association_tokens(), 1)
+        self.assertEqual([a.original_search_term for a in find_associations('usb hub')], ['usb hub'])
+
+
+class FakeRedis:
+    """Just enough of redis-py (decode_responses=True) for single-flight keys, the task streams and timing lists"""
+
+    def __init__(self, **kwargs):
+        self.store = {}
+        self.ttls = {}
+        self.published = []
+        self.streams = {}
+        self.groups = {}
+        self.clock_ms = 1700000000000
+        self._sequence = 0
+
+    def set(self, key, value, ex=None, nx=False):
+        if nx and key in self.store:
+            return None
+        self.store[key] = str(value)
+        self.ttls.pop(key, None)
+        if ex:
+            self.ttls[key] = ex
+        return True
+
+    def get(self, key):
+        return self.store.get(key)
+
+    def delete(self, *keys):
+        for key in keys:
+            self.ttls.pop(key, None)
+        return sum(self.store.pop(key, None) is not None for key in keys)
+
+    def expire(self, key, seconds):
+        if key not in self.store:
+            return False
+        self.ttls[key] = seconds
+        return True
+
+    def ttl(self, key):
+        if key not in self.store:
+            return -2
+        return self.ttls.get(key, -1)
+
+    def eval(self, script, numkeys, key, token):
+        # The compare-and-delete release script
+        if self.store.get(key) == token:
+            return self.delete(key)
+        return 0
+
+    def publish(self, channel, message):
+        self.published.append((channel, message))
+        return 1
+
+    def _group(self, name, groupname):
+        self.streams.setdefault(name, [])
+        return self.groups.setdefault((name, groupname), {'delivered': set(), 'pending': {}})
+
+    def xgroup_create(self, name, groupname, id='$', mkstream=False):
+        self._group(name, groupname)
+        return True
+
+    def xadd(self, name, fields, id='*', maxlen=None, approximate=True):
+        self._sequence += 1
+        message_id = f"{self.clock_ms}-{self._sequence}"
+        self.streams.setdefault(name, []).append((message_id, {k: str(v) for k, v in fields.items()}))
+        return message_id
+
+    def xreadgroup(self, groupname, consumername, streams, count=None, block=None, noack=False):
+        response = []
+        for name in streams:
+            group = self._group(name, groupname)
+            fresh = [entry for entry in self.streams[name] if entry[0] not in group['delivered']][:count]
+            for message_id, _ in fresh:
+                group['delivered'].add(message_id)
+                group['pending'][message_id] = (consumername, self.clock_ms)
+            if fresh:
+                response.append([name, fresh])
+        return response
+
+    def xack(self, name, groupname, *ids):
+        pending = self._group(name, groupname)['pending']
+        return sum(pending.pop(message_id, None) is not None for message_id in ids)
+
+    def xdel(self, name, *ids):
+        before = len(self.streams.get(name, []))
+        self.streams[name] = [entry for entry in self.streams.get(name, []) if entry[0] not in ids]
+        return before - len(self.streams[name])
+
+    def xpending(self, name, groupname):
+        return {'pending': len(self._group(name, groupname)['pending'])}
+
+    def xpending_range(self, name, groupname, min, max, count, consumername=None):
+        pending = self._group(name, groupname)['pending']
+        return [
+            {'message_id': message_id, 'consumer': consumer,
+             'time_since_delivered': self.clock_ms - delivered_at, 'times_delivered': 1}
+            for message_id, (consumer, delivered_at) in list(pending.items())[:count]
+        ]
+
+    def xrange(self, name, min='-', max='+', count=None):
+        entries = [
+            entry for entry in self.streams.get(name, [])
+            if (min == '-' or entry[0] >= min) and (max == '+' or entry[0] <= max)
+        ]
+        return entries[:count]
+
+    def xlen(self, name):
+        return len(self.streams.get(name, []))
+
+    def zadd(self, name, mapping):
+        self.store.setdefault(name, {}).update(mapping)
+        return len(mapping)
+
+    def zrangebyscore(self, name, min, max, start=None, num=None):
+        low = float(min)
+        members = sorted((score, member) for member, score in self.store.get(name, {}).items()
+                         if low <= score <= float(max))
+        members = [member for _, member in members]
+        return members[start:start + num] if num is not None else members
+
+    def zrem(self, name, *members):
+        zset = self.store.get(name, {})
+        return sum(zset.pop(member, None) is not None for member in members)
+
+    def zcard(self, name):
+        return len(self.store.get(name, {}))
+
+    def zcount(self, name, min, max):
+        return len(self.zrangebyscore(name, min, max))
+
+    def lpush(self, name, *values):
+        items = self.store.setdefault(name, [])
+        items[:0] = [str(value) for value in reversed(values)]
+        return len(items)
+
+    def ltrim(self, name, start, end):
+        self.store[name] = self.store.get(name, [])[start:end + 1 if end != -1 else None]
+        return True
+
+    def lrange(self, name, start, end):
+        return self.store.get(name, [])[start:end + 1 if end != -1 else None]
+
+    def pipeline(self, transaction=True):
+        return FakePipeline(self)
+
+
+class FakePipeline:
+    def __init__(self, redis):
+        self._redis = redis
+        self._calls = []
+
+    def __getattr__(self, name):
+        def queue(*args, **kwargs):
+            self._calls.append((getattr(self._redis, name), args, kwargs))
+            return self
+        return queue
+
+    def execute(self):
+        calls, self._calls = self._calls, []
+        return [method(*args, **kwargs) for method, args, kwargs in calls]
+
+
+# Modules that build their own redis.Redis clients
+REDIS_CLIENT_MODULES = (
+    'affiliates.tasks', 'affiliates.views', 'affiliates.callbacks',
+    'affiliates.task_queue', 'affiliates.deadlines', 'affiliates.requeue',
+)
+
+
+class FakeRedisModule:
+    """Stands in for the `redis` name of one module: Redis() returns the fake, the rest is the real package"""
+
+    def __init__(self, fake):
+        self._fake = fake
+
+    def Redis(self, *args, **kwargs):
+        return self._fake
+
+    def __getattr__(self, name):
+        import redis
+        return getattr(redis, name)
+
+
+def use_fake_redis(testcase, fake):
+    """
+    Point the affiliates modules at `fake`. Patching redis.Redis itself would
+    leak into other clients (the TieredCache keeps whatever it first built).
+    """
+    from unittest import mock
+
+    for module in REDIS_CLIENT_MODULES:
+        patcher = mock.patch(f'{module}.redis', FakeRedisModule(fake))
+        patcher.start()
+        testcase.addCleanup(patcher.stop)
+
+
+class TestSingleFlightTasks(TestCase):
+    def setUp(self):
+        self.redis = FakeRedis()
+        use_fake_redis(self, self.redis)
+
+    def test_concurrent_searches_share_one_scrape(self):
+        from django_q.models import Schedule
+        from affiliates.tasks import generate_affiliate_url_from_search
+
+        first, ok = generate_affiliate_url_from_search('Dell  XPS Keyboard', 'general')
+        second, ok_again = generate_affiliate_url_from_search('dell xps keyboard', 'general')
+
+        self.assertTrue(ok and ok_again)
+        self.assertEqual(first, second)
+        self.assertEqual(self.redis.xlen('puppeteer:tasks:interactive'), 1)
+        self.assertFalse(Schedule.objects.filter(name__startswith='safety_check_search_').exists())
+        self.assertEqual(self.redis.zcard('puppeteer:deadlines'), 1)
+
+    def test_finished_scrape_releases_and_failures_are_negative_cached(self):
+        from affiliates.single_flight import finish_flight
+        from affiliates.tasks import generate_affiliate_url_from_search
+
+        first, _ = generate_affiliate_url_from_search('usb hub', 'general')
+        finish_flight(self.redis, first)
+        second, _ = generate_affiliate_url_from_search('usb hub', 'general')
+        self.assertNotEqual(first, second)
+
+        finish_flight(self.redis, second, error='No product data found in callback')
+        self.assertEqual(generate_affiliate_url_from_search('usb hub', 'general'), (None, False))
+        self.assertEqual(self.redis.xlen('puppeteer:tasks:interactive'), 2)
+
+    def test_stale_task_cannot_release_a_newer_lease(self):
+        from affiliates.single_flight import asin_flight_key, finish_flight, join_or_lead
+
+        old, _ = join_or_lead(self.redis, asin_flight_key('b0abc12345'), 'old-task')
+        # The lease expired and another task took it
+        self.redis.delete('single_flight:' + asin_flight_key('B0ABC12345'))
+        new, leader = join_or_lead(self.redis, asin_flight_key('B0ABC12345'), 'new-task')
+        self.assertTrue(leader)
+
+        finish_flight(self.redis, old)
+        self.assertEqual(join_or_lead(self.redis, asin_flight_key('B0ABC12345'), 'third-task'), ('new-task', False))
+
+
+class TestPuppeteerTaskQueue(TestCase):
+    def setUp(self):
+        from django.test import Client
+        from affiliates.stub_worker import StubPuppeteerWorker
+
+        self.redis = FakeRedis()
+        use_fake_redis(self, self.redis)
+        self.client = Client()
+        self.worker = StubPuppeteerWorker(self.redis, self.client)
+
+    def test_search_task_waits_for_a_worker_and_is_acked_by_its_callback(self):
+        from affiliates.callbacks import process_pending_callbacks
+        from affiliates.task_queue import queue_stats
+        from affiliates.tasks import generate_affiliate_url_from_search
+
+        task_id, _ = generate_affiliate_url_from_search('usb c hub', 'general')
+        self.assertEqual(queue_stats(self.redis)['interactive']['waiting'], 1)
+
+        [(lane, task, status)] = self.worker.run_once()
+        self.assertEqual((lane, task['taskId'], status), ('interactive', task_id, 202))
+        self.assertEqual(queue_stats(self.redis)['interactive']['depth'], 0)
+        self.assertIsNone(self.redis.get(f"search_task_status:{task_id}"))
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.assertEqual(process_pending_callbacks(older_than_seconds=0), 1)
+        self.assertEqual(json.loads(self.redis.get(f"search_task_status:{task_id}"))['status'], 'success')
+
+    def test_interactive_lane_is_served_before_bulk(self):
+        from affiliates.callbacks import process_pending_callbacks
+        from affiliates.task_queue import BULK
+        from affiliates.tasks import generate_affiliate_url_from_search, generate_amazon_affiliate_url
+
+        link = AffiliateLink.objects.create(
+            product=Product.objects.create(
+                name='Hub', slug='hub', manufacturer=Manufacturer.objects.create(name='Anker', slug='anker'),
+            ),
+            platform='amazon', platform_id='B0HUB00001', original_url='https://www.amazon.com/dp/B0HUB00001',
+        )
+        generate_amazon_affiliate_url(link.id, link.platform_id, lane=BULK)
+        generate_affiliate_url_from_search('usb c hub', 'general')
+
+        self.assertEqual([lane for lane, _, _ in self.worker.run_once(concurrency=1)], ['interactive'])
+        [(lane, _, status)] = self.worker.run_once(concurrency=1)
+        self.assertEqual((lane, status), ('bulk', 202))
+        process_pending_callbacks(older_than_seconds=0)
+        link.refresh_from_db()
+        self.assertEqual(link.affiliate_url, 'https://amzn.to/b0hub00001')
+
+    def test_lost_tasks_are_redelivered_then_dead_lettered(self):
+        from affiliates.single_flight import recent_failure, search_flight_key
+        from affiliates.task_queue import queue_stats, redeliver_stalled_tasks
+        from affiliates.tasks import generate_affiliate_url_from_search
+
+        generate_affiliate_url_from_search('usb c hub', 'general')
+        self.worker.respond = lambda task: None  # worker crashes before calling back
+
+        self.worker.run_once()
+        self.assertEqual(redeliver_stalled_tasks(self.redis, visibility_timeout=60), {'redelivered': 0, 'dead_lettered': 0})
+        for expected in ({'redelivered': 1, 'dead_lettered': 0},
+                         {'redelivered': 1, 'dead_lettered': 0},
+                         {'redelivered': 0, 'dead_lettered': 1}):
+            self.redis.clock_ms += 61000
+            self.assertEqual(redeliver_stalled_tasks(self.redis, visibility_timeout=60, max_attempts=3), expected)
+            self.worker.run_once()
+
+        stats = queue_stats(self.redis)
+        self.assertEqual((stats['interactive']['depth'], stats['dead_letters']['depth']), (0, 1))
+        self.assertIsNotNone(recent_failure(self.redis, search_flight_key('usb c hub', 'general')))
+
+    def test_redelivery_refreshes_the_single_flight_lease(self):
+        from django.conf import settings
+        from affiliates.single_flight import search_flight_key
+        from affiliates.task_queue import redeliver_stalled_tasks
+        from affiliates.tasks import generate_affiliate_url_from_search
+
+        self.assertGreater(
+            settings.SINGLE_FLIGHT_LEASE_SECONDS,
+            settings.PUPPETEER_VISIBILITY_TIMEOUT_SECONDS * settings.PUPPETEER_MAX_ATTEMPTS,
+        )
+        task_id, _ = generate_affiliate_url_from_search('usb c hub', 'general')
+        lease_key = 'single_flight:' + search_flight_key('usb c hub', 'general')
+        self.worker.respond = lambda task: None
+        self.worker.run_once()
+
+        self.redis.ttls[lease_key] = 5  # about to expire
+        self.redis.clock_ms += 61000
+        self.assertEqual(redeliver_stalled_tasks(self.redis, visibility_timeout=60)['redelivered'], 1)
+        self.assertEqual(self.redis.ttl(lease_key), settings.SINGLE_FLIGHT_LEASE_SECONDS)
+        self.assertEqual(generate_affiliate_url_from_search('USB C  Hub', 'general')[0], task_id)
+
+
+class TestPuppeteerCallbacks(TestCase):
+    def setUp(self):
+        self.redis = FakeRedis()
+        use_fake_redis(self, self.redis)
+
+    def _search_callback(self, payload):
+        return self.client.post('/api/affiliate-search-callback/', data=payload, content_type='application/json')
+
+    def test_duplicate_callbacks_are_processed_once(self):
+        from affiliates.callbacks import process_callback
+        from affiliates.models import PuppeteerCallback
+        from affiliates.stub_worker import default_response
+        from affiliates.tasks import generate_affiliate_url_from_search
+
+        task_id, _ = generate_affiliate_url_from_search('usb c hub', 'general')
+        payload = default_response({'taskType': 'amazon_search', 'taskId': task_id, 'searchTerm': 'usb c hub'})
+        with self.settings(PUPPETEER_CALLBACKS_ASYNC=False), self.captureOnCommitCallbacks(execute=True):
+            self.assertEqual(self._search_callback(payload).status_code, 202)
+        self.assertEqual(self._search_callback(payload).status_code, 200)
+
+        callback = PuppeteerCallback.objects.get(kind='search', task_id=task_id)
+        self.assertEqual((callback.status, callback.attempts, callback.result_status), ('DONE', 1, 200))
+        self.assertIsNone(process_callback(callback.id))
+        self.assertEqual(AffiliateLink.objects.count(), 1)
+
+    def test_invalid_callbacks_are_rejected_before_storing(self):
+        from affiliates.models import PuppeteerCallback
+
+        self.assertEqual(self._search_callback({'affiliateUrl': 'https://amzn.to/x'}).status_code, 400)
+        self.assertEqual(self._search_callback({'taskId': 'abc', 'productData': 'B0HUB00001'}).status_code, 400)
+        self.assertEqual(self.client.get('/api/affiliate-search-callback/').status_code, 405)
+        self.assertFalse(PuppeteerCallback.objects.exists())
+
+    def test_failed_processing_is_retried_then_marked_failed(self):
+        from unittest import mock
+        from affiliates.callbacks import callback_timing, process_pending_callbacks
+        from affiliates.models import PuppeteerCallback
+
+        self.assertEqual(self.client.post(
+            '/api/affiliate/callback/task-1/', data={'affiliateUrl': 'https://amzn.to/x'}, content_type='application/json',
+        ).status_code, 202)
+        with mock.patch('affiliates.views.process_affiliate_callback', return_value=(500, 'Error: boom')):
+            for _ in range(3):
+                process_pending_callbacks(older_than_seconds=0)
+
+        callback = PuppeteerCallback.objects.get(task_id='task-1')
+        self.assertEqual((callback.status, callback.attempts), ('FAILED', 3))
+        timing = callback_timing(self.redis)
+        self.assertEqual((timing['accept']['count'], timing['process']['count']), (1, 3))
+        self.assertGreaterEqual(timing['process']['p95_ms'], timing['process']['p50_ms'])
+
+    def test_handler_exceptions_count_as_failed_attempts(self):
+        from unittest import mock
+        from affiliates.callbacks import process_pending_callbacks
+        from affiliates.models import PuppeteerCallback
+
+        self.client.post(
+            '/api/affiliate/callback/task-2/', data={'affiliateUrl': 'https://amzn.to/x'}, content_type='application/json',
+        )
+        with mock.patch('affiliates.views.process_affiliate_callback', side_effect=RuntimeError('boom')):
+            for _ in range(3):
+                process_pending_callbacks(older_than_seconds=0)
+            self.assertEqual(process_pending_callbacks(older_than_seconds=0), 0)
+
+        callback = PuppeteerCallback.objects.get(task_id='task-2')
+        self.assertEqual((callback.status, callback.attempts, callback.result_message), ('FAILED', 3, 'Error: boom'))
+
+    def test_redis_results_wait_for_the_commit(self):
+        from affiliates.callbacks import process_callback
+        from affiliates.models import PuppeteerCallback
+        from affiliates.single_flight import search_flight_key
+        from affiliates.stub_worker import default_response
+        from affiliates.tasks import generate_affiliate_url_from_search
+
+        task_id, _ = generate_affiliate_url_from_search('usb c hub', 'general')
+        payload = default_response({'taskType': 'amazon_search', 'taskId': task_id, 'searchTerm': 'usb c hub'})
+        self._search_callback(payload)
+        callback = PuppeteerCallback.objects.get(kind='search', task_id=task_id)
+
+        with self.captureOnCommitCallbacks() as callbacks:
+            self.assertEqual(process_callback(callback.id), 200)
+        self.assertIsNone(self.redis.get(f"search_task_status:{task_id}"))
+        self.assertEqual(self.redis.published, [])
+        self.assertEqual(self.redis.get('single_flight:' + search_flight_key('usb c hub', 'general')), task_id)
+
+        for on_commit in callbacks:
+            on_commit()
+        self.assertEqual(json.loads(self.redis.get(f"search_task_status:{task_id}"))['status'], 'success')
+        self.assertEqual([channel for channel, _ in self.redis.published], ['affiliate_notifications'])
+        self.assertIsNone(self.redis.get('single_flight:' + search_flight_key('usb c hub', 'general')))
+
+    def test_rolled_back_handlers_leave_redis_untouched(self):
+        from unittest import mock
+        from affiliates.callbacks import AfterCommitRedis, process_callback
+        from affiliates.models import PuppeteerCallback
+
+        def failing_handler(task_id, data):
+            r = AfterCommitRedis(self.redis)
+            r.set(f"affiliate_task_status:{task_id}", json.dumps({'status': 'success'}))
+            r.publish('affiliate_notifications', task_id)
+            return 500, 'Error: boom'
+
+        self.client.post(
+            '/api/affiliate/callback/task-3/', data={'affiliateUrl': 'https://amzn.to/x'}, content_type='application/json',
+        )
+        callback = PuppeteerCallback.objects.get(task_id='task-3')
+        with mock.patch('affiliates.views.process_affiliate_callback', side_effect=failing_handler):
+            with self.captureOnCommitCallbacks(execute=True) as callbacks:
+                self.assertEqual(process_callback(callback.id), 500)
+
+        self.assertEqual(callbacks, [])
+        self.assertIsNone(self.redis.get('affiliate_task_status:task-3'))
+        self.assertEqual(self.redis.published, [])
+
+
+class TestBulkRequeue(TestCase):
+    def setUp(self):
+        self.redis = FakeRedis()
+        self.sleeps = []
+        manufacturer = Manufacturer.objects.create(name='Anker', slug='anker')
+        # (clicks, future demand) per link; priority is their sum
+        for n, (clicks, demand) in enumerate([(0, 0), (5, 10), (1, 0), (0, 30), (2, 0)]):
+            product = Product.objects.create(
+                name=f'Hub {n}', slug=f'hub-{n}', part_number=f'HUB-{n}', manufacturer=manufacturer,
+                future_demand_count=demand,
+            )
+            AffiliateLink.objects.create(
+                product=product, platform='amazon', platform_id=f'B0HUB0000{n}', clicks=clicks,
+                original_url=f'https://www.amazon.com/dp/B0HUB0000{n}', affiliate_url='' if n else 'ERROR: timed out',
+            )
+
+    def _run(self, **kwargs):
+        from affiliates.requeue import run_requeue
+        return run_requeue(r=self.redis, sleep=self.sleeps.append, clock=lambda: 0.0, **kwargs)
+
+    def _queued_asins(self):
+        return [json.loads(fields['task'])['asin'] for _, fields in self.redis.streams['puppeteer:tasks:bulk']]
+
+    def test_most_popular_links_first_and_a_stopped_run_resumes(self):
+        from affiliates.requeue import get_checkpoint
+
+        first = self._run(limit=2, batch_size=10, rate=2)
+        self.assertEqual((first['success'], first['stopped'], first['resumed']), (2, 'limit', False))
+        self.assertEqual(self._queued_asins(), ['B0HUB00003', 'B0HUB00001'])
+        self.assertEqual(get_checkpoint(r=self.redis)['dispatched'], 2)
+        self.assertEqual(self.sleeps, [1.0])  # 2 tasks at 2/s
+
+        second = self._run(batch_size=2, rate=2)
+        self.assertEqual((second['success'], second['stopped'], second['resumed']), (3, 'done', True))
+        self.assertEqual(self._queued_asins()[2:], ['B0HUB00004', 'B0HUB00002', 'B0HUB00000'])
+        self.assertIsNone(get_checkpoint(r=self.redis))
+        self.assertEqual(self.redis.zcard('puppeteer:deadlines'), 5)
+        self.assertTrue(all(AffiliateLink.objects.values_list('is_processing', flat=True)))
+
+    def test_in_flight_links_are_not_queued_again_until_their_deadline(self):
+        from datetime import timedelta
+        from django.utils import timezone
+
+        self.assertEqual(self._run(batch_size=10, rate=100)['success'], 5)
+        self.assertEqual(self._run(batch_size=10, rate=100)['total_found'], 0)
+
+        AffiliateLink.objects.filter(platform_id='B0HUB00002').update(
+            processing_started_at=timezone.now() - timedelta(hours=2),
+        )
+        self.assertEqual(self._run(batch_size=10, rate=100)['success'], 1)
+        self.assertEqual(len(self._queued_asins()), 6)
+
+    def test_full_bulk_lane_pauses_then_stops_with_a_checkpoint(self):
+        from affiliates.requeue import get_checkpoint
+
+        results = self._run(batch_size=10, rate=100, max_backlog=3, max_wait=0)
+        self.assertEqual((results['success'], results['stopped']), (3, 'backpressure'))
+        self.assertEqual(len(self._queued_asins()), 3)
+        self.assertEqual(get_checkpoint(r=self.redis)['id'], AffiliateLink.objects.get(platform_id='B0HUB00004').id)
+
+
+class TestDeadlineSweeper(TestCase):
+    def setUp(self):
+        self.redis = FakeRedis()
+        use_fake_redis(self, self.redis)
+
+    def test_sweep_expires_only_due_tasks_without_callbacks(self):
+        import time
+        from affiliates.deadlines import sweep_deadlines
+        from affiliates.tasks import generate_affiliate_url_from_search, generate_amazon_affiliate_url
+
+        link = AffiliateLink.objects.create(
+            product=Product.objects.create(
+                name='Hub', slug='hub', manufacturer=Manufacturer.objects.create(name='Anker', slug='anker'),
+            ),
+            platform='amazon', platform_id='B0HUB00001', original_url='https://www.amazon.com/dp/B0HUB00001',
+        )
+        generate_amazon_affiliate_url(link.id, link.platform_id)
+        stalled, _ = generate_affiliate_url_from_search('usb c hub', 'general')
+        answered, _ = generate_affiliate_url_from_search('hdmi cable', 'general')
+        self.redis.set(f"search_task_status:{answered}", json.dumps({'status': 'success'}))
+
+        self.assertEqual(sweep_deadlines(self.redis), {'due': 0, 'expired': 0})
+        self.assertEqual(sweep_deadlines(self.redis, batch_size=2, now=time.time() + 3601), {'due': 3, 'expired': 2})
+
+        link.refresh_from_db()
+        self.assertEqual(link.affiliate_url, 'ERROR: Generation timed out')
+        self.assertEqual(json.loads(self.redis.get(f"search_task_status:{stalled}"))['searchTerm'], 'usb c hub')
+        self.assertEqual(json.loads(self.redis.get(f"search_task_status:{answered}"))['status'], 'success')
+        self.assertEqual(self.redis.zcard('puppeteer:deadlines'), 0)
+
+    def test_deadlines_survive_a_failing_handler(self):
+        import time
+        from unittest import mock
+        from affiliates.deadlines import EXPIRE_HANDLERS, add_deadline, sweep_deadlines
+
+        add_deadline(self.redis, 'search', 'search-1')
+        add_deadline(self.redis, 'affiliate', 'affiliate-1')
+        with mock.patch.dict(EXPIRE_HANDLERS, {'affiliate': mock.Mock(side_effect=RuntimeError('db down'))}):
+            with self.assertRaises(RuntimeError):
+                sweep_deadlines(self.redis, now=time.time() + 3601)
+
+        self.assertIn('affiliate:affiliate-1', self.redis.zrangebyscore('puppeteer:deadlines', '-inf', '+inf'))
+        self.assertEqual(sweep_deadlines(self.redis, now=time.time() + 3601)['due'], 1)
+
+    def test_legacy_safety_check_schedules_are_migrated(self):
+        from django_q.models import Schedule
+        from django.utils import timezone
+        from affiliates.deadlines import migrate_safety_check_schedules
+
+        Schedule.objects.create(
+            name='safety_check_search_abc', func='affiliates.tasks.check_stalled_search_task',
+            args=json.dumps(['abc', 'usb hub']), schedule_type=Schedule.ONCE, next_run=timezone.now(),
+        )
+        self.assertEqual(migrate_safety_check_schedules(self.redis), 1)
+        self.assertFalse(Schedule.objects.exists())
+        self.assertEqual(self.redis.zrangebyscore('puppeteer:deadlines', '-inf', '+inf'), ['search:abc'])
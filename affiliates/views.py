@@ -2,12 +2,16 @@ from django.shortcuts import render
 from django.http import HttpResponse, JsonResponse
 from django.views.decorators.csrf import csrf_exempt
 from django.conf import settings
+from django.db import transaction
 import json
 import redis
 import logging
 import uuid
 import re  # Add regex import for part number extraction
 from affiliates.models import AffiliateLink, ProductAssociation
+from affiliates.association_index import find_associations
+from affiliates.callbacks import AfterCommitRedis, receive_callback
+from affiliates.single_flight import finish_flight
 from django.utils import timezone
 from products.models import Product, Manufacturer, Category
 from django.utils.text import slugify
@@ -23,27 +27,31 @@ logger = logging.getLogger('affiliate_tasks')
 
 @csrf_exempt
 def affiliate_callback(request, task_id):
-    """Handle callback from puppeteer worker with affiliate link results"""
-    if request.method != 'POST':
-        return HttpResponse("POST method required", status=405)
+    """Puppeteer worker callback for an affiliate link task; stored and processed in the background"""
+    return receive_callback(request, 'affiliate', task_id)
+
+def process_affiliate_callback(task_id, data):
+    """
+    Apply a puppeteer worker's affiliate link result (see affiliates/callbacks.py)
     
-    logger.info(f"Received callback for task_id: {task_id}")
+    Returns:
+        tuple: (HTTP status the worker used to get, message)
+    """
+    logger.info(f"Processing callback for task_id: {task_id}")
     
     try:
-        # Get the data from the request
-        data = json.loads(request.body)
         affiliate_url = data.get('affiliateUrl')
         error = data.get('error')
         
         # Get Redis connection
         redis_kwargs = get_redis_connection()
-        r = redis.Redis(**redis_kwargs)
+        r = AfterCommitRedis(redis.Redis(**redis_kwargs))
         
         # Get the affiliate_link_id from Redis
         affiliate_link_id = r.get(f"pending_affiliate_task:{task_id}")
         if not affiliate_link_id:
             logger.error(f"No pending task found for task_id: {task_id}")
-            return HttpResponse("Task not found", status=404)
+            return 404, "Task not found"
         
         # Update the affiliate link
         affiliate_link = AffiliateLink.objects.get(pk=affiliate_link_id)
@@ -71,11 +79,12 @@ def affiliate_callback(request, task_id):
                         commission_rate = data.get('commissionRate') or Decimal('4.00')  # Default 4%
                         
                         # Create or update the unified offer
-                        offer, created = create_affiliate_offer_from_link(
-                            affiliate_link=affiliate_link,
-                            current_price=price_decimal,
-                            commission_rate=commission_rate
-                        )
+                        with transaction.atomic():
+                            offer, created = create_affiliate_offer_from_link(
+                                affiliate_link=affiliate_link,
+                                current_price=price_decimal,
+                                commission_rate=commission_rate
+                            )
                         
                         action = "created" if created else "updated"
                         logger.info(f"✅ Hybrid offer {action}: {offer.product.name} - ${offer.selling_price} (Commission: ${offer.expected_commission})")
@@ -109,10 +118,10 @@ def affiliate_callback(request, task_id):
         # Store this for 1 hour (clients should poll more frequently)
         r.set(f"affiliate_task_status:{task_id}", json.dumps(result_data), ex=3600)
         
-        return HttpResponse("Success", status=200)
+        return 200, "Success"
     except Exception as e:
         logger.error(f"Error processing callback: {str(e)}", exc_info=True)
-        return HttpResponse(f"Error: {str(e)}", status=500)
+        return 500, f"Error: {str(e)}"
 
 def check_affiliate_status(request):
     # Get the task IDs the extension is waiting for
@@ -166,34 +175,36 @@ def get_redis_connection():
 
 @csrf_exempt
 def standalone_callback(request, task_id):
-    """Handle callback from puppeteer worker with standalone affiliate link results"""
-    if request.method != 'POST':
-        return HttpResponse("POST method required", status=405)
+    """Puppeteer worker callback for a standalone ASIN task; stored and processed in the background"""
+    return receive_callback(request, 'standalone', task_id)
+
+def process_standalone_callback(task_id, data):
+    """
+    Apply a puppeteer worker's standalone affiliate link result (see affiliates/callbacks.py)
     
-    logger.info(f"Received standalone callback for task_id: {task_id}")
+    Returns:
+        tuple: (HTTP status the worker used to get, message)
+    """
+    logger.info(f"Processing standalone callback for task_id: {task_id}")
     
     try:
-        # Get the data from the request
-        data = json.loads(request.body)
-        print(f"CALLBACK DATA RECEIVED: {json.dumps(data, indent=2)}")
-        
         affiliate_url = data.get('affiliateUrl')
         error = data.get('error')
         
         if error:
             logger.error(f"Error from puppeteer worker: {error}")
             store_result_in_redis(task_id, error=error)
-            return HttpResponse("Error recorded", status=200)
+            return 200, "Error recorded"
             
         # Get Redis connection
         redis_kwargs = get_redis_connection()
-        r = redis.Redis(**redis_kwargs)
+        r = AfterCommitRedis(redis.Redis(**redis_kwargs))
         
         # Check if we already processed this task
         existing_result = r.get(f"standalone_task_status:{task_id}")
         if existing_result:
             logger.info(f"Task {task_id} already processed, returning success")
-            return HttpResponse("Already processed", status=200)
+            return 200, "Already processed"
         
         # Get the ASIN and original URL from Redis
         asin = r.get(f"pending_standalone_task:{task_id}")
@@ -220,9 +231,9 @@ def standalone_callback(request, task_id):
                     
                     if existing_link:
                         logger.info(f"Affiliate link already exists: {existing_link.id}")
-                        return HttpResponse("Link already exists", status=200)
+                        return 200, "Link already exists"
             
-            return HttpResponse("Task not found", status=404)
+            return 404, "Task not found"
         
         # Check for existing placeholder product to enrich
         placeholder_product = Product.objects.filter(part_number=asin, is_placeholder=True).first()
@@ -313,17 +324,18 @@ def standalone_callback(request, task_id):
                 except (Manufacturer.DoesNotExist, Product.DoesNotExist):
                     # Product doesn't exist, create it
                     try:
-                        product = Product.objects.create(
-                            name=callback_product_data.get('title', f"Amazon Product {asin}"),
-                            slug=slugify(callback_product_data.get('title', f"amazon-product-{asin}")),
-                            description=callback_product_data.get('description', ''),
-                            part_number=extracted_part_number,
-                            manufacturer=manufacturer,
-                            main_image=callback_product_data.get('image', ''),
-                            status='active',
-                            source='amazon',
-                            is_placeholder=False
-                        )
+                        with transaction.atomic():
+                            product = Product.objects.create(
+                                name=callback_product_data.get('title', f"Amazon Product {asin}"),
+                                slug=slugify(callback_product_data.get('title', f"amazon-product-{asin}")),
+                                description=callback_product_data.get('description', ''),
+                                part_number=extracted_part_number,
+                                manufacturer=manufacturer,
+                                main_image=callback_product_data.get('image', ''),
+                                status='active',
+                                source='amazon',
+                                is_placeholder=False
+                            )
                         print(f"✅ Created new product with real data: {product.name}")
                     except Exception as create_error:
                         print(f"Error creating product: {create_error}")
@@ -372,17 +384,18 @@ def standalone_callback(request, task_id):
             except Product.DoesNotExist:
                 # Product doesn't exist, create it
                 try:
-                    product = Product.objects.create(
-                        name=product_data.get('name', f"Amazon Product {asin}"),
-                        slug=slugify(product_data.get('name', f"amazon-product-{asin}")),
-                        description=product_data.get('description', ''),
-                        part_number=extracted_part_number,
-                        manufacturer=manufacturer,
-                        main_image=product_data.get('mainImage', ''),
-                        status='active',
-                        source='amazon',
-                        is_placeholder=False
-                    )
+                    with transaction.atomic():
+                        product = Product.objects.create(
+                            name=product_data.get('name', f"Amazon Product {asin}"),
+                            slug=slugify(product_data.get('name', f"amazon-product-{asin}")),
+                            description=product_data.get('description', ''),
+                            part_number=extracted_part_number,
+                            manufacturer=manufacturer,
+                            main_image=product_data.get('mainImage', ''),
+                            status='active',
+                            source='amazon',
+                            is_placeholder=False
+                        )
                     
                     # Save technical details if available
                     if 'technicalDetails' in product_data:
@@ -490,11 +503,12 @@ def standalone_callback(request, task_id):
                 commission_rate = product_data.get('commissionRate') or Decimal('4.00')  # Default 4%
                 
                 # Create or update the unified offer using our utility function
-                offer, created = create_affiliate_offer_from_link(
-                    affiliate_link=affiliate_link,
-                    current_price=price_decimal,
-                    commission_rate=commission_rate
-                )
+                with transaction.atomic():
+                    offer, created = create_affiliate_offer_from_link(
+                        affiliate_link=affiliate_link,
+                        current_price=price_decimal,
+                        commission_rate=commission_rate
+                    )
                 
                 action = "created" if created else "updated"
                 logger.info(f"✅ Hybrid offer {action} from standalone: {offer.product.name} - ${offer.selling_price} (Commission: ${offer.expected_commission})")
@@ -507,6 +521,7 @@ def standalone_callback(request, task_id):
         
         # Clean up Redis
         r.delete(f"pending_standalone_task:{task_id}")
+        finish_flight(r, task_id)
         r.delete(f"pending_standalone_original_url:{task_id}")
         r.delete(f"pending_product_data:{task_id}")
         
@@ -520,16 +535,16 @@ def standalone_callback(request, task_id):
         }))
         
         print(f"Successfully processed standalone affiliate callback for task {task_id}")
-        return HttpResponse("Success", status=200)
+        return 200, "Success"
     except Exception as e:
         print(f"ERROR: {str(e)}")
         traceback.print_exc()
-        return HttpResponse(f"Error: {str(e)}", status=500)
+        return 500, f"Error: {str(e)}"
 
 def store_result_in_redis(task_id, error=None):
     """Helper to store task results in Redis"""
     redis_kwargs = get_redis_connection()
-    r = redis.Redis(**redis_kwargs)
+    r = AfterCommitRedis(redis.Redis(**redis_kwargs))
     
     # Get the ASIN and original URL
     asin = r.get(f"pending_standalone_task:{task_id}")
@@ -550,32 +565,35 @@ def store_result_in_redis(task_id, error=None):
     
     # Clean up
     r.delete(f"pending_standalone_task:{task_id}")
+    finish_flight(r, task_id, error=error)
     r.delete(f"pending_standalone_original_url:{task_id}")
     r.delete(f"pending_product_data:{task_id}")
 
 @csrf_exempt
 def search_callback(request):
-    """Handle callback from puppeteer worker with Amazon search results"""
-    if request.method != 'POST':
-        return HttpResponse("POST method required", status=405)
+    """Puppeteer worker callback for an Amazon search task; stored and processed in the background"""
+    return receive_callback(request, 'search')
+
+def process_search_callback(data):
+    """
+    Apply a puppeteer worker's Amazon search result (see affiliates/callbacks.py)
     
-    logger.info("Received Amazon search callback")
+    Returns:
+        tuple: (HTTP status the worker used to get, message)
+    """
+    logger.info("Processing Amazon search callback")
     
     try:
-        # Get the data from the request
-        data = json.loads(request.body)
-        print(f"SEARCH CALLBACK DATA RECEIVED: {json.dumps(data, indent=2)}")
-        
         task_id = data.get('taskId')
         error = data.get('error')
         
         if not task_id:
             logger.error("No task_id provided in search callback")
-            return HttpResponse("task_id required", status=400)
+            return 400, "task_id required"
         
         # Get Redis connection
         redis_kwargs = get_redis_connection()
-        r = redis.Redis(**redis_kwargs)
+        r = AfterCommitRedis(redis.Redis(**redis_kwargs))
         
         if error:
             logger.error(f"Error from puppeteer search worker: {error}")
@@ -588,7 +606,8 @@ def search_callback(request):
             r.set(f"search_task_status:{task_id}", json.dumps(result_data), ex=3600)
             # Clean up pending task
             r.delete(f"pending_search_task:{task_id}")
-            return HttpResponse("Error recorded", status=200)
+            finish_flight(r, task_id, error=result_data["error"])
+            return 200, "Error recorded"
         
         # Extract search results from callback
         search_results = data.get('searchResults', [])
@@ -606,7 +625,8 @@ def search_callback(request):
             }
             r.set(f"search_task_status:{task_id}", json.dumps(result_data), ex=3600)
             r.delete(f"pending_search_task:{task_id}")
-            return HttpResponse("No product data found", status=200)
+            finish_flight(r, task_id, error=result_data["error"])
+            return 200, "No product data found"
         
         # IMPORTANT: Amazon search results don't need to be exact matches!
         # We should create affiliate links for ANY valid Amazon product found,
@@ -617,7 +637,7 @@ def search_callback(request):
         pending_task_json = r.get(f"pending_search_task:{task_id}")
         if not pending_task_json:
             logger.error(f"No pending search task found for task_id: {task_id}")
-            return HttpResponse("Task not found", status=404)
+            return 404, "Task not found"
         
         pending_task = json.loads(pending_task_json)
         original_search_term = pending_task.get('searchTerm')
@@ -642,7 +662,8 @@ def search_callback(request):
             }
             r.set(f"search_task_status:{task_id}", json.dumps(result_data), ex=3600)
             r.delete(f"pending_search_task:{task_id}")
-            return HttpResponse("Invalid ASIN", status=200)
+            finish_flight(r, task_id, error=result_data["error"])
+            return 200, "Invalid ASIN"
         
         # Validate affiliate URL (required for revenue generation)
         if not affiliate_url or not affiliate_url.startswith('https://amzn.to/'):
@@ -654,7 +675,8 @@ def search_callback(request):
             }
             r.set(f"search_task_status:{task_id}", json.dumps(result_data), ex=3600)
             r.delete(f"pending_search_task:{task_id}")
-            return HttpResponse("Invalid affiliate URL", status=200)
+            finish_flight(r, task_id, error=result_data["error"])
+            return 200, "Invalid affiliate URL"
         
         logger.info(f"✅ Creating Amazon product: ASIN={asin}, Title='{product_title[:50]}...', Price={product_price}")
         
@@ -722,7 +744,8 @@ def search_callback(request):
                 }
                 r.set(f"search_task_status:{task_id}", json.dumps(result_data), ex=3600)
                 r.delete(f"pending_search_task:{task_id}")
-                return HttpResponse(f"Product creation failed: {create_error}", status=500)
+                finish_flight(r, task_id)
+                return 500, f"Product creation failed: {create_error}"
         
         # Create or update affiliate link
         affiliate_link = None
@@ -763,7 +786,8 @@ def search_callback(request):
             }
             r.set(f"search_task_status:{task_id}", json.dumps(result_data), ex=3600)
             r.delete(f"pending_search_task:{task_id}")
-            return HttpResponse(f"Affiliate link creation failed: {link_error}", status=500)
+            finish_flight(r, task_id)
+            return 500, f"Affiliate link creation failed: {link_error}"
         
         # HYBRID ARCHITECTURE: Create unified offer if we have price data from search
         if affiliate_link and product_price:
@@ -775,11 +799,12 @@ def search_callback(request):
                 commission_rate = selected_product.get('commissionRate') or Decimal('4.00')  # Default 4%
                 
                 # Create or update the unified offer using our utility function
-                offer, created = create_affiliate_offer_from_link(
-                    affiliate_link=affiliate_link,
-                    current_price=price_decimal,
-                    commission_rate=commission_rate
-                )
+                with transaction.atomic():
+                    offer, created = create_affiliate_offer_from_link(
+                        affiliate_link=affiliate_link,
+                        current_price=price_decimal,
+                        commission_rate=commission_rate
+                    )
                 
                 action = "created" if created else "updated"
                 logger.info(f"✅ Hybrid offer {action} from search: {offer.product.name} - ${offer.selling_price} (Commission: ${offer.expected_commission})")
@@ -793,28 +818,29 @@ def search_callback(request):
         # Create ProductAssociation to track search relationships
         if product and affiliate_link:
             try:
-                association, created = ProductAssociation.objects.get_or_create(
-                    target_product=product,
-                    original_search_term=original_search_term,
-                    association_type='search_alternative',
-                    defaults={
-                        'confidence_score': selected_product.get('score', 0.8),
-                        'created_via_platform': 'amazon',
-                        'search_context': {
-                            'search_type': search_type,
-                            'asin': asin,
-                            'title': product_title,
-                            'price': product_price,
-                            'rating': rating,
-                            'review_count': review_count,
-                            'selection_reason': selected_product.get('selectionReason', 'amazon_search')
+                with transaction.atomic():
+                    association, created = ProductAssociation.objects.get_or_create(
+                        target_product=product,
+                        original_search_term=original_search_term,
+                        association_type='search_alternative',
+                        defaults={
+                            'confidence_score': selected_product.get('score', 0.8),
+                            'created_via_platform': 'amazon',
+                            'search_context': {
+                                'search_type': search_type,
+                                'asin': asin,
+                                'title': product_title,
+                                'price': product_price,
+                                'rating': rating,
+                                'review_count': review_count,
+                                'selection_reason': selected_product.get('selectionReason', 'amazon_search')
+                            }
                         }
-                    }
-                )
+                    )
                 
-                if not created:
-                    # Update existing association
-                    association.increment_search_count()
+                    if not created:
+                        # Update existing association
+                        association.increment_search_count()
                 
                 logger.info(f"✅ Product association {'created' if created else 'updated'}: '{original_search_term}' -> {product.name}")
                 
@@ -845,6 +871,7 @@ def search_callback(request):
         
         # Clean up pending task
         r.delete(f"pending_search_task:{task_id}")
+        finish_flight(r, task_id)
         
         # Publish notification
         r.publish("affiliate_notifications", json.dumps({
@@ -858,11 +885,11 @@ def search_callback(request):
         }))
         
         logger.info(f"Successfully processed Amazon search callback for task {task_id}")
-        return HttpResponse("Success", status=200)
+        return 200, "Success"
         
     except Exception as e:
         logger.error(f"Error processing search callback: {str(e)}", exc_info=True)
-        return HttpResponse(f"Error: {str(e)}", status=500)
+        return 500, f"Error: {str(e)}"
 
 @csrf_exempt  # Only if this endpoint doesn't need CSRF protection
 def check_affiliate_task_status(request):
@@ -1044,37 +1071,13 @@ def get_existing_associations(search_term, limit=5):
         return []
     
     try:
-        # Look for exact search term matches first
-        exact_matches = ProductAssociation.objects.filter(
-            original_search_term__iexact=search_term,
-            is_active=True
-        ).select_related('target_product', 'target_product__manufacturer').order_by('-search_count', '-confidence_score')[:limit]
+        # One indexed token query (exact term first, then shared words), LRU-cached per process
+        associations = find_associations(search_term, limit=limit)
         
-        if exact_matches.exists():
-            logger.info(f"🎯 Found {exact_matches.count()} exact associations for '{search_term}'")
-            return list(exact_matches)
-        
-        # If no exact matches, try partial matches
-        # Split search term into words for better matching
-        search_words = search_term.lower().split()
-        
-        if len(search_words) >= 2:
-            # Build a query that looks for associations containing any of the search words
-            from django.db.models import Q
-            
-            word_query = Q()
-            for word in search_words:
-                if len(word) >= 3:  # Skip very short words
-                    word_query |= Q(original_search_term__icontains=word)
-            
-            partial_matches = ProductAssociation.objects.filter(
-                word_query,
-                is_active=True
-            ).select_related('target_product', 'target_product__manufacturer').order_by('-search_count', '-confidence_score')[:limit]
-            
-            if partial_matches.exists():
-                logger.info(f"🔍 Found {partial_matches.count()} partial associations for '{search_term}'")
-                return list(partial_matches)
+        if associations:
+            kind = 'exact' if associations[0].exact_match else 'partial'
+            logger.info(f"🎯 Found {len(associations)} {kind} associations for '{search_term}'")
+            return associations
         
         logger.info(f"❌ No existing associations found for '{search_term}'")
         return []
@@ -12,6 +12,7 @@ django.setup()
 
 from products.models import Product, Manufacturer
 from django.db.models import Q
+from ecommerce_platform.db_routing import use_replica
 
 def analyze_inventory():
     """Comprehensive analysis of current inventory for consumer product strategy"""
@@ -122,4 +123,6 @@ def analyze_inventory():
     }
 
 if __name__ == "__main__":
-    results = analyze_inventory() 
\ No newline at end of file
+    # Read-only report: keep it off the primary
+    with use_replica():
+        results = analyze_inventory() 
\ No newline at end of file
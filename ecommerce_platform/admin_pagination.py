@@ -0,0 +1,62 @@
+"""
+Admin changelist helpers for the high-volume tables.
+
+Django's changelist runs an exact ``COUNT(*)`` for the paginator and, unless
+``show_full_result_count`` is off, a second one for the unfiltered total.
+On tables with millions of rows each count is a full scan. For unfiltered
+changelists on Postgres the paginator reads the planner estimate from
+``pg_class.reltuples`` instead.
+"""
+
+from django.conf import settings
+from django.core.paginator import Paginator
+from django.db import connections
+from django.utils.functional import cached_property
+
+# Tables estimated below this size are counted exactly
+ESTIMATED_COUNT_THRESHOLD = getattr(settings, 'ADMIN_ESTIMATED_COUNT_THRESHOLD', 100000)
+
+
+def estimated_table_count(model, using='default'):
+    """Planner row estimate for a model's table, or None if unavailable"""
+    connection = connections[using]
+    if connection.vendor != 'postgresql':
+        return None
+
+    with connection.cursor() as cursor:
+        cursor.execute(
+            "SELECT reltuples::bigint FROM pg_class WHERE oid = %s::regclass",
+            [model._meta.db_table]
+        )
+        row = cursor.fetchone()
+
+    # reltuples is -1 (PG14+) or 0 for tables that were never analyzed
+    if not row or row[0] is None or row[0] <= 0:
+        return None
+    return int(row[0])
+
+
+class EstimatedCountPaginator(Paginator):
+    """Paginator that uses the table estimate for unfiltered querysets on large tables"""
+
+    @cached_property
+    def count(self):
+        queryset = self.object_list
+        query = getattr(queryset, 'query', None)
+
+        if query is not None and not query.where and not query.distinct:
+            estimate = estimated_table_count(queryset.model, using=queryset.db)
+            if estimate is not None and estimate >= ESTIMATED_COUNT_THRESHOLD:
+                return estimate
+
+        return super().count
+
+
+class FastChangelistMixin:
+    """
+    ModelAdmin mixin for large tables: estimated pagination counts and no
+    second unfiltered COUNT(*) for the "N total" link.
+    """
+
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
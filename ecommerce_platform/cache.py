@@ -0,0 +1,400 @@
+"""
+Tiered cache backend: a small per-process LRU in front of the shared Redis.
+
+Configured as ``CACHES['default']`` so every ``django.core.cache.cache`` user
+gets it. Reads check the in-process LRU first, then Redis; writes go to both.
+Local entries live at most ``LOCAL_TTL`` seconds so deletes made by other
+processes are picked up quickly.
+
+``get_or_set`` with a callable coalesces recomputes across processes: the
+first caller takes a short Redis lock and computes, everyone else waits for
+the value to appear instead of recomputing it. Shared TTLs are jittered so
+keys written together do not all expire together.
+
+If Redis is unreachable the backend degrades to the local LRU and retries
+the connection after ``REDIS_RETRY_SECONDS``.
+"""
+
+import logging
+import pickle
+import random
+import threading
+import time
+import uuid
+from collections import OrderedDict
+
+import redis
+from django.core.cache.backends.base import BaseCache, DEFAULT_TIMEOUT
+
+logger = logging.getLogger(__name__)
+
+_MISSING = object()
+
+METRIC_NAMES = (
+    'local_hits', 'shared_hits', 'misses', 'recomputes',
+    'coalesced_waits', 'lock_timeouts', 'errors',
+)
+
+# Compare-and-delete so a lock is only released by the process holding it
+_RELEASE_LOCK_SCRIPT = """
+if redis.call('get', KEYS[1]) == ARGV[1] then
+    return redis.call('del', KEYS[1])
+end
+return 0
+"""
+
+
+class LocalLRU:
+    """Thread-safe bounded LRU with per-entry expiry"""
+
+    def __init__(self, max_entries=1000):
+        self.max_entries = max_entries
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key, default=_MISSING):
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:
+                return default
+            expires_at, value = entry
+            if expires_at is not None and expires_at <= time.monotonic():
+                del self._data[key]
+                return default
+            self._data.move_to_end(key)
+            return value
+
+    def set(self, key, value, ttl):
+        expires_at = None if ttl is None else time.monotonic() + ttl
+        with self._lock:
+            self._data[key] = (expires_at, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.max_entries:
+                self._data.popitem(last=False)
+
+    def add(self, key, value, ttl):
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is not None and (entry[0] is None or entry[0] > time.monotonic()):
+                return False
+        self.set(key, value, ttl)
+        return True
+
+    def delete(self, key):
+        with self._lock:
+            return self._data.pop(key, None) is not None
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+
+class TieredCache(BaseCache):
+    """
+    Django cache backend combining LocalLRU and Redis
+
+    OPTIONS:
+        LOCAL_MAX_ENTRIES: Size of the per-process LRU (default 1000)
+        LOCAL_TTL: Max seconds a value is served from the LRU (default 30)
+        TTL_JITTER: Fraction shaved randomly off shared TTLs (default 0.1)
+        LOCK_TIMEOUT: Seconds a recompute lock is held at most (default 30)
+        LOCK_WAIT: Seconds a waiter polls for a coalesced value (default 10)
+        REDIS_RETRY_SECONDS: Back-off after a Redis error (default 5)
+        METRICS_FLUSH_SECONDS: How often counters are pushed to Redis (default 30)
+    """
+
+    def __init__(self, server, params):
+        super().__init__(params)
+        options = params.get('OPTIONS', {})
+        self._server = server
+        self._local = LocalLRU(options.get('LOCAL_MAX_ENTRIES', 1000))
+        self._local_ttl = options.get('LOCAL_TTL', 30)
+        self._jitter = options.get('TTL_JITTER', 0.1)
+        self._lock_timeout = options.get('LOCK_TIMEOUT', 30)
+        self._lock_wait = options.get('LOCK_WAIT', 10)
+        self._retry_seconds = options.get('REDIS_RETRY_SECONDS', 5)
+        self._metrics_flush_seconds = options.get('METRICS_FLUSH_SECONDS', 30)
+
+        self._client = None
+        self._down_until = 0.0
+        self._metrics = dict.fromkeys(METRIC_NAMES, 0)
+        self._unflushed = dict.fromkeys(METRIC_NAMES, 0)
+        self._metrics_lock = threading.Lock()
+        self._last_flush = time.monotonic()
+
+    # Redis connection
+
+    def _redis(self):
+        if time.monotonic() < self._down_until:
+            return None
+        if self._client is None:
+            if self._server:
+                self._client = redis.Redis.from_url(self._server, socket_connect_timeout=0.5, socket_timeout=1.0)
+            else:
+                from ecommerce_platform.utils import get_redis_connection
+                kwargs = dict(get_redis_connection(), decode_responses=False)
+                self._client = redis.Redis(socket_connect_timeout=0.5, socket_timeout=1.0, **kwargs)
+        return self._client
+
+    def _redis_failed(self, error):
+        if time.monotonic() >= self._down_until:
+            logger.warning(f"⚠️ Shared cache unavailable, serving from local cache only: {str(error)}")
+        self._down_until = time.monotonic() + self._retry_seconds
+        self._count('errors')
+
+    # Metrics
+
+    def _count(self, name):
+        with self._metrics_lock:
+            self._metrics[name] += 1
+            self._unflushed[name] += 1
+        if time.monotonic() - self._last_flush >= self._metrics_flush_seconds:
+            self.flush_metrics()
+
+    def flush_metrics(self):
+        """Push counters accumulated since the last flush into the shared Redis hash"""
+        with self._metrics_lock:
+            pending = {name: count for name, count in self._unflushed.items() if count}
+            self._unflushed = dict.fromkeys(METRIC_NAMES, 0)
+            self._last_flush = time.monotonic()
+        client = self._redis()
+        if not pending or client is None:
+            return
+        try:
+            pipe = client.pipeline(transaction=False)
+            for name, count in pending.items():
+                pipe.hincrby(self._metrics_key(), name, count)
+            pipe.execute()
+        except redis.RedisError as e:
+            self._redis_failed(e)
+
+    def _metrics_key(self):
+        return f"{self.key_prefix}:cache_metrics"
+
+    def metrics(self):
+        """Counters for this process"""
+        with self._metrics_lock:
+            return dict(self._metrics)
+
+    def shared_metrics(self):
+        """Counters aggregated across all processes (as last flushed)"""
+        client = self._redis()
+        if client is None:
+            return {}
+        try:
+            data = client.hgetall(self._metrics_key())
+        except redis.RedisError as e:
+            self._redis_failed(e)
+            return {}
+        return {name.decode(): int(value) for name, value in data.items()}
+
+    # Helpers
+
+    def _ttl(self, timeout):
+        """Seconds to keep a value in Redis (None = forever), with jitter applied"""
+        if timeout is DEFAULT_TIMEOUT:
+            timeout = self.default_timeout
+        if timeout is None:
+            return None
+        if timeout <= 0:
+            return 0
+        return max(1, int(timeout * (1 - random.uniform(0, self._jitter))))
+
+    def _local_ttl_for(self, ttl):
+        return self._local_ttl if ttl is None else min(ttl, self._local_ttl)
+
+    def _load(self, raw):
+        return pickle.loads(raw)
+
+    def _dump(self, value):
+        return pickle.dumps(value, pickle.HIGHEST_PROTOCOL)
+
+    def _get_raw(self, key):
+        """Look a made key up in both tiers without touching the metrics"""
+        value = self._local.get(key)
+        if value is not _MISSING:
+            return value, 'local'
+        client = self._redis()
+        if client is None:
+            return _MISSING, None
+        try:
+            raw = client.get(key)
+        except redis.RedisError as e:
+            self._redis_failed(e)
+            return _MISSING, None
+        if raw is None:
+            return _MISSING, None
+        value = self._load(raw)
+        self._local.set(key, value, self._local_ttl)
+        return value, 'shared'
+
+    # Django cache API
+
+    def get(self, key, default=None, version=None):
+        key = self.make_and_validate_key(key, version=version)
+        value, tier = self._get_raw(key)
+        if value is _MISSING:
+            self._count('misses')
+            return default
+        self._count('local_hits' if tier == 'local' else 'shared_hits')
+        return value
+
+    def set(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        key = self.make_and_validate_key(key, version=version)
+        self._set(key, value, self._ttl(timeout))
+
+    def _set(self, key, value, ttl):
+        if ttl == 0:
+            self._delete(key)
+            return
+        self._local.set(key, value, self._local_ttl_for(ttl))
+        client = self._redis()
+        if client is None:
+            return
+        try:
+            client.set(key, self._dump(value), ex=ttl)
+        except redis.RedisError as e:
+            self._redis_failed(e)
+
+    def add(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        key = self.make_and_validate_key(key, version=version)
+        ttl = self._ttl(timeout)
+        client = self._redis()
+        if client is not None:
+            try:
+                added = bool(client.set(key, self._dump(value), ex=ttl or None, nx=True))
+                if added and ttl == 0:
+                    # Expires immediately: report whether the key was free, keep nothing
+                    client.delete(key)
+                elif added:
+                    self._local.set(key, value, self._local_ttl_for(ttl))
+                return added
+            except redis.RedisError as e:
+                self._redis_failed(e)
+        if ttl == 0:
+            return self._local.get(key) is _MISSING
+        return self._local.add(key, value, self._local_ttl_for(ttl))
+
+    def delete(self, key, version=None):
+        key = self.make_and_validate_key(key, version=version)
+        return self._delete(key)
+
+    def _delete(self, key):
+        deleted = self._local.delete(key)
+        client = self._redis()
+        if client is None:
+            return deleted
+        try:
+            return bool(client.delete(key)) or deleted
+        except redis.RedisError as e:
+            self._redis_failed(e)
+            return deleted
+
+    def touch(self, key, timeout=DEFAULT_TIMEOUT, version=None):
+        key = self.make_and_validate_key(key, version=version)
+        client = self._redis()
+        if client is None:
+            return self._local.get(key) is not _MISSING
+        ttl = self._ttl(timeout)
+        try:
+            if ttl is None:
+                return bool(client.persist(key))
+            return bool(client.expire(key, ttl))
+        except redis.RedisError as e:
+            self._redis_failed(e)
+            return False
+
+    def has_key(self, key, version=None):
+        key = self.make_and_validate_key(key, version=version)
+        return self._get_raw(key)[0] is not _MISSING
+
+    def clear(self):
+        """Remove this cache's keys only; the Redis database is shared with django-q"""
+        self._local.clear()
+        client = self._redis()
+        if client is None:
+            return
+        try:
+            batch = []
+            for key in client.scan_iter(match=f"{self.key_prefix}:*", count=500):
+                batch.append(key)
+                if len(batch) >= 500:
+                    client.delete(*batch)
+                    batch = []
+            if batch:
+                client.delete(*batch)
+        except redis.RedisError as e:
+            self._redis_failed(e)
+
+    def get_or_set(self, key, default, timeout=DEFAULT_TIMEOUT, version=None):
+        """
+        Return the cached value, computing it at most once across processes
+
+        When ``default`` is callable and the key is missing, the first caller
+        holds a short Redis lock while computing; concurrent callers wait for
+        the value instead of recomputing it. Waiters fall back to computing
+        themselves after LOCK_WAIT seconds.
+        """
+        made_key = self.make_and_validate_key(key, version=version)
+        value, tier = self._get_raw(made_key)
+        if value is not _MISSING:
+            self._count('local_hits' if tier == 'local' else 'shared_hits')
+            return value
+        self._count('misses')
+
+        if not callable(default):
+            self.add(key, default, timeout=timeout, version=version)
+            return self.get(key, default, version=version)
+
+        ttl = self._ttl(timeout)
+        client = self._redis()
+        if client is None:
+            return self._recompute(made_key, default, ttl)
+
+        lock_key = f"{made_key}:lock"
+        token = uuid.uuid4().hex
+        deadline = time.monotonic() + self._lock_wait
+        delay = 0.05
+        while True:
+            try:
+                acquired = client.set(lock_key, token, nx=True, px=int(self._lock_timeout * 1000))
+            except redis.RedisError as e:
+                self._redis_failed(e)
+                return self._recompute(made_key, default, ttl)
+
+            if acquired:
+                try:
+                    return self._recompute(made_key, default, ttl)
+                finally:
+                    try:
+                        client.eval(_RELEASE_LOCK_SCRIPT, 1, lock_key, token)
+                    except redis.RedisError as e:
+                        self._redis_failed(e)
+
+            time.sleep(delay)
+            delay = min(delay * 2, 0.5)
+            value, _ = self._get_raw(made_key)
+            if value is not _MISSING:
+                self._count('coalesced_waits')
+                return value
+            if time.monotonic() >= deadline:
+                self._count('lock_timeouts')
+                logger.warning(f"⏰ Gave up waiting for cache recompute of {key}, computing locally")
+                return self._recompute(made_key, default, ttl)
+
+    def _recompute(self, made_key, default, ttl):
+        value = default()
+        self._count('recomputes')
+        self._set(made_key, value, ttl)
+        return value
+
+
+def get_cache_metrics():
+    """Hit/miss/recompute counters for the default cache (this process and shared)"""
+    from django.core.cache import caches
+
+    backend = caches['default']
+    if not isinstance(backend, TieredCache):
+        return {}
+    backend.flush_metrics()
+    return {'process': backend.metrics(), 'shared': backend.shared_metrics()}
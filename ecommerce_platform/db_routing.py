@@ -0,0 +1,142 @@
+"""
+Read-replica routing.
+
+Reads go to the primary unless the current context opted in with
+``use_replica()``. The GraphQL view opts in for query operations and the
+analytics commands opt in for their whole run, so searches, dashboards and
+reports stop competing with click ingestion and wallet writes.
+
+Reads fall back to the primary whenever the replica could be stale for the
+caller:
+
+- inside a transaction on the primary;
+- after the current context has written anything (read-your-writes within
+  a request or task);
+- for REPLICA_PIN_SECONDS after a client's request wrote, e.g. the wallet
+  balance right after a withdrawal or a quote's status right after upload.
+  Pins are stored in the shared cache, keyed by user id, JWT or session, so
+  they hold across web workers.
+
+Settings:
+    REPLICA_DATABASE_ALIAS: DATABASES alias of the replica (None disables routing)
+    REPLICA_PIN_SECONDS: How long a client's reads stay on the primary after a write
+"""
+
+import hashlib
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import DEFAULT_DB_ALIAS, connections
+
+PIN_CACHE_PREFIX = 'db:pin:'
+
+_prefer_replica = ContextVar('prefer_replica', default=False)
+_wrote = ContextVar('wrote_to_primary', default=False)
+
+
+def get_replica_alias():
+    return getattr(settings, 'REPLICA_DATABASE_ALIAS', None)
+
+
+@contextmanager
+def use_replica():
+    """Route reads in this block to the replica (when configured and safe)"""
+    token = _prefer_replica.set(True)
+    try:
+        yield
+    finally:
+        _prefer_replica.reset(token)
+
+
+@contextmanager
+def use_primary():
+    """Force reads in this block to the primary"""
+    token = _prefer_replica.set(False)
+    try:
+        yield
+    finally:
+        _prefer_replica.reset(token)
+
+
+@contextmanager
+def track_writes():
+    """
+    Scope for one request: yields a callable reporting whether it wrote.
+
+    Starts clean so a write in an earlier request on the same thread can't
+    leak into this one.
+    """
+    token = _wrote.set(False)
+    try:
+        yield lambda: _wrote.get()
+    finally:
+        _wrote.reset(token)
+
+
+def pin_key_for_request(request):
+    """Identity used to pin a client to the primary, or None for anonymous clients"""
+    # The JWT header first: the JWT middleware only sets request.user during
+    # execution, so the user id would differ between the check and the pin
+    authorization = request.META.get('HTTP_AUTHORIZATION')
+    if authorization:
+        return 'auth:' + hashlib.sha256(authorization.encode('utf-8')).hexdigest()[:32]
+
+    user = getattr(request, 'user', None)
+    if user is not None and user.is_authenticated:
+        return f'user:{user.pk}'
+
+    session = getattr(request, 'session', None)
+    if session is not None and session.session_key:
+        return f'session:{session.session_key}'
+    return None
+
+
+def pin_to_primary(request):
+    key = pin_key_for_request(request)
+    if key:
+        cache.set(PIN_CACHE_PREFIX + key, True, timeout=getattr(settings, 'REPLICA_PIN_SECONDS', 10))
+
+
+def is_pinned_to_primary(request):
+    key = pin_key_for_request(request)
+    return bool(key) and cache.get(PIN_CACHE_PREFIX + key) is not None
+
+
+class ReplicaRouter:
+    """Sends opted-in reads to the replica and everything else to the primary"""
+
+    def db_for_read(self, model, **hints):
+        replica = get_replica_alias()
+        if replica is None or not _prefer_replica.get() or _wrote.get():
+            return DEFAULT_DB_ALIAS
+        if connections[DEFAULT_DB_ALIAS].in_atomic_block:
+            return DEFAULT_DB_ALIAS
+        return replica
+
+    def db_for_write(self, model, **hints):
+        _wrote.set(True)
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # The replica holds the same rows as the primary
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        # The replica receives its schema through replication
+        return db != get_replica_alias()
+
+
+class ReplicaPinMiddleware:
+    """Pins a client to the primary for a short window after any request that wrote"""
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        with track_writes() as wrote:
+            response = self.get_response(request)
+            if wrote():
+                pin_to_primary(request)
+        return response
@@ -0,0 +1,249 @@
+"""
+Static cost analysis and depth limiting for GraphQL operations.
+
+Runs after validation and before execution, so an over-budget operation never
+reaches a resolver. The cost of a field is
+
+    multiplier * (weight + cost of its selections)
+
+where ``weight`` is 0 for scalars, 1 for objects unless overridden in
+FIELD_COST_WEIGHTS, and ``multiplier`` is the field's ``first``/``last``/
+``limit`` argument for list and connection fields. Lists the client cannot
+bound count as FIELD_LIST_SIZES when listed there, else DEFAULT_LIST_SIZE on
+the root type and RELATION_LIST_SIZE for an object's relations (a product's
+offers, a quote's items), which hold a handful of rows rather than a page.
+Nested lists therefore still multiply, which is exactly the
+``products { offers { product { offers } } }`` blow-up.
+
+Settings:
+    GRAPHQL_MAX_QUERY_DEPTH: Deepest allowed selection nesting
+    GRAPHQL_MAX_QUERY_COST: Per-operation cost budget
+    GRAPHQL_DEFAULT_LIST_SIZE: Multiplier for root lists without a limit argument
+    GRAPHQL_RELATION_LIST_SIZE: Multiplier for nested relation lists without one
+    GRAPHQL_FIELD_COST_WEIGHTS: ``{'Type.field': weight}`` merged over the defaults
+    GRAPHQL_FIELD_LIST_SIZES: ``{'Type.field': rows}`` merged over the defaults
+"""
+
+import logging
+
+from django.conf import settings
+from graphql import (
+    FieldNode, FragmentSpreadNode, GraphQLError, InlineFragmentNode, OperationType,
+    get_named_type, get_nullable_type, is_leaf_type, is_list_type, value_from_ast,
+    value_from_ast_untyped,
+)
+from graphql.language import OperationDefinitionNode
+
+logger = logging.getLogger(__name__)
+
+LIMIT_ARGUMENTS = ('first', 'last', 'limit')
+
+# Resolvers that do far more work than loading one row
+FIELD_COST_WEIGHTS = {
+    'Query.productsSearch': 10,
+    'Query.unifiedProductSearch': 20,
+    'Query.consumerProductSearch': 20,
+    'Query.searchByName': 10,
+    'Query.searchByPartNumber': 5,
+    'Query.searchByAsin': 5,
+    'Query.priceComparison': 5,
+    'Query.productExists': 5,
+    'Query.existingAlternatives': 10,
+    'Query.productAssociations': 5,
+    'Query.debugAsinLookup': 20,
+    'Query.testExtractProduct': 20,
+}
+
+# Unbounded relation lists whose size is known to differ from RELATION_LIST_SIZE
+FIELD_LIST_SIZES = {
+    'QuoteType.items': 50,          # line items of an uploaded vendor quote
+    'QuoteItemType.matches': 5,     # quotes.tasks keeps the top 5 matches per item
+}
+
+
+def get_cost_limits():
+    """Depth, cost and default list size limits from settings"""
+    return {
+        'max_depth': getattr(settings, 'GRAPHQL_MAX_QUERY_DEPTH', 10),
+        'max_cost': getattr(settings, 'GRAPHQL_MAX_QUERY_COST', 10000),
+        'default_list_size': getattr(settings, 'GRAPHQL_DEFAULT_LIST_SIZE', 50),
+        'relation_list_size': getattr(settings, 'GRAPHQL_RELATION_LIST_SIZE', 5),
+    }
+
+
+def _field_weights():
+    return {**FIELD_COST_WEIGHTS, **getattr(settings, 'GRAPHQL_FIELD_COST_WEIGHTS', {})}
+
+
+def _field_list_sizes():
+    return {**FIELD_LIST_SIZES, **getattr(settings, 'GRAPHQL_FIELD_LIST_SIZES', {})}
+
+
+class QueryCostAnalyzer:
+    """Computes the cost and depth of one operation of a validated document"""
+
+    def __init__(self, schema, document, variables=None, default_list_size=50, weights=None,
+                 relation_list_size=5, list_sizes=None):
+        self.schema = schema
+        self.variables = variables or {}
+        self.default_list_size = default_list_size
+        self.relation_list_size = relation_list_size
+        self.weights = _field_weights() if weights is None else weights
+        self.list_sizes = _field_list_sizes() if list_sizes is None else list_sizes
+        self.root_types = {schema.query_type, schema.mutation_type, schema.subscription_type} - {None}
+        self.fragments = {
+            definition.name.value: definition
+            for definition in document.definitions
+            if not isinstance(definition, OperationDefinitionNode)
+        }
+
+    def analyze(self, operation):
+        """
+        Returns:
+            (cost, depth) for the operation
+        """
+        root_type = {
+            OperationType.QUERY: self.schema.query_type,
+            OperationType.MUTATION: self.schema.mutation_type,
+            OperationType.SUBSCRIPTION: self.schema.subscription_type,
+        }[operation.operation]
+        variables = self._with_variable_defaults(operation)
+        return self._selection_set_cost(root_type, operation.selection_set, variables, 0, frozenset())
+
+    def _with_variable_defaults(self, operation):
+        variables = {}
+        for definition in operation.variable_definitions or []:
+            name = definition.variable.name.value
+            if definition.default_value is not None:
+                variables[name] = value_from_ast_untyped(definition.default_value)
+        variables.update(self.variables)
+        return variables
+
+    def _selection_set_cost(self, parent_type, selection_set, variables, depth, visited_fragments):
+        cost = 0
+        max_depth = depth
+        for selection in selection_set.selections:
+            if isinstance(selection, FieldNode):
+                field_cost, field_depth = self._field_cost(parent_type, selection, variables, depth, visited_fragments)
+            elif isinstance(selection, InlineFragmentNode):
+                fragment_type = (
+                    self.schema.get_type(selection.type_condition.name.value)
+                    if selection.type_condition else parent_type
+                )
+                field_cost, field_depth = self._selection_set_cost(
+                    fragment_type, selection.selection_set, variables, depth, visited_fragments
+                )
+            elif isinstance(selection, FragmentSpreadNode):
+                name = selection.name.value
+                fragment = self.fragments.get(name)
+                if fragment is None or name in visited_fragments:
+                    continue
+                field_cost, field_depth = self._selection_set_cost(
+                    self.schema.get_type(fragment.type_condition.name.value),
+                    fragment.selection_set, variables, depth, visited_fragments | {name}
+                )
+            else:
+                continue
+            cost += field_cost
+            max_depth = max(max_depth, field_depth)
+        return cost, max_depth
+
+    def _field_cost(self, parent_type, node, variables, depth, visited_fragments):
+        name = node.name.value
+        # Introspection (GraphiQL, codegen) is cheap and deeply nested by design
+        if name.startswith('__') or parent_type is None:
+            return 0, depth
+
+        field = getattr(parent_type, 'fields', {}).get(name)
+        if field is None:
+            return 0, depth
+
+        named_type = get_named_type(field.type)
+        if is_leaf_type(named_type):
+            return self.weights.get(f'{parent_type.name}.{name}', 0), depth + 1
+
+        multiplier = self._multiplier(parent_type, field, node, variables)
+        weight = self.weights.get(f'{parent_type.name}.{name}', 1)
+        child_cost, child_depth = 0, depth + 1
+        if node.selection_set:
+            child_cost, child_depth = self._selection_set_cost(
+                named_type, node.selection_set, variables, depth + 1, visited_fragments
+            )
+        return multiplier * (weight + child_cost), child_depth
+
+    def _multiplier(self, parent_type, field, node, variables):
+        # edges/items of a connection were already multiplied at the connection field
+        if parent_type.name.endswith('Connection'):
+            return 1
+
+        is_connection = get_named_type(field.type).name.endswith('Connection')
+        if not is_connection and not is_list_type(get_nullable_type(field.type)):
+            return 1
+
+        limit = self._limit_argument(field, node, variables)
+        if limit is not None:
+            return max(0, limit)
+        size = self.list_sizes.get(f'{parent_type.name}.{node.name.value}')
+        if size is not None:
+            return size
+        return self.default_list_size if parent_type in self.root_types else self.relation_list_size
+
+    def _limit_argument(self, field, node, variables):
+        supplied = {argument.name.value: argument.value for argument in node.arguments or []}
+        for arg_name in LIMIT_ARGUMENTS:
+            arg = field.args.get(arg_name)
+            if arg is None:
+                continue
+            if arg_name in supplied:
+                value = value_from_ast(supplied[arg_name], arg.type, variables)
+            else:
+                value = arg.default_value
+            if isinstance(value, int) and not isinstance(value, bool):
+                return value
+        return None
+
+
+class QueryComplexityError(GraphQLError):
+    def __init__(self, message, code, cost, depth):
+        super().__init__(message, extensions={'code': code, 'cost': cost, 'depth': depth})
+
+
+def check_query_cost(schema, document, operation, variables=None):
+    """
+    Reject operations that exceed the depth limit or cost budget.
+
+    Args:
+        schema: graphql-core GraphQLSchema
+        document: Parsed, validated DocumentNode
+        operation: OperationDefinitionNode to be executed
+        variables: Request variables
+
+    Returns:
+        (cost, depth) of the operation
+
+    Raises:
+        QueryComplexityError: If the operation is too deep or too expensive
+    """
+    limits = get_cost_limits()
+    analyzer = QueryCostAnalyzer(
+        schema, document, variables, default_list_size=limits['default_list_size'],
+        relation_list_size=limits['relation_list_size'],
+    )
+    cost, depth = analyzer.analyze(operation)
+
+    operation_name = operation.name.value if operation.name else 'anonymous'
+    logger.info(f"📐 GraphQL {operation.operation.value} {operation_name}: cost={cost} depth={depth}")
+
+    if depth > limits['max_depth']:
+        logger.warning(f"🚫 Rejected {operation_name}: depth {depth} > {limits['max_depth']}")
+        raise QueryComplexityError(
+            f"Query depth {depth} exceeds the maximum of {limits['max_depth']}",
+            'QUERY_TOO_DEEP', cost, depth,
+        )
+    if cost > limits['max_cost']:
+        logger.warning(f"🚫 Rejected {operation_name}: cost {cost} > {limits['max_cost']}")
+        raise QueryComplexityError(
+            f"Query cost {cost} exceeds the budget of {limits['max_cost']}",
+            'QUERY_TOO_COMPLEX', cost, depth,
+        )
+    return cost, depth
@@ -0,0 +1,229 @@
+"""
+Parsed-document cache and persisted queries for the GraphQL endpoint.
+
+The Chrome extension sends the same handful of query documents thousands of
+times an hour. Parsing and validating a document only depends on its text and
+the schema, so each worker keeps an LRU of ``(document, validation_errors)``
+keyed by the SHA-256 of the query text.
+
+Persisted queries follow the Apollo "automatic persisted queries" protocol:
+clients send ``extensions.persistedQuery.sha256Hash`` instead of the query
+text, and the server looks the document up in
+
+1. the deploy-time manifest (``GRAPHQL_PERSISTED_QUERY_MANIFEST``, a JSON
+   object of ``{sha256: query}``), then
+2. the shared cache, where clients register documents by sending the hash
+   together with the query once (off unless
+   ``GRAPHQL_PERSISTED_QUERIES_ALLOW_REGISTRATION`` is set). Only documents
+   that parse and validate are stored, for ``GRAPHQL_PERSISTED_QUERY_TIMEOUT``
+   seconds; a client whose hash expired gets PersistedQueryNotFound and
+   registers it again.
+"""
+
+import hashlib
+import json
+import logging
+import threading
+from collections import OrderedDict
+
+from django.conf import settings
+from django.core.cache import cache
+from graphql import parse, validate
+from graphql.error import GraphQLError
+
+logger = logging.getLogger(__name__)
+
+PERSISTED_QUERY_CACHE_PREFIX = 'graphql:pq:'
+
+# Hard cap on registered query size so the shared store can't be used as a dump
+MAX_PERSISTED_QUERY_LENGTH = 100_000
+
+
+def query_hash(query):
+    """SHA-256 hex digest of a query document, as sent by APQ clients"""
+    return hashlib.sha256(query.encode('utf-8')).hexdigest()
+
+
+class DocumentCache:
+    """Thread-safe LRU of parsed and validated GraphQL documents"""
+
+    def __init__(self, max_entries=500):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, schema, query):
+        """
+        Parse and validate a query, reusing earlier work for the same text.
+
+        Args:
+            schema: graphql-core GraphQLSchema
+            query: Query document text
+
+        Returns:
+            (document, errors) - document is None when the text does not parse;
+            errors is a list of GraphQLError (empty if the document is valid)
+        """
+        key = query_hash(query)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[0] is schema:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return entry[1], entry[2]
+            self.misses += 1
+
+        try:
+            document = parse(query)
+        except GraphQLError as e:
+            # Syntax errors are not cached; they are cheap to reproduce and
+            # caching them would let junk evict the hot documents
+            return None, [e]
+
+        errors = validate(schema, document)
+
+        with self._lock:
+            self._entries[key] = (schema, document, errors)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+        return document, errors
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.hits = 0
+            self.misses = 0
+
+    def stats(self):
+        with self._lock:
+            return {
+                'entries': len(self._entries),
+                'max_entries': self.max_entries,
+                'hits': self.hits,
+                'misses': self.misses,
+            }
+
+
+document_cache = DocumentCache(getattr(settings, 'GRAPHQL_DOCUMENT_CACHE_SIZE', 500))
+
+
+class PersistedQueryError(GraphQLError):
+    """APQ lookup/registration failure, reported with an Apollo-compatible code"""
+
+    def __init__(self, message, code):
+        super().__init__(message, extensions={'code': code})
+
+
+class PersistedQueryStore:
+    """Lookup and registration of persisted query documents by SHA-256 hash"""
+
+    _manifest = None
+    _manifest_lock = threading.Lock()
+
+    @classmethod
+    def _load_manifest(cls):
+        if cls._manifest is not None:
+            return cls._manifest
+
+        with cls._manifest_lock:
+            if cls._manifest is None:
+                manifest = {}
+                path = getattr(settings, 'GRAPHQL_PERSISTED_QUERY_MANIFEST', None)
+                if path:
+                    try:
+                        with open(path) as f:
+                            manifest = json.load(f)
+                        logger.info(f"📦 Loaded {len(manifest)} persisted GraphQL queries from {path}")
+                    except (OSError, ValueError) as e:
+                        logger.error(f"❌ Could not load persisted query manifest {path}: {e}")
+                cls._manifest = manifest
+        return cls._manifest
+
+    @classmethod
+    def get(cls, sha256_hash):
+        """Registered query text for a hash, or None"""
+        query = cls._load_manifest().get(sha256_hash)
+        if query is None:
+            query = cache.get(PERSISTED_QUERY_CACHE_PREFIX + sha256_hash)
+        return query
+
+    @classmethod
+    def register(cls, sha256_hash, query, schema):
+        """
+        Store a client-supplied query under its hash.
+
+        The hash must match and the document must parse and validate against
+        `schema`; invalid documents are not stored (the request reports their
+        errors as usual).
+
+        Returns:
+            bool: Whether the query was stored
+        """
+        if len(query) > MAX_PERSISTED_QUERY_LENGTH:
+            raise PersistedQueryError('Persisted query is too large', 'PERSISTED_QUERY_TOO_LARGE')
+        if query_hash(query) != sha256_hash:
+            raise PersistedQueryError('provided sha does not match query', 'PERSISTED_QUERY_HASH_MISMATCH')
+        if sha256_hash in cls._load_manifest():
+            return False
+        document, errors = document_cache.get(schema, query)
+        if errors:
+            return False
+        cache.set(
+            PERSISTED_QUERY_CACHE_PREFIX + sha256_hash, query,
+            timeout=getattr(settings, 'GRAPHQL_PERSISTED_QUERY_TIMEOUT', 86400),
+        )
+        return True
+
+    @classmethod
+    def reset_manifest(cls):
+        cls._manifest = None
+
+
+def resolve_persisted_query(query, extensions, schema):
+    """
+    Resolve the query text for a request that may use persisted queries.
+
+    Args:
+        query: Query text sent by the client (may be None)
+        extensions: Request ``extensions`` (dict or JSON string from a GET)
+        schema: graphql-core GraphQLSchema registered documents must validate against
+
+    Returns:
+        The query text to execute
+
+    Raises:
+        PersistedQueryError: Unknown hash, mismatched hash, or registration disabled
+    """
+    if isinstance(extensions, str):
+        try:
+            extensions = json.loads(extensions)
+        except ValueError:
+            extensions = None
+
+    persisted = extensions.get('persistedQuery') if isinstance(extensions, dict) else None
+    if not isinstance(persisted, dict):
+        return query
+
+    if persisted.get('version', 1) != 1:
+        raise PersistedQueryError('Unsupported persisted query version', 'PERSISTED_QUERY_NOT_SUPPORTED')
+
+    sha256_hash = persisted.get('sha256Hash')
+    if not sha256_hash:
+        return query
+
+    if query:
+        if sha256_hash not in PersistedQueryStore._load_manifest():
+            if not getattr(settings, 'GRAPHQL_PERSISTED_QUERIES_ALLOW_REGISTRATION', False):
+                raise PersistedQueryError('PersistedQueryNotSupported', 'PERSISTED_QUERY_NOT_SUPPORTED')
+            PersistedQueryStore.register(sha256_hash, query, schema)
+        return query
+
+    registered = PersistedQueryStore.get(sha256_hash)
+    if registered is None:
+        # Apollo clients retry with the full query on this exact message
+        raise PersistedQueryError('PersistedQueryNotFound', 'PERSISTED_QUERY_NOT_FOUND')
+    return registered
@@ -0,0 +1,126 @@
+"""
+HTTP caching for anonymous GET requests of public catalog queries.
+
+Only operations whose root fields are all in PUBLIC_CACHEABLE_FIELDS are
+eligible: they return the same data to every anonymous extension user. The
+cache key combines the query hash, operation name and canonical variables;
+the catalog version (products/catalog_version.py) is folded into both the
+strong ETag and the server-side key, so any catalog write invalidates both.
+"""
+
+import hashlib
+import json
+
+from django.conf import settings
+from django.core.cache import cache
+from graphql import FieldNode
+
+from products.catalog_version import get_catalog_version
+
+from .documents import PersistedQueryError, document_cache, query_hash, resolve_persisted_query
+
+PUBLIC_CACHEABLE_FIELDS = frozenset({
+    'featuredProducts',
+    'categories',
+    'manufacturers',
+    'product',
+    'priceComparison',
+    '__typename',
+})
+
+RESPONSE_CACHE_PREFIX = 'graphql:response:'
+
+
+def is_anonymous_request(request):
+    """No JWT header and no session user"""
+    if request.META.get('HTTP_AUTHORIZATION'):
+        return False
+    user = getattr(request, 'user', None)
+    return user is None or not user.is_authenticated
+
+
+class PublicQueryCache:
+    """Resolves the cache identity of a GET request, if it has one"""
+
+    def __init__(self, key, version):
+        self.key = key
+        self.version = version
+
+    @property
+    def etag(self):
+        return f'"{self.version}-{self.key[:32]}"'
+
+    @property
+    def cache_key(self):
+        return f'{RESPONSE_CACHE_PREFIX}{self.version}:{self.key}'
+
+    @property
+    def cache_control(self):
+        return f"public, max-age={getattr(settings, 'GRAPHQL_PUBLIC_CACHE_MAX_AGE', 60)}"
+
+    @classmethod
+    def for_request(cls, request, schema):
+        """
+        Args:
+            request: GET HttpRequest
+            schema: graphql-core GraphQLSchema
+
+        Returns:
+            PublicQueryCache, or None if the request is not publicly cacheable
+        """
+        if not is_anonymous_request(request):
+            return None
+
+        params = request.GET
+        try:
+            query = resolve_persisted_query(params.get('query'), params.get('extensions'), schema)
+            variables = json.loads(params['variables']) if params.get('variables') else {}
+        except (PersistedQueryError, ValueError):
+            return None
+        if not query or not isinstance(variables, dict):
+            return None
+
+        document, errors = document_cache.get(schema, query)
+        if errors:
+            return None
+
+        operation_name = params.get('operationName') or None
+        if operation_name == 'null':
+            operation_name = None
+        operations = [
+            definition for definition in document.definitions
+            if getattr(definition, 'operation', None) is not None
+            and (operation_name is None or (definition.name and definition.name.value == operation_name))
+        ]
+        if len(operations) != 1 or operations[0].operation.value != 'query':
+            return None
+
+        selections = operations[0].selection_set.selections
+        # Fragments at the root make the field set harder to see; not worth caching
+        if not all(isinstance(selection, FieldNode) for selection in selections):
+            return None
+        if not {selection.name.value for selection in selections} <= PUBLIC_CACHEABLE_FIELDS:
+            return None
+
+        canonical = json.dumps(
+            [query_hash(query), operation_name, variables],
+            sort_keys=True, separators=(',', ':'), default=str,
+        )
+        return cls(hashlib.sha256(canonical.encode('utf-8')).hexdigest(), get_catalog_version())
+
+    def matches(self, request):
+        """True if the client's If-None-Match already names this response"""
+        header = request.META.get('HTTP_IF_NONE_MATCH', '')
+        return header.strip() == '*' or self.etag in [tag.strip() for tag in header.split(',')]
+
+    def get(self):
+        return cache.get(self.cache_key)
+
+    def set(self, body):
+        cache.set(self.cache_key, body, timeout=getattr(settings, 'GRAPHQL_PUBLIC_CACHE_TIMEOUT', 300))
+
+    def apply_headers(self, response):
+        response['ETag'] = self.etag
+        response['Cache-Control'] = self.cache_control
+        response['Vary'] = 'Authorization, Cookie'
+        return response
@@ -0,0 +1,205 @@
+"""
+Keyset (cursor) pagination for the large list queries.
+
+Offset pagination makes the database scan and discard every row before the
+offset, so deep pages get slower the further a client scrolls. Here a page
+is addressed by an opaque cursor holding the (sort key, id) of its boundary
+row, and the next page is a single index range scan on a composite
+``(sort key, id)`` index:
+
+    WHERE (created_at, id) < (:cursor_created_at, :cursor_id)
+    ORDER BY created_at DESC, id DESC
+    LIMIT :first + 1
+
+``first``/``after`` page forwards, ``last``/``before`` page backwards.
+Totals are only computed when ``totalCount`` is selected. Unless
+``exact: true`` is passed, large result sets report the planner's row
+estimate instead of running ``COUNT(*)``.
+"""
+
+import base64
+import json
+
+import graphene
+from django.db import connections
+from django.db.models import Q
+from graphene import relay
+from graphql import GraphQLError
+
+from ecommerce_platform.admin_pagination import ESTIMATED_COUNT_THRESHOLD, estimated_table_count
+
+MAX_PAGE_SIZE = 100
+DEFAULT_PAGE_SIZE = 20
+
+
+def encode_cursor(sort_value, pk):
+    """Opaque cursor for a row's (sort key, id)"""
+    if hasattr(sort_value, 'isoformat'):
+        sort_value = sort_value.isoformat()
+    payload = json.dumps([sort_value, pk], separators=(',', ':'), default=str)
+    return base64.urlsafe_b64encode(payload.encode('utf-8')).decode('ascii')
+
+
+def decode_cursor(cursor, model, sort_field):
+    """
+    Returns:
+        (sort value, id) converted to the model's field types
+
+    Raises:
+        GraphQLError: If the cursor is malformed
+    """
+    try:
+        sort_value, pk = json.loads(base64.urlsafe_b64decode(cursor.encode('ascii')))
+        field = model._meta.get_field(sort_field)
+        return field.to_python(sort_value), model._meta.pk.to_python(pk)
+    except Exception:
+        raise GraphQLError('Invalid cursor', extensions={'code': 'INVALID_CURSOR'})
+
+
+def estimated_queryset_count(queryset):
+    """
+    Planner row estimate for a queryset, or None if unavailable.
+
+    Unfiltered querysets use the table statistics; filtered ones use the
+    top-level row estimate from EXPLAIN (both Postgres only).
+    """
+    connection = connections[queryset.db]
+    if connection.vendor != 'postgresql':
+        return None
+
+    query = queryset.query
+    if not query.where and not query.distinct:
+        return estimated_table_count(queryset.model, using=queryset.db)
+
+    sql, params = queryset.order_by().values('pk').query.sql_with_params()
+    with connection.cursor() as cursor:
+        cursor.execute(f"EXPLAIN (FORMAT JSON) {sql}", params)
+        plan = cursor.fetchone()[0]
+    if isinstance(plan, str):
+        plan = json.loads(plan)
+    return int(plan[0]['Plan']['Plan Rows'])
+
+
+class KeysetPage:
+    """One page of a keyset-paginated queryset"""
+
+    def __init__(self, queryset, sort_field='created_at', descending=True,
+                 first=None, last=None, after=None, before=None, max_page_size=MAX_PAGE_SIZE):
+        if first is not None and last is not None:
+            raise GraphQLError('Pass either first or last, not both')
+        if (first is not None and first < 0) or (last is not None and last < 0):
+            raise GraphQLError('first and last must be non-negative')
+
+        self.queryset = queryset
+        self.sort_field = sort_field
+        self.descending = descending
+        self.after = after
+        self.before = before
+
+        backward = last is not None or (before is not None and first is None)
+        requested = last if backward else first
+        size = min(DEFAULT_PAGE_SIZE if requested is None else requested, max_page_size)
+
+        page = queryset
+        if after:
+            page = page.filter(self._beyond(after, forward=True))
+        if before:
+            page = page.filter(self._beyond(before, forward=False))
+
+        ordering = self._ordering(reverse=backward)
+        rows = list(page.order_by(*ordering)[:size + 1])
+        has_more = len(rows) > size
+        rows = rows[:size]
+        if backward:
+            rows.reverse()
+
+        self.items = rows
+        if backward:
+            self.has_previous_page = has_more
+            self.has_next_page = before is not None
+        else:
+            self.has_next_page = has_more
+            self.has_previous_page = after is not None
+
+    def _ordering(self, reverse=False):
+        descending = self.descending != reverse
+        prefix = '-' if descending else ''
+        return [f'{prefix}{self.sort_field}', f'{prefix}pk']
+
+    def _beyond(self, cursor, forward):
+        """Rows strictly after (forward) or before the cursor in the page ordering"""
+        sort_value, pk = decode_cursor(cursor, self.queryset.model, self.sort_field)
+        lookup = 'lt' if self.descending == forward else 'gt'
+        return (
+            Q(**{f'{self.sort_field}__{lookup}': sort_value})
+            | Q(**{self.sort_field: sort_value, f'pk__{lookup}': pk})
+        )
+
+    def cursor_for(self, row):
+        return encode_cursor(getattr(row, self.sort_field), row.pk)
+
+    @property
+    def page_info(self):
+        return relay.PageInfo(
+            has_next_page=self.has_next_page,
+            has_previous_page=self.has_previous_page,
+            start_cursor=self.cursor_for(self.items[0]) if self.items else None,
+            end_cursor=self.cursor_for(self.items[-1]) if self.items else None,
+        )
+
+    def total_count(self, exact=False):
+        """Total rows across all pages; a planner estimate for large sets unless exact"""
+        if not exact:
+            estimate = estimated_queryset_count(self.queryset)
+            if estimate is not None and estimate >= ESTIMATED_COUNT_THRESHOLD:
+                return estimate
+        return self.queryset.count()
+
+
+class OffsetPage:
+    """Legacy limit/offset page with the same interface as KeysetPage (no cursors)"""
+
+    page_info = None
+
+    def __init__(self, queryset, limit=None, offset=None):
+        self.queryset = queryset
+        page = queryset
+        if offset is not None:
+            page = page[offset:]
+        if limit is not None:
+            page = page[:limit]
+        self.items = list(page)
+
+    def total_count(self, exact=False):
+        return self.queryset.count()
+
+
+def keyset_arguments():
+    """Relay-style arguments shared by every keyset-paginated field"""
+    return {
+        'first': graphene.Int(description=f"Page size going forward (max {MAX_PAGE_SIZE})"),
+        'after': graphene.String(description="Cursor to continue after (pageInfo.endCursor)"),
+        'last': graphene.Int(description=f"Page size going backward (max {MAX_PAGE_SIZE})"),
+        'before': graphene.String(description="Cursor to continue before (pageInfo.startCursor)"),
+    }
+
+
+class KeysetPageType(graphene.ObjectType):
+    """Fields shared by keyset page types; subclasses add ``items``"""
+
+    class Meta:
+        abstract = True
+
+    page_info = graphene.Field(relay.PageInfo, required=True)
+    total_count = graphene.Int(
+        exact=graphene.Boolean(default_value=False),
+        description=f"Total rows; an estimate above {ESTIMATED_COUNT_THRESHOLD} rows unless exact is true",
+    )
+
+    @staticmethod
+    def resolve_page_info(page, info):
+        return page.page_info
+
+    @staticmethod
+    def resolve_total_count(page, info, exact=False):
+        return page.total_count(exact)
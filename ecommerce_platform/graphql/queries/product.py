@@ -29,16 +29,6 @@ from affiliates.tasks import generate_standalone_amazon_affiliate_url, generate_
 from ..types.product import ProductType, CategoryType, ManufacturerType
 from ..types.offer import OfferType, OfferTypeEnum
 
-# Add NLTK import for stopwords (with fallback)
-try:
-    from nltk.corpus import stopwords
-except ImportError:
-    # Fallback if NLTK is not available
-    class stopwords:
-        @staticmethod
-        def words(lang):
-            return ['the', 'and', 'with', 'for', 'this', 'that', 'from', 'to', 'in', 'of', 'a', 'an']
-
 User = get_user_model()
 
 # Create a custom debug logger that writes to a specific file
@@ -2,6 +2,7 @@ import graphene
 from graphene_django.filter import DjangoFilterConnectionField
 from django.contrib.auth import get_user_model
 from quotes.models import Quote, QuoteItem, ProductMatch, VendorPricing
+from ..pagination import KeysetPage, KeysetPageType, keyset_arguments
 from ..types.quote import (
     QuoteType, QuoteItemType, ProductMatchType, VendorPricingType,
     QuoteConnection, QuoteProcessingStatus, QuoteStatusEnum
@@ -9,6 +10,12 @@ from ..types.quote import (
 
 User = get_user_model()
 
+
+class QuoteKeysetConnection(KeysetPageType):
+    """Cursor-paginated quotes, newest first"""
+    items = graphene.List(QuoteType)
+
+
 class QuoteQuery(graphene.ObjectType):
     """Quote-related GraphQL queries"""
     
@@ -39,6 +46,24 @@ class QuoteQuery(graphene.ObjectType):
         description="Get quotes for the current authenticated user"
     )
     
+    # Cursor-paginated versions of quotes/my_quotes (keyset on created_at, id)
+    quotes_page = graphene.Field(
+        QuoteKeysetConnection,
+        status=graphene.String(),
+        vendor_company=graphene.String(),
+        date_from=graphene.Date(),
+        date_to=graphene.Date(),
+        description="Get quotes with optional filtering, paginated by cursor",
+        **keyset_arguments()
+    )
+    
+    my_quotes_page = graphene.Field(
+        QuoteKeysetConnection,
+        status=graphene.String(),
+        description="Get quotes for the current authenticated user, paginated by cursor",
+        **keyset_arguments()
+    )
+    
     # Quote processing status
     quote_processing_status = graphene.Field(
         QuoteProcessingStatus,
@@ -105,8 +130,9 @@ class QuoteQuery(graphene.ObjectType):
         except Quote.DoesNotExist:
             return None
     
-    def resolve_quotes(self, info, limit=20, offset=0, **kwargs):
-        """Resolve quotes list with filtering"""
+    @staticmethod
+    def _quotes_queryset(info, **kwargs):
+        """Quotes visible to the requesting user, with the list filters applied"""
         user = getattr(info.context, 'user', None)
         if not user or user.is_anonymous:
             # For testing without authentication, return all quotes
@@ -137,14 +163,10 @@ class QuoteQuery(graphene.ObjectType):
         if kwargs.get('date_to'):
             queryset = queryset.filter(created_at__date__lte=kwargs['date_to'])
         
-        # Order by creation date (newest first)
-        queryset = queryset.order_by('-created_at')
-        
-        # Apply pagination
-        return queryset[offset:offset + limit]
+        return queryset
     
-    def resolve_my_quotes(self, info, limit=20, offset=0, **kwargs):
-        """Resolve quotes for current user"""
+    @staticmethod
+    def _my_quotes_queryset(info, **kwargs):
         user = info.context.user
         if user.is_anonymous:
             return Quote.objects.none()
@@ -155,12 +177,38 @@ class QuoteQuery(graphene.ObjectType):
         if kwargs.get('status'):
             queryset = queryset.filter(status=kwargs['status'])
         
+        return queryset
+    
+    def resolve_quotes(self, info, limit=20, offset=0, **kwargs):
+        """Resolve quotes list with filtering"""
+        # Order by creation date (newest first)
+        queryset = QuoteQuery._quotes_queryset(info, **kwargs).order_by('-created_at', '-id')
+        
+        # Apply pagination
+        return queryset[offset:offset + limit]
+    
+    def resolve_my_quotes(self, info, limit=20, offset=0, **kwargs):
+        """Resolve quotes for current user"""
         # Order by creation date (newest first)
-        queryset = queryset.order_by('-created_at')
+        queryset = QuoteQuery._my_quotes_queryset(info, **kwargs).order_by('-created_at', '-id')
         
         # Apply pagination
         return queryset[offset:offset + limit]
     
+    def resolve_quotes_page(self, info, first=None, after=None, last=None, before=None, **kwargs):
+        """Resolve quotes with keyset pagination"""
+        return KeysetPage(
+            QuoteQuery._quotes_queryset(info, **kwargs),
+            first=first, after=after, last=last, before=before,
+        )
+    
+    def resolve_my_quotes_page(self, info, first=None, after=None, last=None, before=None, **kwargs):
+        """Resolve the current user's quotes with keyset pagination"""
+        return KeysetPage(
+            QuoteQuery._my_quotes_queryset(info, **kwargs),
+            first=first, after=after, last=last, before=before,
+        )
+    
     def resolve_quote_processing_status(self, info, quote_id):
         """Resolve quote processing status"""
         try:
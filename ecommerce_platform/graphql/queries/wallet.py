@@ -9,6 +9,7 @@ from users.models import User, UserProfile, WalletTransaction
 from users.services import WalletService
 from users.activity_metrics import ActivityMetricsService
 from users.withdrawal_service import WithdrawalService
+from ..pagination import KeysetPage, KeysetPageType, keyset_arguments
 from ..types.wallet import (
     WalletBalanceType, WalletTransactionType, WalletSummaryType,
     WithdrawalMethodType, ActivityMetricsType, LeaderboardEntryType,
@@ -16,6 +17,11 @@ from ..types.wallet import (
 )
 
 
+class WalletTransactionKeysetConnection(KeysetPageType):
+    """Cursor-paginated wallet transactions, newest first"""
+    items = graphene.List(WalletTransactionType)
+
+
 class WalletQueries(graphene.ObjectType):
     """GraphQL queries for wallet operations"""
     
@@ -35,6 +41,14 @@ class WalletQueries(graphene.ObjectType):
         description="Get wallet transactions for authenticated user"
     )
     
+    wallet_transactions_page = graphene.Field(
+        WalletTransactionKeysetConnection,
+        transaction_type=graphene.String(),
+        status=graphene.String(),
+        description="Get wallet transactions for authenticated user, paginated by cursor",
+        **keyset_arguments()
+    )
+    
     wallet_transaction = graphene.Field(
         WalletTransactionType,
         transaction_id=graphene.Int(required=True),
@@ -83,6 +97,15 @@ class WalletQueries(graphene.ObjectType):
         description="Get all wallet transactions (admin only)"
     )
     
+    all_transactions_page = graphene.Field(
+        WalletTransactionKeysetConnection,
+        user_email=graphene.String(),
+        transaction_type=graphene.String(),
+        status=graphene.String(),
+        description="Get all wallet transactions, paginated by cursor (admin only)",
+        **keyset_arguments()
+    )
+    
     pending_withdrawals = graphene.List(
         WalletTransactionType,
         description="Get pending withdrawals (admin only)"
@@ -134,6 +157,21 @@ class WalletQueries(graphene.ObjectType):
         except Exception as e:
             raise Exception(f"Error fetching wallet transactions: {str(e)}")
     
+    def resolve_wallet_transactions_page(self, info, first=None, after=None, last=None, before=None,
+                                         transaction_type=None, status=None):
+        """Get wallet transactions for authenticated user with keyset pagination"""
+        user = info.context.user
+        if not user.is_authenticated:
+            raise Exception("Authentication required")
+        
+        queryset = WalletTransaction.objects.filter(user=user)
+        if transaction_type:
+            queryset = queryset.filter(transaction_type=transaction_type)
+        if status:
+            queryset = queryset.filter(status=status)
+        
+        return KeysetPage(queryset, first=first, after=after, last=last, before=before)
+    
     def resolve_wallet_transaction(self, info, transaction_id):
         """Get specific wallet transaction by ID"""
         user = info.context.user
@@ -341,6 +379,23 @@ class WalletQueries(graphene.ObjectType):
         except Exception as e:
             raise Exception(f"Error fetching all transactions: {str(e)}")
     
+    def resolve_all_transactions_page(self, info, first=None, after=None, last=None, before=None,
+                                      user_email=None, transaction_type=None, status=None):
+        """Get all wallet transactions with keyset pagination (admin only)"""
+        user = info.context.user
+        if not user.is_authenticated or not user.is_staff:
+            raise Exception("Admin access required")
+        
+        queryset = WalletTransaction.objects.select_related('user', 'affiliate_link')
+        if user_email:
+            queryset = queryset.filter(user__email__icontains=user_email)
+        if transaction_type:
+            queryset = queryset.filter(transaction_type=transaction_type)
+        if status:
+            queryset = queryset.filter(status=status)
+        
+        return KeysetPage(queryset, first=first, after=after, last=last, before=before)
+    
     def resolve_pending_withdrawals(self, info):
         """Get pending withdrawals (admin only)"""
         user = info.context.user
@@ -150,6 +150,11 @@ class CategoryType(DjangoObjectType):
         model = CategoryModel
         fields = "__all__"
 
+    ancestors = graphene.List(lambda: CategoryType, description="Ancestor categories, root first (breadcrumbs)")
+
+    def resolve_ancestors(self, info):
+        return self.get_ancestors()
+
 class ManufacturerType(DjangoObjectType):
     class Meta:
         model = ManufacturerModel
@@ -1,12 +1,134 @@
 import json
 import logging
 import jwt
-from graphene_django.views import GraphQLView
 from django.conf import settings
+from django.db import connection, transaction
+from django.http import HttpResponse, HttpResponseNotAllowed, HttpResponseNotModified
+from django.http.response import HttpResponseBadRequest
+from graphene_django.constants import MUTATION_ERRORS_FLAG
+from graphene_django.settings import graphene_settings
+from graphene_django.views import GraphQLView, HttpError
+from graphql import OperationType, execute_sync, get_operation_ast
+from graphql.execution import ExecutionResult
+
+from ecommerce_platform.db_routing import is_pinned_to_primary, pin_to_primary, use_primary, use_replica
+
+from .cost import QueryComplexityError, check_query_cost
+from .documents import PersistedQueryError, document_cache, resolve_persisted_query
+from .http_cache import PublicQueryCache
 
 logger = logging.getLogger(__name__)
 
-class DebugGraphQLView(GraphQLView):
+
+class PersistedQueryGraphQLView(GraphQLView):
+    """
+    GraphQLView that executes cached, pre-validated documents and accepts
+    persisted queries (see ecommerce_platform/graphql/documents.py).
+
+    The stock view parses the query once to inspect the operation and then
+    hands the text to ``schema.execute``, which parses and validates it again.
+    Here the document is parsed and validated at most once per worker, and
+    its cost is checked against the budget before anything executes.
+
+    Anonymous GET requests for public catalog queries are answered from the
+    response cache (or with 304 Not Modified) without running any resolver.
+
+    Query operations read from the replica (ecommerce_platform/db_routing.py)
+    unless the client wrote recently; mutations pin the client to the primary.
+    """
+
+    def dispatch(self, request, *args, **kwargs):
+        if request.method != 'GET' or (self.graphiql and self.can_display_graphiql(request, request.GET)):
+            return super().dispatch(request, *args, **kwargs)
+
+        public_cache = PublicQueryCache.for_request(request, self.schema.graphql_schema)
+        if public_cache is None:
+            return super().dispatch(request, *args, **kwargs)
+
+        if public_cache.matches(request):
+            return public_cache.apply_headers(HttpResponseNotModified())
+
+        body = public_cache.get()
+        if body is not None:
+            return public_cache.apply_headers(HttpResponse(body, content_type='application/json'))
+
+        response = super().dispatch(request, *args, **kwargs)
+        if response.status_code == 200 and b'"errors"' not in response.content:
+            public_cache.set(response.content)
+            public_cache.apply_headers(response)
+        return response
+
+    def execute_graphql_request(
+        self, request, data, query, variables, operation_name, show_graphiql=False
+    ):
+        extensions = request.GET.get('extensions') or data.get('extensions')
+        try:
+            query = resolve_persisted_query(query, extensions, self.schema.graphql_schema)
+        except PersistedQueryError as e:
+            return ExecutionResult(errors=[e])
+
+        if not query:
+            if show_graphiql:
+                return None
+            raise HttpError(HttpResponseBadRequest("Must provide query string."))
+
+        graphql_schema = self.schema.graphql_schema
+        document, errors = document_cache.get(graphql_schema, query)
+        if errors:
+            return ExecutionResult(errors=errors)
+
+        operation_ast = get_operation_ast(document, operation_name)
+
+        if request.method.lower() == 'get':
+            if operation_ast and operation_ast.operation != OperationType.QUERY:
+                if show_graphiql:
+                    return None
+
+                raise HttpError(
+                    HttpResponseNotAllowed(
+                        ['POST'],
+                        f"Can only perform a {operation_ast.operation.value} operation from a POST request.",
+                    )
+                )
+
+        if operation_ast:
+            try:
+                check_query_cost(graphql_schema, document, operation_ast, variables)
+            except QueryComplexityError as e:
+                return ExecutionResult(errors=[e])
+
+        try:
+            options = {
+                'root_value': self.get_root_value(request),
+                'variable_values': variables,
+                'operation_name': operation_name,
+                'context_value': self.get_context(request),
+                'middleware': self.get_middleware(request),
+            }
+            if self.execution_context_class:
+                options['execution_context_class'] = self.execution_context_class
+
+            if operation_ast and operation_ast.operation == OperationType.MUTATION:
+                pin_to_primary(request)
+                if (
+                    graphene_settings.ATOMIC_MUTATIONS is True
+                    or connection.settings_dict.get('ATOMIC_MUTATIONS', False) is True
+                ):
+                    with transaction.atomic():
+                        result = execute_sync(graphql_schema, document, **options)
+                        if getattr(request, MUTATION_ERRORS_FLAG, False) is True:
+                            transaction.set_rollback(True)
+                    return result
+                return execute_sync(graphql_schema, document, **options)
+
+            read_context = use_primary() if is_pinned_to_primary(request) else use_replica()
+            with read_context:
+                return execute_sync(graphql_schema, document, **options)
+        except Exception as e:
+            return ExecutionResult(errors=[e])
+
+
+class DebugGraphQLView(PersistedQueryGraphQLView):
     def dispatch(self, request, *args, **kwargs):
         logger.info(f"GraphQL request received: {request.method}")
         
@@ -0,0 +1,109 @@
+"""
+PostgreSQL backend that checks connections out of a per-process pool.
+
+Configured from ``DATABASES[alias]['POOL']`` (see settings.py); without a
+``POOL`` entry it behaves exactly like ``django.db.backends.postgresql``.
+Use with ``CONN_MAX_AGE = 0`` so each request hands its connection back to
+the pool when Django closes it.
+"""
+
+from psycopg2 import extensions
+
+from django.db.backends.postgresql import base as postgresql_base
+from django.db.backends.postgresql import creation as postgresql_creation
+from django.db.backends.postgresql.psycopg_any import IsolationLevel
+from django.db.backends.base.base import NO_DB_ALIAS
+
+from .pool import PoolTimeout, close_pools, get_pool
+
+Database = postgresql_base.Database
+
+
+def is_connection_usable(conn):
+    """Round-trip health check for an idle connection"""
+    if conn.closed:
+        return False
+    try:
+        with conn.cursor() as cursor:
+            cursor.execute('SELECT 1')
+        return True
+    except Database.Error:
+        return False
+
+
+def reset_connection(conn):
+    """Roll back anything a request left open; False if the connection can't be reused"""
+    if conn.closed:
+        return False
+    status = conn.info.transaction_status
+    if status == extensions.TRANSACTION_STATUS_IDLE:
+        return True
+    if status in (extensions.TRANSACTION_STATUS_INTRANS, extensions.TRANSACTION_STATUS_INERROR):
+        conn.rollback()
+        return True
+    # ACTIVE (a query still running) or UNKNOWN (connection lost)
+    return False
+
+
+class DatabaseCreation(postgresql_creation.DatabaseCreation):
+    def _destroy_test_db(self, test_database_name, verbosity):
+        # Postgres refuses to drop a database with open (idle pooled) connections
+        close_pools(self.connection.alias)
+        super()._destroy_test_db(test_database_name, verbosity)
+
+
+class DatabaseWrapper(postgresql_base.DatabaseWrapper):
+    creation_class = DatabaseCreation
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._pool = None
+
+    def _pool_options(self):
+        options = self.settings_dict.get('POOL')
+        if not options or self.alias == NO_DB_ALIAS:
+            return None
+        return {
+            'min_size': options.get('MIN_SIZE', 1),
+            'max_size': options.get('MAX_SIZE', 4),
+            'timeout': options.get('TIMEOUT', 10),
+            'max_idle': options.get('MAX_IDLE', 300),
+            'max_lifetime': options.get('MAX_LIFETIME', 1800),
+            'check_after': options.get('CHECK_AFTER', 30),
+        }
+
+    @property
+    def pool(self):
+        options = self._pool_options()
+        if options is None:
+            return None
+        return get_pool(
+            self.alias, self.settings_dict['NAME'],
+            check=is_connection_usable, reset=reset_connection, **options
+        )
+
+    def get_new_connection(self, conn_params):
+        pool = self.pool
+        if pool is None:
+            return super().get_new_connection(conn_params)
+
+        try:
+            connection = pool.getconn(lambda: super(DatabaseWrapper, self).get_new_connection(conn_params))
+        except PoolTimeout as e:
+            # Surfaces as django.db.OperationalError via wrap_database_errors
+            raise Database.OperationalError(str(e)) from e
+
+        # Reused connections skip the parent's setup; keep the wrapper's view in sync
+        self.isolation_level = IsolationLevel(
+            self.settings_dict['OPTIONS'].get('isolation_level', IsolationLevel.READ_COMMITTED)
+        )
+        self._pool = pool
+        return connection
+
+    def _close(self):
+        if self._pool is None or self.connection is None:
+            return super()._close()
+
+        pool, self._pool = self._pool, None
+        with self.wrap_database_errors:
+            pool.putconn(self.connection)
@@ -0,0 +1,298 @@
+"""
+Process-wide database connection pool.
+
+Django opens one connection per thread and, with CONN_MAX_AGE=0, closes it at
+the end of every request. With this pool a "close" hands the connection back
+instead, so a process never holds more than ``max_size`` connections however
+many threads or requests it serves, and a request never pays for a fresh TCP +
+TLS + auth handshake once the pool is warm.
+
+Connections are checked out LIFO so the hot ones stay hot and surplus idle
+connections age out (above ``min_size``) after ``max_idle`` seconds. Idle
+connections are health-checked before reuse when they have been idle longer
+than ``check_after`` seconds, and every connection is replaced after
+``max_lifetime`` seconds so server-side memory does not grow without bound.
+
+One pool exists per (alias, database name, pid): a forked gunicorn or
+django-q worker never reuses its parent's sockets.
+"""
+
+import logging
+import os
+import threading
+import time
+from collections import deque
+
+logger = logging.getLogger(__name__)
+
+# Recent checkout wait times kept for percentiles
+WAIT_SAMPLE_SIZE = 1000
+
+
+class PoolTimeout(Exception):
+    """No connection became available within the pool timeout"""
+
+
+class PoolStats:
+    """Counters and recent wait times for one pool"""
+
+    def __init__(self):
+        self.checkouts = 0
+        self.waits = 0
+        self.timeouts = 0
+        self.opened = 0
+        self.closed = 0
+        self.health_check_failures = 0
+        self.wait_ms_total = 0.0
+        self.wait_ms_max = 0.0
+        self._recent_waits = deque(maxlen=WAIT_SAMPLE_SIZE)
+
+    def record_wait(self, wait_ms):
+        self.checkouts += 1
+        self._recent_waits.append(wait_ms)
+        self.wait_ms_total += wait_ms
+        self.wait_ms_max = max(self.wait_ms_max, wait_ms)
+
+    def wait_percentile(self, percentile):
+        samples = sorted(self._recent_waits)
+        if not samples:
+            return 0.0
+        return samples[min(len(samples) - 1, int(len(samples) * percentile / 100))]
+
+    def as_dict(self):
+        return {
+            'checkouts': self.checkouts,
+            'waits': self.waits,
+            'timeouts': self.timeouts,
+            'opened': self.opened,
+            'closed': self.closed,
+            'health_check_failures': self.health_check_failures,
+            'wait_ms_avg': round(self.wait_ms_total / self.checkouts, 3) if self.checkouts else 0.0,
+            'wait_ms_p95': round(self.wait_percentile(95), 3),
+            'wait_ms_max': round(self.wait_ms_max, 3),
+        }
+
+
+class ConnectionPool:
+    """
+    Thread-safe pool of DB-API connections.
+
+    Args:
+        min_size: Idle connections kept open even when unused
+        max_size: Hard cap on open connections (idle + checked out)
+        timeout: Seconds getconn() waits for a free connection before PoolTimeout
+        max_idle: Seconds an idle connection above min_size is kept
+        max_lifetime: Seconds after which a connection is replaced
+        check_after: Idle seconds after which a connection is health-checked on checkout
+        check: Callable(conn) -> bool, True if the connection is usable
+        reset: Callable(conn) -> bool, cleans up a returned connection; False discards it
+    """
+
+    def __init__(self, min_size=1, max_size=4, timeout=10.0, max_idle=300.0, max_lifetime=1800.0,
+                 check_after=30.0, check=None, reset=None, name='default'):
+        if max_size < 1 or min_size < 0 or min_size > max_size:
+            raise ValueError(f"Invalid pool size min={min_size} max={max_size}")
+
+        self.name = name
+        self.min_size = min_size
+        self.max_size = max_size
+        self.timeout = timeout
+        self.max_idle = max_idle
+        self.max_lifetime = max_lifetime
+        self.check_after = check_after
+        self._check = check
+        self._reset = reset
+
+        self._idle = deque()  # (conn, opened_at, returned_at), most recently returned last
+        self._opened_at = {}  # id(conn) -> opened_at for checked-out connections
+        self._size = 0
+        self._closed = False
+        self._cond = threading.Condition()
+        self.stats = PoolStats()
+
+    @property
+    def size(self):
+        return self._size
+
+    @property
+    def idle(self):
+        return len(self._idle)
+
+    def getconn(self, connect):
+        """
+        Check out a connection, opening one with connect() if below max_size.
+
+        Args:
+            connect: Zero-argument callable returning a new connection
+
+        Raises:
+            PoolTimeout: If max_size connections stay checked out for `timeout` seconds
+        """
+        started = time.monotonic()
+        deadline = started + self.timeout
+        waited = False
+
+        while True:
+            with self._cond:
+                while not self._idle and self._size >= self.max_size:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        self.stats.timeouts += 1
+                        logger.warning(
+                            f"⏳ DB pool '{self.name}' exhausted: {self._size}/{self.max_size} "
+                            f"connections busy for {self.timeout}s"
+                        )
+                        raise PoolTimeout(
+                            f"Timed out after {self.timeout}s waiting for a connection "
+                            f"(pool '{self.name}', max_size={self.max_size})"
+                        )
+                    waited = True
+                    self._cond.wait(remaining)
+
+                if self._idle:
+                    conn, opened_at, returned_at = self._idle.pop()
+                else:
+                    conn = opened_at = returned_at = None
+                    self._size += 1  # reserve the slot; connect outside the lock
+
+            if conn is None:
+                try:
+                    conn = connect()
+                except Exception:
+                    with self._cond:
+                        self._size -= 1
+                        self._cond.notify()
+                    raise
+                opened_at = time.monotonic()
+                self.stats.opened += 1
+            elif not self._reusable(conn, opened_at, returned_at):
+                self._discard(conn)
+                continue
+
+            wait_ms = (time.monotonic() - started) * 1000
+            with self._cond:
+                self._opened_at[id(conn)] = opened_at
+                if waited:
+                    self.stats.waits += 1
+                self.stats.record_wait(wait_ms)
+            return conn
+
+    def putconn(self, conn, discard=False):
+        """Return a checked-out connection; discard=True (or a failed reset) closes it"""
+        with self._cond:
+            opened_at = self._opened_at.pop(id(conn), None)
+        if opened_at is None:
+            # Not ours (e.g. checked out before a fork); just close it
+            self._close_quietly(conn)
+            return
+
+        if not discard and self._reset is not None:
+            try:
+                discard = not self._reset(conn)
+            except Exception:
+                discard = True
+        if not discard and (self._closed or time.monotonic() - opened_at > self.max_lifetime):
+            discard = True
+
+        if discard:
+            self._discard(conn)
+            return
+
+        with self._cond:
+            self._idle.append((conn, opened_at, time.monotonic()))
+            self._prune_idle()
+            self._cond.notify()
+
+    def close(self):
+        """Close every idle connection; checked-out ones are closed when returned"""
+        with self._cond:
+            idle = list(self._idle)
+            self._idle.clear()
+            self._size -= len(idle)
+            self._closed = True  # anything still checked out is closed on return
+            self._cond.notify_all()
+        for conn, _, _ in idle:
+            self._close_quietly(conn)
+            self.stats.closed += 1
+
+    def snapshot(self):
+        with self._cond:
+            return {
+                'name': self.name,
+                'min_size': self.min_size,
+                'max_size': self.max_size,
+                'size': self._size,
+                'idle': len(self._idle),
+                'in_use': self._size - len(self._idle),
+                **self.stats.as_dict(),
+            }
+
+    def _reusable(self, conn, opened_at, returned_at):
+        now = time.monotonic()
+        if now - opened_at > self.max_lifetime:
+            return False
+        if self._check is not None and now - returned_at > self.check_after:
+            try:
+                healthy = self._check(conn)
+            except Exception:
+                healthy = False
+            if not healthy:
+                self.stats.health_check_failures += 1
+                logger.info(f"🩺 DB pool '{self.name}' dropped a dead idle connection")
+                return False
+        return True
+
+    def _prune_idle(self):
+        """Close the least recently used idle connections above min_size (lock held)"""
+        now = time.monotonic()
+        while self._idle and self._size > self.min_size and now - self._idle[0][2] > self.max_idle:
+            conn, _, _ = self._idle.popleft()
+            self._size -= 1
+            self._close_quietly(conn)
+            self.stats.closed += 1
+
+    def _discard(self, conn):
+        self._close_quietly(conn)
+        with self._cond:
+            self._size -= 1
+            self.stats.closed += 1
+            self._cond.notify()
+
+    @staticmethod
+    def _close_quietly(conn):
+        try:
+            conn.close()
+        except Exception:
+            pass
+
+
+_pools = {}
+_pools_lock = threading.Lock()
+
+
+def get_pool(alias, database_name, **options):
+    """The current process's pool for a database alias, created on first use"""
+    key = (alias, database_name, os.getpid())
+    pool = _pools.get(key)
+    if pool is None:
+        with _pools_lock:
+            pool = _pools.get(key)
+            if pool is None:
+                pool = _pools[key] = ConnectionPool(name=alias, **options)
+    return pool
+
+
+def close_pools(alias=None):
+    """Close the idle connections of this process's pools (all aliases by default)"""
+    pid = os.getpid()
+    with _pools_lock:
+        keys = [key for key in _pools if key[2] == pid and (alias is None or key[0] == alias)]
+        pools = [_pools.pop(key) for key in keys]
+    for pool in pools:
+        pool.close()
+
+
+def pool_stats():
+    """Snapshots of this process's pools keyed by alias"""
+    pid = os.getpid()
+    return {key[0]: pool.snapshot() for key, pool in list(_pools.items()) if key[2] == pid}
@@ -6,6 +6,7 @@ import os  # Add this import
 import datetime  # Add this import
 import traceback  # Add this import
 import uuid  # Add this import
+import time
 from urllib.parse import urlparse  # Add this import
 from typing import List, Optional
 from dataclasses import dataclass
@@ -32,6 +33,8 @@ from products.models import (
     Manufacturer as ManufacturerModel
     # Remove Offer as OfferModel from here
 )
+from products.spec_extraction import detect_category
+from products.search_events import record_search
 from offers.models import Offer as OfferModel  # Add this line
 from affiliates.models import AffiliateLink as AffiliateLinkModel  # Add this line
 from affiliates.models import AffiliateLink as AffiliateLinkModel, ProductAssociation  # Add this line
@@ -60,6 +63,8 @@ from ecommerce_platform.graphql.mutations.referral import ReferralMutations
 from ecommerce_platform.graphql.mutations.quote import QuoteMutation
 from ecommerce_platform.graphql.queries.referral import ReferralQueries
 from ecommerce_platform.graphql.queries.quote import QuoteQuery
+from ecommerce_platform.graphql.pagination import KeysetPage, OffsetPage, keyset_arguments
+from products.part_index import exact_part_number_q, prefix_part_number_q, prefix_product_ids
 
 # Import new affiliate models for extension tracking
 from affiliates.models import AffiliateClickEvent, PurchaseIntentEvent
@@ -68,15 +73,22 @@ from users.models import WalletTransaction
 # Import affiliate functions
 from affiliates.tasks import generate_standalone_amazon_affiliate_url, generate_affiliate_url_from_search
 
-# Add NLTK import for stopwords (with fallback)
-try:
-    from nltk.corpus import stopwords
-except ImportError:
-    # Fallback if NLTK is not available
-    class stopwords:
-        @staticmethod
-        def words(lang):
-            return ['the', 'and', 'with', 'for', 'this', 'that', 'from', 'to', 'in', 'of', 'a', 'an']
+# Fallback stop words if NLTK or its corpus is not available
+BASIC_STOP_WORDS = ['the', 'and', 'with', 'for', 'this', 'that', 'from', 'to', 'in', 'of', 'a', 'an']
+
+
+def get_english_stop_words():
+    """
+    English stop words from NLTK, imported on first use.
+
+    NLTK takes a few hundred milliseconds to import, so it is kept out of
+    module load (every web worker imports this schema at boot).
+    """
+    try:
+        from nltk.corpus import stopwords
+        return set(stopwords.words('english'))
+    except (ImportError, LookupError):
+        return set(BASIC_STOP_WORDS)
 
 User = get_user_model()
 
@@ -233,9 +245,11 @@ class Query(ReferralQueries, QuoteQuery, AffiliateQuery, graphene.ObjectType):
         'ecommerce_platform.schema.ProductConnection',
         search=graphene.String(),
         categoryId=graphene.ID(),
+        includeSubcategories=graphene.Boolean(default_value=False),
         manufacturerId=graphene.ID(),
         limit=graphene.Int(),
-        offset=graphene.Int()
+        offset=graphene.Int(),
+        **keyset_arguments()
     )
     
     # Category queries
@@ -423,11 +437,12 @@ class Query(ReferralQueries, QuoteQuery, AffiliateQuery, graphene.ObjectType):
         Resolver to get featured products based on featured flag
         """
         # First try to get products marked as featured
-        queryset = ProductModel.objects.filter(status='active', is_featured=True)
+        # Stable ordering keeps response bodies (and their ETags) deterministic
+        queryset = ProductModel.objects.filter(status='active', is_featured=True).order_by('-created_at', 'id')
         
         # If no featured products, fall back to newest products
         if queryset.count() == 0:
-            queryset = ProductModel.objects.filter(status='active').order_by('-created_at')
+            queryset = ProductModel.objects.filter(status='active').order_by('-created_at', 'id')
         
         # Prefetch related data to avoid N+1 query issues
         queryset = queryset.prefetch_related(
@@ -457,7 +472,9 @@ class Query(ReferralQueries, QuoteQuery, AffiliateQuery, graphene.ObjectType):
         
         return product
     
-    def resolve_products(self, info, search=None, categoryId=None, manufacturerId=None, limit=None, offset=None):
+    def resolve_products(self, info, search=None, categoryId=None, includeSubcategories=False,
+                         manufacturerId=None, limit=None, offset=None,
+                         first=None, after=None, last=None, before=None):
         query = ProductModel.objects.all()
         
         if search:
@@ -467,35 +484,32 @@ class Query(ReferralQueries, QuoteQuery, AffiliateQuery, graphene.ObjectType):
                 Q(part_number__icontains=search)
             )
         
-        if categoryId:
+        if categoryId and includeSubcategories:
+            category = CategoryModel.objects.filter(pk=categoryId).only('path').first()
+            query = query.filter(pk__in=category.get_subtree_products().values('pk')) if category else query.none()
+        elif categoryId:
             query = query.filter(categories__id=categoryId)
         
         if manufacturerId:
             query = query.filter(manufacturer_id=manufacturerId)
         
-        total_count = query.count()
-        
-        if offset is not None:
-            query = query[offset:]
+        # Cursor arguments switch to keyset pagination (newest first); limit/offset
+        # remain for existing clients. Either way the count only runs if selected.
+        if any(arg is not None for arg in (first, after, last, before)):
+            return KeysetPage(query, first=first, after=after, last=last, before=before)
         
-        if limit is not None:
-            query = query[:limit]
-            
-        return ProductConnection(
-            total_count=total_count,
-            items=list(query)
-        )
+        return OffsetPage(query, limit=limit, offset=offset)
     
     def resolve_categories(self, info, parent_id=None):
         if parent_id:
-            return CategoryModel.objects.filter(parent_id=parent_id)
-        return CategoryModel.objects.filter(parent__isnull=True)
+            return CategoryModel.objects.filter(parent_id=parent_id).order_by('name', 'id')
+        return CategoryModel.objects.filter(parent__isnull=True).order_by('name', 'id')
     
     def resolve_category(self, info, id):
         return CategoryModel.objects.get(pk=id)
     
     def resolve_manufacturers(self, info):
-        return ManufacturerModel.objects.all()
+        return ManufacturerModel.objects.order_by('name', 'id')
     
     def resolve_manufacturer(self, info, id):
         return ManufacturerModel.objects.get(pk=id)
@@ -536,7 +550,7 @@ class Query(ReferralQueries, QuoteQuery, AffiliateQuery, graphene.ObjectType):
         if offer_types:
             queryset = queryset.filter(offer_type__in=offer_types)
         
-        return queryset.select_related('product', 'vendor').order_by('selling_price')
+        return queryset.select_related('product', 'vendor').order_by('selling_price', 'id')
     
     # Check if product exists
     product_exists = graphene.Field(
@@ -721,14 +735,14 @@ class Query(ReferralQueries, QuoteQuery, AffiliateQuery, graphene.ObjectType):
         product = None
         match_method = "none"
         
-        # STRATEGY 1: Exact part number match
-        try:
-            product = ProductModel.objects.prefetch_related(
-                'offers', 'offers__vendor', 'affiliate_links', 'manufacturer', 'categories'
-            ).get(part_number__iexact=part_number)
+        # STRATEGY 1: Exact part number match (shared part-number index when built)
+        product = ProductModel.objects.prefetch_related(
+            'offers', 'offers__vendor', 'affiliate_links', 'manufacturer', 'categories'
+        ).filter(exact_part_number_q(part_number)).order_by('id').first()
+        if product:
             match_method = "exact_part_number"
             debug_logger.info(f"✅ Found by exact part number: {product.name}")
-        except ProductModel.DoesNotExist:
+        else:
             debug_logger.info(f"❌ No exact part number match for: {part_number}")
         
         # STRATEGY 2: Fuzzy name matching
@@ -1018,6 +1032,24 @@ class Query(ReferralQueries, QuoteQuery, AffiliateQuery, graphene.ObjectType):
         return qs
     
     def resolve_unifiedProductSearch(self, info, asin=None, partNumber=None, name=None, url=None, waitForAffiliate=False):
+        """Unified search, recorded as a search-demand event (products/search_events.py)"""
+        started = time.perf_counter()
+        results = self._search_unified_products(info, asin=asin, partNumber=partNumber, name=name, url=url,
+                                                waitForAffiliate=waitForAffiliate)
+        matched_product_id = next(
+            (result.id for result in results or []
+             if getattr(result, '_source_product', None) is not None or str(getattr(result, 'id', '')).isdigit()),
+            None
+        )
+        record_search(
+            partNumber or name or asin or url,
+            user=getattr(info.context, 'user', None),
+            product_id=int(matched_product_id) if matched_product_id is not None else None,
+            latency_ms=(time.perf_counter() - started) * 1000,
+        )
+        return results
+
+    def _search_unified_products(self, info, asin=None, partNumber=None, name=None, url=None, waitForAffiliate=False):
         """
         UNIFIED MULTI-RETAILER SEARCH (CHROME EXTENSION)
         
@@ -1301,7 +1333,7 @@ class Query(ReferralQueries, QuoteQuery, AffiliateQuery, graphene.ObjectType):
                 import re
                 if re.match(r'^B[A-Z0-9]{9}$', partNumber):
                     debug_logger.info(f"🧠 DETECTED: partNumber '{partNumber}' is actually an ASIN! Redirecting to ASIN flow...")
-                    return self.resolve_unifiedProductSearch(info, asin=partNumber, name=name, url=url, waitForAffiliate=waitForAffiliate)
+                    return self._search_unified_products(info, asin=partNumber, name=name, url=url, waitForAffiliate=waitForAffiliate)
                 
                 return Query._handle_non_amazon_product_search_static(partNumber=partNumber, name=name)
             
@@ -1321,7 +1353,7 @@ class Query(ReferralQueries, QuoteQuery, AffiliateQuery, graphene.ObjectType):
                 if asin_match:
                     extracted_asin = asin_match.group(1)
                     debug_logger.info(f"🔍 Extracted Amazon ASIN from URL: {extracted_asin}")
-                    return self.resolve_unifiedProductSearch(info, asin=extracted_asin, waitForAffiliate=waitForAffiliate)
+                    return self._search_unified_products(info, asin=extracted_asin, waitForAffiliate=waitForAffiliate)
                 
                 debug_logger.info(f"⚠️  Could not extract product ID from URL: {url}")
                 return []
@@ -2060,9 +2092,6 @@ class Query(ReferralQueries, QuoteQuery, AffiliateQuery, graphene.ObjectType):
         This runs as a background task to avoid slowing down the response
         """
         try:
-            # Import here to avoid circular imports
-            from products.tasks import create_future_product_record
-            
             debug_logger.info(f"📝 FUTURE PRODUCT: Queuing creation for part='{part_number}', name='{name}'")
             
             # Queue the task asynchronously
@@ -2084,13 +2113,6 @@ class Query(ReferralQueries, QuoteQuery, AffiliateQuery, graphene.ObjectType):
             
             debug_logger.info(f"✅ Future product creation queued successfully")
             
-            # DEMO FIX: Also execute synchronously as fallback to ensure it works
-            try:
-                result = create_future_product_record(task_data)
-                debug_logger.info(f"📝 Synchronous fallback executed: {result}")
-            except Exception as sync_error:
-                debug_logger.error(f"❌ Synchronous fallback failed: {sync_error}")
-            
         except Exception as e:
             debug_logger.error(f"❌ Error queuing future product creation: {e}")
             # Don't fail the main request if background task fails
@@ -2115,9 +2137,16 @@ class Query(ReferralQueries, QuoteQuery, AffiliateQuery, graphene.ObjectType):
         """
         Find products by part number (case-insensitive search)
         """
-        products = ProductModel.objects.filter(
-            part_number__icontains=part_number
-        ).select_related('manufacturer')[:limit]
+        # Exact and prefix hits come from the part-number index; substring
+        # matches still need the database
+        ids = prefix_product_ids(part_number, limit)
+        if ids:
+            products = ProductModel.objects.filter(pk__in=ids).select_related('manufacturer')
+            products = sorted(products, key=lambda product: ids.index(product.pk))
+        else:
+            products = ProductModel.objects.filter(
+                part_number__icontains=part_number
+            ).select_related('manufacturer')[:limit]
         
         results = []
         for product in products:
@@ -2760,31 +2789,8 @@ def extract_product_from_url(url):
                 context['product_line'] = product_name
                 break
         
-        # Category detection (order matters - check specific combos first)
-        category_patterns = [
-            # Check for combos first before individual components
-            ('keyboard_mouse_combo', ['keyboard and mouse', 'mouse and keyboard', 'keyboard + mouse', 'wireless keyboard and mouse', 'keyboard mouse combo']),
-            # Then check for individual product types
-            ('laptop', ['laptop', 'notebook', 'macbook', 'ultrabook', 'thinkpad', 'surface laptop']),
-            ('desktop', ['desktop pc', 'desktop computer', 'pc computer', 'workstation', 'all-in-one']),
-            ('monitor', ['monitor', 'display', 'screen', 'lcd', 'led', 'oled']),
-            ('gaming', ['gaming laptop', 'gaming desktop', 'gaming monitor', 'gaming pc', 'gaming chair', 'gaming headset']),
-            ('printer', ['printer', 'inkjet', 'laserjet', 'multifunction', 'mfp', 'all-in-one printer']),
-            ('keyboard', ['keyboard', 'kb']),  # Will only match if combo didn't match first
-            ('mouse', ['mouse', 'mice']),  # Will only match if combo didn't match first
-            ('tablet', ['tablet', 'ipad', 'surface pro']),
-            ('phone', ['phone', 'iphone', 'smartphone', 'android']),
-            ('headphones', ['headphones', 'earbuds', 'airpods', 'headset']),
-            ('speaker', ['speaker', 'audio', 'soundbar']),
-            ('cable', ['cable', 'cord']),
-            ('adapter', ['adapter', 'charger']),
-            ('stand', ['stand', 'mount']),
-        ]
-        
-        for category_name, patterns in category_patterns:
-            if any(pattern in name_lower for pattern in patterns):
-                context['category'] = category_name
-                break
+        # Category detection (shared with the specs extracted at ingest)
+        context['category'] = detect_category(amazon_product_name)
         
         # Specs extraction (look for common technical specifications)
         import re
@@ -3353,15 +3359,19 @@ class Dimensions(graphene.ObjectType):
 
 # Create a pagination container for products
 class ProductConnection(graphene.ObjectType):
-    """Simple connection type for products"""
-    total_count = graphene.Int()
+    """Simple connection type for products (resolved from a KeysetPage or OffsetPage)"""
+    total_count = graphene.Int(
+        exact=graphene.Boolean(default_value=False),
+        description="Total matching products; an estimate for very large sets unless exact is true"
+    )
     items = graphene.List(ProductType)
+    page_info = graphene.Field(relay.PageInfo, description="Cursors; only set when paginating with first/after/last/before")
     
-    # Add alias for camelCase if needed
-    totalCount = graphene.Int()
+    def resolve_total_count(self, info, exact=False):
+        return self.total_count(exact)
     
-    def resolve_totalCount(self, info):
-        return self.total_count
+    def resolve_page_info(self, info):
+        return self.page_info
 
 # Add this new class to support Relay-style connections
 class ProductEdge(graphene.ObjectType):
@@ -3671,8 +3681,8 @@ def get_significant_terms():
     word_counts = Counter(words)
     
     # Remove common stop words
-    stop_words = set(stopwords.words('english'))
-    stop_words.update(['the', 'and', 'with', 'for', 'this', 'that', 'from', 'to', 'in', 'of', 'a', 'an'])
+    stop_words = get_english_stop_words()
+    stop_words.update(BASIC_STOP_WORDS)
     
     # Find significant terms (frequent enough but not too common)
     significant_terms = {}
@@ -3892,27 +3902,22 @@ def ensure_affiliate_link_exists(asin):
     - Comprehensive logging to track duplicate prevention
     - Background task safety checks
     """
-    import redis
+    from django.core.cache import cache
     from django.utils import timezone
     from datetime import timedelta
     
-    # STEP 1: Check Redis cache first (5-minute cache)
-    try:
-        redis_kwargs = get_redis_connection()
-        r = redis.Redis(**redis_kwargs)
-        cache_key = f"affiliate_check:{asin}"
-        cached_result = r.get(cache_key)
-        
-        if cached_result:
-            debug_logger.info(f"🚀 CACHE HIT: ASIN {asin} - returning cached affiliate link")
-            try:
-                link_id = int(cached_result)
-                return AffiliateLinkModel.objects.get(id=link_id)
-            except (ValueError, AffiliateLinkModel.DoesNotExist):
-                debug_logger.warning(f"⚠️ Invalid cached link ID {cached_result}, proceeding with DB check")
-                r.delete(cache_key)  # Clear bad cache
-    except Exception as e:
-        debug_logger.warning(f"⚠️ Redis cache check failed: {e}")
+    # STEP 1: Check the shared cache first (5-minute cache)
+    cache_key = f"affiliate_check:{asin}"
+    cached_result = cache.get(cache_key)
+    
+    if cached_result:
+        debug_logger.info(f"🚀 CACHE HIT: ASIN {asin} - returning cached affiliate link")
+        try:
+            link_id = int(cached_result)
+            return AffiliateLinkModel.objects.get(id=link_id)
+        except (ValueError, AffiliateLinkModel.DoesNotExist):
+            debug_logger.warning(f"⚠️ Invalid cached link ID {cached_result}, proceeding with DB check")
+            cache.delete(cache_key)  # Clear bad cache
     
     # STEP 2: Check database for existing affiliate link
     existing_link = AffiliateLinkModel.objects.filter(
@@ -3928,11 +3933,8 @@ def ensure_affiliate_link_exists(asin):
             debug_logger.info(f"✅ COMPLETE LINK: Affiliate URL already exists - {existing_link.affiliate_url[:50]}...")
             
             # Cache the complete link for 5 minutes
-            try:
-                r.setex(cache_key, 300, existing_link.id)  # 5 minutes
-                debug_logger.info(f"💾 CACHED: Complete affiliate link for ASIN {asin}")
-            except Exception as e:
-                debug_logger.warning(f"⚠️ Failed to cache complete link: {e}")
+            cache.set(cache_key, existing_link.id, 300)
+            debug_logger.info(f"💾 CACHED: Complete affiliate link for ASIN {asin}")
             
             return existing_link
         
@@ -4023,11 +4025,8 @@ def ensure_affiliate_link_exists(asin):
         return existing_link
     
     # STEP 5: Cache the processing link for a shorter time (1 minute) 
-    try:
-        r.setex(cache_key, 60, existing_link.id)  # 1 minute for processing links
-        debug_logger.info(f"💾 CACHED: Processing affiliate link for ASIN {asin}")
-    except Exception as e:
-        debug_logger.warning(f"⚠️ Failed to cache processing link: {e}")
+    cache.set(cache_key, existing_link.id, 60)  # 1 minute for processing links
+    debug_logger.info(f"💾 CACHED: Processing affiliate link for ASIN {asin}")
     
     return existing_link
 
@@ -4242,20 +4241,21 @@ def find_products_by_extracted_part_numbers(amazon_product):
     for part_candidate in potential_parts:
         # Try exact match
         matches = ProductModel.objects.filter(
-            part_number__iexact=part_candidate,
+            exact_part_number_q(part_candidate),
             offers__isnull=False
-        ).exclude(id=amazon_product.id)
+        ).exclude(id=amazon_product.id).distinct()
         
         for match in matches:
             if match not in exact_matches:
                 exact_matches.append(match)
                 debug_logger.info(f"🎯 EXACT PART NUMBER MATCH: {match.part_number} matched extracted '{part_candidate}'")
         
-        # Try partial matches (part number contains the candidate)
+        # Try partial matches (part number starts with the candidate when indexed,
+        # contains it when nothing starts with it or there is no index)
         partial_matches = ProductModel.objects.filter(
-            part_number__icontains=part_candidate,
+            prefix_part_number_q(part_candidate),
             offers__isnull=False
-        ).exclude(id=amazon_product.id)
+        ).exclude(id=amazon_product.id).distinct()
         
         for match in partial_matches:
             if match not in exact_matches:
@@ -6,13 +6,24 @@ import os
 
 logger = logging.getLogger(__name__)
 
-try:
-    from google.auth.transport import requests as google_requests
-    from google.oauth2 import id_token
-    GOOGLE_AUTH_AVAILABLE = True
-except ImportError:
-    logger.warning("Google Auth libraries not installed. Google OAuth will not be available.")
-    GOOGLE_AUTH_AVAILABLE = False
+
+def _load_google_auth():
+    """
+    Import the Google Auth libraries on first use.
+
+    google-auth pulls in cryptography and rsa, which is a noticeable share of
+    web worker boot time for an endpoint that only runs at sign-in.
+
+    Returns:
+        (id_token, google_requests) modules, or (None, None) if not installed
+    """
+    try:
+        from google.auth.transport import requests as google_requests
+        from google.oauth2 import id_token
+    except ImportError:
+        logger.warning("Google Auth libraries not installed. Google OAuth will not be available.")
+        return None, None
+    return id_token, google_requests
 
 class GoogleOAuthService:
     """Service for handling Google OAuth verification"""
@@ -45,7 +56,8 @@ class GoogleOAuthService:
         """
         Verify Google ID token and return user info
         """
-        if not GOOGLE_AUTH_AVAILABLE:
+        id_token, google_requests = _load_google_auth()
+        if id_token is None:
             logger.error("Google Auth libraries not available")
             return None
             
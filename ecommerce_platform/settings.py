@@ -12,18 +12,31 @@ https://docs.djangoproject.com/en/3.2/ref/settings/
 
 from pathlib import Path
 import os
+import sys
 import environ
 from dotenv import load_dotenv
 from datetime import timedelta
 import dj_database_url
 import django_heroku
-import redis
 from urllib.parse import urlparse
 
 # env_path = Path('.') / '.env'
 # load_dotenv(dotenv_path=env_path)
 load_dotenv()
 
+# Boot diagnostics are opt-in: printing them (and pinging Redis) on every
+# import slows down each gunicorn worker, management command and test run.
+SETTINGS_VERBOSE = os.environ.get('SETTINGS_VERBOSE', 'False').lower() == 'true'
+REDIS_BOOT_CHECK = os.environ.get('REDIS_BOOT_CHECK', 'False').lower() == 'true'
+
+# Cold-boot import budget checked by `manage.py profile_imports --check`
+WEB_BOOT_IMPORT_BUDGET_MS = int(os.environ.get('WEB_BOOT_IMPORT_BUDGET_MS', 3000))
+
+
+def _boot_log(*args):
+    if SETTINGS_VERBOSE:
+        print(*args)
+
 SYNNEX_LOCAL_ONLY = False
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
@@ -45,7 +58,7 @@ ALLOWED_HOSTS = os.environ.get('ALLOWED_HOSTS', 'localhost,127.0.0.1').split(','
 # Replace the hardcoded BASE_URL with:
 BASE_URL = os.environ.get('BASE_URL', 'http://localhost:8000')
 
-print("BASE_URL", BASE_URL)
+_boot_log("BASE_URL", BASE_URL)
 # Application definition
 
 INSTALLED_APPS = [
@@ -78,6 +91,7 @@ MIDDLEWARE = [
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
+    'ecommerce_platform.db_routing.ReplicaPinMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
     'ecommerce_platform.middleware.ResponseSizeMiddleware',
@@ -93,6 +107,74 @@ GRAPHENE = {
         'graphql_jwt.middleware.JSONWebTokenMiddleware',
     ],
 }
+
+# Print every GraphQL request/response body (SimpleDebugGraphQLView); slow, dev only
+GRAPHQL_DEBUG_REQUESTS = os.environ.get('GRAPHQL_DEBUG_REQUESTS', 'False').lower() == 'true'
+# Parsed + validated documents kept per worker (ecommerce_platform/graphql/documents.py)
+GRAPHQL_DOCUMENT_CACHE_SIZE = int(os.environ.get('GRAPHQL_DOCUMENT_CACHE_SIZE', 500))
+# Optional {sha256: query} JSON of persisted queries shipped with the clients
+GRAPHQL_PERSISTED_QUERY_MANIFEST = os.environ.get('GRAPHQL_PERSISTED_QUERY_MANIFEST')
+# Let clients register persisted queries by sending hash + query once (off: the
+# manifest covers the shipped clients, and registrations take shared cache space)
+GRAPHQL_PERSISTED_QUERIES_ALLOW_REGISTRATION = os.environ.get(
+    'GRAPHQL_PERSISTED_QUERIES_ALLOW_REGISTRATION', 'False'
+).lower() == 'true'
+# Seconds a registered query stays in the shared cache; clients re-register on a miss
+GRAPHQL_PERSISTED_QUERY_TIMEOUT = int(os.environ.get('GRAPHQL_PERSISTED_QUERY_TIMEOUT', 86400))
+# Query cost analysis (ecommerce_platform/graphql/cost.py)
+GRAPHQL_MAX_QUERY_DEPTH = int(os.environ.get('GRAPHQL_MAX_QUERY_DEPTH', 10))
+GRAPHQL_MAX_QUERY_COST = int(os.environ.get('GRAPHQL_MAX_QUERY_COST', 10000))
+GRAPHQL_DEFAULT_LIST_SIZE = int(os.environ.get('GRAPHQL_DEFAULT_LIST_SIZE', 50))
+GRAPHQL_RELATION_LIST_SIZE = int(os.environ.get('GRAPHQL_RELATION_LIST_SIZE', 5))
+# Anonymous GET catalog queries (ecommerce_platform/graphql/http_cache.py)
+GRAPHQL_PUBLIC_CACHE_MAX_AGE = int(os.environ.get('GRAPHQL_PUBLIC_CACHE_MAX_AGE', 60))
+GRAPHQL_PUBLIC_CACHE_TIMEOUT = int(os.environ.get('GRAPHQL_PUBLIC_CACHE_TIMEOUT', 300))
+
+# Memory-mapped part-number index (products/part_index.py), written by
+# `manage.py build_part_index`; lookups fall back to the database without it
+PART_INDEX_PATH = os.environ.get('PART_INDEX_PATH', os.path.join(BASE_DIR, 'var', 'part_index.bin'))
+# How often the scheduled refresh rebuilds the index if products changed
+PART_INDEX_REFRESH_MINUTES = int(os.environ.get('PART_INDEX_REFRESH_MINUTES', 15))
+PART_INDEX_RELOAD_SECONDS = int(os.environ.get('PART_INDEX_RELOAD_SECONDS', 5))
+
+# In-process BM25 index for consumer matching (products/text_index.py)
+TEXT_INDEX_ENABLED = os.environ.get('TEXT_INDEX_ENABLED', 'True').lower() == 'true'
+TEXT_INDEX_REFRESH_SECONDS = int(os.environ.get('TEXT_INDEX_REFRESH_SECONDS', 60))
+
+# Per-process LRU in front of the ProductAssociation token lookup (affiliates/association_index.py)
+ASSOCIATION_LOOKUP_CACHE_SIZE = int(os.environ.get('ASSOCIATION_LOOKUP_CACHE_SIZE', 2048))
+ASSOCIATION_LOOKUP_CACHE_SECONDS = int(os.environ.get('ASSOCIATION_LOOKUP_CACHE_SECONDS', 30))
+
+# Durable Puppeteer task queue on Redis Streams (affiliates/task_queue.py)
+PUPPETEER_VISIBILITY_TIMEOUT_SECONDS = int(os.environ.get('PUPPETEER_VISIBILITY_TIMEOUT_SECONDS', 300))
+PUPPETEER_MAX_ATTEMPTS = int(os.environ.get('PUPPETEER_MAX_ATTEMPTS', 3))
+PUPPETEER_STREAM_MAXLEN = int(os.environ.get('PUPPETEER_STREAM_MAXLEN', 100000))
+# Also PUBLISH to the old affiliate_tasks channel while workers migrate to the streams
+PUPPETEER_PUBSUB_FALLBACK = os.environ.get('PUPPETEER_PUBSUB_FALLBACK', 'False').lower() == 'true'
+
+# One Puppeteer scrape per search term / ASIN at a time (affiliates/single_flight.py):
+# how long a lease may be held, and how long a failed scrape is not retried.
+# The lease outlasts every redelivery of its task, plus one visibility timeout.
+SINGLE_FLIGHT_LEASE_SECONDS = int(os.environ.get(
+    'SINGLE_FLIGHT_LEASE_SECONDS', PUPPETEER_VISIBILITY_TIMEOUT_SECONDS * (PUPPETEER_MAX_ATTEMPTS + 1)
+))
+SINGLE_FLIGHT_FAILURE_SECONDS = int(os.environ.get('SINGLE_FLIGHT_FAILURE_SECONDS', 300))
+# Tasks with no callback after this long are marked as timed out (affiliates/deadlines.py)
+STALLED_TASK_TIMEOUT_SECONDS = int(os.environ.get('STALLED_TASK_TIMEOUT_SECONDS', 3600))
+# Callbacks are stored and answered 202, then processed by django-q (affiliates/callbacks.py);
+# turn off to process them in the request when no qcluster is running
+PUPPETEER_CALLBACKS_ASYNC = os.environ.get('PUPPETEER_CALLBACKS_ASYNC', 'True').lower() == 'true'
+PUPPETEER_CALLBACK_MAX_ATTEMPTS = int(os.environ.get('PUPPETEER_CALLBACK_MAX_ATTEMPTS', 3))
+# Bulk requeue of pending affiliate links (affiliates/requeue.py): tasks per second, links per page,
+# and the bulk lane depth at which it pauses (stopping after the max wait)
+AFFILIATE_REQUEUE_RATE_PER_SECOND = int(os.environ.get('AFFILIATE_REQUEUE_RATE_PER_SECOND', 5))
+AFFILIATE_REQUEUE_BATCH_SIZE = int(os.environ.get('AFFILIATE_REQUEUE_BATCH_SIZE', 100))
+AFFILIATE_REQUEUE_MAX_BACKLOG = int(os.environ.get('AFFILIATE_REQUEUE_MAX_BACKLOG', 1000))
+AFFILIATE_REQUEUE_MAX_WAIT_SECONDS = int(os.environ.get('AFFILIATE_REQUEUE_MAX_WAIT_SECONDS', 600))
+# Search-demand events (products/search_events.py): buffer cap if the rollup stops, hourly row retention
+SEARCH_EVENT_BUFFER_MAX = int(os.environ.get('SEARCH_EVENT_BUFFER_MAX', 100000))
+SEARCH_ROLLUP_HOURLY_RETENTION_DAYS = int(os.environ.get('SEARCH_ROLLUP_HOURLY_RETENTION_DAYS', 14))
+
 # print(os.environ)
 # Determine Redis configuration based on environment
 # Initialize local_redis_password to None
@@ -100,44 +182,43 @@ local_redis_password = None
 
 if 'REDISCLOUD_URL' in os.environ:
     # Production settings using Redis Cloud
-    print("Using Redis Cloud")
+    _boot_log("Using Redis Cloud")
     REDIS_URL = os.environ['REDISCLOUD_URL']
-    print(f"REDISCLOUD_URL found: {REDIS_URL}")
-    redis_client = redis.from_url(REDIS_URL)
+    _boot_log(f"REDISCLOUD_URL found: {REDIS_URL}")
 
     # Parse the REDISCLOUD_URL
     url = urlparse(REDIS_URL)
     REDIS_HOST = url.hostname
     REDIS_PORT = url.port
     REDIS_DB = url.path[1:]  # Remove the leading '/'
-    print(f"Parsed Redis Cloud settings - Host: {REDIS_HOST}, Port: {REDIS_PORT}, DB: {REDIS_DB}")
+    _boot_log(f"Parsed Redis Cloud settings - Host: {REDIS_HOST}, Port: {REDIS_PORT}, DB: {REDIS_DB}")
 else:
     # Local development settings
     REDIS_HOST = os.environ.get('REDIS_HOST', 'localhost')
     REDIS_PORT = int(os.environ.get('REDIS_PORT', 6379))
     REDIS_DB = int(os.environ.get('REDIS_DB', 0))
-    print(f"Using local Redis settings - Host: {REDIS_HOST}, Port: {REDIS_PORT}, DB: {REDIS_DB}")
+    _boot_log(f"Using local Redis settings - Host: {REDIS_HOST}, Port: {REDIS_PORT}, DB: {REDIS_DB}")
     # Get local Redis password if it exists
     local_redis_password = os.environ.get('REDIS_PASSWORD', None)
-    redis_client_kwargs = {
-        'host': REDIS_HOST,
-        'port': REDIS_PORT,
-        'db': REDIS_DB,
-    }
     if local_redis_password:
-        redis_client_kwargs['password'] = local_redis_password
-        print("Local Redis password found")
-    redis_client = redis.Redis(**redis_client_kwargs)
-    print(f"Local Redis client initialized with settings: {redis_client_kwargs}")
-
-# Test Redis connection
-try:
-    redis_client.ping()
-    print("Successfully connected to Redis")
-except redis.ConnectionError as e:
-    print(f"Failed to connect to Redis: {str(e)}")
-except Exception as e:
-    print(f"Unexpected error connecting to Redis: {str(e)}")
+        _boot_log("Local Redis password found")
+
+# Test Redis connection (opt-in; a blocking network round-trip at import time)
+if REDIS_BOOT_CHECK:
+    import redis
+
+    try:
+        if 'REDISCLOUD_URL' in os.environ:
+            redis.from_url(REDIS_URL).ping()
+        else:
+            redis.Redis(
+                host=REDIS_HOST, port=REDIS_PORT, db=REDIS_DB, password=local_redis_password
+            ).ping()
+        print("Successfully connected to Redis")
+    except redis.ConnectionError as e:
+        print(f"Failed to connect to Redis: {str(e)}")
+    except Exception as e:
+        print(f"Unexpected error connecting to Redis: {str(e)}")
 
 AUTHENTICATION_BACKENDS = [
     "ecommerce_platform.jwt_debug.DebugJSONWebTokenBackend",  # Our debug backend first
@@ -156,8 +237,8 @@ GRAPHQL_JWT = {
 # Remove CORS URL restriction to allow all endpoints (including REST API)
 # CORS_URLS_REGEX = r'^/(graphql|upload-quote)/.*$'
 
-print("Final Redis settings for Q_CLUSTER:", REDIS_HOST, REDIS_PORT, REDIS_DB)
-print(f"Q_CLUSTER Redis password: {'Set' if (url.password if 'REDISCLOUD_URL' in os.environ else local_redis_password) else 'Not set'}")
+_boot_log("Final Redis settings for Q_CLUSTER:", REDIS_HOST, REDIS_PORT, REDIS_DB)
+_boot_log(f"Q_CLUSTER Redis password: {'Set' if (url.password if 'REDISCLOUD_URL' in os.environ else local_redis_password) else 'Not set'}")
 
 Q_CLUSTER = {
     'name': 'ecommerce_platform',
@@ -181,7 +262,29 @@ Q_CLUSTER = {
 }
 
 # Add Q_CLUSTER logging
-print("Q_CLUSTER configuration:", Q_CLUSTER)
+_boot_log("Q_CLUSTER configuration:", Q_CLUSTER)
+
+# Shared cache: per-process LRU in front of Redis (see ecommerce_platform/cache.py)
+if 'REDISCLOUD_URL' in os.environ:
+    CACHE_REDIS_URL = REDIS_URL
+else:
+    CACHE_REDIS_URL = f"redis://{':' + local_redis_password + '@' if local_redis_password else ''}{REDIS_HOST}:{REDIS_PORT}/{REDIS_DB}"
+
+CACHES = {
+    'default': {
+        'BACKEND': 'ecommerce_platform.cache.TieredCache',
+        'LOCATION': CACHE_REDIS_URL,
+        'KEY_PREFIX': 'ecp',
+        'TIMEOUT': 300,
+        'OPTIONS': {
+            'LOCAL_MAX_ENTRIES': int(os.environ.get('CACHE_LOCAL_MAX_ENTRIES', 1000)),
+            'LOCAL_TTL': int(os.environ.get('CACHE_LOCAL_TTL', 30)),
+            'TTL_JITTER': 0.1,
+            'LOCK_TIMEOUT': 30,
+            'LOCK_WAIT': 10,
+        },
+    },
+}
 
 TEMPLATES = [
     {
@@ -253,6 +356,69 @@ DATABASES = {
 if 'DATABASE_URL' in os.environ:
     DATABASES['default'] = dj_database_url.config(conn_max_age=600, ssl_require=True)
 
+# Read replica (ecommerce_platform/db_routing.py). GraphQL queries and the
+# analytics commands read from it; set DATABASE_REPLICA_SAME_AS_PRIMARY=true to
+# exercise the routing locally with a second alias pointing at the primary.
+if 'DATABASE_REPLICA_URL' in os.environ:
+    DATABASES['replica'] = dj_database_url.parse(
+        os.environ['DATABASE_REPLICA_URL'], conn_max_age=600, ssl_require='DATABASE_URL' in os.environ
+    )
+elif os.environ.get('DATABASE_REPLICA_SAME_AS_PRIMARY', 'False').lower() == 'true':
+    DATABASES['replica'] = {**DATABASES['default']}
+
+if 'replica' in DATABASES:
+    # Tests see the primary's test database through the replica alias
+    DATABASES['replica']['TEST'] = {'MIRROR': 'default'}
+    REPLICA_DATABASE_ALIAS = 'replica'
+else:
+    REPLICA_DATABASE_ALIAS = None
+
+DATABASE_ROUTERS = ['ecommerce_platform.db_routing.ReplicaRouter']
+REPLICA_PIN_SECONDS = int(os.environ.get('REPLICA_PIN_SECONDS', 10))
+
+# Connection pooling (ecommerce_platform/pooled_postgresql). Each process keeps
+# its own pool, sized by role: gunicorn threads share the web pool, while each
+# django-q worker runs one task at a time and needs one connection, plus one per
+# payout batch thread (users/payout_executor.py, at most PAYOUT_BATCH_MAX_THREADS).
+# Postgres connections in use ≈ processes × MAX_SIZE, independent of traffic.
+PROCESS_ROLE = os.environ.get('PROCESS_ROLE') or ('worker' if 'qcluster' in sys.argv else 'web')
+DATABASE_POOL_ENABLED = os.environ.get('DATABASE_POOL_ENABLED', 'True').lower() == 'true'
+PAYOUT_BATCH_MAX_THREADS = int(os.environ.get('PAYOUT_BATCH_MAX_THREADS', 8))
+# Payouts claimed longer ago than this (batch task timeout is 15 min) go back to approved
+PAYOUT_CLAIM_TIMEOUT_SECONDS = int(os.environ.get('PAYOUT_CLAIM_TIMEOUT_SECONDS', 1800))
+DATABASE_POOL_SIZES = {
+    'web': {
+        'MIN_SIZE': int(os.environ.get('DB_POOL_WEB_MIN_SIZE', 1)),
+        'MAX_SIZE': int(os.environ.get('DB_POOL_WEB_MAX_SIZE', 4)),
+    },
+    'worker': {
+        'MIN_SIZE': int(os.environ.get('DB_POOL_WORKER_MIN_SIZE', 0)),
+        'MAX_SIZE': int(os.environ.get('DB_POOL_WORKER_MAX_SIZE', PAYOUT_BATCH_MAX_THREADS + 1)),
+    },
+}
+
+for _alias, _database in DATABASES.items():
+    if not DATABASE_POOL_ENABLED or _database['ENGINE'] != 'django.db.backends.postgresql':
+        continue
+    _database.update({
+        'ENGINE': 'ecommerce_platform.pooled_postgresql',
+        # Django "closes" the connection after every request, which returns it to the pool
+        'CONN_MAX_AGE': 0,
+        'POOL': {
+            **DATABASE_POOL_SIZES.get(PROCESS_ROLE, DATABASE_POOL_SIZES['web']),
+            'TIMEOUT': float(os.environ.get('DB_POOL_TIMEOUT', 10)),
+            'MAX_IDLE': float(os.environ.get('DB_POOL_MAX_IDLE', 300)),
+            'MAX_LIFETIME': float(os.environ.get('DB_POOL_MAX_LIFETIME', 1800)),
+            'CHECK_AFTER': float(os.environ.get('DB_POOL_CHECK_AFTER', 30)),
+        },
+    })
+    # Lets pg_stat_activity (and the pool load test) attribute connections to a role
+    _database['OPTIONS'] = {
+        **_database.get('OPTIONS', {}), 'application_name': f'ecommerce_platform:{PROCESS_ROLE}:{_alias}',
+    }
+
+_boot_log(f"Database pool: role={PROCESS_ROLE} config={DATABASES['default'].get('POOL')} replica={REPLICA_DATABASE_ALIAS}")
+
 
 # Password validation
 # https://docs.djangoproject.com/en/3.2/ref/settings/#auth-password-validators
@@ -351,7 +517,9 @@ LOGGING = {
         },
     },
 }
-django_heroku.settings(locals())    
+# DATABASES is configured above (including DATABASE_URL); don't let
+# django-heroku replace the pooled backend with its own
+django_heroku.settings(locals(), databases=False)
 
 # Debug logging for Google OAuth configuration
 import logging
@@ -20,8 +20,8 @@ from django.views.decorators.csrf import csrf_exempt
 from django.conf import settings
 from django.conf.urls.static import static
 from quotes.views import upload_quote_rest, test_jwt_token
-from ecommerce_platform.graphql.views import DebugGraphQLView
-from ecommerce_platform.views import test_auth, debug_token, test_simple_task, check_task_status
+from ecommerce_platform.graphql.views import DebugGraphQLView, PersistedQueryGraphQLView
+from ecommerce_platform.views import test_auth, debug_token, test_simple_task, check_task_status, export_data
 from affiliates.views import (
     affiliate_callback, 
     standalone_callback, 
@@ -34,9 +34,14 @@ import json
 import traceback
 from django.http import JsonResponse
 
-class SimpleDebugGraphQLView(GraphQLView):
+class SimpleDebugGraphQLView(PersistedQueryGraphQLView):
     @csrf_exempt
     def dispatch(self, request, *args, **kwargs):
+        # Request/response dumps re-encode every body; only pay for them when asked
+        if not settings.GRAPHQL_DEBUG_REQUESTS:
+            response = super().dispatch(request, *args, **kwargs)
+            return self._map_error_status(response)
+
         print("\n" + "="*80)
         print(f"GRAPHQL REQUEST: {request.method} {request.path}")
         print("-"*80)
@@ -75,24 +80,7 @@ class SimpleDebugGraphQLView(GraphQLView):
             # Let the parent class handle the request normally
             response = super().dispatch(request, *args, **kwargs)
             
-            # Check for authentication errors in GraphQL response
-            if response.status_code == 200 and hasattr(response, 'content'):
-                try:
-                    content = json.loads(response.content)
-                    if 'errors' in content:
-                        for error in content['errors']:
-                            extensions = error.get('extensions', {})
-                            error_code = extensions.get('code')
-                            
-                            # Return proper HTTP status for auth errors
-                            if error_code in ['INVALID_CREDENTIALS', 'EMAIL_NOT_VERIFIED', 'AUTHENTICATION_FAILED']:
-                                response.status_code = 401
-                            elif error_code in ['PERMISSION_DENIED']:
-                                response.status_code = 403
-                            elif error_code in ['INVALID_INPUT', 'VALIDATION_ERROR']:
-                                response.status_code = 400
-                except:
-                    pass  # If we can't parse, keep original response
+            response = self._map_error_status(response)
             
             print(f"RESPONSE STATUS: {response.status_code}")
             
@@ -123,9 +111,33 @@ class SimpleDebugGraphQLView(GraphQLView):
                 }]
             }, status=500)
 
+    @staticmethod
+    def _map_error_status(response):
+        """Return proper HTTP status codes for auth and validation errors in a GraphQL response"""
+        # Only decode responses that can contain errors
+        if response.status_code != 200 or b'"errors"' not in getattr(response, 'content', b''):
+            return response
+
+        try:
+            content = json.loads(response.content)
+            for error in content.get('errors') or []:
+                extensions = error.get('extensions') or {}
+                error_code = extensions.get('code')
+
+                if error_code in ['INVALID_CREDENTIALS', 'EMAIL_NOT_VERIFIED', 'AUTHENTICATION_FAILED']:
+                    response.status_code = 401
+                elif error_code in ['PERMISSION_DENIED']:
+                    response.status_code = 403
+                elif error_code in ['INVALID_INPUT', 'VALIDATION_ERROR']:
+                    response.status_code = 400
+        except Exception:
+            pass  # If we can't parse, keep original response
+        return response
+
 urlpatterns = [
     # Payout Management Dashboard (must come before admin/ to avoid catch-all)
     path('', include('users.urls')),
+    path('admin/exports/<str:export_name>/', export_data, name='export_data'),
     
     path('admin/', admin.site.urls),
     path('graphql/', csrf_exempt(SimpleDebugGraphQLView.as_view(graphiql=True))),
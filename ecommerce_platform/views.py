@@ -1,5 +1,7 @@
-from django.http import JsonResponse
+from django.http import JsonResponse, Http404
 from django.views.decorators.http import require_http_methods
+from django.contrib.admin.views.decorators import staff_member_required
+from datetime import timedelta
 import jwt
 from django.conf import settings
 from django.views.decorators.csrf import csrf_exempt
@@ -97,3 +99,35 @@ def check_task_status(request, task_id):
         return JsonResponse({
             'error': 'Task not found'
         }, status=404)
+
+
+@staff_member_required
+@require_http_methods(["GET"])
+def export_data(request, export_name):
+    """
+    Stream a CSV/JSONL export of a high-volume table
+
+    Query params: format (csv|jsonl), gzip (1), start_date / end_date (YYYY-MM-DD, inclusive)
+    """
+    from ecommerce_platform.exports import EXPORTS, streaming_export_response, parse_export_date
+
+    if export_name not in EXPORTS:
+        raise Http404(f"Unknown export: {export_name}")
+
+    try:
+        start = parse_export_date(request.GET.get('start_date'))
+        end = parse_export_date(request.GET.get('end_date'))
+    except ValueError:
+        return JsonResponse({"error": "Dates must use YYYY-MM-DD"}, status=400)
+
+    fmt = request.GET.get('format', 'csv')
+    if fmt not in ('csv', 'jsonl'):
+        return JsonResponse({"error": "format must be csv or jsonl"}, status=400)
+
+    return streaming_export_response(
+        export_name,
+        fmt=fmt,
+        compress=request.GET.get('gzip') in ('1', 'true'),
+        start=start,
+        end=end + timedelta(days=1) if end else None,
+    )
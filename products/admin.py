@@ -27,6 +27,7 @@ class ProductAdmin(admin.ModelAdmin):
     inlines = [ProductCategoryInline, AffiliateInline]
     readonly_fields = ('created_at', 'updated_at')
     actions = ['mark_as_demo', 'mark_as_production', 'delete_demo_products']
+    list_select_related = ('manufacturer',)
     
     def manufacturer_name(self, obj):
         return obj.manufacturer.name if obj.manufacturer else "No Manufacturer"
@@ -0,0 +1,28 @@
+"""
+Catalog version stamp for HTTP caching of public catalog queries.
+
+Any write to products, categories, manufacturers, offers or affiliate links
+replaces the version (see products/signals.py), which changes every ETag and
+server-side response cache key derived from it. Old cache entries are never
+read again and simply expire.
+"""
+
+import time
+
+from django.core.cache import cache
+
+CATALOG_VERSION_KEY = 'catalog:version'
+
+
+def get_catalog_version():
+    """Current catalog version (an opaque integer)"""
+    version = cache.get(CATALOG_VERSION_KEY)
+    if version is None:
+        cache.add(CATALOG_VERSION_KEY, time.time_ns(), timeout=None)
+        version = cache.get(CATALOG_VERSION_KEY) or time.time_ns()
+    return version
+
+
+def bump_catalog_version():
+    """Invalidate everything derived from the current catalog version"""
+    cache.set(CATALOG_VERSION_KEY, time.time_ns(), timeout=None)
@@ -0,0 +1,212 @@
+"""
+Materialized-path maintenance for the category hierarchy.
+
+Every Category stores ``path``: the ids from the root down to itself, each
+followed by ``/`` (``"3/17/42/"``). The subtree of a category is a single
+indexed prefix match (``path LIKE '3/17/%'``) and its ancestors are the ids
+in its own path, so breadcrumbs and subtree queries never recurse.
+
+Product counts are kept per category:
+
+    product_count           links to the category itself
+    subtree_product_count   links to the category or any descendant
+
+They are adjusted incrementally from ProductCategory signals. Bulk writers
+(the Synnex import, the synthetic catalog) wrap their work in
+``CategoryTree.bulk_counts()`` so the counts are recomputed once per batch
+instead of once per row.
+"""
+
+import threading
+from collections import defaultdict
+from contextlib import contextmanager
+
+from django.db import transaction
+from django.db.models import CharField, Count, F, Sum, Value
+from django.db.models.functions import Concat, Substr
+
+PATH_SEPARATOR = '/'
+
+_bulk_state = threading.local()
+
+
+def path_ids(path):
+    """Category ids in a materialized path, root first"""
+    return [int(part) for part in path.split(PATH_SEPARATOR) if part]
+
+
+class CategoryTree:
+    """Service for keeping category paths and product counts consistent"""
+
+    @staticmethod
+    def build_path(category_id, parent_path=''):
+        return f"{parent_path}{category_id}{PATH_SEPARATOR}"
+
+    @staticmethod
+    def sync_path(category):
+        """
+        Recompute a category's path after save and move its subtree if it changed.
+
+        Args:
+            category: Saved Category instance (path/depth are updated in place)
+        """
+        from .models import Category
+
+        parent_path = ''
+        if category.parent_id:
+            parent_path = Category.objects.filter(pk=category.parent_id).values_list('path', flat=True).first() or ''
+
+        old_path = category.path
+        new_path = CategoryTree.build_path(category.pk, parent_path)
+        if old_path == new_path:
+            return
+
+        new_depth = new_path.count(PATH_SEPARATOR) - 1
+        with transaction.atomic():
+            Category.objects.filter(pk=category.pk).update(path=new_path, depth=new_depth)
+
+            if old_path:
+                old_depth = old_path.count(PATH_SEPARATOR) - 1
+                Category.objects.filter(path__startswith=old_path).exclude(pk=category.pk).update(
+                    path=Concat(Value(new_path), Substr('path', len(old_path) + 1), output_field=CharField()),
+                    depth=F('depth') + (new_depth - old_depth),
+                )
+
+                # The subtree's products leave the old ancestors and join the new ones
+                moved = Category.objects.filter(pk=category.pk).values_list('subtree_product_count', flat=True).first()
+                if moved:
+                    Category.objects.filter(pk__in=path_ids(old_path)[:-1]).update(
+                        subtree_product_count=F('subtree_product_count') - moved
+                    )
+                    Category.objects.filter(pk__in=path_ids(new_path)[:-1]).update(
+                        subtree_product_count=F('subtree_product_count') + moved
+                    )
+
+        category.path = new_path
+        category.depth = new_depth
+
+    @staticmethod
+    def adjust_counts(category_id, delta):
+        """Add delta product links to a category and every ancestor"""
+        from .models import Category
+
+        pending = getattr(_bulk_state, 'touched', None)
+        if pending is not None:
+            pending.add(category_id)
+            return
+
+        path = Category.objects.filter(pk=category_id).values_list('path', flat=True).first()
+        if path is None:
+            return
+
+        Category.objects.filter(pk=category_id).update(product_count=F('product_count') + delta)
+        Category.objects.filter(pk__in=path_ids(path)).update(
+            subtree_product_count=F('subtree_product_count') + delta
+        )
+
+    @staticmethod
+    @contextmanager
+    def bulk_counts():
+        """
+        Defer per-row count updates and recount the touched categories once on exit.
+
+        Nested use joins the outermost block.
+        """
+        if getattr(_bulk_state, 'touched', None) is not None:
+            yield
+            return
+
+        _bulk_state.touched = set()
+        try:
+            yield
+        finally:
+            touched = _bulk_state.touched
+            _bulk_state.touched = None
+            if touched:
+                CategoryTree.recount(touched)
+
+    @staticmethod
+    def recount(category_ids):
+        """
+        Recompute product counts for categories and the subtree counts of their ancestors.
+
+        Args:
+            category_ids: Iterable of category ids whose memberships changed
+        """
+        from .models import Category, ProductCategory
+
+        categories = list(Category.objects.filter(pk__in=set(category_ids)).only('id', 'path'))
+        if not categories:
+            return
+
+        direct = dict(
+            ProductCategory.objects.filter(category__in=categories)
+            .values('category_id').annotate(n=Count('id')).values_list('category_id', 'n')
+        )
+        for category in categories:
+            category.product_count = direct.get(category.id, 0)
+        Category.objects.bulk_update(categories, ['product_count'], batch_size=500)
+
+        affected = {ancestor_id for category in categories for ancestor_id in path_ids(category.path)}
+        ancestors = list(Category.objects.filter(pk__in=affected).only('id', 'path'))
+        for ancestor in ancestors:
+            ancestor.subtree_product_count = (
+                Category.objects.filter(path__startswith=ancestor.path)
+                .aggregate(total=Sum('product_count'))['total'] or 0
+            )
+        Category.objects.bulk_update(ancestors, ['subtree_product_count'], batch_size=500)
+
+    @staticmethod
+    def rebuild(category_model=None, product_category_model=None):
+        """
+        Rebuild every path, depth and count from the parent links.
+
+        Takes the models as arguments so migrations can pass historical models.
+
+        Returns:
+            Number of categories rebuilt
+        """
+        if category_model is None:
+            from .models import Category as category_model, ProductCategory as product_category_model
+
+        categories = {c.id: c for c in category_model.objects.only('id', 'parent_id')}
+        children = defaultdict(list)
+        for category in categories.values():
+            children[category.parent_id].append(category)
+
+        # Walk from the roots; categories in a parent cycle are never reached
+        # and are re-rooted so every row ends up with a valid path
+        stack = [(category, '') for category in children[None]]
+        visited = set()
+        while True:
+            while stack:
+                category, parent_path = stack.pop()
+                if category.id in visited:
+                    continue
+                visited.add(category.id)
+                category.path = CategoryTree.build_path(category.id, parent_path)
+                category.depth = category.path.count(PATH_SEPARATOR) - 1
+                stack.extend((child, category.path) for child in children[category.id])
+            orphans = [c for c in categories.values() if c.id not in visited]
+            if not orphans:
+                break
+            stack.append((orphans[0], ''))
+
+        direct = dict(
+            product_category_model.objects.values('category_id')
+            .annotate(n=Count('id')).values_list('category_id', 'n')
+        )
+        subtree = defaultdict(int)
+        for category in categories.values():
+            category.product_count = direct.get(category.id, 0)
+            for ancestor_id in path_ids(category.path):
+                subtree[ancestor_id] += category.product_count
+        for category in categories.values():
+            category.subtree_product_count = subtree[category.id]
+
+        category_model.objects.bulk_update(
+            list(categories.values()),
+            ['path', 'depth', 'product_count', 'subtree_product_count'],
+            batch_size=500,
+        )
+        return len(categories)
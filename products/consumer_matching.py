@@ -20,14 +20,20 @@ import re
 from typing import Dict, List, Tuple, Optional
 from dataclasses import dataclass, field
 from products.models import Product
-from django.db.models import Q
+from products.part_index import prefix_part_number_q
+from products.spec_extraction import detect_category, extract_specs, features_of, has_current_specs, spec_filter_q
+from products.text_index import get_text_index
+from django.db.models import Min, Q, prefetch_related_objects
 from collections import Counter
-from functools import lru_cache
 import pickle
 import os
 from django.conf import settings
 from django.core.cache import cache
 
+# Candidates taken from the BM25 text index, and the most a perfect text match adds to a relevance score
+TEXT_RANK_CANDIDATES = 30
+TEXT_RANK_WEIGHT = 1.0
+
 @dataclass
 class ConsumerMatchResult:
     """Result of consumer-focused product matching (No Amazon API version)"""
@@ -47,7 +53,7 @@ class ProductSpecs:
     resolution: Optional[str] = None  # 4K, 8K, 1080p
     speed: Optional[str] = None     # 48Gbps, etc.
     version: Optional[str] = None   # HDMI 2.1, USB 3.0, etc.
-    features: List[str] = field(default_factory=list)  # HDR, eARC, etc.
+    features: List[str] = field(default_factory=list)  # hdr, earc, etc.
 
 class ConsumerProductMatcher:
     """Enhanced matcher focusing on supplier inventory (No Amazon API)"""
@@ -295,6 +301,25 @@ class ConsumerProductMatcher:
             if product not in [r[0] for r in all_results]:
                 all_results.append((product, 'fuzzy_name', 6))
         
+        # Strategy 7: Spec match in SQL against the specs extracted at ingest
+        spec_matches = self._spec_search(search_term)
+        for product in spec_matches:
+            if product not in [r[0] for r in all_results]:
+                all_results.append((product, 'spec_match', 8))
+        
+        # Strategy 8: BM25 text ranking across the whole supplier catalog
+        text_index = get_text_index()
+        text_scores = {}
+        if text_index is not None:
+            ranked = text_index.search(search_term, limit=TEXT_RANK_CANDIDATES)
+            seen_ids = {r[0].id for r in all_results}
+            ranked_products = Product.objects.in_bulk([product_id for product_id, _ in ranked if product_id not in seen_ids])
+            for product_id, _ in ranked:
+                if product_id in ranked_products:
+                    all_results.append((ranked_products[product_id], 'text_rank', 6))
+            text_scores = text_index.score(search_term, [r[0].id for r in all_results])
+        top_text_score = max(text_scores.values(), default=0.0)
+        
         # SMART RELEVANCE SCORING: Re-rank based on specifications
         print(f"🧠 SMART RANKING: Applying relevance scoring...")
         
@@ -318,12 +343,15 @@ class ConsumerProductMatcher:
                 print(f"🔧 Using default USB reference specs: {reference_specs.length}ft, ${reference_specs.price}")
         
         # Calculate relevance scores for all results
+        specs_by_id = self._candidate_specs([r[0] for r in all_results], text_index)
         scored_results = []
         for product, match_type, base_score in all_results:
-            candidate_specs = extract_product_specs(product)
+            candidate_specs = specs_by_id[product.id]
             
-            # Calculate smart relevance score
+            # Calculate smart relevance score, plus how well the text matches relative to the best match
             relevance_score = calculate_relevance_score(reference_specs, candidate_specs, base_score)
+            if top_text_score:
+                relevance_score += TEXT_RANK_WEIGHT * text_scores.get(product.id, 0.0) / top_text_score
             
             print(f"  📊 {product.name[:50]}...")
             print(f"      Base: {base_score:.1f}, Relevance: {relevance_score:.2f}")
@@ -350,11 +378,44 @@ class ConsumerProductMatcher:
         
         print(f"🔍 ENHANCED SEARCH: Found {len(filtered_results)} filtered products with smart ranking")
         for i, product in enumerate(filtered_results[:5]):
-            specs = extract_product_specs(product)
+            specs = specs_by_id[product.id]
             print(f"  {i+1}. {product.name} (${specs.price or 'N/A'}) ({specs.length or '?'}ft)")
         
         return filtered_results
     
+    def _spec_search(self, search_term: str) -> List[Product]:
+        """Products whose extracted specs match the category and specs named in the search term"""
+        wanted = extract_specs(search_term)
+        category = detect_category(search_term)
+        if not category or not (wanted['length_ft'] or wanted['resolution'] or wanted['speed_gbps'] or wanted['version']):
+            return []
+        
+        query = spec_filter_q(
+            category=category,
+            resolution=wanted['resolution'],
+            length_ft=wanted['length_ft'],
+            min_speed_gbps=wanted['speed_gbps'],
+            version=wanted['version'],
+        )
+        # Include both partner imports AND manual/demo products
+        return list(Product.objects.filter(query).filter(Q(source='partner_import') | Q(source='manual'))[:10])
+    
+    def _candidate_specs(self, products: List[Product], text_index) -> Dict[int, ProductSpecs]:
+        """Specs per product id: cached by the text index, else extracted with offers prefetched in one query"""
+        specs_by_id = {}
+        missing = []
+        for product in products:
+            cached = text_index.specs_for(product.id) if text_index is not None else None
+            if cached is not None:
+                specs_by_id[product.id] = cached
+            else:
+                missing.append(product)
+        
+        prefetch_related_objects(missing, 'offers')
+        for product in missing:
+            specs_by_id[product.id] = extract_product_specs(product)
+        return specs_by_id
+    
     def _demo_product_search(self, search_term: str) -> List[Product]:
         """Search demo products that are contextually relevant to the search term"""
         if not search_term:
@@ -491,7 +552,7 @@ class ConsumerProductMatcher:
         
         query = Q()
         for part in potential_parts:
-            query |= Q(part_number__icontains=part)
+            query |= prefix_part_number_q(part)
             query |= Q(name__icontains=part)
             query |= Q(description__icontains=part)
         
@@ -987,14 +1048,19 @@ class DynamicProductIntelligence:
     def __init__(self):
         self.cache_timeout = 3600 * 24  # 24 hours
         
-    @lru_cache(maxsize=1)
+    LEARNED_CATEGORIES_KEY = "learned_categories_v1"
+    MARKETING_NOISE_KEY = "marketing_noise_v1_{min_threshold}"
+    
     def get_learned_categories(self):
         """Learn product categories from actual database content"""
-        cache_key = "learned_categories_v1"
-        cached = cache.get(cache_key)
-        if cached:
-            return cached
-            
+        # get_or_set coalesces the scan: one process relearns, the others wait for its result
+        return cache.get_or_set(self.LEARNED_CATEGORIES_KEY, self._learn_categories, self.cache_timeout)
+    
+    def invalidate(self):
+        """Drop the learned data so the next call relearns it"""
+        cache.delete_many([self.LEARNED_CATEGORIES_KEY, self.MARKETING_NOISE_KEY.format(min_threshold=10)])
+    
+    def _learn_categories(self):
         print("🧠 Learning product categories from database...")
         
         # Analyze all product names and descriptions
@@ -1055,17 +1121,17 @@ class DynamicProductIntelligence:
         print(f"✅ Learned {len(learned['laptop_indicators'])} laptop indicators")
         print(f"✅ Learned {len(learned['cable_indicators'])} cable indicators") 
         print(f"✅ Learned {len(learned['brand_indicators'])} brand indicators")
-        
-        cache.set(cache_key, learned, self.cache_timeout)
         return learned
     
     def detect_marketing_noise(self, min_threshold=10):
         """Automatically detect marketing fluff words"""
-        cache_key = f"marketing_noise_v1_{min_threshold}"
-        cached = cache.get(cache_key)
-        if cached:
-            return cached
-            
+        return cache.get_or_set(
+            self.MARKETING_NOISE_KEY.format(min_threshold=min_threshold),
+            lambda: self._detect_marketing_noise(min_threshold),
+            self.cache_timeout
+        )
+    
+    def _detect_marketing_noise(self, min_threshold):
         print("🔍 Analyzing marketing noise patterns...")
         
         from products.models import Product
@@ -1093,7 +1159,6 @@ class DynamicProductIntelligence:
                          if word_counts[word] >= min_threshold]
         
         print(f"✅ Detected {len(frequent_noise)} marketing noise terms")
-        cache.set(cache_key, frequent_noise, self.cache_timeout)
         return frequent_noise
     
     def get_category_confidence(self, text, category_type):
@@ -1352,72 +1417,57 @@ def extract_clean_terms(product_name: str) -> List[str]:
 
 def extract_product_specs(product: Product, product_name_override: str = None) -> ProductSpecs:
     """Extract technical specifications from product name and description"""
-    # Handle case where only product name is provided (no product object)
-    if product is None and product_name_override:
-        text = product_name_override
-    else:
-        text = product_name_override or product.name
-        if product and product.description:
-            text += " " + product.description
-    
-    text_lower = text.lower()
-    
-    specs = ProductSpecs()
-    
-    # Extract cable length
-    length_patterns = [
-        r'(\d+(?:\.\d+)?)\s*(?:ft|feet|foot)',
-        r'(\d+(?:\.\d+)?)\s*(?:m|meter|metres)',
-        r'(\d+)-(?:ft|foot|feet)',
-    ]
-    for pattern in length_patterns:
-        match = re.search(pattern, text_lower)
-        if match:
-            specs.length = float(match.group(1))
-            break
-    
-    # Extract resolution
-    if '8k' in text_lower or '8k@' in text_lower:
-        specs.resolution = '8k'
-    elif '4k' in text_lower or '4k@' in text_lower:
-        specs.resolution = '4k'  
-    elif '1440p' in text_lower:
-        specs.resolution = '1440p'
-    elif '1080p' in text_lower:
-        specs.resolution = '1080p'
-    
-    # Extract speed/bandwidth
-    speed_match = re.search(r'(\d+)\s*gbps', text_lower)
-    if speed_match:
-        specs.speed = speed_match.group(1) + 'gbps'
-    
-    # Extract version
-    version_patterns = [
-        r'hdmi\s*(\d+\.\d+)',
-        r'usb\s*(\d+\.\d+)',
-        r'usb[-\s]*([c3-9])',
-    ]
-    for pattern in version_patterns:
-        match = re.search(pattern, text_lower)
-        if match:
-            specs.version = match.group(1)
-            break
-    
-    # Extract features
-    feature_keywords = ['hdr', 'hdr10', 'eARC', 'hdcp', 'dolby', 'atmos', 'braided']
-    specs.features = [keyword for keyword in feature_keywords if keyword.lower() in text_lower]
+    # Saved products carry specs extracted at write time
+    if product is not None and not product_name_override and has_current_specs(product):
+        return stored_product_specs(product)
+    
+    # Same extractor (and units: feet) as the stored specs, so reference and candidates compare
+    name = product_name_override or product.name
+    description = product.description if product else ''
+    extracted = extract_specs(name, description)
+    specs = ProductSpecs(
+        length=extracted['length_ft'],
+        resolution=extracted['resolution'],
+        speed=f"{extracted['speed_gbps']}gbps" if extracted['speed_gbps'] else None,
+        version=extracted['version'],
+        features=extracted['features'],
+    )
     
     # Get price from offers (only if product object exists)
     if product:
         try:
-            offers = list(product.offers.all())
-            if offers:
-                specs.price = float(offers[0].selling_price)
+            specs.price = _lowest_offer_price(product)
         except:
             pass
     
     return specs
 
+def stored_product_specs(product: Product, price: Optional[float] = None, with_price: bool = True) -> ProductSpecs:
+    """ProductSpecs from the spec columns filled in at write time (products/spec_extraction.py)"""
+    specs = ProductSpecs(
+        length=product.spec_length_ft,
+        resolution=product.spec_resolution or None,
+        speed=f"{product.spec_speed_gbps}gbps" if product.spec_speed_gbps else None,
+        version=product.spec_version or None,
+        features=features_of(product),
+        price=price,
+    )
+    if with_price and price is None:
+        try:
+            specs.price = _lowest_offer_price(product)
+        except:
+            pass
+    return specs
+
+def _lowest_offer_price(product: Product) -> Optional[float]:
+    """Lowest active offer price, from prefetched offers when available"""
+    prefetched = getattr(product, '_prefetched_objects_cache', {}).get('offers')
+    if prefetched is not None:
+        prices = [offer.selling_price for offer in prefetched if offer.is_active]
+        return float(min(prices)) if prices else None
+    price = product.offers.filter(is_active=True).aggregate(price=Min('selling_price'))['price']
+    return float(price) if price is not None else None
+
 def calculate_relevance_score(reference_specs: ProductSpecs, candidate_specs: ProductSpecs, base_score: float = 1.0) -> float:
     """Calculate relevance score based on spec similarity"""
     score = base_score
@@ -0,0 +1,148 @@
+"""
+Import-time profiling for process boot.
+
+Each boot target is imported in a fresh interpreter started with
+``python -X importtime`` so the numbers reflect a cold worker, not the
+already-warm process running the management command.
+"""
+
+import os
+import subprocess
+import sys
+from collections import defaultdict
+
+from django.conf import settings
+
+# What each process type imports before it can serve its first unit of work
+BOOT_TARGETS = {
+    'web': (
+        "from django.core.wsgi import get_wsgi_application\n"
+        "application = get_wsgi_application()\n"
+        "from django.urls import get_resolver\n"
+        "get_resolver().url_patterns\n"
+        "from graphene_django.settings import graphene_settings\n"
+        "graphene_settings.SCHEMA\n"
+    ),
+    'worker': (
+        "import django\n"
+        "django.setup()\n"
+        "import affiliates.tasks, products.tasks, quotes.tasks, users.tasks\n"
+    ),
+}
+
+# Heavy optional dependencies that must stay out of web worker boot
+HEAVY_MODULES = ['openai', 'PyPDF2', 'PIL', 'nltk', 'paramiko', 'google.oauth2', 'google.auth']
+
+DEFAULT_WEB_BOOT_BUDGET_MS = 3000
+
+
+def get_boot_budget_ms(target):
+    """Import-time budget for a boot target from settings, in milliseconds"""
+    if target == 'web':
+        return getattr(settings, 'WEB_BOOT_IMPORT_BUDGET_MS', DEFAULT_WEB_BOOT_BUDGET_MS)
+    return getattr(settings, 'WORKER_BOOT_IMPORT_BUDGET_MS', None)
+
+
+def parse_importtime(output):
+    """
+    Parse ``-X importtime`` stderr output.
+
+    Args:
+        output: Raw stderr text
+
+    Returns:
+        List of dicts with module, self_us, cumulative_us and depth, in import order
+    """
+    entries = []
+    for line in output.splitlines():
+        if not line.startswith('import time:'):
+            continue
+        parts = line[len('import time:'):].split('|')
+        if len(parts) != 3:
+            continue
+        try:
+            self_us = int(parts[0].strip())
+            cumulative_us = int(parts[1].strip())
+        except ValueError:
+            # Header line ("self [us] | cumulative | imported package")
+            continue
+        name = parts[2].rstrip()
+        stripped = name.lstrip(' ')
+        entries.append({
+            'module': stripped,
+            'self_us': self_us,
+            'cumulative_us': cumulative_us,
+            # One leading space, then two per nesting level
+            'depth': (len(name) - len(stripped) - 1) // 2,
+        })
+    return entries
+
+
+def summarize_imports(entries):
+    """
+    Summarize parsed import entries.
+
+    Returns:
+        Dict with total_ms (sum of top-level cumulative times), modules
+        (per-module cumulative cost, most expensive first) and packages
+        (self time rolled up by top-level package, most expensive first)
+    """
+    total_us = sum(e['cumulative_us'] for e in entries if e['depth'] == 0)
+
+    packages = defaultdict(int)
+    for entry in entries:
+        packages[entry['module'].split('.')[0]] += entry['self_us']
+
+    return {
+        'total_ms': total_us / 1000,
+        'module_count': len(entries),
+        'modules': sorted(entries, key=lambda e: e['cumulative_us'], reverse=True),
+        'packages': sorted(
+            ({'package': name, 'self_ms': us / 1000} for name, us in packages.items()),
+            key=lambda p: p['self_ms'],
+            reverse=True,
+        ),
+    }
+
+
+def profile_boot(target='web'):
+    """
+    Import a boot target in a fresh interpreter and summarize its import cost.
+
+    Args:
+        target: Key of BOOT_TARGETS
+
+    Returns:
+        summarize_imports() result plus the list of loaded module names
+
+    Raises:
+        RuntimeError: If the child process fails to boot
+    """
+    env = os.environ.copy()
+    env.setdefault('DJANGO_SETTINGS_MODULE', settings.SETTINGS_MODULE)
+    env['PYTHONPATH'] = os.pathsep.join(
+        filter(None, [str(settings.BASE_DIR), env.get('PYTHONPATH')])
+    )
+
+    result = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-c', BOOT_TARGETS[target]],
+        cwd=str(settings.BASE_DIR),
+        env=env,
+        capture_output=True,
+        text=True,
+    )
+    if result.returncode != 0:
+        raise RuntimeError(f"{target} boot failed: {result.stderr.strip().splitlines()[-1:]}")
+
+    entries = parse_importtime(result.stderr)
+    summary = summarize_imports(entries)
+    summary['loaded'] = {e['module'] for e in entries}
+    return summary
+
+
+def heavy_modules_loaded(loaded):
+    """Heavy modules (or their submodules) present in a set of loaded module names"""
+    return sorted(
+        heavy for heavy in HEAVY_MODULES
+        if any(name == heavy or name.startswith(heavy + '.') for name in loaded)
+    )
@@ -1,5 +1,6 @@
 from django.core.management.base import BaseCommand
 from products.consumer_matching import dynamic_intelligence
+from ecommerce_platform.db_routing import use_replica
 
 
 class Command(BaseCommand):
@@ -18,13 +19,16 @@ class Command(BaseCommand):
         )
 
     def handle(self, *args, **options):
+        with use_replica():
+            return self._analyze(options)
+
+    def _analyze(self, options):
         self.stdout.write(self.style.SUCCESS('🧠 Product Intelligence Analysis'))
         
         if options['update_cache']:
             self.stdout.write('🔄 Updating learned categories cache...')
-            # Clear cache to force re-learning
-            from django.core.cache import cache
-            cache.clear()
+            # Drop the learned data to force re-learning
+            dynamic_intelligence.invalidate()
             learned = dynamic_intelligence.get_learned_categories()
             
             self.stdout.write('📊 Learned Categories Summary:')
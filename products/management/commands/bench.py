@@ -0,0 +1,392 @@
+import json
+import os
+import random
+import resource
+import statistics
+import subprocess
+import time
+import tracemalloc
+from contextlib import contextmanager
+from decimal import Decimal
+from unittest import mock
+
+from django.conf import settings
+from django.contrib.auth.models import AnonymousUser
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test import RequestFactory
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+
+from products.synthetic_catalog import (
+    CATALOG_SIZES, SyntheticCatalogGenerator, bench_products, delete_synthetic_catalog
+)
+
+BENCH_DOMAIN = 'bench.example.com'
+
+SCENARIOS = ['products_search', 'unifiedProductSearch', 'priceComparison', 'quote_matching', 'activity_scorer']
+
+PRODUCTS_SEARCH_QUERY = """
+query ProductsSearch($term: String) {
+  productsSearch(term: $term, first: 20) { items { id name partNumber } }
+}
+"""
+
+UNIFIED_SEARCH_QUERY = """
+query UnifiedSearch($partNumber: String, $name: String) {
+  unifiedProductSearch(partNumber: $partNumber, name: $name) { id name partNumber matchType }
+}
+"""
+
+PRICE_COMPARISON_QUERY = """
+query PriceComparison($productId: ID!) {
+  priceComparison(productId: $productId) { id sellingPrice offerType }
+}
+"""
+
+
+def percentile(values, pct):
+    """Nearest-rank percentile of a list of numbers"""
+    ordered = sorted(values)
+    rank = max(1, int(round(pct / 100.0 * len(ordered))))
+    return ordered[min(rank, len(ordered)) - 1]
+
+
+class Command(BaseCommand):
+    help = (
+        'Generate a reproducible synthetic catalog and benchmark search, price comparison, '
+        'quote matching and activity scoring. Writes p50/p95 latency, query counts and peak '
+        'memory to a JSON artifact. Run against a dedicated benchmark database.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--size',
+            choices=sorted(CATALOG_SIZES),
+            default='10k',
+            help='Synthetic catalog size (default: 10k)',
+        )
+        parser.add_argument(
+            '--seed',
+            type=int,
+            default=42,
+            help='Random seed for catalog generation and scenario inputs (default: 42)',
+        )
+        parser.add_argument(
+            '--repeat',
+            type=int,
+            default=20,
+            help='Timed runs per scenario (default: 20)',
+        )
+        parser.add_argument(
+            '--quote-lines',
+            type=int,
+            default=200,
+            help='Line items in the quote matching scenario (default: 200)',
+        )
+        parser.add_argument(
+            '--quote-repeat',
+            type=int,
+            default=3,
+            help='Timed runs of the quote matching scenario (default: 3)',
+        )
+        parser.add_argument(
+            '--scenario',
+            action='append',
+            choices=SCENARIOS,
+            help='Only run the given scenario (repeatable)',
+        )
+        parser.add_argument(
+            '--reuse-catalog',
+            action='store_true',
+            help='Benchmark the synthetic catalog already in the database instead of regenerating it',
+        )
+        parser.add_argument(
+            '--keep',
+            action='store_true',
+            help='Keep the synthetic catalog after the run',
+        )
+        parser.add_argument(
+            '--live-dispatch',
+            action='store_true',
+            help='Let searches enqueue real Amazon/Puppeteer tasks (disabled by default)',
+        )
+        parser.add_argument(
+            '--output',
+            type=str,
+            help='Path of the JSON artifact (default: bench_results/bench-<size>-<timestamp>.json)',
+        )
+        parser.add_argument(
+            '--compare',
+            type=str,
+            help='Previous JSON artifact to print p50/p95 deltas against',
+        )
+
+    def handle(self, *args, **options):
+        size = CATALOG_SIZES[options['size']]
+        self.rng = random.Random(options['seed'])
+        self.factory = RequestFactory()
+
+        self.stdout.write(self.style.SUCCESS(
+            f"🚀 Benchmark: {options['size']} catalog, seed {options['seed']}, {options['repeat']} runs per scenario"
+        ))
+
+        catalog = {'size': size, 'reused': options['reuse_catalog']}
+        if options['reuse_catalog']:
+            catalog['products'] = bench_products().count()
+            if not catalog['products']:
+                raise CommandError('No synthetic catalog found; run without --reuse-catalog first')
+        else:
+            self.stdout.write('🧹 Removing previous synthetic catalog...')
+            delete_synthetic_catalog()
+            self.stdout.write(f'🌱 Generating {size} products...')
+            catalog.update(SyntheticCatalogGenerator(size, seed=options['seed']).generate())
+            self.stdout.write(f"✅ Catalog generated in {catalog['elapsed_seconds']}s")
+
+        if connection.vendor == 'postgresql':
+            with connection.cursor() as cursor:
+                cursor.execute('ANALYZE')
+
+        self._prepare_inputs(options['quote_lines'])
+
+        scenario_names = options['scenario'] or SCENARIOS
+        runners = {
+            'products_search': (self._run_products_search, options['repeat']),
+            'unifiedProductSearch': (self._run_unified_search, options['repeat']),
+            'priceComparison': (self._run_price_comparison, options['repeat']),
+            'quote_matching': (self._run_quote_matching, options['quote_repeat']),
+            'activity_scorer': (self._run_activity_scorer, options['repeat']),
+        }
+
+        results = {}
+        try:
+            with self._dispatch_isolation(options['live_dispatch']):
+                for name in scenario_names:
+                    runner, repeat = runners[name]
+                    results[name] = self._measure(name, runner, repeat)
+        finally:
+            self._cleanup_inputs()
+            if not options['keep']:
+                self.stdout.write('🧹 Removing synthetic catalog...')
+                delete_synthetic_catalog()
+
+        artifact = {
+            'meta': {
+                'created_at': timezone.now().isoformat(),
+                'git_commit': self._git_commit(),
+                'database': connection.vendor,
+                'catalog_size': options['size'],
+                'seed': options['seed'],
+                'repeat': options['repeat'],
+                'quote_lines': options['quote_lines'],
+                'live_dispatch': options['live_dispatch'],
+                'max_rss_kb': resource.getrusage(resource.RUSAGE_SELF).ru_maxrss,
+            },
+            'catalog': catalog,
+            'scenarios': results,
+        }
+
+        output = options['output'] or os.path.join(
+            settings.BASE_DIR, 'bench_results',
+            f"bench-{options['size']}-{timezone.now().strftime('%Y%m%d_%H%M%S')}.json"
+        )
+        os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+        with open(output, 'w') as f:
+            json.dump(artifact, f, indent=2, default=str)
+        self.stdout.write(self.style.SUCCESS(f"📄 Results written to {output}"))
+
+        if options['compare']:
+            self._compare(options['compare'], results)
+
+    # Scenario inputs
+
+    def _prepare_inputs(self, quote_lines):
+        from quotes.models import Quote, QuoteItem
+        from users.models import User, WalletTransaction
+        from affiliates.models import AffiliateLink
+
+        products = list(bench_products().order_by('id').values('id', 'name', 'part_number')[:5000])
+        if not products:
+            raise CommandError('Synthetic catalog is empty')
+        sample = self.rng.sample(products, min(len(products), 500))
+
+        self.search_terms = [product['name'].split(' ', 1)[1].rsplit(' ', 1)[-1].lower() for product in sample[:50]]
+        self.search_terms += [' '.join(product['name'].split()[1:3]) for product in sample[50:100]]
+        self.part_numbers = [product['part_number'] for product in sample[:100]]
+        self.product_ids = [product['id'] for product in sample]
+
+        self.users = [
+            User.objects.get_or_create(email=f'bench-{i}@{BENCH_DOMAIN}')[0]
+            for i in range(20)
+        ]
+        links = list(AffiliateLink.objects.filter(product_id__in=self.product_ids)[:100])
+        if links:
+            WalletTransaction.objects.bulk_create([
+                WalletTransaction(
+                    user=self.users[i % len(self.users)],
+                    transaction_type='EARNING_CONFIRMED' if i % 3 else 'EARNING_PROJECTED',
+                    status='CONFIRMED' if i % 3 else 'PENDING',
+                    amount=Decimal('2.50'),
+                    balance_before=Decimal('0.00'),
+                    balance_after=Decimal('2.50'),
+                    affiliate_link=links[i % len(links)],
+                    description='bench',
+                )
+                for i in range(len(self.users) * 25)
+            ])
+
+        # 60% exact part numbers, 20% reformatted, 20% unknown
+        self.quote = Quote.objects.create(
+            user=self.users[0], vendor_company='Bench Vendor', original_filename='bench-quote.pdf', status='completed'
+        )
+        items = []
+        for line in range(quote_lines):
+            product = sample[line % len(sample)]
+            roll = line % 10
+            if roll < 6:
+                part_number = product['part_number']
+            elif roll < 8:
+                part_number = product['part_number'].replace('-', '').lower()
+            else:
+                part_number = f"UNK-{self.rng.randint(100000, 999999)}"
+            items.append(QuoteItem(
+                quote=self.quote, line_number=line + 1, part_number=part_number,
+                description=product['name'], manufacturer=product['name'].split(' ', 1)[0],
+                quantity=self.rng.randint(1, 20), unit_price=Decimal('99.00'), total_price=Decimal('99.00'),
+            ))
+        QuoteItem.objects.bulk_create(items)
+
+    def _cleanup_inputs(self):
+        from quotes.models import Quote
+        from users.models import User
+
+        Quote.objects.filter(user__email__endswith=f'@{BENCH_DOMAIN}').delete()
+        User.objects.filter(email__endswith=f'@{BENCH_DOMAIN}').delete()
+
+    @contextmanager
+    def _dispatch_isolation(self, live):
+        """Keep searches from publishing real Amazon/Puppeteer tasks unless --live-dispatch is set"""
+        if live:
+            yield
+            return
+
+        def fake_search_task(search_term, search_type='general'):
+            return f"bench-{abs(hash(search_term))}", True
+
+        def fake_async_task(*args, **kwargs):
+            return 'bench-task'
+
+        with mock.patch('ecommerce_platform.schema.generate_affiliate_url_from_search', fake_search_task), \
+                mock.patch('affiliates.tasks.generate_affiliate_url_from_search', fake_search_task), \
+                mock.patch('ecommerce_platform.schema.async_task', fake_async_task), \
+                mock.patch('django_q.tasks.async_task', fake_async_task):
+            yield
+
+    # Scenarios
+
+    def _execute(self, query, variables):
+        from ecommerce_platform.schema import schema
+
+        request = self.factory.post('/graphql/')
+        request.user = AnonymousUser()
+        result = schema.execute(query, variable_values=variables, context_value=request)
+        if result.errors:
+            raise RuntimeError(result.errors[0])
+        return result
+
+    def _run_products_search(self, i):
+        self._execute(PRODUCTS_SEARCH_QUERY, {'term': self.search_terms[i % len(self.search_terms)]})
+
+    def _run_unified_search(self, i):
+        if i % 2:
+            variables = {'name': self.search_terms[i % len(self.search_terms)]}
+        else:
+            variables = {'partNumber': self.part_numbers[i % len(self.part_numbers)]}
+        self._execute(UNIFIED_SEARCH_QUERY, variables)
+
+    def _run_price_comparison(self, i):
+        self._execute(PRICE_COMPARISON_QUERY, {'productId': str(self.product_ids[i % len(self.product_ids)])})
+
+    def _run_quote_matching(self, i):
+        from quotes.tasks import match_quote_products
+
+        result = match_quote_products(self.quote.id)
+        if not result.get('success'):
+            raise RuntimeError(result.get('error_message'))
+
+    def _run_activity_scorer(self, i):
+        from users.activity_metrics import ActivityMetricsService
+
+        ActivityMetricsService.calculate_user_activity_score(self.users[i % len(self.users)])
+
+    # Measurement
+
+    def _measure(self, name, runner, repeat):
+        self.stdout.write(f"⏱️ {name}...")
+        timings, queries, errors = [], [], 0
+
+        # Warm-up run (imports, caches, first connection) is not measured
+        try:
+            runner(0)
+        except Exception as e:
+            self.stdout.write(self.style.WARNING(f"   warm-up failed: {str(e)}"))
+
+        for i in range(1, max(1, repeat) + 1):
+            with CaptureQueriesContext(connection) as ctx:
+                started = time.perf_counter()
+                try:
+                    runner(i)
+                except Exception as e:
+                    errors += 1
+                    self.stdout.write(self.style.WARNING(f"   run {i} failed: {str(e)}"))
+                timings.append((time.perf_counter() - started) * 1000)
+            queries.append(len(ctx.captured_queries))
+
+        # Peak Python heap for one extra traced run (tracing slows execution, so it is not timed)
+        tracemalloc.start()
+        try:
+            runner(repeat + 1)
+        except Exception:
+            pass
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+
+        stats = {
+            'runs': len(timings),
+            'errors': errors,
+            'p50_ms': round(percentile(timings, 50), 2),
+            'p95_ms': round(percentile(timings, 95), 2),
+            'mean_ms': round(statistics.mean(timings), 2),
+            'max_ms': round(max(timings), 2),
+            'queries_median': statistics.median(queries),
+            'queries_max': max(queries),
+            'peak_memory_kb': round(peak / 1024, 1),
+        }
+        self.stdout.write(
+            f"   p50 {stats['p50_ms']}ms, p95 {stats['p95_ms']}ms, "
+            f"{stats['queries_median']} queries, peak {stats['peak_memory_kb']}KB"
+        )
+        return stats
+
+    def _compare(self, path, results):
+        with open(path) as f:
+            previous = json.load(f).get('scenarios', {})
+
+        self.stdout.write(self.style.SUCCESS(f"📊 Compared with {path}"))
+        for name, stats in results.items():
+            before = previous.get(name)
+            if not before:
+                continue
+            for metric in ('p50_ms', 'p95_ms', 'queries_median'):
+                old, new = before.get(metric), stats[metric]
+                if old:
+                    change = (new - old) / old * 100
+                    self.stdout.write(f"   {name} {metric}: {old} → {new} ({change:+.1f}%)")
+
+    def _git_commit(self):
+        try:
+            return subprocess.run(
+                ['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True, cwd=settings.BASE_DIR, timeout=5
+            ).stdout.strip() or None
+        except Exception:
+            return None
@@ -0,0 +1,98 @@
+import random
+import statistics
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db.models import Q
+
+from products.consumer_matching import calculate_relevance_score, extract_product_specs, ProductSpecs
+from products.models import Product
+from products.text_index import INDEXED_SOURCES, build_text_index, tokenize
+
+
+def _percentiles(samples_ms):
+    ordered = sorted(samples_ms)
+    return {
+        'p50': statistics.median(ordered),
+        'p95': ordered[min(len(ordered) - 1, int(len(ordered) * 0.95))],
+    }
+
+
+class Command(BaseCommand):
+    help = 'Build the consumer-matching BM25 text index and time top-k scoring against the per-candidate loop'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--queries',
+            type=int,
+            default=50,
+            help='Number of sampled queries to time (default: 50)',
+        )
+        parser.add_argument(
+            '--limit',
+            type=int,
+            default=30,
+            help='Top-k candidates per query (default: 30)',
+        )
+        parser.add_argument(
+            '--seed',
+            type=int,
+            default=42,
+            help='Random seed for the query sample (default: 42)',
+        )
+
+    def handle(self, *args, **options):
+        self.stdout.write('🔤 Building product text index...')
+        started = time.monotonic()
+        index = build_text_index()
+        self.stdout.write(self.style.SUCCESS(
+            f"✅ Indexed {len(index):,} products in {time.monotonic() - started:.2f}s"
+        ))
+        if not len(index):
+            raise CommandError('Nothing to benchmark: no supplier products to index')
+
+        # Queries look like consumer searches: two or three words of a real product name
+        names = list(Product.objects.filter(source__in=INDEXED_SOURCES).values_list('name', flat=True)[:50000])
+        rng = random.Random(options['seed'])
+        queries = []
+        while len(queries) < options['queries']:
+            words = [word for word in tokenize(rng.choice(names)) if len(word) > 2]
+            if words:
+                queries.append(' '.join(rng.sample(words, min(len(words), rng.randint(2, 3)))))
+
+        limit = options['limit']
+        reference = ProductSpecs(price=20.0, length=6.0)
+
+        def loop_path(query):
+            # The old shape: fetch icontains candidates, then specs and score one product at a time
+            q = Q()
+            for word in query.split():
+                q |= Q(name__icontains=word)
+            candidates = Product.objects.filter(q).filter(source__in=INDEXED_SOURCES)[:limit]
+            return sorted(
+                (calculate_relevance_score(reference, extract_product_specs(product), 6) for product in candidates),
+                reverse=True,
+            )
+
+        def index_path(query):
+            return [
+                calculate_relevance_score(reference, index.specs_for(product_id), 6) + score
+                for product_id, score in index.search(query, limit=limit)
+            ]
+
+        self.stdout.write(f"\n⏱️ {len(queries)} queries, top {limit} (per-candidate loop vs text index, full catalog)")
+        self.stdout.write(f"{'path':<8} {'p50':>9} {'p95':>9}")
+        results = {}
+        for name, lookup in (('loop', loop_path), ('index', index_path)):
+            samples = []
+            for query in queries:
+                query_started = time.perf_counter()
+                lookup(query)
+                samples.append((time.perf_counter() - query_started) * 1000)
+            results[name] = _percentiles(samples)
+            self.stdout.write(f"{name:<8} {results[name]['p50']:>7.2f}ms {results[name]['p95']:>7.2f}ms")
+
+        if results['index']['p50']:
+            self.stdout.write(self.style.SUCCESS(
+                f"🚀 {results['loop']['p50'] / results['index']['p50']:.0f}x faster at p50"
+            ))
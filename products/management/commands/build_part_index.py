@@ -0,0 +1,111 @@
+import random
+import statistics
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from products.models import Product
+from products.part_index import PartNumberIndex, build_part_index, get_index_path, schedule_part_index_refresh
+
+
+def _percentiles(samples_ms):
+    ordered = sorted(samples_ms)
+    return {
+        'p50': statistics.median(ordered),
+        'p95': ordered[min(len(ordered) - 1, int(len(ordered) * 0.95))],
+    }
+
+
+class Command(BaseCommand):
+    help = 'Build the memory-mapped part-number index shared by web and worker processes'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--output',
+            type=str,
+            help='Index file to write (default: PART_INDEX_PATH)',
+        )
+        parser.add_argument(
+            '--bench',
+            type=int,
+            default=0,
+            metavar='N',
+            help='Afterwards, time N sampled lookups against the current database queries',
+        )
+        parser.add_argument(
+            '--schedule',
+            action='store_true',
+            help='Create the schedule that rebuilds the index when products change (every PART_INDEX_REFRESH_MINUTES)',
+        )
+        parser.add_argument(
+            '--seed',
+            type=int,
+            default=42,
+            help='Random seed for the benchmark sample (default: 42)',
+        )
+
+    def handle(self, *args, **options):
+        if options['schedule']:
+            task_id = schedule_part_index_refresh()
+            if task_id:
+                self.stdout.write(self.style.SUCCESS(f"📅 Scheduled part number index refresh: {task_id}"))
+            else:
+                self.stdout.write("📅 Part number index refresh is already scheduled")
+
+        path = options['output'] or get_index_path()
+        self.stdout.write(f'📇 Building part number index at {path}...')
+        stats = build_part_index(path)
+        self.stdout.write(self.style.SUCCESS(
+            f"✅ Indexed {stats['entries']:,} part numbers ({stats['bytes'] / 1024:.0f} KiB) in {stats['seconds']}s"
+        ))
+
+        if options['bench']:
+            self._bench(PartNumberIndex(path), options['bench'], options['seed'])
+
+    def _bench(self, index, count, seed):
+        if not index.count:
+            raise CommandError('Nothing to benchmark: the index is empty')
+
+        part_numbers = list(Product.objects.exclude(part_number='').values_list('part_number', flat=True)[:50000])
+        rng = random.Random(seed)
+        sample = [rng.choice(part_numbers) for _ in range(count)]
+        prefixes = [part_number[:max(3, len(part_number) // 2)] for part_number in sample]
+        typos = [part_number[:-1] + ('X' if part_number[-1:] != 'X' else 'Y') for part_number in sample]
+
+        cases = [
+            ('exact', sample,
+             lambda q: list(Product.objects.filter(part_number__iexact=q).values_list('id', flat=True)),
+             index.exact),
+            ('prefix', prefixes,
+             lambda q: list(Product.objects.filter(part_number__icontains=q).values_list('id', flat=True)[:50]),
+             lambda q: index.prefix(q, limit=50)),
+            ('fuzzy', typos,
+             None,
+             lambda q: index.fuzzy(q, max_distance=1)),
+        ]
+
+        self.stdout.write(f'\n⏱️ {count} lookups per case (database query path vs index)')
+        self.stdout.write(f"{'case':<8} {'db p50':>9} {'db p95':>9} {'index p50':>10} {'index p95':>10} {'speedup':>8}")
+        for name, queries, db_lookup, index_lookup in cases:
+            index_times = self._time(index_lookup, queries)
+            if db_lookup is None:
+                # The database has no equivalent; fuzzy matching falls back to name icontains today
+                self.stdout.write(
+                    f"{name:<8} {'-':>9} {'-':>9} {index_times['p50']:>8.3f}ms {index_times['p95']:>8.3f}ms {'-':>8}"
+                )
+                continue
+            db_times = self._time(db_lookup, queries)
+            speedup = db_times['p50'] / index_times['p50'] if index_times['p50'] else float('inf')
+            self.stdout.write(
+                f"{name:<8} {db_times['p50']:>7.3f}ms {db_times['p95']:>7.3f}ms "
+                f"{index_times['p50']:>8.3f}ms {index_times['p95']:>8.3f}ms {speedup:>7.0f}x"
+            )
+
+    @staticmethod
+    def _time(lookup, queries):
+        samples = []
+        for query in queries:
+            started = time.perf_counter()
+            lookup(query)
+            samples.append((time.perf_counter() - started) * 1000)
+        return _percentiles(samples)
@@ -0,0 +1,168 @@
+import multiprocessing
+import threading
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+
+from ecommerce_platform.pooled_postgresql.pool import close_pools, pool_stats
+
+LOADTEST_APPLICATION_NAME = 'ecommerce_platform:pool-loadtest'
+
+
+def _simulate_worker(pooled, threads, requests, query_ms, results):
+    """One forked 'gunicorn worker': `threads` threads each serving requests"""
+    # Pools are per pid, so the child starts with an empty pool of its own
+    settings_dict = connections['default'].settings_dict
+    settings_dict.setdefault('OPTIONS', {})['application_name'] = LOADTEST_APPLICATION_NAME
+    if not pooled:
+        settings_dict['POOL'] = None
+
+    errors = []
+
+    def serve(count):
+        for _ in range(count):
+            try:
+                with connections['default'].cursor() as cursor:
+                    cursor.execute('SELECT pg_sleep(%s)', [query_ms / 1000])
+            except Exception as e:
+                errors.append(str(e))
+            finally:
+                # End of request: Django closes (or, pooled, returns) the connection
+                connections['default'].close()
+
+    per_thread = max(1, requests // threads)
+    workers = [threading.Thread(target=serve, args=(per_thread,)) for _ in range(threads)]
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join()
+
+    # Keep the payload small so the child can exit before the parent reads it
+    results.put({'errors': errors[:10], 'error_count': len(errors), 'pool': pool_stats().get('default')})
+    close_pools()
+
+
+class Command(BaseCommand):
+    help = 'Load test the DB connection pool: server connection count as web workers and threads scale'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--processes',
+            default='1,2,4',
+            help='Comma-separated worker process counts to test (default: 1,2,4)',
+        )
+        parser.add_argument(
+            '--threads',
+            type=int,
+            default=8,
+            help='Concurrent request threads per process (default: 8)',
+        )
+        parser.add_argument(
+            '--requests',
+            type=int,
+            default=200,
+            help='Requests per process (default: 200)',
+        )
+        parser.add_argument(
+            '--query-ms',
+            type=float,
+            default=20,
+            help='Server-side time per request query (default: 20ms)',
+        )
+        parser.add_argument(
+            '--compare',
+            action='store_true',
+            help='Also run each level without the pool (a connection per request)',
+        )
+
+    def handle(self, *args, **options):
+        connection = connections['default']
+        if connection.vendor != 'postgresql':
+            raise CommandError('The pool load test needs a PostgreSQL database')
+        if not connection.settings_dict.get('POOL'):
+            raise CommandError('Connection pooling is disabled (DATABASE_POOL_ENABLED)')
+
+        try:
+            levels = [int(level) for level in options['processes'].split(',')]
+        except ValueError:
+            raise CommandError('--processes must be a comma-separated list of integers')
+
+        max_size = connection.settings_dict['POOL']['MAX_SIZE']
+        self.stdout.write(
+            f"🏋️ Pool load test: {options['threads']} threads × {options['requests']} requests per process, "
+            f"{options['query_ms']}ms queries, MAX_SIZE={max_size}"
+        )
+        self.stdout.write(
+            f"{'mode':<8} {'procs':>5} {'peak conns':>10} {'bound':>6} {'req/s':>8} "
+            f"{'wait p95':>9} {'wait max':>9} {'opened':>7} {'errors':>6}"
+        )
+
+        modes = [True, False] if options['compare'] else [True]
+        failed = False
+        for processes in levels:
+            for pooled in modes:
+                row = self._run_level(pooled, processes, options)
+                bound = processes * max_size
+                within = not pooled or row['peak'] <= bound
+                failed |= not within or row['error_count'] > 0
+
+                line = (
+                    f"{'pooled' if pooled else 'direct':<8} {processes:>5} {row['peak']:>10} "
+                    f"{bound if pooled else '-':>6} {row['throughput']:>8.0f} "
+                    f"{row['wait_p95']:>8.1f}ms {row['wait_max']:>8.1f}ms {row['opened']:>7} {row['error_count']:>6}"
+                )
+                self.stdout.write(self.style.SUCCESS(line) if within else self.style.ERROR(line))
+                for error in row['errors'][:3]:
+                    self.stdout.write(self.style.WARNING(f"   ⚠️ {error}"))
+
+        if failed:
+            raise CommandError('Pooled connection count exceeded processes × MAX_SIZE or requests failed')
+        self.stdout.write(self.style.SUCCESS('✅ Connections stayed within processes × MAX_SIZE at every level'))
+
+    def _run_level(self, pooled, processes, options):
+        context = multiprocessing.get_context('fork')
+        results = context.Queue()
+        children = [
+            context.Process(
+                target=_simulate_worker,
+                args=(pooled, options['threads'], options['requests'], options['query_ms'], results),
+            )
+            for _ in range(processes)
+        ]
+
+        peak = 0
+        started = time.monotonic()
+        for child in children:
+            child.start()
+
+        # Sample from a separate, unpooled connection so the sampler isn't counted
+        connection = connections['default']
+        sampler = connection.__class__({**connection.settings_dict, 'POOL': None}, 'default')
+        try:
+            with sampler.cursor() as cursor:
+                while any(child.is_alive() for child in children):
+                    cursor.execute(
+                        'SELECT count(*) FROM pg_stat_activity WHERE application_name = %s',
+                        [LOADTEST_APPLICATION_NAME],
+                    )
+                    peak = max(peak, cursor.fetchone()[0])
+                    time.sleep(0.02)
+        finally:
+            sampler.close()
+
+        reports = [results.get() for _ in children]
+        for child in children:
+            child.join()
+        elapsed = time.monotonic() - started
+
+        pools = [report['pool'] for report in reports if report['pool']]
+        return {
+            'peak': peak,
+            'throughput': processes * options['requests'] / elapsed if elapsed else 0,
+            'wait_p95': max((pool['wait_ms_p95'] for pool in pools), default=0.0),
+            'wait_max': max((pool['wait_ms_max'] for pool in pools), default=0.0),
+            'opened': sum(pool['opened'] for pool in pools) if pools else processes * options['requests'],
+            'errors': [error for report in reports for error in report['errors']],
+            'error_count': sum(report['error_count'] for report in reports),
+        }
@@ -0,0 +1,36 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from products.models import Product
+from products.spec_extraction import SPEC_EXTRACTOR_VERSION, backfill_specs
+
+
+class Command(BaseCommand):
+    help = 'Extract structured specs into the spec_* columns for products missing current ones'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=1000,
+            help='Products per bulk update (default: 1000)',
+        )
+        parser.add_argument(
+            '--force',
+            action='store_true',
+            help='Re-extract every product, not just those from an older extractor',
+        )
+
+    def handle(self, *args, **options):
+        pending = Product.objects.all() if options['force'] else Product.objects.filter(
+            specs_extracted_version__lt=SPEC_EXTRACTOR_VERSION
+        )
+        self.stdout.write(f'🔧 Extracting specs (extractor v{SPEC_EXTRACTOR_VERSION}) for {pending.count():,} products...')
+
+        started = time.monotonic()
+        updated = backfill_specs(batch_size=options['batch_size'], force=options['force'])
+        elapsed = time.monotonic() - started
+
+        rate = updated / elapsed if elapsed else 0
+        self.stdout.write(self.style.SUCCESS(f'✅ Updated {updated:,} products in {elapsed:.1f}s ({rate:,.0f}/s)'))
@@ -1,7 +1,6 @@
 import os
 import logging
 import zipfile
-import paramiko
 from typing import List, Dict, Generator
 from django.core.management.base import BaseCommand
 from django_q.tasks import async_task
@@ -75,7 +74,10 @@ class Command(BaseCommand):
         if not all([sftp_host, sftp_username, sftp_password]):
             self.stdout.write(self.style.WARNING("Missing SFTP credentials - skipping download"))
             return False
-            
+
+        # paramiko pulls in cryptography; only load it when actually downloading
+        import paramiko
+
         try:
             ssh = paramiko.SSHClient()
             ssh.set_missing_host_key_policy(paramiko.AutoAddPolicy())
@@ -3,6 +3,7 @@ from django.core.mail import send_mail
 from django.conf import settings
 from products.consumer_matching import dynamic_intelligence
 from products.models import Product
+from ecommerce_platform.db_routing import use_replica
 import json
 from datetime import datetime, timedelta
 
@@ -23,6 +24,11 @@ class Command(BaseCommand):
         )
 
     def handle(self, *args, **options):
+        # Analytics reads go to the replica; anything written is still read back from the primary
+        with use_replica():
+            return self._maintain(options)
+
+    def _maintain(self, options):
         self.stdout.write(self.style.SUCCESS('🔄 Weekly Intelligence Maintenance'))
         
         report = {
@@ -51,8 +57,7 @@ class Command(BaseCommand):
         
         # Update learned categories cache
         if not options['dry_run']:
-            from django.core.cache import cache
-            cache.delete('learned_categories_v1')
+            dynamic_intelligence.invalidate()
             learned = dynamic_intelligence.get_learned_categories()
             report['intelligence_updates'].append({
                 'type': 'cache_refreshed',
@@ -0,0 +1,115 @@
+import json
+
+from django.core.management.base import BaseCommand, CommandError
+
+from products.import_profile import (
+    BOOT_TARGETS, get_boot_budget_ms, heavy_modules_loaded, profile_boot
+)
+
+
+class Command(BaseCommand):
+    help = 'Report per-module import cost of a cold web or worker boot and check it against the budget'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--target',
+            choices=sorted(BOOT_TARGETS),
+            default='web',
+            help='Process type to boot (default: web)',
+        )
+        parser.add_argument(
+            '--top',
+            type=int,
+            default=25,
+            help='Number of modules and packages to list (default: 25)',
+        )
+        parser.add_argument(
+            '--runs',
+            type=int,
+            default=3,
+            help='Cold boots to profile; the fastest is reported (default: 3)',
+        )
+        parser.add_argument(
+            '--check',
+            action='store_true',
+            help='Exit non-zero if boot import time exceeds the budget or a heavy dependency is imported',
+        )
+        parser.add_argument(
+            '--budget-ms',
+            type=float,
+            help='Override the budget (default: WEB_BOOT_IMPORT_BUDGET_MS / WORKER_BOOT_IMPORT_BUDGET_MS)',
+        )
+        parser.add_argument(
+            '--json',
+            action='store_true',
+            help='Print the report as JSON',
+        )
+
+    def handle(self, *args, **options):
+        target = options['target']
+        top = options['top']
+
+        try:
+            runs = [profile_boot(target) for _ in range(max(1, options['runs']))]
+        except RuntimeError as e:
+            raise CommandError(str(e))
+
+        # The fastest run is the least disturbed by disk cache and scheduler noise
+        summary = min(runs, key=lambda run: run['total_ms'])
+        heavy = heavy_modules_loaded(summary['loaded'])
+        budget_ms = options['budget_ms'] or get_boot_budget_ms(target)
+
+        if options['json']:
+            self.stdout.write(json.dumps({
+                'target': target,
+                'total_ms': round(summary['total_ms'], 1),
+                'runs_ms': [round(run['total_ms'], 1) for run in runs],
+                'module_count': summary['module_count'],
+                'budget_ms': budget_ms,
+                'heavy_modules': heavy,
+                'modules': [
+                    {'module': m['module'], 'cumulative_ms': m['cumulative_us'] / 1000,
+                     'self_ms': m['self_us'] / 1000}
+                    for m in summary['modules'][:top]
+                ],
+                'packages': summary['packages'][:top],
+            }, indent=2))
+        else:
+            self._report(target, summary, runs, top, heavy, budget_ms)
+
+        if options['check']:
+            self._check(target, summary, heavy, budget_ms)
+
+    def _report(self, target, summary, runs, top, heavy, budget_ms):
+        self.stdout.write(self.style.SUCCESS(f"🚀 Import profile: {target} boot"))
+        run_times = ', '.join(f"{run['total_ms']:.0f}ms" for run in runs)
+        self.stdout.write(
+            f"⏱️ {summary['total_ms']:.1f}ms across {summary['module_count']} modules (runs: {run_times})"
+        )
+        if budget_ms:
+            self.stdout.write(f"🎯 Budget: {budget_ms:.0f}ms")
+
+        self.stdout.write(f"\n📦 Top {top} modules by cumulative import time:")
+        for module in summary['modules'][:top]:
+            self.stdout.write(
+                f"  {module['cumulative_us'] / 1000:>9.1f}ms  {module['self_us'] / 1000:>8.1f}ms self  "
+                f"{'  ' * module['depth']}{module['module']}"
+            )
+
+        self.stdout.write(f"\n📊 Top {top} packages by own import time:")
+        for package in summary['packages'][:top]:
+            self.stdout.write(f"  {package['self_ms']:>9.1f}ms  {package['package']}")
+
+        if heavy:
+            self.stdout.write(self.style.WARNING(f"\n⚠️ Heavy dependencies imported at boot: {', '.join(heavy)}"))
+
+    def _check(self, target, summary, heavy, budget_ms):
+        failures = []
+        if budget_ms and summary['total_ms'] > budget_ms:
+            failures.append(f"import time {summary['total_ms']:.0f}ms exceeds budget {budget_ms:.0f}ms")
+        if target == 'web' and heavy:
+            failures.append(f"heavy dependencies imported: {', '.join(heavy)}")
+
+        if failures:
+            raise CommandError(f"{target} boot budget check failed: {'; '.join(failures)}")
+        self.stdout.write(self.style.SUCCESS(f"✅ {target} boot within budget"))
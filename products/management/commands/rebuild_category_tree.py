@@ -0,0 +1,21 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from products.category_tree import CategoryTree
+from products.models import Category
+
+
+class Command(BaseCommand):
+    help = 'Rebuild category materialized paths and product counts from the parent links'
+
+    def handle(self, *args, **options):
+        self.stdout.write(self.style.SUCCESS('🌳 Rebuilding category tree'))
+
+        with transaction.atomic():
+            rebuilt = CategoryTree.rebuild()
+
+        roots = Category.objects.filter(parent__isnull=True).order_by('-subtree_product_count')[:10]
+        for root in roots:
+            self.stdout.write(f"  {root.name}: {root.subtree_product_count} products in subtree")
+
+        self.stdout.write(self.style.SUCCESS(f"✅ Rebuilt {rebuilt} categories"))
@@ -0,0 +1,60 @@
+from django.core.management.base import BaseCommand
+
+from products.search_events import buffered_events, flush_search_events, schedule_search_rollup, top_unmet_searches
+
+
+class Command(BaseCommand):
+    help = 'Show the most searched terms with no catalog match; flush or schedule the search event rollup'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--days',
+            type=int,
+            default=7,
+            help='Report window in days (default: 7)',
+        )
+        parser.add_argument(
+            '--limit',
+            type=int,
+            default=20,
+            help='Number of terms to show (default: 20)',
+        )
+        parser.add_argument(
+            '--flush',
+            action='store_true',
+            help='Roll up buffered search events first (normally scheduled every minute)',
+        )
+        parser.add_argument(
+            '--schedule',
+            action='store_true',
+            help='Create the every-minute rollup schedule if it does not exist',
+        )
+
+    def handle(self, *args, **options):
+        if options['schedule']:
+            task_id = schedule_search_rollup()
+            if task_id:
+                self.stdout.write(self.style.SUCCESS(f"📅 Scheduled search event rollup: {task_id}"))
+            else:
+                self.stdout.write("📅 Search event rollup is already scheduled")
+
+        if options['flush']:
+            counts = flush_search_events()
+            self.stdout.write(self.style.SUCCESS(
+                f"📊 Rolled up {counts['events']} search events in {counts['batches']} batches"
+            ))
+
+        self.stdout.write(f"🗃️ {buffered_events()} search events waiting for the next rollup")
+
+        unmet = top_unmet_searches(days=options['days'], limit=options['limit'])
+        if not unmet:
+            self.stdout.write(f"✅ No unmet searches in the last {options['days']} days")
+            return
+
+        self.stdout.write(f"\n🔍 Top unmet searches, last {options['days']} days")
+        self.stdout.write(f"{'term':<40} {'unmet':>7} {'searches':>9} {'avg ms':>8} {'last':>11}")
+        for row in unmet:
+            self.stdout.write(
+                f"{row['term'][:40]:<40} {row['unmatched']:>7} {row['searches']:>9} "
+                f"{row['avg_latency_ms']:>8.0f} {row['last_searched'].isoformat():>11}"
+            )
@@ -0,0 +1,48 @@
+# Generated by Django 4.2.7 on 2026-10-18 21:29
+
+from django.db import migrations, models
+
+
+def build_category_paths(apps, schema_editor):
+    """Backfill materialized paths and product counts for existing categories"""
+    from products.category_tree import CategoryTree
+
+    CategoryTree.rebuild(
+        apps.get_model('products', 'Category'),
+        apps.get_model('products', 'ProductCategory'),
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('products', '0005_product_is_placeholder'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='category',
+            name='depth',
+            field=models.PositiveSmallIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='category',
+            name='path',
+            field=models.CharField(blank=True, editable=False, help_text="Ancestor ids from the root, e.g. '3/17/42/'", max_length=255),
+        ),
+        migrations.AddField(
+            model_name='category',
+            name='product_count',
+            field=models.PositiveIntegerField(default=0, editable=False, help_text='Products linked directly to this category'),
+        ),
+        migrations.AddField(
+            model_name='category',
+            name='subtree_product_count',
+            field=models.PositiveIntegerField(default=0, editable=False, help_text='Products linked to this category or any descendant'),
+        ),
+        migrations.AddIndex(
+            model_name='category',
+            index=models.Index(fields=['path'], name='category_path_idx', opclasses=['varchar_pattern_ops']),
+        ),
+        migrations.RunPython(build_category_paths, migrations.RunPython.noop),
+    ]
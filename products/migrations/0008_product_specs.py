@@ -0,0 +1,52 @@
+# Generated by Django 4.2.7 on 2026-10-18 21:49
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('products', '0007_product_products_pr_created_3be21c_idx'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='product',
+            name='spec_category',
+            field=models.CharField(blank=True, max_length=30),
+        ),
+        migrations.AddField(
+            model_name='product',
+            name='spec_features',
+            field=models.CharField(blank=True, max_length=100),
+        ),
+        migrations.AddField(
+            model_name='product',
+            name='spec_length_ft',
+            field=models.FloatField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='product',
+            name='spec_resolution',
+            field=models.CharField(blank=True, db_index=True, max_length=10),
+        ),
+        migrations.AddField(
+            model_name='product',
+            name='spec_speed_gbps',
+            field=models.PositiveIntegerField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='product',
+            name='spec_version',
+            field=models.CharField(blank=True, max_length=10),
+        ),
+        migrations.AddField(
+            model_name='product',
+            name='specs_extracted_version',
+            field=models.PositiveSmallIntegerField(db_index=True, default=0),
+        ),
+        migrations.AddIndex(
+            model_name='product',
+            index=models.Index(fields=['spec_category', 'spec_length_ft'], name='products_pr_spec_ca_189f2c_idx'),
+        ),
+    ]
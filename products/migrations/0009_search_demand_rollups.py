@@ -0,0 +1,73 @@
+# Generated by Django 4.2.7 on 2026-10-18 22:14
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('products', '0008_product_specs'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='UserSearchDaily',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('bucket', models.DateField()),
+                ('searches', models.PositiveIntegerField(default=0)),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='search_days', to=settings.AUTH_USER_MODEL)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='SearchDemandHourly',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('term', models.CharField(max_length=255)),
+                ('searches', models.PositiveIntegerField(default=0)),
+                ('matched', models.PositiveIntegerField(default=0)),
+                ('unmatched', models.PositiveIntegerField(default=0)),
+                ('total_latency_ms', models.BigIntegerField(default=0)),
+                ('max_latency_ms', models.PositiveIntegerField(default=0)),
+                ('bucket', models.DateTimeField()),
+                ('last_product', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='products.product')),
+            ],
+        ),
+        migrations.CreateModel(
+            name='SearchDemandDaily',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('term', models.CharField(max_length=255)),
+                ('searches', models.PositiveIntegerField(default=0)),
+                ('matched', models.PositiveIntegerField(default=0)),
+                ('unmatched', models.PositiveIntegerField(default=0)),
+                ('total_latency_ms', models.BigIntegerField(default=0)),
+                ('max_latency_ms', models.PositiveIntegerField(default=0)),
+                ('bucket', models.DateField()),
+                ('last_product', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='products.product')),
+            ],
+        ),
+        migrations.AddConstraint(
+            model_name='usersearchdaily',
+            constraint=models.UniqueConstraint(fields=('user', 'bucket'), name='unique_user_search_day'),
+        ),
+        migrations.AddIndex(
+            model_name='searchdemandhourly',
+            index=models.Index(fields=['bucket'], name='products_se_bucket_634cc8_idx'),
+        ),
+        migrations.AddConstraint(
+            model_name='searchdemandhourly',
+            constraint=models.UniqueConstraint(fields=('term', 'bucket'), name='unique_search_demand_hour'),
+        ),
+        migrations.AddIndex(
+            model_name='searchdemanddaily',
+            index=models.Index(fields=['bucket', 'unmatched'], name='products_se_bucket_17fc59_idx'),
+        ),
+        migrations.AddConstraint(
+            model_name='searchdemanddaily',
+            constraint=models.UniqueConstraint(fields=('term', 'bucket'), name='unique_search_demand_day'),
+        ),
+    ]
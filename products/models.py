@@ -1,6 +1,8 @@
 from django.db import models
 from django.contrib.postgres.search import SearchVectorField
 from django.contrib.postgres.indexes import GinIndex
+
+from .category_tree import CategoryTree, path_ids
 # Create your models here.
 PRODUCT_STATUS_CHOICES = [
     ('active', 'Active'),
@@ -34,6 +36,22 @@ class Manufacturer(models.Model):
     
 
 
+class CategoryQuerySet(models.QuerySet):
+    def subtree(self, category, include_self=True):
+        """The category and all of its descendants (one indexed prefix match)"""
+        queryset = self.filter(path__startswith=category.path)
+        if not include_self:
+            queryset = queryset.exclude(pk=category.pk)
+        return queryset
+
+    def ancestors(self, category, include_self=False):
+        """Ancestors of a category, root first (breadcrumb order)"""
+        ids = path_ids(category.path)
+        if not include_self:
+            ids = ids[:-1]
+        return self.filter(pk__in=ids).order_by('depth')
+
+
 class Category(models.Model):
     """Product Categorization Heirarchy"""
     name = models.CharField(max_length=255)
@@ -45,14 +63,40 @@ class Category(models.Model):
     display_order = models.IntegerField(default=0)
     is_visible = models.BooleanField(default=True)
 
+    # Materialized path maintained by products.category_tree.CategoryTree
+    path = models.CharField(max_length=255, blank=True, editable=False, help_text="Ancestor ids from the root, e.g. '3/17/42/'")
+    depth = models.PositiveSmallIntegerField(default=0, editable=False)
+    product_count = models.PositiveIntegerField(default=0, editable=False, help_text="Products linked directly to this category")
+    subtree_product_count = models.PositiveIntegerField(default=0, editable=False, help_text="Products linked to this category or any descendant")
+
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
+    objects = CategoryQuerySet.as_manager()
+
     class Meta:
         verbose_name_plural = 'categories'
+        indexes = [
+            # varchar_pattern_ops lets Postgres use the index for LIKE 'prefix%'
+            models.Index(fields=['path'], name='category_path_idx', opclasses=['varchar_pattern_ops']),
+        ]
 
     def __str__(self):
         return self.name
+
+    def save(self, *args, **kwargs):
+        super().save(*args, **kwargs)
+        CategoryTree.sync_path(self)
+
+    def get_ancestors(self, include_self=False):
+        return Category.objects.ancestors(self, include_self=include_self)
+
+    def get_descendants(self, include_self=False):
+        return Category.objects.subtree(self, include_self=include_self)
+
+    def get_subtree_products(self):
+        """Distinct products linked to this category or any descendant"""
+        return Product.objects.filter(categories__path__startswith=self.path).distinct()
     
 class Product(models.Model):
     """ Universla product information seperate from vendor"""
@@ -93,11 +137,28 @@ class Product(models.Model):
     # Indicates a minimal placeholder created before full product data is scraped
     is_placeholder = models.BooleanField(default=False, db_index=True)
 
+    # Specs extracted from name/description on save (products/spec_extraction.py)
+    spec_length_ft = models.FloatField(null=True, blank=True)
+    spec_resolution = models.CharField(max_length=10, blank=True, db_index=True)
+    spec_speed_gbps = models.PositiveIntegerField(null=True, blank=True)
+    spec_version = models.CharField(max_length=10, blank=True)
+    spec_features = models.CharField(max_length=100, blank=True)  # ',hdr,braided,'
+    spec_category = models.CharField(max_length=30, blank=True)
+    specs_extracted_version = models.PositiveSmallIntegerField(default=0, db_index=True)
+
     class Meta:
         # Comment out the indexes temporarily
         # indexes = [
         #     GinIndex(fields=['search_vector'], name='product_search_index')
         # ]
+        indexes = [
+            # Keyset pagination of the products query (created_at DESC, id DESC)
+            models.Index(fields=['created_at', 'id']),
+            # Spec search: category first, then a length range
+            models.Index(fields=['spec_category', 'spec_length_ft']),
+            # Products edited since the part-number index snapshot (part_index.py)
+            models.Index(fields=['updated_at']),
+        ]
         constraints = [
             models.UniqueConstraint(
                 fields=['manufacturer', 'part_number'],
@@ -121,4 +182,55 @@ class ProductCategory(models.Model):
                 fields=['product', 'category'],
                 name='unique_product_category'
             )
-        ]
\ No newline at end of file
+        ]
+
+class SearchDemandRollup(models.Model):
+    """Search events for one normalized term in one period (products/search_events.py)"""
+    term = models.CharField(max_length=255)
+    searches = models.PositiveIntegerField(default=0)
+    matched = models.PositiveIntegerField(default=0)  # Searches that found a catalog product
+    unmatched = models.PositiveIntegerField(default=0)
+    total_latency_ms = models.BigIntegerField(default=0)
+    max_latency_ms = models.PositiveIntegerField(default=0)
+    last_product = models.ForeignKey(Product, on_delete=models.SET_NULL, null=True, blank=True, related_name='+')
+
+    class Meta:
+        abstract = True
+
+    @property
+    def avg_latency_ms(self):
+        return self.total_latency_ms / self.searches if self.searches else 0
+
+class SearchDemandHourly(SearchDemandRollup):
+    bucket = models.DateTimeField()  # Start of the hour
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['term', 'bucket'], name='unique_search_demand_hour')
+        ]
+        indexes = [
+            models.Index(fields=['bucket']),
+        ]
+
+class SearchDemandDaily(SearchDemandRollup):
+    bucket = models.DateField()
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['term', 'bucket'], name='unique_search_demand_day')
+        ]
+        indexes = [
+            # Top unmet searches over a date range
+            models.Index(fields=['bucket', 'unmatched']),
+        ]
+
+class UserSearchDaily(models.Model):
+    """Searches per user per day, for the activity score"""
+    user = models.ForeignKey('users.User', on_delete=models.CASCADE, related_name='search_days')
+    bucket = models.DateField()
+    searches = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['user', 'bucket'], name='unique_user_search_day')
+        ]
@@ -0,0 +1,427 @@
+"""
+Memory-mapped part-number index shared by every worker process.
+
+``manage.py build_part_index`` writes a snapshot of all normalized part
+numbers, sorted, with their product ids. Workers ``mmap`` the file read-only,
+so the OS page cache holds one copy for every gunicorn and django-q process
+on the machine and no lookup allocates more than the key it compares.
+
+File layout (little-endian, sections 8-byte aligned)::
+
+    header   magic b'PNIX', version, count, max_product_id, built_at
+    offsets  (count + 1) x u32   start of each key in the key blob
+    ids      count x u64         product id of each key
+    keys     ASCII blob          normalized part numbers, sorted
+
+Keys are normalized with normalize_part_number(): upper case, letters and
+digits only, so ``hp-123 4`` and ``HP1234`` are the same key. Exact and
+prefix lookups are binary searches; fuzzy lookup scans the keys sharing the
+query's first characters with an early-exit edit distance.
+
+The build writes a temp file and renames it over the old one. Readers check
+the file's identity every PART_INDEX_RELOAD_SECONDS and remap when a new
+snapshot appears. Lookups correct the snapshot with two small queries:
+products created (``pk > max_product_id``) or edited (``updated_at`` after the
+build started) since the snapshot are matched on their current part number,
+and snapshot hits whose part number changed since are dropped.
+
+refresh_part_index() rebuilds the snapshot when products changed since it
+was built. It runs every PART_INDEX_REFRESH_MINUTES once scheduled
+(``manage.py build_part_index --schedule``) and after each Synnex import.
+The refresh writes the file on the worker that runs it, so PART_INDEX_PATH
+should be on storage the web processes share.
+"""
+
+import bisect
+import logging
+import mmap
+import os
+import re
+import struct
+import tempfile
+import threading
+import time
+from datetime import datetime, timezone as dt_timezone
+
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+MAGIC = b'PNIX'
+VERSION = 1
+HEADER = struct.Struct('<4sIQQd')
+ALIGNMENT = 8
+
+_NON_ALNUM = re.compile(r'[^0-9A-Z]')
+
+
+def normalize_part_number(part_number):
+    """Upper-case letters and digits only; '' for values with neither"""
+    return _NON_ALNUM.sub('', (part_number or '').upper())
+
+
+def get_index_path():
+    return getattr(settings, 'PART_INDEX_PATH', os.path.join(settings.BASE_DIR, 'var', 'part_index.bin'))
+
+
+def _aligned(offset):
+    return (offset + ALIGNMENT - 1) // ALIGNMENT * ALIGNMENT
+
+
+def build_part_index(path=None, queryset=None, batch_size=10000):
+    """
+    Write a new index snapshot and atomically replace the current one.
+
+    Args:
+        path: Output file (default: PART_INDEX_PATH)
+        queryset: Products to index (default: all products)
+
+    Returns:
+        dict with path, entries, bytes and seconds
+    """
+    from .models import Product
+
+    started = time.monotonic()
+    # Edits from here on may be missing from the snapshot; lookups re-check them
+    snapshot_at = time.time()
+    path = path or get_index_path()
+    queryset = Product.objects.all() if queryset is None else queryset
+
+    entries = []
+    max_product_id = 0
+    for product_id, part_number in queryset.values_list('id', 'part_number').iterator(chunk_size=batch_size):
+        max_product_id = max(max_product_id, product_id)
+        key = normalize_part_number(part_number)
+        if key:
+            entries.append((key.encode('ascii'), product_id))
+    entries.sort()
+
+    keys = b''.join(key for key, _ in entries)
+    if len(keys) > 0xFFFFFFFF:
+        raise ValueError('Part number index exceeds 4 GiB of keys')
+
+    offsets = [0]
+    for key, _ in entries:
+        offsets.append(offsets[-1] + len(key))
+
+    count = len(entries)
+    offsets_start = _aligned(HEADER.size)
+    ids_start = _aligned(offsets_start + 4 * (count + 1))
+    keys_start = ids_start + 8 * count
+
+    directory = os.path.dirname(os.path.abspath(path))
+    os.makedirs(directory, exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=directory, prefix='.part_index-')
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            f.write(HEADER.pack(MAGIC, VERSION, count, max_product_id, snapshot_at))
+            f.write(b'\0' * (offsets_start - HEADER.size))
+            f.write(struct.pack(f'<{count + 1}I', *offsets))
+            f.write(b'\0' * (ids_start - offsets_start - 4 * (count + 1)))
+            f.write(struct.pack(f'<{count}Q', *(product_id for _, product_id in entries)))
+            f.write(keys)
+        os.replace(tmp_path, path)
+    except BaseException:
+        os.unlink(tmp_path)
+        raise
+
+    return {
+        'path': path,
+        'entries': count,
+        'bytes': keys_start + len(keys),
+        'seconds': round(time.monotonic() - started, 3),
+    }
+
+
+class _Keys:
+    """Sequence view of the sorted keys for bisect"""
+
+    def __init__(self, index):
+        self._index = index
+
+    def __len__(self):
+        return self._index.count
+
+    def __getitem__(self, i):
+        return self._index.key(i)
+
+
+def _one_edit_distance(a, b):
+    """0 or 1 if a and b are at most one edit apart, else None (linear time)"""
+    if a == b:
+        return 0
+    if len(a) > len(b):
+        a, b = b, a
+    if len(b) - len(a) > 1:
+        return None
+    for i, (char_a, char_b) in enumerate(zip(a, b)):
+        if char_a != char_b:
+            rest = a[i + 1:] if len(a) == len(b) else a[i:]
+            return 1 if rest == b[i + 1:] else None
+    return 1
+
+
+def _within_distance(a, b, max_distance):
+    """Levenshtein distance of a and b if <= max_distance, else None"""
+    if abs(len(a) - len(b)) > max_distance:
+        return None
+    if max_distance == 1:
+        return _one_edit_distance(a, b)
+    previous = list(range(len(b) + 1))
+    for i, char_a in enumerate(a, 1):
+        current = [i]
+        for j, char_b in enumerate(b, 1):
+            current.append(min(previous[j] + 1, current[j - 1] + 1, previous[j - 1] + (char_a != char_b)))
+        # Every later row is at least this row's minimum
+        if min(current) > max_distance:
+            return None
+        previous = current
+    return previous[-1] if previous[-1] <= max_distance else None
+
+
+class PartNumberIndex:
+    """Read-only view of one index snapshot"""
+
+    def __init__(self, path):
+        with open(path, 'rb') as f:
+            self._mmap = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, version, count, max_product_id, built_at = HEADER.unpack_from(self._mmap, 0)
+        if magic != MAGIC or version != VERSION:
+            raise ValueError(f'{path} is not a version {VERSION} part number index')
+
+        self.path = path
+        self.count = count
+        self.max_product_id = max_product_id
+        self.built_at = built_at
+
+        offsets_start = _aligned(HEADER.size)
+        ids_start = _aligned(offsets_start + 4 * (count + 1))
+        self._keys_start = ids_start + 8 * count
+        view = memoryview(self._mmap)
+        self._offsets = view[offsets_start:offsets_start + 4 * (count + 1)].cast('I')
+        self._ids = view[ids_start:self._keys_start].cast('Q')
+        self._sequence = _Keys(self)
+
+    def __len__(self):
+        return self.count
+
+    def key(self, i):
+        start = self._keys_start + self._offsets[i]
+        return self._mmap[start:self._keys_start + self._offsets[i + 1]]
+
+    def _range(self, low_key, high_key):
+        low = bisect.bisect_left(self._sequence, low_key)
+        high = bisect.bisect_left(self._sequence, high_key, lo=low)
+        return low, high
+
+    def exact(self, part_number):
+        """Product ids whose normalized part number equals the query's"""
+        key = normalize_part_number(part_number).encode('ascii')
+        if not key:
+            return []
+        low, high = self._range(key, key + b'\0')
+        return [self._ids[i] for i in range(low, high)]
+
+    def prefix(self, part_number, limit=50):
+        """Product ids whose normalized part number starts with the query's (exact matches first)"""
+        key = normalize_part_number(part_number).encode('ascii')
+        if not key:
+            return []
+        low, high = self._range(key, key + b'\x7f')
+        return [self._ids[i] for i in range(low, min(high, low + limit))]
+
+    def fuzzy(self, part_number, max_distance=1, limit=20, anchor=2):
+        """
+        Product ids within max_distance edits of the query, closest first.
+
+        Only keys sharing the first ``anchor`` characters are scanned
+        (anchor=0 scans the whole index, which is much slower).
+        """
+        key = normalize_part_number(part_number)
+        if not key:
+            return []
+        anchored = key[:anchor].encode('ascii')
+        low, high = self._range(anchored, anchored + b'\x7f') if anchored else (0, self.count)
+
+        offsets = self._offsets
+        min_length, max_length = len(key) - max_distance, len(key) + max_distance
+        matches = []
+        for i in range(low, high):
+            length = offsets[i + 1] - offsets[i]
+            if length < min_length or length > max_length:
+                continue
+            candidate = self.key(i).decode('ascii')
+            distance = _within_distance(key, candidate, max_distance)
+            if distance is not None:
+                matches.append((distance, length, self._ids[i]))
+        matches.sort()
+        return [product_id for _, _, product_id in matches[:limit]]
+
+
+_current = None
+_current_identity = None
+_last_checked = 0.0
+_reload_lock = threading.Lock()
+
+
+def get_part_index():
+    """
+    The newest index snapshot for this process, or None if none has been built.
+
+    Rechecks the file at most every PART_INDEX_RELOAD_SECONDS.
+    """
+    global _current, _current_identity, _last_checked
+
+    interval = getattr(settings, 'PART_INDEX_RELOAD_SECONDS', 5)
+    now = time.monotonic()
+    if _current is not None and now - _last_checked < interval:
+        return _current
+
+    with _reload_lock:
+        if _current is not None and now - _last_checked < interval:
+            return _current
+        _last_checked = now
+
+        path = get_index_path()
+        try:
+            stat = os.stat(path)
+        except FileNotFoundError:
+            _current = _current_identity = None
+            return None
+
+        identity = (stat.st_ino, stat.st_mtime_ns, stat.st_size)
+        if identity != _current_identity:
+            try:
+                index = PartNumberIndex(path)
+            except (OSError, ValueError) as e:
+                logger.error(f"❌ Could not load part number index {path}: {e}")
+                return _current
+            # Readers still holding the old snapshot keep it mapped until they drop it
+            _current, _current_identity = index, identity
+            logger.info(f"📇 Loaded part number index: {index.count} entries from {path}")
+        return _current
+
+
+def reset_part_index():
+    global _current, _current_identity, _last_checked
+    with _reload_lock:
+        _current = _current_identity = None
+        _last_checked = 0.0
+
+
+def _with_changes(index, ids, lookup, part_number):
+    """Correct a snapshot's ids for products created or edited since it was built (usually a no-op)"""
+    from django.db.models import Q
+    from .models import Product
+
+    built_at = datetime.fromtimestamp(index.built_at, tz=dt_timezone.utc)
+    changed = Q(pk__gt=index.max_product_id) | Q(updated_at__gte=built_at)
+    # Drop hits whose part number was edited away from the query since the snapshot
+    key = normalize_part_number(part_number)
+    stale = {
+        pk for pk, current in Product.objects.filter(changed, pk__in=ids).values_list('pk', 'part_number')
+        if not (normalize_part_number(current) == key if lookup == 'iexact'
+                else normalize_part_number(current).startswith(key))
+    }
+    ids = [pk for pk in ids if pk not in stale]
+    newer = Product.objects.filter(changed, **{f'part_number__{lookup}': part_number})
+    return ids + [pk for pk in newer.values_list('pk', flat=True) if pk not in ids]
+
+
+def exact_product_ids(part_number):
+    """
+    Ids of products with this part number (ignoring case and punctuation).
+
+    Returns:
+        List of product ids, or None when no index is available and the
+        caller should keep using its database query
+    """
+    index = get_part_index()
+    if index is None:
+        return None
+    return _with_changes(index, index.exact(part_number), 'iexact', part_number)
+
+
+def prefix_product_ids(part_number, limit=50):
+    """Ids of products whose part number starts with the query, or None without an index"""
+    index = get_part_index()
+    if index is None:
+        return None
+    return _with_changes(index, index.prefix(part_number, limit), 'istartswith', part_number)[:limit]
+
+
+def exact_part_number_q(part_number):
+    """Filter for an exact part number: an id lookup from the index, or iexact without one"""
+    from django.db.models import Q
+
+    ids = exact_product_ids(part_number)
+    if ids is None:
+        return Q(part_number__iexact=part_number)
+    return Q(pk__in=ids)
+
+
+def prefix_part_number_q(part_number, limit=50):
+    """
+    Filter for part numbers containing the query.
+
+    With an index, part numbers that start with the query are found by id
+    and the icontains scan only runs when none do; a query that is a prefix
+    of some part numbers therefore no longer matches others that merely
+    contain it further in.
+    """
+    from django.db.models import Q
+
+    ids = prefix_product_ids(part_number, limit)
+    if not ids:
+        return Q(part_number__icontains=part_number)
+    return Q(pk__in=ids)
+
+
+def refresh_part_index():
+    """
+    Rebuild the index if products were created or edited since its snapshot.
+
+    Returns:
+        The build stats, or None when the index is current or was never built
+    """
+    from django.db.models import Q
+    from .models import Product
+
+    path = get_index_path()
+    try:
+        index = PartNumberIndex(path)
+    except FileNotFoundError:
+        return None
+    except (OSError, ValueError) as e:
+        logger.warning(f"⚠️ Rebuilding unreadable part number index {path}: {e}")
+    else:
+        built_at = datetime.fromtimestamp(index.built_at, tz=dt_timezone.utc)
+        if not Product.objects.filter(Q(pk__gt=index.max_product_id) | Q(updated_at__gte=built_at)).exists():
+            return None
+
+    stats = build_part_index(path)
+    logger.info(f"📇 Rebuilt part number index: {stats['entries']} entries in {stats['seconds']}s")
+    return stats
+
+
+def schedule_part_index_refresh():
+    """
+    Schedule refresh_part_index to run every PART_INDEX_REFRESH_MINUTES
+
+    Returns:
+        str: Scheduled task ID, or None when already scheduled
+    """
+    from django_q.tasks import schedule
+    from django_q.models import Schedule
+
+    if Schedule.objects.filter(name='refresh_part_index').exists():
+        return None
+    task_id = schedule(
+        'products.part_index.refresh_part_index',
+        schedule_type=Schedule.MINUTES,
+        minutes=getattr(settings, 'PART_INDEX_REFRESH_MINUTES', 15),
+        name='refresh_part_index',
+        repeats=-1  # Repeat indefinitely
+    )
+    logger.info(f"📅 Scheduled part number index refresh: {task_id}")
+    return task_id
@@ -0,0 +1,347 @@
+"""
+Search-demand events, buffered in Redis and rolled up in batches.
+
+Searches used to leave no trace except demand counters bumped with a
+Product.save() per search (create_future_product_record), and the activity
+score guessed searches as ``clicks * 2``. Now the search path makes one
+pipelined ``RPUSH`` per search::
+
+    search_events:buffer   JSON {term, user, product, latency_ms, at, demand}
+
+and flush_search_events(), scheduled every minute, claims the buffer in
+batches and applies them with a handful of queries per batch:
+
+- SearchDemandHourly / SearchDemandDaily: searches, matched, unmatched and
+  latency per normalized term and period (hourly rows are pruned after
+  SEARCH_ROLLUP_HOURLY_RETENTION_DAYS)
+- UserSearchDaily: searches per user per day, for the activity score
+- Product.future_demand_count / last_demand_date: one F() update per
+  product per batch
+
+Recording never raises: with Redis down the event is dropped with a
+warning, the search itself is unaffected. A batch whose database writes
+fail is pushed back onto the buffer for the next flush. The buffer is
+capped at SEARCH_EVENT_BUFFER_MAX events (oldest dropped) if flushing stops.
+"""
+
+import json
+import logging
+import time
+from collections import defaultdict
+from datetime import datetime, timedelta, timezone as dt_timezone
+
+import redis
+from django.conf import settings
+from django.db import IntegrityError, models, transaction
+from django.utils import timezone
+
+logger = logging.getLogger(__name__)
+
+BUFFER_KEY = 'search_events:buffer'
+MAX_TERM_LENGTH = 255
+
+
+def _redis():
+    from ecommerce_platform.utils import get_redis_connection
+    return redis.Redis(**get_redis_connection())
+
+
+def normalize_term(term):
+    """Lower case with single spaces, so 'USB  Hub' and 'usb hub' share a row"""
+    return ' '.join((term or '').lower().split())[:MAX_TERM_LENGTH]
+
+
+def _push(r, event):
+    pipe = r.pipeline(transaction=False)
+    pipe.rpush(BUFFER_KEY, json.dumps(event))
+    pipe.ltrim(BUFFER_KEY, -getattr(settings, 'SEARCH_EVENT_BUFFER_MAX', 100000), -1)
+    pipe.execute()
+
+
+def record_search(term, user=None, product_id=None, latency_ms=None, r=None):
+    """
+    Buffer a search event.
+
+    Args:
+        term: What was searched for
+        user: The searching user (anonymous users are not attributed)
+        product_id: The catalog product the search matched, or None for an unmet search
+        latency_ms: How long the search took
+    """
+    term = normalize_term(term)
+    if not term:
+        return
+    try:
+        _push(r or _redis(), {
+            'term': term,
+            'user': user.id if user is not None and getattr(user, 'is_authenticated', False) else None,
+            'product': product_id,
+            'latency_ms': round(latency_ms) if latency_ms is not None else None,
+            'at': time.time(),
+        })
+    except redis.RedisError as e:
+        logger.warning(f"⚠️ Search event for '{term}' dropped: {str(e)}")
+
+
+def record_demand(product_id, r=None):
+    """Buffer a demand hit for a product found outside a catalog match (e.g. a future product record)"""
+    try:
+        _push(r or _redis(), {'demand': product_id, 'at': time.time()})
+    except redis.RedisError as e:
+        logger.warning(f"⚠️ Demand event for product {product_id} dropped: {str(e)}")
+
+
+def _claim(r, batch_size):
+    """Atomically take up to batch_size events off the front of the buffer"""
+    pipe = r.pipeline(transaction=True)
+    pipe.lrange(BUFFER_KEY, 0, batch_size - 1)
+    pipe.ltrim(BUFFER_KEY, batch_size, -1)
+    raw_events, _ = pipe.execute()
+    return raw_events
+
+
+def _new_totals():
+    return {'searches': 0, 'matched': 0, 'unmatched': 0, 'total_latency_ms': 0, 'max_latency_ms': 0,
+            'last_product_id': None}
+
+
+def _aggregate(events):
+    hourly = defaultdict(_new_totals)
+    daily = defaultdict(_new_totals)
+    user_days = defaultdict(int)
+    demand = defaultdict(lambda: [0, None])  # product id -> [count, last datetime]
+
+    for event in events:
+        at = datetime.fromtimestamp(event['at'], tz=dt_timezone.utc)
+        product_id = event.get('product') or event.get('demand')
+        if product_id:
+            counts = demand[product_id]
+            counts[0] += 1
+            counts[1] = max(counts[1], at) if counts[1] else at
+        if 'term' not in event:
+            continue
+
+        hour = at.replace(minute=0, second=0, microsecond=0)
+        for totals in (hourly[(event['term'], hour)], daily[(event['term'], hour.date())]):
+            totals['searches'] += 1
+            totals['matched' if product_id else 'unmatched'] += 1
+            latency = event.get('latency_ms') or 0
+            totals['total_latency_ms'] += latency
+            totals['max_latency_ms'] = max(totals['max_latency_ms'], latency)
+            if product_id:
+                totals['last_product_id'] = product_id
+        if event.get('user'):
+            user_days[(event['user'], hour.date())] += 1
+    return hourly, daily, user_days, demand
+
+
+def _merge_rollups(model, totals_by_key):
+    """Add totals to existing (term, bucket) rows and create the missing ones"""
+    if not totals_by_key:
+        return
+    terms = {term for term, _ in totals_by_key}
+    buckets = {bucket for _, bucket in totals_by_key}
+    existing = {
+        (row.term, row.bucket): row
+        for row in model.objects.select_for_update().filter(term__in=terms, bucket__in=buckets)
+    }
+
+    updated, created = [], []
+    for (term, bucket), totals in totals_by_key.items():
+        row = existing.get((term, bucket))
+        if row is None:
+            created.append(model(term=term, bucket=bucket, **totals))
+            continue
+        for field in ('searches', 'matched', 'unmatched', 'total_latency_ms'):
+            setattr(row, field, getattr(row, field) + totals[field])
+        row.max_latency_ms = max(row.max_latency_ms, totals['max_latency_ms'])
+        row.last_product_id = totals['last_product_id'] or row.last_product_id
+        updated.append(row)
+
+    model.objects.bulk_update(updated, [
+        'searches', 'matched', 'unmatched', 'total_latency_ms', 'max_latency_ms', 'last_product',
+    ])
+    model.objects.bulk_create(created)
+
+
+def _merge_user_days(user_days):
+    from .models import UserSearchDaily
+
+    if not user_days:
+        return
+    existing = {
+        (row.user_id, row.bucket): row
+        for row in UserSearchDaily.objects.select_for_update().filter(
+            user_id__in={user_id for user_id, _ in user_days},
+            bucket__in={bucket for _, bucket in user_days},
+        )
+    }
+    updated, created = [], []
+    for (user_id, bucket), searches in user_days.items():
+        row = existing.get((user_id, bucket))
+        if row is None:
+            created.append(UserSearchDaily(user_id=user_id, bucket=bucket, searches=searches))
+        else:
+            row.searches += searches
+            updated.append(row)
+    UserSearchDaily.objects.bulk_update(updated, ['searches'])
+    UserSearchDaily.objects.bulk_create(created)
+
+
+def _apply_demand(demand):
+    from .models import Product
+
+    for product_id, (count, last_at) in demand.items():
+        # update() skips post_save: demand counters don't change the public catalog
+        Product.objects.filter(pk=product_id).update(
+            future_demand_count=models.F('future_demand_count') + count,
+            last_demand_date=models.Case(
+                models.When(last_demand_date__gte=last_at, then=models.F('last_demand_date')),
+                default=models.Value(last_at),
+            ),
+        )
+
+
+def _apply(events):
+    from django.contrib.auth import get_user_model
+    from .models import Product, SearchDemandDaily, SearchDemandHourly
+
+    hourly, daily, user_days, demand = _aggregate(events)
+
+    # Products and users deleted since the search must not break the batch
+    known_products = set(Product.objects.filter(pk__in=list(demand)).values_list('pk', flat=True))
+    demand = {product_id: counts for product_id, counts in demand.items() if product_id in known_products}
+    for totals in (*hourly.values(), *daily.values()):
+        if totals['last_product_id'] not in known_products:
+            totals['last_product_id'] = None
+    known_users = set(get_user_model().objects.filter(
+        pk__in={user_id for user_id, _ in user_days}
+    ).values_list('pk', flat=True))
+    user_days = {key: searches for key, searches in user_days.items() if key[0] in known_users}
+
+    # A concurrent flush can create the same new row first; the retry then finds it
+    for attempt in range(2):
+        try:
+            with transaction.atomic():
+                _merge_rollups(SearchDemandHourly, hourly)
+                _merge_rollups(SearchDemandDaily, daily)
+                _merge_user_days(user_days)
+                _apply_demand(demand)
+            return
+        except IntegrityError:
+            if attempt:
+                raise
+
+
+def prune_hourly_rollups(days=None):
+    """Delete hourly rows older than `days` (default SEARCH_ROLLUP_HOURLY_RETENTION_DAYS)"""
+    from .models import SearchDemandHourly
+
+    days = days or getattr(settings, 'SEARCH_ROLLUP_HOURLY_RETENTION_DAYS', 14)
+    return SearchDemandHourly.objects.filter(bucket__lt=timezone.now() - timedelta(days=days)).delete()[0]
+
+
+def flush_search_events(r=None, batch_size=5000, max_batches=20):
+    """
+    Roll buffered search events into the aggregate tables.
+
+    Returns:
+        dict: events applied and batches written
+    """
+    r = r or _redis()
+    counts = {'events': 0, 'batches': 0}
+    for _ in range(max_batches):
+        raw_events = _claim(r, batch_size)
+        if not raw_events:
+            break
+        events = []
+        for raw in raw_events:
+            try:
+                events.append(json.loads(raw))
+            except ValueError:
+                logger.warning(f"⚠️ Skipping malformed search event: {raw[:100]}")
+        try:
+            _apply(events)
+        except Exception:
+            # Keep the events for the next flush rather than losing them
+            r.lpush(BUFFER_KEY, *reversed(raw_events))
+            logger.error(f"❌ Search rollup failed, {len(raw_events)} events returned to the buffer", exc_info=True)
+            raise
+        counts['events'] += len(events)
+        counts['batches'] += 1
+
+    prune_hourly_rollups()
+    if counts['events']:
+        logger.info(f"📊 Rolled up {counts['events']} search events in {counts['batches']} batches")
+    return counts
+
+
+def buffered_events(r=None):
+    """Events waiting for the next flush"""
+    return (r or _redis()).llen(BUFFER_KEY)
+
+
+def top_unmet_searches(days=7, limit=20):
+    """
+    Terms searched most often without a catalog match.
+
+    Returns:
+        list of dicts: term, unmatched, searches, avg_latency_ms, last_searched
+    """
+    from .models import SearchDemandDaily
+
+    since = timezone.now().date() - timedelta(days=days - 1)
+    rows = (
+        SearchDemandDaily.objects.filter(bucket__gte=since)
+        .values('term')
+        .annotate(
+            unmatched_total=models.Sum('unmatched'),
+            searches_total=models.Sum('searches'),
+            latency_total=models.Sum('total_latency_ms'),
+            last_searched=models.Max('bucket'),
+        )
+        .filter(unmatched_total__gt=0)
+        .order_by('-unmatched_total', 'term')[:limit]
+    )
+    return [
+        {
+            'term': row['term'],
+            'unmatched': row['unmatched_total'],
+            'searches': row['searches_total'],
+            'avg_latency_ms': row['latency_total'] / row['searches_total'] if row['searches_total'] else 0,
+            'last_searched': row['last_searched'],
+        }
+        for row in rows
+    ]
+
+
+def user_search_count(user, since):
+    """Searches by `user` on or after the date `since`, as rolled up so far"""
+    from .models import UserSearchDaily
+
+    return UserSearchDaily.objects.filter(user=user, bucket__gte=since).aggregate(
+        total=models.Sum('searches')
+    )['total'] or 0
+
+
+def schedule_search_rollup():
+    """
+    Schedule flush_search_events to run every minute
+
+    Returns:
+        str: Scheduled task ID, or None when already scheduled
+    """
+    from django_q.tasks import schedule
+    from django_q.models import Schedule
+
+    if Schedule.objects.filter(name='flush_search_events').exists():
+        return None
+    task_id = schedule(
+        'products.search_events.flush_search_events',
+        schedule_type=Schedule.MINUTES,
+        minutes=1,
+        name='flush_search_events',
+        repeats=-1  # Repeat indefinitely
+    )
+    logger.info(f"📅 Scheduled search event rollup: {task_id}")
+    return task_id
@@ -0,0 +1,55 @@
+from django.db import transaction
+from django.db.models.signals import post_save, post_delete, pre_save
+from django.dispatch import receiver
+
+from affiliates.models import AffiliateLink
+from offers.models import Offer
+from .catalog_version import bump_catalog_version
+from .category_tree import CategoryTree
+from .models import Product, Manufacturer, Category, ProductCategory
+from .spec_extraction import SPEC_FIELDS, apply_specs
+
+
+@receiver(post_save, sender=Product)
+@receiver(post_delete, sender=Product)
+@receiver(post_save, sender=Manufacturer)
+@receiver(post_delete, sender=Manufacturer)
+@receiver(post_save, sender=Category)
+@receiver(post_delete, sender=Category)
+@receiver(post_save, sender=ProductCategory)
+@receiver(post_delete, sender=ProductCategory)
+@receiver(post_save, sender=Offer)
+@receiver(post_delete, sender=Offer)
+@receiver(post_save, sender=AffiliateLink)
+@receiver(post_delete, sender=AffiliateLink)
+def invalidate_public_catalog_cache(sender, instance, **kwargs):
+    # After commit, so a cache fill racing the transaction can't pin old data
+    transaction.on_commit(bump_catalog_version)
+
+
+@receiver(post_save, sender=ProductCategory)
+def count_category_link(sender, instance, created, **kwargs):
+    if created:
+        CategoryTree.adjust_counts(instance.category_id, 1)
+
+
+@receiver(post_delete, sender=ProductCategory)
+def uncount_category_link(sender, instance, **kwargs):
+    CategoryTree.adjust_counts(instance.category_id, -1)
+
+
+SPEC_SOURCE_FIELDS = {'name', 'description'}
+
+
+@receiver(pre_save, sender=Product)
+def extract_specs_on_save(sender, instance, update_fields=None, **kwargs):
+    if update_fields is None:
+        apply_specs(instance)
+
+
+@receiver(post_save, sender=Product)
+def extract_specs_on_partial_save(sender, instance, update_fields=None, **kwargs):
+    # save(update_fields=[...]) wouldn't write columns changed in pre_save
+    if update_fields is not None and SPEC_SOURCE_FIELDS & set(update_fields):
+        apply_specs(instance)
+        Product.objects.filter(pk=instance.pk).update(**{field: getattr(instance, field) for field in SPEC_FIELDS})
@@ -0,0 +1,205 @@
+"""
+Structured product specs, extracted once when a product is written.
+
+Matching used to run the same regex batteries over every candidate's name
+and description on every search. The extractor below runs at ingest
+instead: a pre_save signal fills the ``spec_*`` columns on Product, and
+``manage.py extract_specs`` backfills rows written by bulk_create or by an
+older extractor (SPEC_EXTRACTOR_VERSION). Searches then filter in SQL with
+spec_filter_q() and read specs off the row.
+
+Normalized values:
+    spec_length_ft    cable/cord length in feet (meters converted)
+    spec_resolution   '8k', '4k', '1440p' or '1080p'
+    spec_speed_gbps   bandwidth in Gbps
+    spec_version      HDMI/USB version ('2.1', '3.0', 'c')
+    spec_features     ',hdr,braided,' (delimited so one feature is a contains match)
+    spec_category     detect_category() of the name: 'cable', 'laptop', ...
+"""
+
+import re
+
+from django.db import transaction
+from django.db.models import Q
+
+# Bump when the patterns change so `manage.py extract_specs` re-extracts every product
+SPEC_EXTRACTOR_VERSION = 2
+
+FEET_PER_METER = 3.28084
+
+# Tokens start on a word boundary and may be followed by digits ('8k60hz', 'hdr10'),
+# not letters: '48k', 'research' and 'usb cable' carry no 8k, eARC or USB-C
+_LENGTH_FEET = re.compile(r'\b(\d+(?:\.\d+)?)\s*-?\s*(?:ft|feet|foot)\b')
+_LENGTH_METERS = re.compile(r'\b(\d+(?:\.\d+)?)\s*(?:m|meters?|metres?)\b')
+_SPEED = re.compile(r'\b(\d+)\s*gbps\b')
+_VERSIONS = [
+    re.compile(r'\bhdmi\s*(\d+\.\d+)'),
+    re.compile(r'\busb\s*(\d+\.\d+)'),
+    re.compile(r'\busb[-\s]*([c3-9])(?![a-z])'),
+]
+_RESOLUTIONS = [
+    ('8k', re.compile(r'\b8k(?![a-z])')),
+    ('4k', re.compile(r'\b4k(?![a-z])')),
+    ('1440p', re.compile(r'\b1440p(?![a-z])')),
+    ('1080p', re.compile(r'\b1080p(?![a-z])')),
+]
+FEATURES = ('hdr', 'hdr10', 'earc', 'hdcp', 'dolby', 'atmos', 'braided')
+_FEATURES = [(feature, re.compile(rf'\b{feature}(?![a-z])')) for feature in FEATURES]
+
+# Checked in order: combos before their parts, specific before generic
+CATEGORY_PATTERNS = [
+    ('keyboard_mouse_combo', ['keyboard and mouse', 'mouse and keyboard', 'keyboard + mouse', 'wireless keyboard and mouse', 'keyboard mouse combo']),
+    ('laptop', ['laptop', 'notebook', 'macbook', 'ultrabook', 'thinkpad', 'surface laptop']),
+    ('desktop', ['desktop pc', 'desktop computer', 'pc computer', 'workstation', 'all-in-one']),
+    ('monitor', ['monitor', 'display', 'screen', 'lcd', 'led', 'oled']),
+    ('gaming', ['gaming laptop', 'gaming desktop', 'gaming monitor', 'gaming pc', 'gaming chair', 'gaming headset']),
+    ('printer', ['printer', 'inkjet', 'laserjet', 'multifunction', 'mfp', 'all-in-one printer']),
+    ('keyboard', ['keyboard', 'kb']),
+    ('mouse', ['mouse', 'mice']),
+    ('tablet', ['tablet', 'ipad', 'surface pro']),
+    ('phone', ['phone', 'iphone', 'smartphone', 'android']),
+    ('headphones', ['headphones', 'earbuds', 'airpods', 'headset']),
+    ('speaker', ['speaker', 'audio', 'soundbar']),
+    ('cable', ['cable', 'cord']),
+    ('adapter', ['adapter', 'charger']),
+    ('stand', ['stand', 'mount']),
+]
+# Whole words only, so 'led' doesn't match 'cabled' nor 'kb' match 'kbps'
+_CATEGORIES = [
+    (category, re.compile(r'\b(?:' + '|'.join(re.escape(pattern) for pattern in patterns) + r')s?\b'))
+    for category, patterns in CATEGORY_PATTERNS
+]
+
+SPEC_FIELDS = (
+    'spec_length_ft', 'spec_resolution', 'spec_speed_gbps', 'spec_version',
+    'spec_features', 'spec_category', 'specs_extracted_version',
+)
+
+
+def detect_category(name):
+    """Product category from a name ('cable', 'laptop', ...), or None"""
+    name_lower = (name or '').lower()
+    for category, pattern in _CATEGORIES:
+        if pattern.search(name_lower):
+            return category
+    return None
+
+
+def extract_specs(name, description=''):
+    """
+    Normalized specs from a product's name and description.
+
+    Returns:
+        dict with length_ft, resolution, speed_gbps, version, features
+        and category (None or empty when not found)
+    """
+    text_lower = f"{name or ''} {description or ''}".lower()
+
+    length_ft = None
+    match = _LENGTH_FEET.search(text_lower)
+    if match:
+        length_ft = float(match.group(1))
+    else:
+        match = _LENGTH_METERS.search(text_lower)
+        if match:
+            length_ft = round(float(match.group(1)) * FEET_PER_METER, 1)
+
+    resolution = next((label for label, pattern in _RESOLUTIONS if pattern.search(text_lower)), None)
+
+    match = _SPEED.search(text_lower)
+    speed_gbps = int(match.group(1)) if match else None
+
+    version = None
+    for pattern in _VERSIONS:
+        match = pattern.search(text_lower)
+        if match:
+            version = match.group(1)
+            break
+
+    return {
+        'length_ft': length_ft,
+        'resolution': resolution,
+        'speed_gbps': speed_gbps,
+        'version': version,
+        'features': [feature for feature, pattern in _FEATURES if pattern.search(text_lower)],
+        'category': detect_category(name),
+    }
+
+
+def apply_specs(product):
+    """Set the product's spec columns from its name and description (does not save)"""
+    specs = extract_specs(product.name, product.description)
+    product.spec_length_ft = specs['length_ft']
+    product.spec_resolution = specs['resolution'] or ''
+    # Column is a PositiveIntegerField; '0gbps' is noise
+    product.spec_speed_gbps = specs['speed_gbps'] or None
+    product.spec_version = specs['version'] or ''
+    product.spec_features = f",{','.join(specs['features'])}," if specs['features'] else ''
+    product.spec_category = specs['category'] or ''
+    product.specs_extracted_version = SPEC_EXTRACTOR_VERSION
+    return product
+
+
+def features_of(product):
+    return [feature for feature in product.spec_features.split(',') if feature]
+
+
+def has_current_specs(product):
+    return getattr(product, 'specs_extracted_version', 0) >= SPEC_EXTRACTOR_VERSION
+
+
+def spec_filter_q(category=None, resolution=None, length_ft=None, length_tolerance_ft=3,
+                  min_speed_gbps=None, version=None, features=()):
+    """
+    Filter on extracted specs; arguments left as None are not constrained.
+
+    A length matches within length_tolerance_ft either way.
+    """
+    q = Q()
+    if category:
+        q &= Q(spec_category=category)
+    if resolution:
+        q &= Q(spec_resolution=resolution)
+    if length_ft is not None:
+        q &= Q(spec_length_ft__gte=length_ft - length_tolerance_ft, spec_length_ft__lte=length_ft + length_tolerance_ft)
+    if min_speed_gbps is not None:
+        q &= Q(spec_speed_gbps__gte=min_speed_gbps)
+    if version:
+        q &= Q(spec_version=version)
+    for feature in features:
+        q &= Q(spec_features__contains=f',{feature},')
+    return q
+
+
+def backfill_specs(queryset=None, batch_size=1000, force=False):
+    """
+    Extract specs for products that don't have current ones, in pk-ordered batches.
+
+    Returns:
+        Number of products updated
+    """
+    from .models import Product
+
+    queryset = Product.objects.all() if queryset is None else queryset
+    if not force:
+        queryset = queryset.filter(specs_extracted_version__lt=SPEC_EXTRACTOR_VERSION)
+    queryset = queryset.only('id', 'name', 'description').order_by('pk')
+
+    updated = 0
+    last_pk = 0
+    while True:
+        batch = list(queryset.filter(pk__gt=last_pk)[:batch_size])
+        if not batch:
+            return updated
+        # Most products share a handful of spec combinations: one UPDATE per
+        # distinct combination beats bulk_update's per-row CASE expressions
+        groups = {}
+        for product in batch:
+            apply_specs(product)
+            values = tuple(getattr(product, field) for field in SPEC_FIELDS)
+            groups.setdefault(values, []).append(product.pk)
+        with transaction.atomic():
+            for values, pks in groups.items():
+                Product.objects.filter(pk__in=pks).update(**dict(zip(SPEC_FIELDS, values)))
+        updated += len(batch)
+        last_pk = batch[-1].pk
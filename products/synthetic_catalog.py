@@ -0,0 +1,298 @@
+"""
+Reproducible synthetic catalogs for benchmarking.
+
+Generates manufacturers, Synnex-style products, supplier and affiliate
+offers, Amazon affiliate links, search associations and categories at
+production sizes (10k / 100k / 1M products). Every row is derived from a
+seeded ``random.Random`` so two runs with the same size and seed produce the
+same catalog. All generated rows are tagged (``bench-`` slugs, dedicated
+vendors) so they can be removed without touching real data.
+"""
+
+import logging
+import random
+import string
+import time
+from decimal import Decimal
+
+from django.db import transaction
+
+from affiliates.association_index import index_missing_association_tokens
+from affiliates.models import AffiliateLink, ProductAssociation
+from offers.models import Offer
+from vendors.models import Vendor
+from .category_tree import CategoryTree
+from .models import Category, Manufacturer, Product, ProductCategory
+from .spec_extraction import apply_specs
+
+logger = logging.getLogger(__name__)
+
+CATALOG_SIZES = {
+    '10k': 10_000,
+    '100k': 100_000,
+    '1m': 1_000_000,
+}
+
+BENCH_SLUG_PREFIX = 'bench-'
+BENCH_SUPPLIER_CODE = 'bench-synnex'
+BENCH_AFFILIATE_CODE = 'bench-amazon'
+BATCH_SIZE = 5000
+
+_UPPER = string.ascii_uppercase
+_ALNUM = string.ascii_uppercase + string.digits
+
+
+def _letters(rng, n):
+    return ''.join(rng.choice(_UPPER) for _ in range(n))
+
+
+def _digits(rng, n):
+    return ''.join(rng.choice(string.digits) for _ in range(n))
+
+
+def _alnum(rng, n):
+    return ''.join(rng.choice(_ALNUM) for _ in range(n))
+
+
+# Manufacturer part number formats as they appear in the Synnex feed
+PART_NUMBER_FORMATS = {
+    'Dell': lambda rng: f"{rng.randint(210, 599)}-{_letters(rng, 4)}",
+    'HP': lambda rng: f"{rng.randint(1, 9)}{_letters(rng, 2)}{_digits(rng, 2)}{rng.choice(['AA', 'UT', 'UA'])}#ABA",
+    'Lenovo': lambda rng: f"2{rng.randint(0, 1)}{_letters(rng, 2)}{_digits(rng, 3)}{_letters(rng, 2)}US",
+    'Cisco': lambda rng: f"C{rng.choice(['9200', '9300', '1000'])}{rng.choice(['', 'L'])}-{rng.choice([8, 24, 48])}{rng.choice(['T', 'P', 'FP'])}-{rng.choice(['4G', '4X', '2G'])}-{rng.choice(['E', 'A'])}",
+    'Logitech': lambda rng: f"{rng.choice(['910', '920', '960', '981'])}-{_digits(rng, 6)}",
+    'Samsung': lambda rng: f"LS{rng.choice([24, 27, 32, 34])}{_letters(rng, 1)}{_digits(rng, 3)}{_letters(rng, 4)}",
+    'Microsoft': lambda rng: f"{_letters(rng, 3)}-{_digits(rng, 5)}",
+    'APC': lambda rng: f"SM{rng.choice(['T', 'X', 'C'])}{rng.choice([750, 1000, 1500, 2200, 3000])}{rng.choice(['', 'C', 'RM2U', 'I'])}",
+    'Kingston': lambda rng: f"SA{rng.randint(400, 999)}S{_digits(rng, 2)}/{rng.choice(['240', '480', '960'])}G",
+    'Belkin': lambda rng: f"F{rng.randint(1, 9)}U{_digits(rng, 3)}{_alnum(rng, 3)}",
+    'Lexmark': lambda rng: f"{_digits(rng, 2)}{_letters(rng, 1)}{_digits(rng, 4)}",
+    'Western Digital': lambda rng: f"WDS{rng.choice(['100', '200', '500'])}T{_digits(rng, 1)}{_letters(rng, 1)}0{_letters(rng, 1)}",
+}
+
+# (category, product lines, spec templates, price range)
+PRODUCT_TYPES = [
+    ('Laptops', ['Latitude', 'EliteBook', 'ThinkPad', 'ProBook', 'Surface Laptop'],
+     ['Intel Core i{cpu}, {ram}GB RAM, {ssd}GB SSD, {screen}" FHD', 'AMD Ryzen {cpu}, {ram}GB RAM, {ssd}GB SSD, {screen}" display'],
+     (549, 2499)),
+    ('Monitors', ['UltraSharp', 'ProDisplay', 'ThinkVision', 'Odyssey', 'ViewFinity'],
+     ['{screen}" {res} IPS monitor, {hz}Hz, USB-C', '{screen}" curved {res} monitor, {hz}Hz'],
+     (129, 1299)),
+    ('Keyboards', ['MX Keys', 'Wireless Keyboard', 'Slim Keyboard', 'Ergo Keyboard'],
+     ['Wireless keyboard, Bluetooth, USB receiver', 'Wired USB keyboard, full size'],
+     (19, 149)),
+    ('Mice', ['MX Master', 'Wireless Mouse', 'Optical Mouse', 'Travel Mouse'],
+     ['Wireless mouse, {dpi} DPI, Bluetooth', 'USB optical mouse, {dpi} DPI'],
+     (9, 119)),
+    ('Docking Stations', ['Thunderbolt Dock', 'USB-C Dock', 'Universal Dock'],
+     ['USB-C docking station, {watts}W power delivery, dual 4K', 'Thunderbolt 4 dock, {watts}W, 2.5GbE'],
+     (99, 399)),
+    ('Storage', ['NVMe SSD', 'SATA SSD', 'Portable SSD'],
+     ['{ssd}GB solid state drive, {speed} MB/s read', '{ssd}GB 2.5" SATA SSD'],
+     (39, 499)),
+    ('Networking', ['Catalyst Switch', 'Managed Switch', 'Access Point'],
+     ['{ports}-port gigabit managed switch, PoE+', 'Wi-Fi 6 access point, {ports} streams'],
+     (149, 4999)),
+    ('Power', ['Smart-UPS', 'Back-UPS', 'Surge Protector'],
+     ['{va}VA line interactive UPS, LCD', '{va}VA tower UPS, {ports} outlets'],
+     (79, 1899)),
+    ('Cables', ['USB-C Cable', 'HDMI Cable', 'DisplayPort Cable'],
+     ['{length}ft USB-C to USB-C cable, 100W', '{length}ft HDMI 2.1 cable, 8K'],
+     (7, 49)),
+    ('Printers', ['LaserJet', 'Color Laser', 'MFP'],
+     ['Monochrome laser printer, {ppm} ppm, duplex', 'Color laser MFP, {ppm} ppm, Wi-Fi'],
+     (149, 1499)),
+]
+
+_SPEC_VALUES = {
+    'cpu': [3, 5, 7, 9], 'ram': [8, 16, 32, 64], 'ssd': [256, 512, 1000, 2000],
+    'screen': [13, 14, 15, 16, 24, 27, 32, 34], 'res': ['FHD', 'QHD', '4K UHD'], 'hz': [60, 75, 144, 165],
+    'dpi': [1000, 4000, 8000], 'watts': [65, 90, 130], 'speed': [550, 3500, 7000], 'ports': [4, 8, 24, 48],
+    'va': [750, 1000, 1500, 3000], 'length': [3, 6, 10], 'ppm': [30, 40, 55],
+}
+
+ASSOCIATION_TYPES = ['search_alternative', 'same_brand_alternative', 'cross_brand_alternative', 'compatible_accessory']
+
+
+class SyntheticCatalogGenerator:
+    """
+    Build a reproducible synthetic catalog
+
+    Args:
+        size: Number of products to generate
+        seed: Random seed; the same (size, seed) always yields the same catalog
+        affiliate_ratio: Share of products that get an Amazon affiliate link and offer
+        association_ratio: Share of products that get a search association
+    """
+
+    def __init__(self, size, seed=42, affiliate_ratio=0.25, association_ratio=0.05, batch_size=BATCH_SIZE):
+        self.size = size
+        self.seed = seed
+        self.affiliate_ratio = affiliate_ratio
+        self.association_ratio = association_ratio
+        self.batch_size = batch_size
+        self.rng = random.Random(seed)
+
+    def _spec_text(self, template):
+        return template.format(**{key: self.rng.choice(values) for key, values in _SPEC_VALUES.items()})
+
+    def _part_number(self, manufacturer_name, seen):
+        make = PART_NUMBER_FORMATS[manufacturer_name]
+        part_number = make(self.rng)
+        while part_number in seen:
+            # Formats with few free characters collide at 1M rows; extend with a revision suffix
+            part_number = f"{make(self.rng)}-{_alnum(self.rng, 2)}"
+        seen.add(part_number)
+        return part_number
+
+    def _asin(self, index):
+        return f"B0{index:08X}"[:10]
+
+    def _setup_reference_data(self):
+        manufacturers = {}
+        for name in PART_NUMBER_FORMATS:
+            manufacturers[name], _ = Manufacturer.objects.get_or_create(
+                name=name, defaults={'slug': name.lower().replace(' ', '-')}
+            )
+
+        categories = {}
+        for category_name, *_ in PRODUCT_TYPES:
+            categories[category_name], _ = Category.objects.get_or_create(
+                slug=f"{BENCH_SLUG_PREFIX}{category_name.lower().replace(' ', '-')}",
+                defaults={'name': f"Synnex-{category_name}"}
+            )
+
+        supplier, _ = Vendor.objects.get_or_create(
+            code=BENCH_SUPPLIER_CODE,
+            defaults={'name': 'Bench Synnex', 'slug': BENCH_SUPPLIER_CODE, 'vendor_type': 'supplier'}
+        )
+        affiliate, _ = Vendor.objects.get_or_create(
+            code=BENCH_AFFILIATE_CODE,
+            defaults={'name': 'Bench Amazon', 'slug': BENCH_AFFILIATE_CODE, 'vendor_type': 'affiliate'}
+        )
+        return manufacturers, categories, supplier, affiliate
+
+    def generate(self):
+        """
+        Generate the catalog in batches
+
+        Returns:
+            Dict with row counts per table and elapsed seconds
+        """
+        started = time.monotonic()
+        manufacturers, categories, supplier, affiliate = self._setup_reference_data()
+        manufacturer_names = list(PART_NUMBER_FORMATS)
+        seen_part_numbers = set()
+        counts = {'products': 0, 'offers': 0, 'affiliate_links': 0, 'associations': 0, 'product_categories': 0}
+
+        # Products of each type from the previous batch, used as association targets
+        previous_by_type = {}
+
+        for batch_start in range(0, self.size, self.batch_size):
+            batch_end = min(batch_start + self.batch_size, self.size)
+            products, product_types, prices = [], [], []
+
+            for index in range(batch_start, batch_end):
+                category_name, lines, templates, (low, high) = self.rng.choice(PRODUCT_TYPES)
+                manufacturer_name = self.rng.choice(manufacturer_names)
+                part_number = self._part_number(manufacturer_name, seen_part_numbers)
+                line = self.rng.choice(lines)
+                model = f"{self.rng.randint(3, 9)}{self.rng.randint(100, 999)}"
+                # bulk_create skips the pre_save spec extraction
+                products.append(apply_specs(Product(
+                    name=f"{manufacturer_name} {line} {model} {category_name.rstrip('s')}"[:255],
+                    slug=f"{BENCH_SLUG_PREFIX}{index}",
+                    description=self._spec_text(self.rng.choice(templates)),
+                    specifications={},
+                    manufacturer=manufacturers[manufacturer_name],
+                    part_number=part_number,
+                    status='active',
+                    source='partner_import',
+                )))
+                product_types.append(category_name)
+                prices.append(Decimal(self.rng.randint(low * 100, high * 100)) / 100)
+
+            with transaction.atomic():
+                Product.objects.bulk_create(products, batch_size=self.batch_size)
+                counts['products'] += len(products)
+
+                offers, links, associations, memberships = [], [], [], []
+                current_by_type = {}
+                for offset, (product, category_name, price) in enumerate(zip(products, product_types, prices)):
+                    index = batch_start + offset
+                    current_by_type.setdefault(category_name, []).append(product)
+                    memberships.append(ProductCategory(product=product, category=categories[category_name], is_primary=True))
+
+                    cost = (price / Decimal('1.15')).quantize(Decimal('0.01'))
+                    offers.append(Offer(
+                        product=product, vendor=supplier, offer_type='supplier',
+                        cost_price=cost, selling_price=price, msrp=(price * Decimal('1.10')).quantize(Decimal('0.01')),
+                        vendor_sku=_digits(self.rng, 7), stock_quantity=self.rng.randint(0, 500),
+                    ))
+
+                    if self.rng.random() < self.affiliate_ratio:
+                        asin = self._asin(index)
+                        amazon_price = (price * Decimal(str(self.rng.uniform(0.9, 1.2)))).quantize(Decimal('0.01'))
+                        offers.append(Offer(
+                            product=product, vendor=affiliate, offer_type='affiliate',
+                            selling_price=amazon_price, vendor_sku=asin,
+                            vendor_url=f"https://www.amazon.com/dp/{asin}", stock_quantity=1,
+                        ))
+                        links.append(AffiliateLink(
+                            product=product, platform='amazon', platform_id=asin,
+                            original_url=f"https://www.amazon.com/dp/{asin}",
+                            affiliate_url=f"https://www.amazon.com/dp/{asin}?tag=bench-20",
+                            clicks=self.rng.randint(0, 200),
+                        ))
+
+                    targets = previous_by_type.get(category_name)
+                    if targets and self.rng.random() < self.association_ratio:
+                        associations.append(ProductAssociation(
+                            source_product=product,
+                            target_product=self.rng.choice(targets),
+                            original_search_term=product.name.split(' ', 1)[1].lower(),
+                            association_type=self.rng.choice(ASSOCIATION_TYPES),
+                            confidence_score=Decimal(self.rng.randint(50, 99)) / 100,
+                            search_count=self.rng.randint(1, 50),
+                        ))
+
+                ProductCategory.objects.bulk_create(memberships, batch_size=self.batch_size)
+                Offer.objects.bulk_create(offers, batch_size=self.batch_size)
+                AffiliateLink.objects.bulk_create(links, batch_size=self.batch_size)
+                ProductAssociation.objects.bulk_create(associations, batch_size=self.batch_size, ignore_conflicts=True)
+
+            counts['product_categories'] += len(memberships)
+            counts['offers'] += len(offers)
+            counts['affiliate_links'] += len(links)
+            counts['associations'] += len(associations)
+            previous_by_type = current_by_type
+            logger.info(f"🌱 Synthetic catalog: {batch_end}/{self.size} products")
+
+        # bulk_create skips the ProductCategory signals
+        CategoryTree.recount(category.id for category in categories.values())
+        # ...and the ProductAssociation ones that tokenize search terms
+        index_missing_association_tokens()
+
+        counts['elapsed_seconds'] = round(time.monotonic() - started, 2)
+        return counts
+
+
+def bench_products():
+    """Queryset of products created by the synthetic catalog generator"""
+    return Product.objects.filter(slug__startswith=BENCH_SLUG_PREFIX, source='partner_import')
+
+
+def delete_synthetic_catalog(batch_size=BATCH_SIZE):
+    """Remove every synthetic product (offers, links and associations cascade)"""
+    deleted = 0
+    with CategoryTree.bulk_counts():
+        while True:
+            ids = list(bench_products().values_list('id', flat=True)[:batch_size])
+            if not ids:
+                break
+            Product.objects.filter(id__in=ids).delete()
+            deleted += len(ids)
+
+    Category.objects.filter(slug__startswith=BENCH_SLUG_PREFIX).delete()
+    Vendor.objects.filter(code__in=[BENCH_SUPPLIER_CODE, BENCH_AFFILIATE_CODE]).delete()
+    return deleted
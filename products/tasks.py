@@ -1,6 +1,8 @@
 from django_q.tasks import async_task, schedule
 from django_q.models import Schedule
 from products.models import Product, Manufacturer, Category, ProductCategory
+from products.category_tree import CategoryTree
+from products.search_events import record_demand
 from vendors.models import Vendor
 from offers.models import Offer
 import os
@@ -13,7 +15,15 @@ debug_logger = logging.getLogger('debug')
 def process_batch(batch_data):
     """Process a batch of product data"""
     results = {"success": 0, "errors": 0, "error_messages": []}
-    
+
+    # Category counts are recomputed once for the batch instead of per product
+    with CategoryTree.bulk_counts():
+        _process_batch_items(batch_data, results)
+
+    return f"Processed {len(batch_data)} items: {results['success']} successes, {results['errors']} errors"
+
+
+def _process_batch_items(batch_data, results):
     for item in batch_data:
         try:
             # Get or create manufacturer
@@ -122,8 +132,6 @@ def process_batch(batch_data):
             error_msg = f"Error processing {item.get('mfr_part', 'unknown')}: {str(e)}"
             results["error_messages"].append(error_msg)
             print(f"ERROR: {error_msg}")
-    
-    return f"Processed {len(batch_data)} items: {results['success']} successes, {results['errors']} errors"
 
 # Helper functions for data cleaning
 def clean_decimal(value):
@@ -173,6 +181,13 @@ def check_tasks_and_send_email(task_ids):
     
     # All tasks are finished
     success_percent = (completed_tasks / total_tasks) * 100
+
+    # New and updated part numbers go into the next index snapshot (no-op without an index)
+    from products.part_index import refresh_part_index
+    try:
+        refresh_part_index()
+    except Exception as e:
+        debug_logger.error(f"Part number index refresh after import failed: {str(e)}")
     
     # Send email notification
     subject = f"Product Import Completed - {success_percent:.1f}% Success"
@@ -228,13 +243,11 @@ def create_future_product_record(task_data):
         
         if existing_product:
             print(f"✅ Product already exists: {existing_product.name}")
-            # Update metadata to track this as a future opportunity
-            if not hasattr(existing_product, 'future_demand_count'):
-                existing_product.future_demand_count = 0
-            existing_product.future_demand_count += 1
-            existing_product.last_demand_date = timezone.now()
-            existing_product.save()
-            return f"Updated demand tracking for existing product: {existing_product.name}"
+            if existing_product.status == 'future_opportunity':
+                # Searches never match future products, so count their demand here; the
+                # rollup applies it in batches (products/search_events.py)
+                record_demand(existing_product.id)
+            return f"Recorded demand for existing product: {existing_product.name}"
         
         # Create new future product record
         try:
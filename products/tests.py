@@ -1,3 +1,932 @@
-from django.test import TestCase
+import json
+import os
+from unittest import skipUnless
 
-# Create your tests here.
+from django.test import SimpleTestCase, TestCase, override_settings
+
+from .category_tree import CategoryTree
+from .models import Category, Manufacturer, Product, ProductCategory
+from .synthetic_catalog import SyntheticCatalogGenerator, bench_products, delete_synthetic_catalog
+
+
+class TestSyntheticCatalog(TestCase):
+    def test_same_seed_generates_same_catalog(self):
+        counts = SyntheticCatalogGenerator(300, seed=7, batch_size=100).generate()
+        first = list(bench_products().order_by('slug').values_list('slug', 'part_number', 'name'))
+
+        self.assertEqual(counts['products'], 300)
+        self.assertEqual(counts['offers'], 300 + counts['affiliate_links'])
+        self.assertEqual(len({part_number for _, part_number, _ in first}), 300)
+
+        self.assertEqual(delete_synthetic_catalog(), 300)
+        SyntheticCatalogGenerator(300, seed=7, batch_size=100).generate()
+        second = list(bench_products().order_by('slug').values_list('slug', 'part_number', 'name'))
+
+        self.assertEqual(first, second)
+
+
+class TestTieredCache(TestCase):
+    def setUp(self):
+        from ecommerce_platform.cache import TieredCache
+
+        # Nothing listens on port 1, so the backend runs on its local tier only
+        self.cache = TieredCache('redis://127.0.0.1:1/0', {'KEY_PREFIX': 'test', 'OPTIONS': {'LOCAL_MAX_ENTRIES': 2}})
+
+    def test_get_or_set_computes_once(self):
+        calls = []
+
+        def compute():
+            calls.append(1)
+            return {'laptop_indicators': ['thinkpad']}
+
+        first = self.cache.get_or_set('learned', compute, 60)
+        second = self.cache.get_or_set('learned', compute, 60)
+
+        self.assertEqual(first, second)
+        self.assertEqual(len(calls), 1)
+        metrics = self.cache.metrics()
+        self.assertEqual(metrics['recomputes'], 1)
+        self.assertEqual(metrics['local_hits'], 1)
+
+    def test_local_tier_is_bounded(self):
+        for key in ('a', 'b', 'c'):
+            self.cache.set(key, key, 60)
+
+        self.assertIsNone(self.cache.get('a'))
+        self.assertEqual(self.cache.get('c'), 'c')
+
+    def test_add_only_sets_missing_keys(self):
+        self.assertTrue(self.cache.add('kick', 1, 60))
+        self.assertFalse(self.cache.add('kick', 2, 60))
+        self.assertEqual(self.cache.get('kick'), 1)
+        self.assertTrue(self.cache.add('gone', 1, 0))
+        self.assertIsNone(self.cache.get('gone'))
+
+
+class FakeCacheRedis:
+    """The string commands TieredCache uses, in memory (expiry is recorded, not enforced)"""
+
+    def __init__(self):
+        self.data = {}
+        self.expiry = {}
+
+    def get(self, key):
+        return self.data.get(key)
+
+    def set(self, key, value, ex=None, px=None, nx=False):
+        if nx and key in self.data:
+            return None
+        self.data[key] = value
+        self.expiry[key] = ex if ex is not None else (px / 1000 if px is not None else None)
+        return True
+
+    def delete(self, *keys):
+        return sum(self.data.pop(key, None) is not None for key in keys)
+
+    def eval(self, script, numkeys, *keys_and_args):
+        # Only the compare-and-delete lock release
+        key, token = keys_and_args
+        if self.data.get(key) == token:
+            return self.delete(key)
+        return 0
+
+
+class TestTieredCacheSharedTier(TestCase):
+    def setUp(self):
+        from ecommerce_platform.cache import TieredCache
+
+        self.redis = FakeCacheRedis()
+        self.caches = []
+        for _ in range(2):
+            # Two processes: separate local tiers over one Redis
+            cache = TieredCache('redis://fake', {'KEY_PREFIX': 'test', 'OPTIONS': {'LOCK_WAIT': 1}})
+            cache._client = self.redis
+            self.caches.append(cache)
+        self.cache, self.other = self.caches
+
+    def test_values_are_shared_through_redis(self):
+        self.cache.set('catalog', {'version': 3}, 60)
+
+        self.assertEqual(self.other.get('catalog'), {'version': 3})
+        self.assertEqual(self.other.metrics()['shared_hits'], 1)
+        self.assertLessEqual(self.redis.expiry['test:1:catalog'], 60)
+
+        self.other.delete('catalog')
+        self.assertNotIn('test:1:catalog', self.redis.data)
+
+    def test_add_with_zero_timeout_stores_nothing(self):
+        self.assertTrue(self.cache.add('kick', 1, 0))
+        self.assertEqual(self.redis.data, {})
+        self.assertIsNone(self.cache.get('kick'))
+
+        self.cache.set('kick', 1, 60)
+        self.assertFalse(self.other.add('kick', 2, 0))
+        self.assertEqual(self.other.get('kick'), 1)
+
+    def test_recompute_runs_under_the_lock_and_releases_it(self):
+        calls = []
+
+        value = self.cache.get_or_set('learned', lambda: calls.append(1) or 'fresh', 60)
+
+        self.assertEqual((value, calls), ('fresh', [1]))
+        self.assertNotIn('test:1:learned:lock', self.redis.data)
+        self.assertEqual(self.other.get_or_set('learned', lambda: calls.append(1) or 'again', 60), 'fresh')
+        self.assertEqual(calls, [1])
+
+    def test_waiters_use_the_lock_holders_value(self):
+        from unittest import mock
+
+        # Another process holds the recompute lock and writes the value while we wait
+        self.redis.set('test:1:learned:lock', 'other-process', nx=True)
+
+        def other_process_finishes(delay):
+            self.other.set('learned', 'computed elsewhere', 60)
+
+        with mock.patch('ecommerce_platform.cache.time.sleep', side_effect=other_process_finishes):
+            value = self.cache.get_or_set('learned', lambda: self.fail('recomputed despite the lock'), 60)
+
+        self.assertEqual(value, 'computed elsewhere')
+        self.assertEqual(self.cache.metrics()['coalesced_waits'], 1)
+
+    def test_waiters_compute_locally_after_lock_wait(self):
+        from unittest import mock
+
+        self.redis.set('test:1:learned:lock', 'stuck-process', nx=True)
+        clock = iter(range(0, 100))
+
+        with mock.patch('ecommerce_platform.cache.time.sleep'), \
+                mock.patch('ecommerce_platform.cache.time.monotonic', side_effect=lambda: next(clock)):
+            value = self.cache.get_or_set('learned', lambda: 'local', 60)
+
+        self.assertEqual(value, 'local')
+        self.assertEqual(self.cache.metrics()['lock_timeouts'], 1)
+        # The stuck holder's lock is not ours to release
+        self.assertEqual(self.redis.data['test:1:learned:lock'], 'stuck-process')
+
+
+class TestBootImports(SimpleTestCase):
+    def test_parse_importtime_tracks_depth(self):
+        from .import_profile import parse_importtime, summarize_imports
+
+        output = (
+            "import time: self [us] | cumulative | imported package\n"
+            "import time:       100 |        100 |   encodings.utf_8\n"
+            "import time:        50 |        400 | encodings\n"
+        )
+        entries = parse_importtime(output)
+
+        self.assertEqual([(e['module'], e['depth']) for e in entries], [('encodings.utf_8', 1), ('encodings', 0)])
+        self.assertEqual(summarize_imports(entries)['total_ms'], 0.4)
+
+    # Spawns a cold Python boot: set RUN_BOOT_PROFILE_TESTS=true, or run `manage.py profile_imports --check`
+    @skipUnless(os.environ.get('RUN_BOOT_PROFILE_TESTS', 'False').lower() == 'true', 'cold-boot subprocess test')
+    def test_web_boot_skips_heavy_dependencies(self):
+        from .import_profile import heavy_modules_loaded, profile_boot
+
+        self.assertEqual(heavy_modules_loaded(profile_boot('web')['loaded']), [])
+
+
+@override_settings(GRAPHQL_PERSISTED_QUERIES_ALLOW_REGISTRATION=True)
+class TestPersistedQueries(TestCase):
+    QUERY = '{ manufacturers { id name } }'
+
+    def setUp(self):
+        from ecommerce_platform.graphql.documents import document_cache
+
+        self.document_cache = document_cache
+        self.document_cache.clear()
+        Manufacturer.objects.create(name='Dell', slug='dell')
+
+    def _post(self, body):
+        return self.client.post('/graphql/', data=json.dumps(body), content_type='application/json')
+
+    def test_hash_is_registered_then_served_without_query_text(self):
+        from ecommerce_platform.graphql.documents import query_hash
+
+        extensions = {'persistedQuery': {'version': 1, 'sha256Hash': query_hash(self.QUERY)}}
+
+        missing = self._post({'extensions': extensions}).json()
+        self.assertEqual(missing['errors'][0]['message'], 'PersistedQueryNotFound')
+
+        registered = self._post({'query': self.QUERY, 'extensions': extensions}).json()
+        self.assertEqual(registered['data']['manufacturers'][0]['name'], 'Dell')
+
+        served = self._post({'extensions': extensions}).json()
+        self.assertEqual(served, registered)
+        # Parsed once, when registration validated it
+        self.assertEqual(self.document_cache.stats()['misses'], 1)
+
+    def test_registration_is_off_by_default(self):
+        from ecommerce_platform.graphql.documents import query_hash
+
+        extensions = {'persistedQuery': {'version': 1, 'sha256Hash': query_hash(self.QUERY)}}
+        with self.settings(GRAPHQL_PERSISTED_QUERIES_ALLOW_REGISTRATION=False):
+            response = self._post({'query': self.QUERY, 'extensions': extensions}).json()
+
+        self.assertEqual(response['errors'][0]['extensions']['code'], 'PERSISTED_QUERY_NOT_SUPPORTED')
+
+    def test_only_valid_documents_are_stored_with_a_timeout(self):
+        from unittest import mock
+        from ecommerce_platform.graphql.documents import query_hash
+
+        invalid = '{ manufacturers { notAField } }'
+        with mock.patch('ecommerce_platform.graphql.documents.cache') as shared_cache, \
+                self.settings(GRAPHQL_PERSISTED_QUERY_TIMEOUT=600):
+            for query in (invalid, self.QUERY):
+                extensions = {'persistedQuery': {'version': 1, 'sha256Hash': query_hash(query)}}
+                self._post({'query': query, 'extensions': extensions})
+
+        shared_cache.set.assert_called_once_with(
+            f'graphql:pq:{query_hash(self.QUERY)}', self.QUERY, timeout=600
+        )
+
+    def test_mismatched_hash_is_rejected(self):
+        extensions = {'persistedQuery': {'version': 1, 'sha256Hash': '0' * 64}}
+
+        response = self._post({'query': self.QUERY, 'extensions': extensions}).json()
+
+        self.assertEqual(response['errors'][0]['extensions']['code'], 'PERSISTED_QUERY_HASH_MISMATCH')
+
+    def test_invalid_documents_are_cached_with_their_errors(self):
+        for _ in range(2):
+            response = self._post({'query': '{ manufacturers { notAField } }'}).json()
+            self.assertIn('notAField', response['errors'][0]['message'])
+
+        self.assertEqual(self.document_cache.stats(), {'entries': 1, 'max_entries': 500, 'hits': 1, 'misses': 1})
+
+
+class TestQueryCost(TestCase):
+    def _post(self, query):
+        return self.client.post('/graphql/', data=json.dumps({'query': query}), content_type='application/json').json()
+
+    def test_nested_lists_multiply_and_are_rejected(self):
+        response = self._post(
+            '{ products { items { offers { product { offers { product { offers { product { offers { id } } } } } } } } } }'
+        )
+
+        error = response['errors'][0]
+        self.assertEqual(error['extensions']['code'], 'QUERY_TOO_COMPLEX')
+        self.assertGreater(error['extensions']['cost'], 10000)
+        self.assertIsNone(response.get('data'))
+
+    def test_limit_argument_bounds_the_cost(self):
+        from graphql import get_operation_ast, parse
+
+        from ecommerce_platform.graphql.cost import QueryCostAnalyzer
+        from ecommerce_platform.schema import schema
+
+        query = 'query($n: Int = 5) { featuredProducts(limit: $n) { id offers { id } } }'
+        document = parse(query)
+        operation = get_operation_ast(document)
+
+        # featuredProducts: n * (1 + offers, a relation list: 5 * 1)
+        self.assertEqual(QueryCostAnalyzer(schema.graphql_schema, document).analyze(operation), (30, 3))
+        self.assertEqual(
+            QueryCostAnalyzer(schema.graphql_schema, document, {'n': 2}).analyze(operation)[0], 12
+        )
+
+    def test_documented_client_queries_fit_the_default_budget(self):
+        import re
+        from django.conf import settings
+        from graphql import GraphQLError, parse, validate
+        from graphql.language import OperationDefinitionNode
+
+        from ecommerce_platform.graphql.cost import check_query_cost
+        from ecommerce_platform.schema import schema
+
+        checked = set()
+        for doc in ('QUOTE_ANALYSIS_CORRECTED_QUERY.md', 'QUOTE_ANALYSIS_FRONTEND_SPEC.md', 'API_DOCUMENTATION.md'):
+            with open(os.path.join(settings.BASE_DIR, doc)) as f:
+                blocks = re.findall(r'```graphql\n(.*?)```', f.read(), re.S)
+            for block in blocks:
+                try:
+                    document = parse(block)
+                except GraphQLError:
+                    continue  # response samples and fragments of queries
+                if validate(schema.graphql_schema, document):
+                    continue  # examples that drifted from the schema can't run anyway
+                for operation in document.definitions:
+                    if isinstance(operation, OperationDefinitionNode) and operation.name:
+                        with self.subTest(doc=doc, operation=operation.name.value):
+                            check_query_cost(schema.graphql_schema, document, operation)
+                        checked.add(operation.name.value)
+
+        self.assertLessEqual(
+            {'QuoteAnalysis', 'MyQuotes', 'UnifiedSearch', 'ConsumerSearch', 'FeaturedProducts'}, checked
+        )
+
+    def test_depth_limit(self):
+        with self.settings(GRAPHQL_MAX_QUERY_DEPTH=2):
+            response = self._post('{ featuredProducts(limit: 1) { manufacturer { name } } }')
+
+        self.assertEqual(response['errors'][0]['extensions']['code'], 'QUERY_TOO_DEEP')
+
+
+class TestPublicQueryHttpCache(TestCase):
+    QUERY = '{ manufacturers { name } }'
+
+    def setUp(self):
+        from django.core.cache import cache
+
+        cache.clear()
+        Manufacturer.objects.create(name='Dell', slug='dell')
+
+    def test_etag_304_and_invalidation_on_catalog_write(self):
+        first = self.client.get('/graphql/', {'query': self.QUERY}, HTTP_ACCEPT='application/json')
+        etag = first['ETag']
+        self.assertEqual(first.status_code, 200)
+        self.assertIn('public', first['Cache-Control'])
+
+        with self.assertNumQueries(0):
+            cached = self.client.get('/graphql/', {'query': self.QUERY}, HTTP_ACCEPT='application/json')
+            not_modified = self.client.get(
+                '/graphql/', {'query': self.QUERY}, HTTP_ACCEPT='application/json', HTTP_IF_NONE_MATCH=etag
+            )
+        self.assertEqual(cached.content, first.content)
+        self.assertEqual(not_modified.status_code, 304)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            Manufacturer.objects.create(name='HP', slug='hp')
+
+        fresh = self.client.get(
+            '/graphql/', {'query': self.QUERY}, HTTP_ACCEPT='application/json', HTTP_IF_NONE_MATCH=etag
+        )
+        self.assertEqual(fresh.status_code, 200)
+        self.assertNotEqual(fresh['ETag'], etag)
+        self.assertEqual([m['name'] for m in fresh.json()['data']['manufacturers']], ['Dell', 'HP'])
+
+    def test_authenticated_and_non_allowlisted_queries_are_not_cached(self):
+        authed = self.client.get(
+            '/graphql/', {'query': self.QUERY}, HTTP_ACCEPT='application/json', HTTP_AUTHORIZATION='JWT x'
+        )
+        other = self.client.get('/graphql/', {'query': '{ users { id } }'}, HTTP_ACCEPT='application/json')
+
+        self.assertNotIn('ETag', authed)
+        self.assertNotIn('ETag', other)
+
+
+class TestCategoryTree(TestCase):
+    def setUp(self):
+        manufacturer = Manufacturer.objects.create(name='Dell', slug='dell')
+        self.products = [
+            Product.objects.create(name=f'P{i}', slug=f'p{i}', manufacturer=manufacturer, part_number=f'P-{i}')
+            for i in range(3)
+        ]
+        self.root = Category.objects.create(name='Computers', slug='computers')
+        self.laptops = Category.objects.create(name='Laptops', slug='laptops', parent=self.root)
+        self.gaming = Category.objects.create(name='Gaming', slug='gaming', parent=self.laptops)
+
+    def _refresh(self):
+        for category in (self.root, self.laptops, self.gaming):
+            category.refresh_from_db()
+
+    def test_paths_and_helpers(self):
+        self.assertEqual(self.gaming.path, f'{self.root.id}/{self.laptops.id}/{self.gaming.id}/')
+        self.assertEqual(self.gaming.depth, 2)
+        self.assertEqual(list(self.gaming.get_ancestors()), [self.root, self.laptops])
+        self.assertEqual(set(self.root.get_descendants()), {self.laptops, self.gaming})
+
+        ProductCategory.objects.create(product=self.products[0], category=self.gaming)
+        ProductCategory.objects.create(product=self.products[1], category=self.laptops)
+        self.assertEqual(set(self.root.get_subtree_products()), set(self.products[:2]))
+
+    def test_counts_are_incremental_and_follow_moves(self):
+        ProductCategory.objects.create(product=self.products[0], category=self.gaming)
+        ProductCategory.objects.create(product=self.products[1], category=self.gaming)
+        ProductCategory.objects.create(product=self.products[2], category=self.laptops)
+        self._refresh()
+        self.assertEqual((self.gaming.product_count, self.gaming.subtree_product_count), (2, 2))
+        self.assertEqual((self.laptops.product_count, self.laptops.subtree_product_count), (1, 3))
+        self.assertEqual(self.root.subtree_product_count, 3)
+
+        # Move Gaming to the root: its products leave Laptops and Computers
+        self.gaming.parent = None
+        self.gaming.save()
+        self._refresh()
+        self.assertEqual(self.gaming.path, f'{self.gaming.id}/')
+        self.assertEqual(self.laptops.subtree_product_count, 1)
+        self.assertEqual(self.root.subtree_product_count, 1)
+
+        self.products[0].delete()
+        self.gaming.refresh_from_db()
+        self.assertEqual(self.gaming.subtree_product_count, 1)
+
+    def test_bulk_counts_match_rebuild(self):
+        with CategoryTree.bulk_counts():
+            for product in self.products:
+                ProductCategory.objects.create(product=product, category=self.gaming)
+        self._refresh()
+        incremental = [(c.path, c.product_count, c.subtree_product_count) for c in (self.root, self.laptops, self.gaming)]
+
+        Category.objects.update(path='', product_count=0, subtree_product_count=0)
+        CategoryTree.rebuild()
+        self._refresh()
+        rebuilt = [(c.path, c.product_count, c.subtree_product_count) for c in (self.root, self.laptops, self.gaming)]
+
+        self.assertEqual(incremental, rebuilt)
+        self.assertEqual(rebuilt[0][2], 3)
+
+
+class TestKeysetPagination(TestCase):
+    QUERY = '''
+        query($first: Int, $after: String, $last: Int, $before: String) {
+            products(first: $first, after: $after, last: $last, before: $before) {
+                items { partNumber }
+                totalCount
+                pageInfo { hasNextPage hasPreviousPage startCursor endCursor }
+            }
+        }
+    '''
+
+    def setUp(self):
+        manufacturer = Manufacturer.objects.create(name='Dell', slug='dell')
+        for i in range(5):
+            Product.objects.create(name=f'P{i}', slug=f'p{i}', manufacturer=manufacturer, part_number=f'P-{i}')
+        # Equal sort keys are ordered by id
+        Product.objects.update(created_at=Product.objects.get(part_number='P-0').created_at)
+
+    def _page(self, **variables):
+        response = self.client.post(
+            '/graphql/', data=json.dumps({'query': self.QUERY, 'variables': variables}),
+            content_type='application/json',
+        ).json()
+        return response.get('data') and response['data']['products'], response.get('errors')
+
+    def _parts(self, page):
+        return [item['partNumber'] for item in page['items']]
+
+    def test_forward_and_backward_pages(self):
+        first, _ = self._page(first=2)
+        self.assertEqual(self._parts(first), ['P-4', 'P-3'])
+        self.assertEqual(first['totalCount'], 5)
+        self.assertTrue(first['pageInfo']['hasNextPage'])
+        self.assertFalse(first['pageInfo']['hasPreviousPage'])
+
+        second, _ = self._page(first=2, after=first['pageInfo']['endCursor'])
+        third, _ = self._page(first=2, after=second['pageInfo']['endCursor'])
+        self.assertEqual(self._parts(second), ['P-2', 'P-1'])
+        self.assertEqual(self._parts(third), ['P-0'])
+        self.assertFalse(third['pageInfo']['hasNextPage'])
+
+        back, _ = self._page(last=2, before=third['pageInfo']['startCursor'])
+        self.assertEqual(self._parts(back), ['P-2', 'P-1'])
+        self.assertTrue(back['pageInfo']['hasPreviousPage'])
+
+    def test_offset_arguments_still_work(self):
+        response = self.client.post(
+            '/graphql/', data=json.dumps({'query': '{ products(limit: 2, offset: 1) { items { id } totalCount pageInfo { endCursor } } }'}),
+            content_type='application/json',
+        ).json()
+        page = response['data']['products']
+        self.assertEqual((len(page['items']), page['totalCount'], page['pageInfo']), (2, 5, None))
+
+    def test_invalid_cursor(self):
+        page, errors = self._page(first=2, after='not-a-cursor')
+        self.assertIsNone(page)
+        self.assertEqual(errors[0]['extensions']['code'], 'INVALID_CURSOR')
+
+
+class TestConnectionPool(SimpleTestCase):
+    class FakeConnection:
+        def __init__(self):
+            self.closed = False
+
+        def close(self):
+            self.closed = True
+
+    def _pool(self, **options):
+        from ecommerce_platform.pooled_postgresql.pool import ConnectionPool
+
+        return ConnectionPool(**{'min_size': 0, 'max_size': 2, 'timeout': 0.05, **options})
+
+    def test_connections_are_reused_and_capped(self):
+        from ecommerce_platform.pooled_postgresql.pool import PoolTimeout
+
+        pool = self._pool()
+        first = pool.getconn(self.FakeConnection)
+        pool.putconn(first)
+        self.assertIs(pool.getconn(self.FakeConnection), first)
+
+        pool.getconn(self.FakeConnection)
+        with self.assertRaises(PoolTimeout):
+            pool.getconn(self.FakeConnection)
+
+        stats = pool.snapshot()
+        self.assertEqual((stats['size'], stats['in_use'], stats['opened'], stats['timeouts']), (2, 2, 2, 1))
+
+    def test_waiting_checkout_gets_returned_connection(self):
+        import threading
+
+        pool = self._pool(max_size=1, timeout=2)
+        held = pool.getconn(self.FakeConnection)
+        threading.Timer(0.05, pool.putconn, args=(held,)).start()
+
+        self.assertIs(pool.getconn(self.FakeConnection), held)
+        self.assertEqual(pool.stats.waits, 1)
+        self.assertGreater(pool.stats.wait_ms_max, 0)
+
+    def test_failed_reset_and_health_check_discard(self):
+        pool = self._pool(reset=lambda conn: False)
+        conn = pool.getconn(self.FakeConnection)
+        pool.putconn(conn)
+        self.assertTrue(conn.closed)
+        self.assertEqual(pool.size, 0)
+
+        pool = self._pool(check=lambda conn: False, check_after=0)
+        conn = pool.getconn(self.FakeConnection)
+        pool.putconn(conn)
+        replacement = pool.getconn(self.FakeConnection)
+        self.assertIsNot(replacement, conn)
+        self.assertTrue(conn.closed)
+        self.assertEqual(pool.stats.health_check_failures, 1)
+
+    def test_idle_connections_above_min_size_are_pruned(self):
+        pool = self._pool(min_size=1, max_idle=0)
+        conns = [pool.getconn(self.FakeConnection) for _ in range(2)]
+        for conn in conns:
+            pool.putconn(conn)
+
+        self.assertEqual((pool.size, pool.idle), (1, 1))
+
+
+@override_settings(REPLICA_DATABASE_ALIAS='replica')
+class TestReplicaRouting(SimpleTestCase):
+    def setUp(self):
+        from ecommerce_platform.db_routing import ReplicaRouter
+
+        self.router = ReplicaRouter()
+
+    def test_reads_use_replica_only_when_opted_in(self):
+        from ecommerce_platform.db_routing import track_writes, use_primary, use_replica
+
+        with track_writes():
+            self.assertEqual(self.router.db_for_read(Product), 'default')
+            with use_replica():
+                self.assertEqual(self.router.db_for_read(Product), 'replica')
+                with use_primary():
+                    self.assertEqual(self.router.db_for_read(Product), 'default')
+
+                # Read-your-writes: after a write the rest of the scope stays on the primary
+                self.assertEqual(self.router.db_for_write(Product), 'default')
+                self.assertEqual(self.router.db_for_read(Product), 'default')
+
+        self.assertFalse(self.router.allow_migrate('replica', 'products'))
+        self.assertTrue(self.router.allow_migrate('default', 'products'))
+
+    def test_pins_are_per_client(self):
+        from django.test import RequestFactory
+
+        from ecommerce_platform.db_routing import is_pinned_to_primary, pin_to_primary
+
+        factory = RequestFactory()
+        writer = factory.post('/graphql/', HTTP_AUTHORIZATION='JWT writer-token')
+        same_client = factory.get('/graphql/', HTTP_AUTHORIZATION='JWT writer-token')
+        other_client = factory.get('/graphql/', HTTP_AUTHORIZATION='JWT other-token')
+
+        pin_to_primary(writer)
+        self.assertTrue(is_pinned_to_primary(same_client))
+        self.assertFalse(is_pinned_to_primary(other_client))
+
+
+class TestReplicaPinOnMutation(TestCase):
+    def test_mutation_pins_client_to_primary(self):
+        from django.contrib.auth import get_user_model
+        from django.test import RequestFactory
+
+        from ecommerce_platform.db_routing import is_pinned_to_primary
+
+        user = get_user_model().objects.create_user(email='pinned@example.com', password='x')
+        self.client.force_login(user)
+        request = RequestFactory().get('/graphql/')
+        request.user = user
+        self.assertFalse(is_pinned_to_primary(request))
+
+        self.client.post(
+            '/graphql/', data=json.dumps({'query': 'mutation { verifyToken(token: "bogus") { payload } }'}),
+            content_type='application/json',
+        )
+        self.assertTrue(is_pinned_to_primary(request))
+
+
+class TestPartNumberIndex(TestCase):
+    def setUp(self):
+        import os
+        import tempfile
+
+        from .part_index import reset_part_index
+
+        manufacturer = Manufacturer.objects.create(name='HP', slug='hp')
+        self.products = {
+            part_number: Product.objects.create(
+                name=part_number, slug=part_number.lower(), manufacturer=manufacturer, part_number=part_number
+            )
+            for part_number in ('HP-1234A', 'HP-1234AB', 'HP-9999', 'CF258X')
+        }
+        directory = tempfile.mkdtemp()
+        self.path = os.path.join(directory, 'part_index.bin')
+        self.settings_override = override_settings(PART_INDEX_PATH=self.path, PART_INDEX_RELOAD_SECONDS=0)
+        self.settings_override.enable()
+        self.addCleanup(self.settings_override.disable)
+        self.addCleanup(reset_part_index)
+        reset_part_index()
+
+    def test_exact_prefix_and_fuzzy_lookups(self):
+        from .part_index import PartNumberIndex, build_part_index
+
+        build_part_index(self.path)
+        index = PartNumberIndex(self.path)
+        ids = {part_number: product.id for part_number, product in self.products.items()}
+
+        self.assertEqual(index.exact('hp 1234a'), [ids['HP-1234A']])
+        self.assertEqual(index.prefix('HP1234'), [ids['HP-1234A'], ids['HP-1234AB']])
+        self.assertEqual(index.fuzzy('CF259X'), [ids['CF258X']])
+        self.assertEqual(index.fuzzy('HP-1234B', max_distance=1), [ids['HP-1234A'], ids['HP-1234AB']])
+        self.assertEqual(index.exact('nope'), [])
+
+    def test_falls_back_without_index_and_sees_new_products(self):
+        from .part_index import build_part_index, exact_part_number_q, exact_product_ids
+
+        self.assertIsNone(exact_product_ids('CF258X'))
+        self.assertEqual(
+            list(Product.objects.filter(exact_part_number_q('cf258x'))), [self.products['CF258X']]
+        )
+
+        build_part_index(self.path)
+        self.assertEqual(exact_product_ids('CF258X'), [self.products['CF258X'].id])
+
+        # Created after the snapshot: found through the pk > max_product_id tail
+        newer = Product.objects.create(
+            name='New', slug='new', manufacturer=self.products['CF258X'].manufacturer, part_number='Q2612A'
+        )
+        self.assertEqual(exact_product_ids('q2612a'), [newer.id])
+
+        # A rebuilt snapshot is picked up on the next lookup
+        build_part_index(self.path)
+        self.assertEqual(exact_product_ids('Q2612-A'), [newer.id])
+
+    def test_edited_part_numbers_match_their_new_value_only(self):
+        from .part_index import build_part_index, exact_product_ids, prefix_product_ids
+
+        build_part_index(self.path)
+        edited = self.products['HP-9999']
+        edited.part_number = 'Q7553X'
+        edited.save()
+
+        self.assertEqual(exact_product_ids('HP9999'), [])
+        self.assertEqual(exact_product_ids('q7553x'), [edited.id])
+        self.assertEqual(prefix_product_ids('HP-1234'), [self.products['HP-1234A'].id, self.products['HP-1234AB'].id])
+
+    def test_prefix_filter_falls_back_to_substring(self):
+        from .part_index import build_part_index, prefix_part_number_q
+
+        build_part_index(self.path)
+
+        self.assertEqual(list(Product.objects.filter(prefix_part_number_q('258X'))), [self.products['CF258X']])
+        self.assertEqual(
+            set(Product.objects.filter(prefix_part_number_q('HP-1234'))),
+            {self.products['HP-1234A'], self.products['HP-1234AB']},
+        )
+
+    def test_refresh_rebuilds_only_after_changes(self):
+        import os
+        from .part_index import build_part_index, refresh_part_index
+
+        self.assertIsNone(refresh_part_index())
+        self.assertFalse(os.path.exists(self.path))
+
+        build_part_index(self.path)
+        self.assertIsNone(refresh_part_index())
+
+        Product.objects.create(
+            name='New', slug='new', manufacturer=self.products['CF258X'].manufacturer, part_number='Q2612A'
+        )
+        self.assertEqual(refresh_part_index()['entries'], 5)
+        self.assertIsNone(refresh_part_index())
+
+
+class TestProductTextIndex(TestCase):
+    def setUp(self):
+        from offers.models import Offer
+        from vendors.models import Vendor
+
+        manufacturer = Manufacturer.objects.create(name='StarTech', slug='startech')
+        vendor = Vendor.objects.create(name='Synnex', slug='synnex')
+
+        def create(name, description, price=None):
+            product = Product.objects.create(
+                name=name, slug=name.lower().replace(' ', '-'), description=description,
+                manufacturer=manufacturer, part_number=name.upper().replace(' ', ''), source='partner_import',
+            )
+            if price is not None:
+                Offer.objects.create(product=product, vendor=vendor, selling_price=price)
+                Offer.objects.create(product=product, vendor=vendor, selling_price=price + 10)
+            return product
+
+        self.hdmi = create('HDMI Cable 6ft 4K', 'High speed cable 18Gbps with HDR', price=12)
+        self.usb = create('USB-C Cable', 'Charges laptops; also carries HDMI alt mode video', price=9)
+        self.rack = create('Rack Shelf', 'Steel server rack shelf')
+
+    def test_name_matches_outrank_description_mentions(self):
+        from .text_index import build_text_index
+
+        index = build_text_index()
+        ranked = index.search('hdmi cable', limit=5)
+
+        self.assertEqual([product_id for product_id, _ in ranked], [self.hdmi.id, self.usb.id])
+        self.assertEqual(index.score('hdmi cable', [self.rack.id]), {self.rack.id: 0.0})
+
+        specs = index.specs_for(self.hdmi.id)
+        self.assertEqual((specs.length, specs.resolution, specs.speed, specs.price), (6.0, '4k', '18gbps', 12.0))
+        self.assertIsNone(index.specs_for(self.rack.id).price)
+
+    def test_refresh_reindexes_changed_products_and_rebuilds_after_deletes(self):
+        from .text_index import build_text_index, refresh_text_index
+
+        index = build_text_index()
+        self.rack.name = 'HDMI Rack Shelf'
+        self.rack.save()
+        refreshed = refresh_text_index(index)
+
+        self.assertIs(refreshed, index)
+        self.assertIn(self.rack.id, dict(index.search('hdmi')))
+        self.assertEqual(index.tombstones, 1)
+
+        self.usb.delete()
+        refreshed = refresh_text_index(index)
+        self.assertIsNot(refreshed, index)
+        self.assertNotIn(self.usb.id, dict(refreshed.search('hdmi')))
+
+    def test_lowest_offer_price_uses_prefetched_offers(self):
+        from django.db.models import prefetch_related_objects
+
+        from .consumer_matching import extract_product_specs
+
+        products = [self.hdmi, self.usb]
+        prefetch_related_objects(products, 'offers')
+        with self.assertNumQueries(0):
+            prices = [extract_product_specs(product).price for product in products]
+        self.assertEqual(prices, [12.0, 9.0])
+
+
+class TestSpecExtraction(TestCase):
+    def setUp(self):
+        self.manufacturer = Manufacturer.objects.create(name='StarTech', slug='startech')
+
+    def create(self, name, description=''):
+        return Product.objects.create(
+            name=name, slug=name.lower().replace(' ', '-'), description=description,
+            manufacturer=self.manufacturer, part_number=name.upper().replace(' ', ''), source='partner_import',
+        )
+
+    def test_extracts_normalized_specs(self):
+        from .spec_extraction import detect_category, extract_specs
+
+        specs = extract_specs('HDMI 2.1 Cable 2m', 'Braided 48 Gbps cable, 8K@60Hz with eARC')
+        self.assertEqual(specs['length_ft'], 6.6)
+        self.assertEqual(
+            (specs['resolution'], specs['speed_gbps'], specs['version'], specs['category']),
+            ('8k', 48, '2.1', 'cable'),
+        )
+        self.assertEqual(specs['features'], ['earc', 'braided'])
+
+        # Whole words only: 'cabled' is not an LED monitor
+        self.assertEqual(detect_category('Cabled keyboard'), 'keyboard')
+        self.assertEqual(detect_category('Wireless keyboard and mouse'), 'keyboard_mouse_combo')
+
+        # Tokens need a word boundary: no eARC in 'research', no 8K in '48K', no USB-C in 'usb cable'
+        specs = extract_specs('USB cable for research, 48K audio')
+        self.assertEqual((specs['features'], specs['resolution'], specs['version']), ([], None, None))
+        self.assertEqual(extract_specs('HDR10 4K60 eARC')['features'], ['hdr', 'hdr10', 'earc'])
+
+    def test_reference_and_candidate_specs_share_units(self):
+        from .consumer_matching import extract_product_specs
+
+        reference = extract_product_specs(None, '2m HDMI 2.1 cable with eARC')
+        candidate = extract_product_specs(self.create('HDMI 2.1 Cable 2m', 'Supports eARC'))
+        self.assertEqual((reference.length, reference.version, reference.features), (6.6, '2.1', ['earc']))
+        self.assertEqual((candidate.length, candidate.version, candidate.features), (6.6, '2.1', ['earc']))
+
+    def test_specs_saved_on_write_and_filtered_in_sql(self):
+        from .spec_extraction import spec_filter_q
+
+        short = self.create('HDMI Cable 6ft 4K', 'Supports HDR')
+        self.create('HDMI Cable 25ft 4K')
+        self.create('4K Monitor 6ft cord included')
+
+        self.assertEqual((short.spec_category, short.spec_length_ft, short.spec_features), ('cable', 6.0, ',hdr,'))
+        matches = Product.objects.filter(spec_filter_q(category='cable', resolution='4k', length_ft=5, features=['hdr']))
+        self.assertEqual(list(matches), [short])
+
+        # Partial saves of the text re-extract too
+        short.name = 'HDMI Cable 10ft 8K'
+        short.save(update_fields=['name'])
+        short.refresh_from_db()
+        self.assertEqual((short.spec_length_ft, short.spec_resolution), (10.0, '8k'))
+
+    def test_backfill_fills_bulk_created_products(self):
+        from .spec_extraction import SPEC_EXTRACTOR_VERSION, backfill_specs
+
+        Product.objects.bulk_create([
+            Product(name=f'USB-C Cable {i}ft', slug=f'usb-{i}', manufacturer=self.manufacturer, part_number=f'USB-{i}')
+            for i in range(1, 4)
+        ])
+        self.assertEqual(backfill_specs(batch_size=2), 3)
+        self.assertEqual(
+            sorted(Product.objects.values_list('spec_length_ft', 'spec_version', 'specs_extracted_version')),
+            [(1.0, 'c', SPEC_EXTRACTOR_VERSION), (2.0, 'c', SPEC_EXTRACTOR_VERSION), (3.0, 'c', SPEC_EXTRACTOR_VERSION)],
+        )
+        self.assertEqual(backfill_specs(), 0)
+
+
+class FakeListRedis:
+    """The list commands the search event buffer uses (decode_responses=True)"""
+
+    def __init__(self):
+        self.lists = {}
+
+    def rpush(self, name, *values):
+        self.lists.setdefault(name, []).extend(str(value) for value in values)
+        return len(self.lists[name])
+
+    def lpush(self, name, *values):
+        self.lists[name] = [str(value) for value in reversed(values)] + self.lists.get(name, [])
+        return len(self.lists[name])
+
+    def lrange(self, name, start, end):
+        return self.lists.get(name, [])[start:end + 1 if end != -1 else None]
+
+    def ltrim(self, name, start, end):
+        self.lists[name] = self.lrange(name, start, end)
+        return True
+
+    def llen(self, name):
+        return len(self.lists.get(name, []))
+
+    def pipeline(self, transaction=True):
+        redis = self
+
+        class Pipeline:
+            def __init__(self):
+                self.calls = []
+
+            def __getattr__(self, name):
+                def queue(*args):
+                    self.calls.append((getattr(redis, name), args))
+                    return self
+                return queue
+
+            def execute(self):
+                calls, self.calls = self.calls, []
+                return [method(*args) for method, args in calls]
+
+        return Pipeline()
+
+
+class TestSearchEvents(TestCase):
+    def setUp(self):
+        from users.models import User
+
+        self.redis = FakeListRedis()
+        self.user = User.objects.create(email='searcher@example.com')
+        manufacturer = Manufacturer.objects.create(name='Anker', slug='anker')
+        self.hub = Product.objects.create(name='USB-C Hub', slug='usb-c-hub', manufacturer=manufacturer, part_number='A8346')
+
+    def test_buffered_searches_roll_up_into_demand_and_reports(self):
+        from .models import SearchDemandDaily, SearchDemandHourly
+        from .search_events import flush_search_events, record_search, top_unmet_searches, user_search_count
+
+        record_search('USB-C  Hub', user=self.user, product_id=self.hub.id, latency_ms=120, r=self.redis)
+        record_search('thunderbolt dock', user=self.user, latency_ms=300, r=self.redis)
+        record_search('Thunderbolt Dock', latency_ms=100, r=self.redis)
+        self.assertFalse(SearchDemandDaily.objects.exists())  # nothing written on the search path
+
+        self.assertEqual(flush_search_events(self.redis, batch_size=2), {'events': 3, 'batches': 2})
+        record_search('thunderbolt dock', r=self.redis)
+        flush_search_events(self.redis)
+
+        dock = SearchDemandDaily.objects.get(term='thunderbolt dock')
+        self.assertEqual((dock.searches, dock.unmatched, dock.max_latency_ms), (3, 3, 300))
+        self.assertEqual(SearchDemandHourly.objects.get(term='usb-c hub').last_product, self.hub)
+        self.hub.refresh_from_db()
+        self.assertEqual(self.hub.future_demand_count, 1)
+        self.assertIsNotNone(self.hub.last_demand_date)
+        self.assertEqual(user_search_count(self.user, dock.bucket), 2)
+        self.assertEqual([row['term'] for row in top_unmet_searches()], ['thunderbolt dock'])
+
+    def test_failed_rollup_keeps_the_events(self):
+        from unittest import mock
+        from .search_events import BUFFER_KEY, flush_search_events, record_search
+
+        record_search('thunderbolt dock', r=self.redis)
+        with mock.patch('products.search_events._merge_rollups', side_effect=RuntimeError('db down')):
+            with self.assertRaises(RuntimeError):
+                flush_search_events(self.redis)
+        self.assertEqual(self.redis.llen(BUFFER_KEY), 1)
+
+    def test_search_path_survives_redis_outage(self):
+        import redis
+        from unittest import mock
+        from .search_events import record_search
+
+        with mock.patch.object(FakeListRedis, 'pipeline', side_effect=redis.ConnectionError('down')):
+            record_search('thunderbolt dock', r=self.redis)
@@ -0,0 +1,299 @@
+"""
+In-process BM25 index over supplier product names and descriptions.
+
+Consumer matching used to score candidates one product at a time: a regex
+spec extraction and an ``offers`` query per product, then a Python relevance
+loop over whatever a handful of ``icontains`` queries happened to return.
+This index keeps, per process:
+
+- postings: term -> (slots, term frequencies), the columns of a sparse
+  document-term matrix. Scoring a query walks only the postings of its
+  terms and accumulates into one score map (the sparse matrix-vector
+  product), then takes the top k with a heap;
+- per-product ProductSpecs read from the spec columns filled at ingest
+  (extracted once here for rows not backfilled yet), with the lowest
+  active offer price from a single aggregate query.
+
+Name tokens count NAME_WEIGHT times, so a term in the title outweighs the
+same term buried in a long description.
+
+The index is built on first use and refreshed incrementally at most every
+TEXT_INDEX_REFRESH_SECONDS: products and offers whose ``updated_at`` moved
+are re-indexed (the old slot is tombstoned), and a drift in product count
+(deletes) or too many tombstones triggers a full rebuild.
+"""
+
+import heapq
+import logging
+import math
+import re
+import threading
+import time
+from array import array
+from types import SimpleNamespace
+
+from django.conf import settings
+from django.db.models import Max, Min
+
+from .spec_extraction import SPEC_FIELDS, has_current_specs
+
+logger = logging.getLogger(__name__)
+
+INDEXED_SOURCES = ('partner_import', 'manual')
+NAME_WEIGHT = 3
+REBUILD_TOMBSTONE_RATIO = 0.25
+REBUILD_MIN_TOMBSTONES = 100
+
+_TOKEN = re.compile(r'[a-z0-9]+(?:\.[0-9]+)?')
+STOP_WORDS = frozenset({
+    'a', 'an', 'and', 'are', 'at', 'by', 'for', 'from', 'in', 'is', 'it', 'of',
+    'on', 'or', 'the', 'this', 'that', 'to', 'with', 'you', 'your',
+})
+
+
+def tokenize(text):
+    """Lower-case word and version tokens ('hdmi', '2.1', '6ft'), stop words removed"""
+    return [token for token in _TOKEN.findall((text or '').lower()) if token not in STOP_WORDS]
+
+
+class ProductTextIndex:
+    """BM25 postings plus cached specs for one snapshot of the supplier catalog"""
+
+    def __init__(self, k1=1.2, b=0.75):
+        self.k1 = k1
+        self.b = b
+        self._slots = {}                  # product id -> slot
+        self._product_ids = array('q')    # slot -> product id (0 once tombstoned)
+        self._lengths = array('f')        # slot -> weighted token count
+        self._specs = []                  # slot -> ProductSpecs
+        self._postings = {}               # term -> (array('I') slots, array('f') tf)
+        self._total_length = 0.0
+        self._norms = None                # slot -> k1 * (1 - b + b * len / avgdl), rebuilt lazily
+        self.synced_at = None             # newest product/offer updated_at seen
+        self.built_at = None
+        # Held while searching and while a refresh mutates the postings
+        self.lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._slots)
+
+    @property
+    def tombstones(self):
+        return len(self._product_ids) - len(self._slots)
+
+    def add(self, product_id, name, description, specs=None):
+        """Index (or re-index) one product"""
+        self.remove(product_id)
+
+        counts = {}
+        for token in tokenize(name):
+            counts[token] = counts.get(token, 0) + NAME_WEIGHT
+        for token in tokenize(description):
+            counts[token] = counts.get(token, 0) + 1
+
+        slot = len(self._product_ids)
+        self._slots[product_id] = slot
+        self._product_ids.append(product_id)
+        length = float(sum(counts.values()))
+        self._lengths.append(length)
+        self._specs.append(specs)
+        self._total_length += length
+        self._norms = None
+
+        for term, tf in counts.items():
+            postings = self._postings.get(term)
+            if postings is None:
+                postings = self._postings[term] = (array('I'), array('f'))
+            postings[0].append(slot)
+            postings[1].append(tf)
+
+    def remove(self, product_id):
+        slot = self._slots.pop(product_id, None)
+        if slot is None:
+            return
+        self._product_ids[slot] = 0
+        self._specs[slot] = None
+        self._total_length -= self._lengths[slot]
+        self._norms = None
+
+    def specs_for(self, product_id):
+        slot = self._slots.get(product_id)
+        return None if slot is None else self._specs[slot]
+
+    def set_price(self, product_id, price):
+        specs = self.specs_for(product_id)
+        if specs is not None:
+            specs.price = price
+
+    def _term_weights(self, query):
+        """IDF per distinct query term present in the index"""
+        live = len(self._slots)
+        weights = {}
+        for term in set(tokenize(query)):
+            postings = self._postings.get(term)
+            if postings is None:
+                continue
+            df = len(postings[0])
+            weights[term] = math.log(1 + (live - df + 0.5) / (df + 0.5))
+        return weights
+
+    def _accumulate(self, query):
+        """slot -> BM25 score for every live product matching any query term"""
+        if not self._slots:
+            return {}
+        if self._norms is None:
+            average = self._total_length / len(self._slots) or 1.0
+            k1, b = self.k1, self.b
+            self._norms = array('f', (k1 * (1 - b + b * length / average) for length in self._lengths))
+
+        norms, k1_plus_1 = self._norms, self.k1 + 1
+        scores = {}
+        get = scores.get
+        for term, idf in self._term_weights(query).items():
+            slots, tfs = self._postings[term]
+            for slot, tf in zip(slots, tfs):
+                scores[slot] = get(slot, 0.0) + idf * tf * k1_plus_1 / (tf + norms[slot])
+        return scores
+
+    def search(self, query, limit=50):
+        """[(product_id, score)] of the best `limit` matches, best first"""
+        with self.lock:
+            product_ids = self._product_ids
+            scores = self._accumulate(query)
+            best = heapq.nlargest(limit, ((score, slot) for slot, score in scores.items() if product_ids[slot]))
+            return [(product_ids[slot], score) for score, slot in best]
+
+    def score(self, query, product_ids):
+        """{product_id: score} for the given products (0.0 when not indexed or not matching)"""
+        with self.lock:
+            scores = self._accumulate(query)
+            return {
+                product_id: scores.get(self._slots.get(product_id, -1), 0.0)
+                for product_id in product_ids
+            }
+
+
+def _offer_prices(product_ids=None, updated_after=None):
+    """Lowest active offer price per product, in one grouped query"""
+    from offers.models import Offer
+
+    offers = Offer.objects.filter(is_active=True)
+    if product_ids is not None:
+        offers = offers.filter(product_id__in=product_ids)
+    if updated_after is not None:
+        offers = offers.filter(product_id__in=Offer.objects.filter(updated_at__gt=updated_after).values('product_id'))
+    return {
+        row['product_id']: float(row['price'])
+        for row in offers.values('product_id').annotate(price=Min('selling_price'))
+    }
+
+
+def _index_rows(index, rows, prices):
+    from .consumer_matching import extract_product_specs, stored_product_specs
+
+    synced_at = index.synced_at
+    with index.lock:
+        for product_id, name, description, source, updated_at, *spec_values in rows:
+            if synced_at is None or updated_at > synced_at:
+                synced_at = updated_at
+            if source not in INDEXED_SOURCES:
+                index.remove(product_id)
+                continue
+            stored = SimpleNamespace(**dict(zip(SPEC_FIELDS, spec_values)))
+            if has_current_specs(stored):
+                specs = stored_product_specs(stored, with_price=False)
+            else:
+                specs = extract_product_specs(None, f"{name} {description or ''}")
+            specs.price = prices.get(product_id)
+            index.add(product_id, name, description, specs)
+    index.synced_at = synced_at
+
+
+_ROW_FIELDS = ('id', 'name', 'description', 'source', 'updated_at', *SPEC_FIELDS)
+
+
+def build_text_index(batch_size=2000):
+    """Index every supplier product from scratch"""
+    from .models import Product
+
+    started = time.monotonic()
+    index = ProductTextIndex()
+    prices = _offer_prices()
+    rows = Product.objects.filter(source__in=INDEXED_SOURCES).values_list(*_ROW_FIELDS)
+    _index_rows(index, rows.iterator(chunk_size=batch_size), prices)
+
+    from offers.models import Offer
+    newest_offer = Offer.objects.aggregate(newest=Max('updated_at'))['newest']
+    if newest_offer and (index.synced_at is None or newest_offer > index.synced_at):
+        index.synced_at = newest_offer
+
+    index.built_at = time.time()
+    logger.info(f"🔤 Built product text index: {len(index)} products in {time.monotonic() - started:.2f}s")
+    return index
+
+
+def refresh_text_index(index):
+    """
+    Apply product and offer changes since the index was last synced.
+
+    Returns:
+        The same index, or a freshly built one when deletes or tombstones
+        make incremental maintenance unreliable
+    """
+    from .models import Product
+
+    if index.synced_at is None:
+        return build_text_index()
+
+    changed = list(Product.objects.filter(updated_at__gt=index.synced_at).values_list(*_ROW_FIELDS))
+    repriced = _offer_prices(updated_after=index.synced_at)
+    if changed:
+        _index_rows(index, changed, _offer_prices(product_ids=[row[0] for row in changed]))
+    with index.lock:
+        for product_id, price in repriced.items():
+            index.set_price(product_id, price)
+    if repriced:
+        from offers.models import Offer
+        newest_offer = Offer.objects.aggregate(newest=Max('updated_at'))['newest']
+        if newest_offer and newest_offer > index.synced_at:
+            index.synced_at = newest_offer
+
+    live = Product.objects.filter(source__in=INDEXED_SOURCES).count()
+    if live != len(index) or index.tombstones > max(REBUILD_TOMBSTONE_RATIO * len(index), REBUILD_MIN_TOMBSTONES):
+        return build_text_index()
+    return index
+
+
+_current = None
+_last_refreshed = 0.0
+_lock = threading.Lock()
+
+
+def get_text_index():
+    """
+    This process's text index, built on first use and refreshed at most
+    every TEXT_INDEX_REFRESH_SECONDS. None when disabled (TEXT_INDEX_ENABLED).
+    """
+    global _current, _last_refreshed
+
+    if not getattr(settings, 'TEXT_INDEX_ENABLED', True):
+        return None
+
+    interval = getattr(settings, 'TEXT_INDEX_REFRESH_SECONDS', 60)
+    now = time.monotonic()
+    if _current is not None and now - _last_refreshed < interval:
+        return _current
+
+    with _lock:
+        if _current is not None and now - _last_refreshed < interval:
+            return _current
+        _current = build_text_index() if _current is None else refresh_text_index(_current)
+        _last_refreshed = time.monotonic()
+        return _current
+
+
+def reset_text_index():
+    global _current, _last_refreshed
+    with _lock:
+        _current = None
+        _last_refreshed = 0.0
@@ -2,10 +2,13 @@ from django.contrib import admin
 from django.utils.html import format_html
 from django.urls import reverse
 from django.utils.safestring import mark_safe
+from django.db.models import Count, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+from ecommerce_platform.admin_pagination import FastChangelistMixin
 from .models import Quote, QuoteItem, ProductMatch, VendorPricing
 
 @admin.register(Quote)
-class QuoteAdmin(admin.ModelAdmin):
+class QuoteAdmin(FastChangelistMixin, admin.ModelAdmin):
     list_display = [
         'id', 'vendor_company', 'quote_number', 'user', 'status', 
         'total', 'item_count', 'matched_item_count', 'demo_mode_enabled', 'created_at'
@@ -44,13 +47,33 @@ class QuoteAdmin(admin.ModelAdmin):
         })
     )
     
+    list_select_related = ('user',)
+    ordering = ('-created_at', '-id')
+    
+    def get_queryset(self, request):
+        # Correlated subqueries instead of two count queries per row; unused
+        # subquery annotations are also stripped from the paginator's COUNT(*)
+        items = QuoteItem.objects.filter(quote=OuterRef('pk')).order_by().values('quote')
+        return super().get_queryset(request).annotate(
+            _item_count=Coalesce(Subquery(items.annotate(c=Count('id')).values('c')), 0),
+            _matched_item_count=Coalesce(Subquery(
+                items.filter(matches__isnull=False).annotate(c=Count('id', distinct=True)).values('c')
+            ), 0),
+        )
+    
     def item_count(self, obj):
+        if hasattr(obj, '_item_count'):
+            return obj._item_count
         return obj.item_count
     item_count.short_description = 'Total Items'
+    item_count.admin_order_field = '_item_count'
     
     def matched_item_count(self, obj):
+        if hasattr(obj, '_matched_item_count'):
+            return obj._matched_item_count
         return obj.matched_item_count
     matched_item_count.short_description = 'Matched Items'
+    matched_item_count.admin_order_field = '_matched_item_count'
 
 class ProductMatchInline(admin.TabularInline):
     model = ProductMatch
@@ -59,7 +82,7 @@ class ProductMatchInline(admin.TabularInline):
     fields = ['product', 'confidence', 'is_exact_match', 'match_method', 'price_difference', 'is_demo_price']
 
 @admin.register(QuoteItem)
-class QuoteItemAdmin(admin.ModelAdmin):
+class QuoteItemAdmin(FastChangelistMixin, admin.ModelAdmin):
     list_display = [
         'id', 'quote', 'part_number', 'description_truncated', 'manufacturer',
         'quantity', 'unit_price', 'total_price', 'match_count'
@@ -69,6 +92,7 @@ class QuoteItemAdmin(admin.ModelAdmin):
     readonly_fields = ['created_at', 'updated_at', 'extraction_confidence', 'raw_extracted_data']
     
     inlines = [ProductMatchInline]
+    list_select_related = ('quote',)
     
     fieldsets = (
         ('Quote Information', {
@@ -98,13 +122,20 @@ class QuoteItemAdmin(admin.ModelAdmin):
         return obj.description[:50] + '...' if len(obj.description) > 50 else obj.description
     description_truncated.short_description = 'Description'
     
+    def get_queryset(self, request):
+        matches = ProductMatch.objects.filter(quote_item=OuterRef('pk')).order_by().values('quote_item')
+        return super().get_queryset(request).annotate(
+            _match_count=Coalesce(Subquery(matches.annotate(c=Count('id')).values('c')), 0)
+        )
+    
     def match_count(self, obj):
-        count = obj.matches.count()
+        count = obj._match_count if hasattr(obj, '_match_count') else obj.matches.count()
         if count > 0:
             url = reverse('admin:quotes_productmatch_changelist') + f'?quote_item__id={obj.id}'
             return format_html('<a href="{}">{} matches</a>', url, count)
         return '0 matches'
     match_count.short_description = 'Matches'
+    match_count.admin_order_field = '_match_count'
 
 @admin.register(ProductMatch)
 class ProductMatchAdmin(admin.ModelAdmin):
@@ -113,6 +144,7 @@ class ProductMatchAdmin(admin.ModelAdmin):
         'match_method', 'price_difference', 'is_demo_price'
     ]
     list_filter = ['is_exact_match', 'match_method', 'is_demo_price', 'demo_generated_product']
+    list_select_related = ('quote_item', 'product')
     search_fields = [
         'quote_item__part_number', 'quote_item__description', 
         'product__name', 'product__part_number'
@@ -149,6 +181,7 @@ class VendorPricingAdmin(admin.ModelAdmin):
         'quoted_price', 'quantity', 'quote_date', 'is_confirmed'
     ]
     list_filter = ['vendor_company', 'is_confirmed', 'quote_date']
+    list_select_related = ('product',)
     search_fields = [
         'vendor_company', 'vendor_name', 'part_number_used',
         'product__name', 'product__part_number'
@@ -0,0 +1,17 @@
+# Generated by Django 4.2.7 on 2026-10-18 21:08
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('quotes', '0002_quote_pdf_content'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='quote',
+            index=models.Index(fields=['created_at', 'id'], name='quotes_quot_created_eb1988_idx'),
+        ),
+    ]
@@ -0,0 +1,17 @@
+# Generated by Django 4.2.7 on 2026-10-18 21:33
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('quotes', '0003_quote_quotes_quot_created_eb1988_idx'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='quote',
+            index=models.Index(fields=['user', 'created_at', 'id'], name='quotes_quot_user_id_d694f1_idx'),
+        ),
+    ]
@@ -67,6 +67,8 @@ class Quote(models.Model):
             models.Index(fields=['user', '-created_at']),
             models.Index(fields=['status']),
             models.Index(fields=['vendor_company']),
+            models.Index(fields=['created_at', 'id']),
+            models.Index(fields=['user', 'created_at', 'id']),
         ]
     
     def __str__(self):
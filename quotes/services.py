@@ -4,12 +4,10 @@ import logging
 from typing import Dict, List, Optional, Tuple
 from decimal import Decimal
 from datetime import datetime, date
-import PyPDF2
 from io import BytesIO
 import base64
 
 from django.conf import settings
-from openai import OpenAI
 
 logger = logging.getLogger(__name__)
 
@@ -22,6 +20,10 @@ class QuoteParsingService:
         if not api_key:
             raise ValueError("OPENAI_API_KEY environment variable is required")
         
+        # openai and PyPDF2 are heavy imports only the quote worker needs,
+        # so they are loaded when a parser is built rather than at module load
+        from openai import OpenAI
+
         self.client = OpenAI(api_key=api_key)
         self.max_file_size = 10 * 1024 * 1024  # 10MB
     
@@ -192,6 +194,8 @@ class QuoteParsingService:
             Extracted text content
         """
         try:
+            import PyPDF2
+
             with open(pdf_file_path, 'rb') as file:
                 pdf_reader = PyPDF2.PdfReader(file)
                 text = ""
@@ -10,6 +10,7 @@ from typing import Dict, List, Optional
 from quotes.models import Quote, QuoteItem, ProductMatch, VendorPricing
 from quotes.services import QuoteParsingService
 from products.models import Product, Manufacturer
+from products.part_index import exact_part_number_q
 from vendors.models import Vendor
 from offers.models import Offer
 
@@ -454,7 +455,7 @@ class ProductMatchingService:
         
         try:
             products = Product.objects.filter(
-                part_number__iexact=quote_item.part_number,
+                exact_part_number_q(quote_item.part_number),
                 status='active'
             )
             
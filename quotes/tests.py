@@ -1,3 +1,31 @@
+from decimal import Decimal
+
 from django.test import TestCase
+from django.urls import reverse
+
+from users.models import User
+from .models import Quote, QuoteItem
+
+
+class TestQuoteAdminChangelist(TestCase):
+    def setUp(self):
+        self.admin = User.objects.create(email='admin@example.com', is_staff=True, is_superuser=True)
+        self.client.force_login(self.admin)
+
+    def _create_quotes(self, count):
+        for i in range(count):
+            quote = Quote.objects.create(user=self.admin, original_filename=f'quote-{i}.pdf')
+            QuoteItem.objects.create(
+                quote=quote, part_number=f'PN-{i}', description='Item', quantity=1,
+                unit_price=Decimal('1.00'), total_price=Decimal('1.00')
+            )
+
+    def test_query_count_does_not_grow_with_rows(self):
+        self._create_quotes(2)
+        with self.assertNumQueries(5):
+            response = self.client.get(reverse('admin:quotes_quote_changelist'))
+        self.assertEqual(response.status_code, 200)
 
-# Create your tests here.
+        self._create_quotes(10)
+        with self.assertNumQueries(5):
+            self.client.get(reverse('admin:quotes_quote_changelist'))
@@ -12,6 +12,7 @@ import logging
 from .models import User, UserProfile, WalletTransaction
 from affiliates.models import AffiliateLink
 from products.models import Product
+from products.search_events import record_search, user_search_count
 
 logger = logging.getLogger(__name__)
 
@@ -46,8 +47,8 @@ class ActivityMetricsService:
         
         # Get affiliate link clicks (from click tracking)
         affiliate_clicks = AffiliateLink.objects.filter(
-            wallet_transactions__user=user,
-            wallet_transactions__created_at__gte=cutoff_date
+            wallettransaction__user=user,
+            wallettransaction__created_at__gte=cutoff_date
         ).aggregate(total_clicks=Sum('clicks'))['total_clicks'] or 0
         
         # Get successful conversions
@@ -63,9 +64,8 @@ class ActivityMetricsService:
             created_at__gte=cutoff_date
         ).values('created_at__date').distinct().count()
         
-        # Get search queries (would need to implement search tracking)
-        # For now, we'll estimate based on affiliate interactions
-        search_queries = affiliate_clicks * 2  # Estimate 2 searches per affiliate click
+        # Get search queries (rolled up from buffered search events, up to the last flush)
+        search_queries = user_search_count(user, cutoff_date.date())
         
         # Get referrals made (would need referral system)
         referrals_made = 0  # Placeholder for future referral system
@@ -416,8 +416,8 @@ class ActivityTracker:
     def track_search_query(user: User, query: str) -> None:
         """Track when user performs a search"""
         try:
-            # Could implement search tracking here
-            # For now, this is a placeholder
+            # Buffered in Redis and rolled up every minute (products/search_events.py)
+            record_search(query, user=user)
             
             logger.info(f"Tracked search for {user.email}: {query}")
             
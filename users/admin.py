@@ -13,8 +13,10 @@ import json
 from .models import (
     User, UserProfile, WalletTransaction, PayoutRequest,
     ReferralCode, Promotion, UserReferralCode, ReferralDisbursement,
-    OrganizationVerification, OrganizationTaxInfo
+    OrganizationVerification, OrganizationTaxInfo, NotificationOutbox
 )
+from ecommerce_platform.exports import streaming_export_response
+from ecommerce_platform.admin_pagination import FastChangelistMixin
 from .withdrawal_service import WithdrawalAdminService
 from .services import WalletService, ReconciliationService
 from .activity_metrics import ActivityMetricsService
@@ -252,7 +254,7 @@ class UserProfileAdmin(admin.ModelAdmin):
 
 
 @admin.register(WalletTransaction)
-class WalletTransactionAdmin(admin.ModelAdmin):
+class WalletTransactionAdmin(FastChangelistMixin, admin.ModelAdmin):
     """Admin interface for wallet transactions"""
     
     list_display = [
@@ -299,6 +301,9 @@ class WalletTransactionAdmin(admin.ModelAdmin):
     
     actions = ['approve_withdrawals', 'reject_withdrawals', 'confirm_earnings', 'export_transactions']
     
+    # Matches the (created_at, id) index so the changelist is an index scan
+    ordering = ('-created_at', '-id')
+    
     def get_queryset(self, request):
         return super().get_queryset(request).select_related(
             'user', 'affiliate_link', 'affiliate_link__product', 'processed_by'
@@ -449,10 +454,8 @@ class WalletTransactionAdmin(admin.ModelAdmin):
     confirm_earnings.short_description = "Confirm projected earnings"
     
     def export_transactions(self, request, queryset):
-        """Export selected transactions to CSV"""
-        # This would generate a CSV export
-        # For now, just show count
-        self.message_user(request, f"Export functionality: {queryset.count()} transactions selected")
+        """Stream selected transactions as CSV"""
+        return streaming_export_response('wallet_transactions', queryset=queryset)
     export_transactions.short_description = "Export to CSV"
 
 
@@ -846,11 +849,8 @@ class PayoutRequestAdmin(admin.ModelAdmin):
     retry_failed_payouts.short_description = "Retry failed payouts"
     
     def export_payout_report(self, request, queryset):
-        """Export payout data (placeholder for CSV export)"""
-        self.message_user(
-            request, 
-            f"Export functionality: {queryset.count()} payouts selected for export"
-        )
+        """Stream selected payouts as CSV"""
+        return streaming_export_response('payouts', queryset=queryset)
     export_payout_report.short_description = "Export payout report"
     
     def send_status_notifications(self, request, queryset):
@@ -1086,6 +1086,8 @@ class ReferralDisbursementAdmin(admin.ModelAdmin):
         }),
     )
     
+    actions = ['export_disbursements']
+    
     def recipient_email(self, obj):
         return obj.recipient_user.email
     recipient_email.short_description = 'Recipient'
@@ -1093,6 +1095,11 @@ class ReferralDisbursementAdmin(admin.ModelAdmin):
     def amount_display(self, obj):
         return f"${obj.amount}"
     amount_display.short_description = 'Amount'
+    
+    def export_disbursements(self, request, queryset):
+        """Stream selected disbursements as CSV"""
+        return streaming_export_response('referral_disbursements', queryset=queryset)
+    export_disbursements.short_description = "Export to CSV"
 
 
 @admin.register(OrganizationVerification)
@@ -1204,4 +1211,37 @@ class OrganizationTaxInfoAdmin(admin.ModelAdmin):
     
     def organization_name(self, obj):
         return obj.organization.profile.organization_name or obj.organization.email
-    organization_name.short_description = 'Organization'
\ No newline at end of file
+    organization_name.short_description = 'Organization'
+
+
+@admin.register(NotificationOutbox)
+class NotificationOutboxAdmin(admin.ModelAdmin):
+    """Admin interface for queued email notifications"""
+    
+    list_display = [
+        'id', 'user', 'notification_type', 'status', 'attempts', 'next_attempt_at', 'created_at', 'sent_at'
+    ]
+    
+    list_filter = [
+        'status', 'notification_type', 'created_at'
+    ]
+    
+    search_fields = [
+        'user__email', 'subject'
+    ]
+    
+    list_select_related = ['user']
+    
+    readonly_fields = [
+        'created_at', 'sent_at', 'locked_at', 'last_error'
+    ]
+    
+    actions = ['retry_now']
+    
+    def retry_now(self, request, queryset):
+        """Make selected notifications due for delivery immediately"""
+        updated = queryset.exclude(status='SENT').update(
+            status='PENDING', next_attempt_at=timezone.now(), locked_at=None
+        )
+        self.message_user(request, f"Queued {updated} notifications for immediate delivery")
+    retry_now.short_description = "Retry delivery now"
@@ -0,0 +1,215 @@
+import statistics
+import time
+from decimal import Decimal
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import connection
+from django.test import Client
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from affiliates.models import AffiliateLink, AffiliateClickEvent, PurchaseIntentEvent
+from products.models import Manufacturer, Product
+from quotes.models import Quote, QuoteItem, ProductMatch
+from users.models import User, WalletTransaction
+
+BENCH_DOMAIN = 'admin-bench.example.com'
+BENCH_MANUFACTURER_SLUG = 'admin-bench'
+
+CHANGELISTS = [
+    ('Wallet transactions', 'admin:users_wallettransaction_changelist'),
+    ('Click events', 'admin:affiliates_affiliateclickevent_changelist'),
+    ('Purchase intents', 'admin:affiliates_purchaseintentevent_changelist'),
+    ('Affiliate links', 'admin:affiliates_affiliatelink_changelist'),
+    ('Quotes', 'admin:quotes_quote_changelist'),
+    ('Quote items', 'admin:quotes_quoteitem_changelist'),
+    ('Product matches', 'admin:quotes_productmatch_changelist'),
+]
+
+
+class Command(BaseCommand):
+    help = 'Seed a synthetic dataset and time every high-volume admin changelist (latency and query count)'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--rows',
+            type=int,
+            default=5000,
+            help='Rows seeded per high-volume table (default: 5000)',
+        )
+        parser.add_argument(
+            '--repeat',
+            type=int,
+            default=5,
+            help='Requests per changelist (default: 5)',
+        )
+        parser.add_argument(
+            '--no-seed',
+            action='store_true',
+            help='Benchmark the existing data without seeding',
+        )
+        parser.add_argument(
+            '--keep',
+            action='store_true',
+            help='Keep the seeded dataset instead of deleting it',
+        )
+
+    def handle(self, *args, **options):
+        self.stdout.write(self.style.SUCCESS('🚀 Admin changelist benchmark'))
+
+        seeded = False
+        if not options['no_seed']:
+            self._seed(options['rows'])
+            seeded = True
+
+        try:
+            admin_user, _ = User.objects.get_or_create(
+                email=f'bench-admin@{BENCH_DOMAIN}',
+                defaults={'is_staff': True, 'is_superuser': True},
+            )
+            hosts = [host for host in settings.ALLOWED_HOSTS if host and host != '*']
+            client = Client(SERVER_NAME=hosts[0] if hosts else 'localhost')
+            client.force_login(admin_user)
+
+            for label, url_name in CHANGELISTS:
+                self._bench(client, label, reverse(url_name), options['repeat'])
+        finally:
+            if seeded and not options['keep']:
+                self._cleanup()
+
+    def _bench(self, client, label, url, repeat):
+        timings = []
+        queries = 0
+        status_code = None
+        for _ in range(max(1, repeat)):
+            with CaptureQueriesContext(connection) as ctx:
+                started = time.perf_counter()
+                response = client.get(url)
+                timings.append((time.perf_counter() - started) * 1000)
+            queries = len(ctx.captured_queries)
+            status_code = response.status_code
+
+        if status_code != 200:
+            self.stdout.write(self.style.ERROR(f"❌ {label}: HTTP {status_code}"))
+            return
+
+        self.stdout.write(
+            f"⏱️ {label}: median {statistics.median(timings):.1f}ms, "
+            f"max {max(timings):.1f}ms, {queries} queries"
+        )
+
+    def _seed(self, rows):
+        self.stdout.write(f"🌱 Seeding {rows} rows per table...")
+
+        manufacturer, _ = Manufacturer.objects.get_or_create(
+            slug=BENCH_MANUFACTURER_SLUG, defaults={'name': 'Admin Bench'}
+        )
+        users = [
+            User.objects.get_or_create(email=f'bench-{i}@{BENCH_DOMAIN}')[0]
+            for i in range(20)
+        ]
+
+        product_count = max(1, rows // 10)
+        products = Product.objects.bulk_create([
+            Product(
+                name=f'Bench Product {i}',
+                slug=f'bench-product-{i}',
+                manufacturer=manufacturer,
+                part_number=f'BENCH-{i:07d}',
+            )
+            for i in range(product_count)
+        ])
+        links = AffiliateLink.objects.bulk_create([
+            AffiliateLink(
+                product=product,
+                platform='amazon',
+                platform_id=f'B0BENCH{i:05d}',
+                original_url=f'https://www.amazon.com/dp/B0BENCH{i:05d}',
+                affiliate_url=f'https://www.amazon.com/dp/B0BENCH{i:05d}?tag=bench',
+            )
+            for i, product in enumerate(products)
+        ])
+
+        WalletTransaction.objects.bulk_create([
+            WalletTransaction(
+                user=users[i % len(users)],
+                transaction_type='EARNING_PROJECTED',
+                amount=Decimal('1.25'),
+                balance_before=Decimal('0.00'),
+                balance_after=Decimal('1.25'),
+                affiliate_link=links[i % len(links)],
+                description='admin bench',
+            )
+            for i in range(rows)
+        ], batch_size=1000)
+
+        clicks = AffiliateClickEvent.objects.bulk_create([
+            AffiliateClickEvent(
+                user=users[i % len(users)],
+                affiliate_link=links[i % len(links)],
+                session_id=f'bench-{i}',
+                target_domain='amazon.com',
+            )
+            for i in range(rows)
+        ], batch_size=1000)
+
+        PurchaseIntentEvent.objects.bulk_create([
+            PurchaseIntentEvent(
+                click_event=click,
+                intent_stage='cart_add',
+                confidence_level='MEDIUM',
+                confidence_score=Decimal('0.60'),
+                page_url='https://www.amazon.com/cart',
+            )
+            for click in clicks[:rows // 2]
+        ], batch_size=1000)
+
+        quotes = Quote.objects.bulk_create([
+            Quote(
+                user=users[i % len(users)],
+                vendor_company='Bench Vendor',
+                original_filename=f'bench-{i}.pdf',
+                status='completed',
+            )
+            for i in range(max(1, rows // 20))
+        ], batch_size=1000)
+        items = QuoteItem.objects.bulk_create([
+            QuoteItem(
+                quote=quotes[i % len(quotes)],
+                line_number=i // len(quotes) + 1,
+                part_number=products[i % len(products)].part_number,
+                description='Bench line item',
+                manufacturer=manufacturer.name,
+                quantity=1,
+                unit_price=Decimal('10.00'),
+                total_price=Decimal('10.00'),
+            )
+            for i in range(rows)
+        ], batch_size=1000)
+        ProductMatch.objects.bulk_create([
+            ProductMatch(
+                quote_item=item,
+                product=products[i % len(products)],
+                confidence=0.9,
+                is_exact_match=True,
+                match_method='exact_part_number',
+                price_difference=Decimal('0.00'),
+                price_difference_percentage=0.0,
+            )
+            for i, item in enumerate(items[::2])
+        ], batch_size=1000)
+
+        with connection.cursor() as cursor:
+            if connection.vendor == 'postgresql':
+                # Refresh pg_class.reltuples so estimated counts reflect the seed
+                cursor.execute('ANALYZE')
+
+    def _cleanup(self):
+        self.stdout.write('🧹 Removing seeded dataset')
+        Quote.objects.filter(user__email__endswith=f'@{BENCH_DOMAIN}').delete()
+        WalletTransaction.objects.filter(user__email__endswith=f'@{BENCH_DOMAIN}').delete()
+        AffiliateClickEvent.objects.filter(user__email__endswith=f'@{BENCH_DOMAIN}').delete()
+        Product.objects.filter(manufacturer__slug=BENCH_MANUFACTURER_SLUG).delete()
+        Manufacturer.objects.filter(slug=BENCH_MANUFACTURER_SLUG).delete()
+        User.objects.filter(email__endswith=f'@{BENCH_DOMAIN}').delete()
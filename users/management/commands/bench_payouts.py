@@ -0,0 +1,104 @@
+import time
+from decimal import Decimal
+
+from django.core.management.base import BaseCommand
+
+from users.models import PayoutRequest, User
+from users.payout_executor import PayoutBatchExecutor, TokenBucket, DEFAULT_PROVIDER_RATE_LIMITS
+
+
+class Command(BaseCommand):
+    help = 'Benchmark sequential vs concurrent batch payout execution against the mock payout service'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--count',
+            type=int,
+            default=100,
+            help='Number of synthetic approved payouts per run (default: 100)',
+        )
+        parser.add_argument(
+            '--latency',
+            type=float,
+            default=0.2,
+            help='Injected mock provider latency in seconds (default: 0.2)',
+        )
+        parser.add_argument(
+            '--email',
+            type=str,
+            default='payout-bench@example.com',
+            help='User that owns the synthetic payouts',
+        )
+        parser.add_argument(
+            '--skip-sequential',
+            action='store_true',
+            help='Only run the concurrent executor',
+        )
+        parser.add_argument(
+            '--keep',
+            action='store_true',
+            help='Keep the synthetic payouts instead of deleting them',
+        )
+
+    def handle(self, *args, **options):
+        user, _ = User.objects.get_or_create(email=options['email'])
+        service_options = {'latency': options['latency']}
+        methods = list(DEFAULT_PROVIDER_RATE_LIMITS.keys())
+        created_ids = []
+
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"🚀 Payout benchmark: {options['count']} payouts, {options['latency']}s injected latency"
+            )
+        )
+
+        try:
+            if not options['skip_sequential']:
+                ids = self._create_payouts(user, options['count'], methods)
+                created_ids.extend(ids)
+                executor = PayoutBatchExecutor(ids, service_options=service_options)
+                unlimited = TokenBucket(rate=1_000_000)
+
+                started = time.monotonic()
+                for payout in PayoutRequest.objects.filter(id__in=ids).select_related('user', 'wallet_transaction'):
+                    executor._process_one(payout, unlimited)
+                sequential = time.monotonic() - started
+                self._report('Sequential', options['count'], sequential)
+
+            ids = self._create_payouts(user, options['count'], methods)
+            created_ids.extend(ids)
+            result = PayoutBatchExecutor(ids, service_options=service_options).run()
+            self._report('Concurrent', options['count'], result['elapsed_seconds'])
+
+            for provider, stats in sorted(result['providers'].items()):
+                self.stdout.write(
+                    f"   {provider}: {stats['queued']} queued, {stats['successful']} ok, "
+                    f"{stats['failed']} failed, {stats['skipped']} skipped"
+                )
+
+            # A second run over the same ids must not pay anything again
+            replay = PayoutBatchExecutor(ids, service_options=service_options).run()
+            self.stdout.write(
+                f"♻️ Replay of concurrent batch processed {replay['total_processed']} payouts (expected 0)"
+            )
+        finally:
+            if not options['keep']:
+                PayoutRequest.objects.filter(id__in=created_ids).delete()
+
+    def _create_payouts(self, user, count, methods):
+        payouts = PayoutRequest.objects.bulk_create([
+            PayoutRequest(
+                user=user,
+                amount=Decimal('25.00'),
+                status='approved',
+                payout_method=methods[i % len(methods)],
+                recipient_email=user.email,
+                metadata={'request_source': 'bench_payouts'},
+            )
+            for i in range(count)
+        ])
+        return [payout.id for payout in payouts]
+
+    def _report(self, label, count, elapsed):
+        rate = count / elapsed if elapsed else 0
+        self.stdout.write(f"⏱️ {label}: {elapsed:.2f}s ({rate:.1f} payouts/s)")
@@ -0,0 +1,48 @@
+from django.core.management.base import BaseCommand
+from django.db.models import Count, Min
+from django.utils import timezone
+
+from users.models import NotificationOutbox
+from users.notifications import NotificationDispatcher, NotificationTaskManager
+
+
+class Command(BaseCommand):
+    help = 'Show the notification outbox backlog; drain it or schedule the dispatcher'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--schedule',
+            action='store_true',
+            help='Create the every-minute dispatcher schedule if it does not exist',
+        )
+        parser.add_argument(
+            '--drain',
+            action='store_true',
+            help='Deliver due notifications now (normally scheduled every minute)',
+        )
+
+    def handle(self, *args, **options):
+        if options['schedule']:
+            task_id = NotificationTaskManager.schedule_dispatcher()
+            if task_id:
+                self.stdout.write(self.style.SUCCESS(f"📅 Scheduled notification dispatcher: {task_id}"))
+            else:
+                self.stdout.write("📅 Notification dispatcher is already scheduled")
+
+        if options['drain']:
+            totals = NotificationDispatcher().drain()
+            self.stdout.write(self.style.SUCCESS(
+                f"📬 Sent {totals['sent']}/{totals['claimed']} notifications in {totals['batches']} batches "
+                f"({totals['retried']} retried, {totals['failed']} failed)"
+            ))
+
+        counts = dict(NotificationOutbox.objects.values_list('status').annotate(count=Count('id')))
+        self.stdout.write(
+            f"📨 Outbox: {counts.get('PENDING', 0)} pending, {counts.get('SENDING', 0)} sending, "
+            f"{counts.get('SENT', 0)} sent, {counts.get('FAILED', 0)} failed"
+        )
+        due = NotificationOutbox.objects.filter(status='PENDING', next_attempt_at__lte=timezone.now())
+        oldest = due.aggregate(oldest=Min('next_attempt_at'))['oldest']
+        if oldest:
+            age = (timezone.now() - oldest).total_seconds()
+            self.stdout.write(self.style.WARNING(f"⏳ {due.count()} due now, oldest waiting {age:.0f}s"))
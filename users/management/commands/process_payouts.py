@@ -4,6 +4,7 @@ from decimal import Decimal
 
 from users.models import PayoutRequest
 from users.mock_payout_service import PayoutProcessor
+from users.payout_executor import PayoutBatchExecutor
 from users.tasks import PayoutTaskManager
 
 
@@ -33,12 +34,33 @@ class Command(BaseCommand):
             action='store_true',
             help='Show what would be processed without actually processing',
         )
+        parser.add_argument(
+            '--recover-stale',
+            action='store_true',
+            help='First move payouts stuck in processing past PAYOUT_CLAIM_TIMEOUT_SECONDS back to approved',
+        )
+        parser.add_argument(
+            '--schedule',
+            action='store_true',
+            help='Create the every-5-minutes stale claim recovery schedule if it does not exist',
+        )
 
     def handle(self, *args, **options):
         self.stdout.write(
             self.style.SUCCESS('🚀 Payout Processing Command Started')
         )
 
+        if options['schedule']:
+            task_id = PayoutTaskManager.schedule_stale_claim_recovery()
+            if task_id:
+                self.stdout.write(self.style.SUCCESS(f"📅 Scheduled stale payout claim recovery: {task_id}"))
+            else:
+                self.stdout.write("📅 Stale payout claim recovery is already scheduled")
+
+        if options['recover_stale'] and not options['dry_run']:
+            released = PayoutBatchExecutor.release_stale_claims()
+            self.stdout.write(self.style.WARNING(f"♻️ Released {len(released)} payouts stuck in processing"))
+
         if options['payout_id']:
             # Process specific payout
             try:
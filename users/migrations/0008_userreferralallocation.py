@@ -0,0 +1,30 @@
+# Generated by Django 4.2.7 on 2026-10-18 21:04
+
+from decimal import Decimal
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0007_notificationoutbox'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='UserReferralAllocation',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('user_percentage', models.DecimalField(decimal_places=2, default=Decimal('100.00'), max_digits=5)),
+                ('codes', models.JSONField(blank=True, default=list, help_text='[{referral_code_id, recipient_user_id, percentage}] for codes that receive disbursements')),
+                ('valid_until', models.DateTimeField(blank=True, help_text='Next promotion window boundary after which this allocation must be recomputed', null=True)),
+                ('computed_at', models.DateTimeField(auto_now=True)),
+                ('user', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='referral_allocation', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['valid_until'], name='users_userr_valid_u_f8e47d_idx')],
+            },
+        ),
+    ]
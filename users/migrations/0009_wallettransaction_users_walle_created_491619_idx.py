@@ -0,0 +1,17 @@
+# Generated by Django 4.2.7 on 2026-10-18 21:08
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0008_userreferralallocation'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='wallettransaction',
+            index=models.Index(fields=['created_at', 'id'], name='users_walle_created_491619_idx'),
+        ),
+    ]
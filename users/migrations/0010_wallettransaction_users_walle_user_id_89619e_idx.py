@@ -0,0 +1,17 @@
+# Generated by Django 4.2.7 on 2026-10-18 21:33
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0009_wallettransaction_users_walle_created_491619_idx'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='wallettransaction',
+            index=models.Index(fields=['user', 'created_at', 'id'], name='users_walle_user_id_89619e_idx'),
+        ),
+    ]
@@ -1,5 +1,7 @@
 import random
+import threading
 import time
+from collections import OrderedDict
 from decimal import Decimal
 from django.utils import timezone
 from datetime import timedelta
@@ -45,22 +47,42 @@ class MockPayoutService:
         "Fraud protection triggered",
     ]
 
+    # Results already returned per idempotency key, mirroring the
+    # Idempotency-Key behaviour of Stripe/PayPal so retries never pay twice.
+    # Like the providers' key expiry, only the most recent keys are kept.
+    IDEMPOTENCY_KEYS_KEPT = 10000
+    _idempotent_results: 'OrderedDict[str, Dict[str, Any]]' = OrderedDict()
+    _idempotency_lock = threading.Lock()
+
     @classmethod
-    def process_payout(cls, payout_request: PayoutRequest, simulate_delay: bool = True) -> Dict[str, Any]:
+    def process_payout(cls, payout_request: PayoutRequest, simulate_delay: bool = True,
+                       latency: Optional[float] = None, idempotency_key: Optional[str] = None) -> Dict[str, Any]:
         """
         Simulate processing a payout request through external payment service
         
         Args:
             payout_request: The payout request to process
             simulate_delay: Whether to simulate realistic processing delays
+            latency: Fixed delay in seconds to inject instead of the random 3-10s (for benchmarks)
+            idempotency_key: Key identifying this payout attempt; repeated keys return the original result
             
         Returns:
             Dict containing processing results
         """
+        if idempotency_key:
+            with cls._idempotency_lock:
+                previous = cls._idempotent_results.get(idempotency_key)
+            if previous is not None:
+                logger.info(f"♻️ Mock payout #{payout_request.id} replayed for idempotency key {idempotency_key}")
+                return previous
+
         logger.info(f"🔄 Mock processing payout #{payout_request.id} via {payout_request.payout_method}")
         
-        # Simulate processing delay (3-10 seconds)
-        if simulate_delay:
+        # Simulate processing delay (3-10 seconds unless a fixed latency is injected)
+        if latency is not None:
+            if latency > 0:
+                time.sleep(latency)
+        elif simulate_delay:
             delay = random.uniform(3, 10)
             logger.info(f"⏳ Simulating {delay:.1f}s processing delay...")
             time.sleep(delay)
@@ -77,9 +99,16 @@ class MockPayoutService:
         is_successful = random.random() < success_rate
         
         if is_successful:
-            return cls._simulate_successful_payout(payout_request, processing_fee, net_amount)
+            result = cls._simulate_successful_payout(payout_request, processing_fee, net_amount)
         else:
-            return cls._simulate_failed_payout(payout_request)
+            result = cls._simulate_failed_payout(payout_request)
+
+        if idempotency_key:
+            with cls._idempotency_lock:
+                result = cls._idempotent_results.setdefault(idempotency_key, result)
+                while len(cls._idempotent_results) > cls.IDEMPOTENCY_KEYS_KEPT:
+                    cls._idempotent_results.popitem(last=False)
+        return result
     
     @classmethod
     def _calculate_processing_fee(cls, amount: Decimal, method: str) -> Decimal:
@@ -216,67 +245,85 @@ class PayoutProcessor:
             # Process through mock service
             result = MockPayoutService.process_payout(payout_request)
             
-            if result['success']:
-                # Mark as completed
-                payout_request.mark_completed(
-                    external_transaction_id=result['external_transaction_id'],
-                    net_amount=result['net_amount'],
-                    processing_fee=result['processing_fee']
-                )
-                
-                logger.info(f"✅ Payout #{payout_request.id} completed successfully")
-                
-                # Simulate webhook notification
-                MockPayoutService.simulate_webhook_notification(payout_request, result)
-                
-                return {
-                    'success': True,
-                    'payout_id': payout_request.id,
-                    'status': 'completed',
-                    'message': result['message'],
-                    'external_transaction_id': result['external_transaction_id'],
-                    'net_amount': result['net_amount'],
-                    'processing_fee': result['processing_fee'],
-                }
-            
-            else:
-                # Mark as failed
-                payout_request.mark_failed(
-                    error_message=result['error_message'],
-                    can_retry=result['can_retry']
-                )
-                
-                logger.error(f"❌ Payout #{payout_request.id} failed: {result['error_message']}")
-                
-                # Simulate webhook notification
-                MockPayoutService.simulate_webhook_notification(payout_request, result)
-                
-                return {
-                    'success': False,
-                    'payout_id': payout_request.id,
-                    'status': 'failed',
-                    'error_message': result['error_message'],
-                    'can_retry': result['can_retry'],
-                    'retry_after': result.get('retry_after'),
-                }
+            return cls.apply_service_result(payout_request, result)
         
         except Exception as e:
-            logger.error(f"💥 Unexpected error processing payout #{payout_request.id}: {str(e)}")
+            return cls.handle_processing_error(payout_request, e)
+    
+    @classmethod
+    def apply_service_result(cls, payout_request: PayoutRequest, result: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        Record the payment service result on a payout that is in processing status
+        
+        Args:
+            payout_request: The payout request being processed
+            result: Result dict returned by the payout service
             
-            # Mark as failed with system error
-            payout_request.mark_failed(
-                error_message=f"System error: {str(e)}",
-                can_retry=True
+        Returns:
+            Dict containing processing results
+        """
+        if result['success']:
+            # Mark as completed
+            payout_request.mark_completed(
+                external_transaction_id=result['external_transaction_id'],
+                net_amount=result['net_amount'],
+                processing_fee=result['processing_fee']
             )
             
+            logger.info(f"✅ Payout #{payout_request.id} completed successfully")
+            
+            # Simulate webhook notification
+            MockPayoutService.simulate_webhook_notification(payout_request, result)
+            
             return {
-                'success': False,
+                'success': True,
                 'payout_id': payout_request.id,
-                'status': 'failed',
-                'error_message': f"System error: {str(e)}",
-                'can_retry': True,
-                'retry_after': 3600,  # Retry in 1 hour
+                'status': 'completed',
+                'message': result['message'],
+                'external_transaction_id': result['external_transaction_id'],
+                'net_amount': result['net_amount'],
+                'processing_fee': result['processing_fee'],
             }
+        
+        # Mark as failed
+        payout_request.mark_failed(
+            error_message=result['error_message'],
+            can_retry=result['can_retry']
+        )
+        
+        logger.error(f"❌ Payout #{payout_request.id} failed: {result['error_message']}")
+        
+        # Simulate webhook notification
+        MockPayoutService.simulate_webhook_notification(payout_request, result)
+        
+        return {
+            'success': False,
+            'payout_id': payout_request.id,
+            'status': 'failed',
+            'error_message': result['error_message'],
+            'can_retry': result['can_retry'],
+            'retry_after': result.get('retry_after'),
+        }
+    
+    @classmethod
+    def handle_processing_error(cls, payout_request: PayoutRequest, error: Exception) -> Dict[str, Any]:
+        """Mark a payout as failed after an unexpected system error"""
+        logger.error(f"💥 Unexpected error processing payout #{payout_request.id}: {str(error)}")
+        
+        # Mark as failed with system error
+        payout_request.mark_failed(
+            error_message=f"System error: {str(error)}",
+            can_retry=True
+        )
+        
+        return {
+            'success': False,
+            'payout_id': payout_request.id,
+            'status': 'failed',
+            'error_message': f"System error: {str(error)}",
+            'can_retry': True,
+            'retry_after': 3600,  # Retry in 1 hour
+        }
     
     @classmethod
     def batch_process_payouts(cls, payout_ids: list) -> Dict[str, Any]:
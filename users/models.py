@@ -258,6 +258,8 @@ class WalletTransaction(models.Model):
             models.Index(fields=['status', 'created_at']),
             models.Index(fields=['affiliate_link']),
             models.Index(fields=['transaction_type', 'status']),
+            models.Index(fields=['created_at', 'id']),
+            models.Index(fields=['user', 'created_at', 'id']),
         ]
     
     def __str__(self):
@@ -292,18 +294,17 @@ class WalletTransaction(models.Model):
         
         profile.save()
         
-        # Send notification about balance change
-        from django.core.mail import send_mail
-        from django.conf import settings
-        
+        # Queue notification about balance change (delivered by the outbox dispatcher)
         if self.transaction_type == 'EARNING_CONFIRMED':
-            send_mail(
+            from .notifications import NotificationTaskManager
+            
+            NotificationOutbox.objects.create(
+                user=self.user,
+                notification_type='EARNING_CONFIRMED',
                 subject='Earnings Added to Your Wallet',
-                message=f'${self.amount} has been added to your wallet. New balance: ${profile.available_balance}',
-                from_email=settings.DEFAULT_FROM_EMAIL,
-                recipient_list=[self.user.email],
-                fail_silently=True
+                plain_text=f'${self.amount} has been added to your wallet. New balance: ${profile.available_balance}',
             )
+            NotificationTaskManager.kick_dispatcher()
 
 
 class PayoutRequest(models.Model):
@@ -937,6 +938,42 @@ class UserReferralCode(models.Model):
         super().save(*args, **kwargs)
 
 
+class UserReferralAllocation(models.Model):
+    """
+    Materialized purchase-time referral allocation for a user.
+    
+    Recomputed whenever the user's codes or the related promotions change
+    (see users.signals) and when a promotion window boundary passes
+    (users.tasks.refresh_referral_allocation_windows_task), so creating
+    disbursements for a purchase is a single indexed read.
+    """
+    user = models.OneToOneField(User, on_delete=models.CASCADE, related_name='referral_allocation')
+    user_percentage = models.DecimalField(max_digits=5, decimal_places=2, default=Decimal('100.00'))
+    codes = models.JSONField(
+        default=list,
+        blank=True,
+        help_text="[{referral_code_id, recipient_user_id, percentage}] for codes that receive disbursements"
+    )
+    valid_until = models.DateTimeField(
+        null=True,
+        blank=True,
+        help_text="Next promotion window boundary after which this allocation must be recomputed"
+    )
+    computed_at = models.DateTimeField(auto_now=True)
+    
+    class Meta:
+        indexes = [
+            models.Index(fields=['valid_until']),
+        ]
+    
+    def __str__(self):
+        return f"{self.user.email} allocation ({len(self.codes)} codes, user {self.user_percentage}%)"
+    
+    @property
+    def is_stale(self):
+        return self.valid_until is not None and self.valid_until < timezone.now()
+
+
 class ReferralDisbursement(models.Model):
     """Track disbursements from user earnings to organizations/individuals"""
     wallet_transaction = models.ForeignKey(WalletTransaction, on_delete=models.CASCADE, related_name='referral_disbursements')
@@ -1058,4 +1095,45 @@ class OrganizationTaxInfo(models.Model):
         verbose_name_plural = "Organization Tax Information"
     
     def __str__(self):
-        return f"Tax Info - {self.organization.profile.organization_name}"
\ No newline at end of file
+        return f"Tax Info - {self.organization.profile.organization_name}"
+
+class NotificationOutbox(models.Model):
+    """
+    Outgoing email notifications, written in the same transaction as the
+    wallet/payout change that triggers them and delivered in batches by
+    users.tasks.dispatch_notification_outbox_task.
+    """
+
+    STATUSES = [
+        ('PENDING', 'Pending'),
+        ('SENDING', 'Sending'),
+        ('SENT', 'Sent'),
+        ('FAILED', 'Failed'),
+    ]
+
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='notification_outbox')
+    notification_type = models.CharField(max_length=40)
+    subject = models.CharField(max_length=255)
+    template_name = models.CharField(max_length=255, blank=True)
+    context = models.JSONField(default=dict, blank=True, help_text="JSON-safe template context")
+    plain_text = models.TextField(blank=True, help_text="Pre-rendered body used when no template is set")
+
+    status = models.CharField(max_length=10, choices=STATUSES, default='PENDING')
+    attempts = models.PositiveSmallIntegerField(default=0)
+    max_attempts = models.PositiveSmallIntegerField(default=5)
+    next_attempt_at = models.DateTimeField(default=timezone.now)
+    locked_at = models.DateTimeField(null=True, blank=True)
+    last_error = models.TextField(blank=True)
+
+    created_at = models.DateTimeField(auto_now_add=True)
+    sent_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        ordering = ['created_at']
+        indexes = [
+            models.Index(fields=['status', 'next_attempt_at']),
+            models.Index(fields=['user', 'notification_type']),
+        ]
+
+    def __str__(self):
+        return f"{self.notification_type} to {self.user.email} ({self.status})"
@@ -2,15 +2,23 @@
 Notification Service for Wallet Events
 """
 
-from django.core.mail import send_mail
-from django.template.loader import render_to_string
+from django.core.cache import cache
+from django.core.mail import EmailMultiAlternatives, get_connection
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import models, transaction
+from django.db.models import Count, Q, Sum
+from django.template import TemplateDoesNotExist
+from django.template.loader import get_template
 from django.conf import settings
 from django.utils import timezone
+from datetime import timedelta
 from decimal import Decimal
 from typing import Dict, Any, List, Optional
+import json
 import logging
+import time
 
-from .models import User, WalletTransaction
+from .models import User, WalletTransaction, NotificationOutbox
 
 logger = logging.getLogger(__name__)
 
@@ -46,11 +54,12 @@ class NotificationService:
             
             subject = f"${amount} Added to Your Wallet!"
             
-            # Send email
+            # Queue email
             success = NotificationService._send_email_notification(
                 user=user,
                 subject=subject,
                 template_name='wallet/notifications/earning_confirmed.html',
+                notification_type='EARNING_CONFIRMED',
                 context=context
             )
             
@@ -84,6 +93,7 @@ class NotificationService:
                 user=user,
                 subject=subject,
                 template_name='wallet/notifications/withdrawal_initiated.html',
+                notification_type='WITHDRAWAL_INITIATED',
                 context=context
             )
             
@@ -115,6 +125,7 @@ class NotificationService:
                 user=user,
                 subject=subject,
                 template_name='wallet/notifications/withdrawal_completed.html',
+                notification_type='WITHDRAWAL_COMPLETED',
                 context=context
             )
             
@@ -145,6 +156,7 @@ class NotificationService:
                 user=user,
                 subject=subject,
                 template_name='wallet/notifications/withdrawal_failed.html',
+                notification_type='WITHDRAWAL_FAILED',
                 context=context
             )
             
@@ -176,6 +188,7 @@ class NotificationService:
                 user=user,
                 subject=subject,
                 template_name='wallet/notifications/activity_bonus.html',
+                notification_type='ACTIVITY_BONUS',
                 context=context
             )
             
@@ -211,6 +224,7 @@ class NotificationService:
                 user=user,
                 subject=subject,
                 template_name='wallet/notifications/balance_threshold.html',
+                notification_type='BALANCE_THRESHOLD',
                 context=context
             )
             
@@ -241,6 +255,7 @@ class NotificationService:
                 user=user,
                 subject=subject,
                 template_name='wallet/notifications/monthly_summary.html',
+                notification_type='MONTHLY_SUMMARY',
                 context=context
             )
             
@@ -254,55 +269,57 @@ class NotificationService:
             return False
     
     @staticmethod
-    def _send_email_notification(user: User, subject: str, template_name: str, context: Dict[str, Any]) -> bool:
-        """Send email notification with template"""
+    def _send_email_notification(user: User, subject: str, template_name: str, context: Dict[str, Any],
+                                 notification_type: str = 'GENERIC') -> bool:
+        """
+        Queue an email notification in the outbox.
+        
+        The outbox row is written in the caller's transaction, so it commits
+        or rolls back together with the wallet change it describes. Rendering
+        and SMTP delivery happen later in NotificationDispatcher.
+        """
         try:
-            # Add common context variables
-            context.update({
-                'site_name': getattr(settings, 'SITE_NAME', 'Ecommerce Platform'),
-                'site_url': getattr(settings, 'BASE_URL', 'http://localhost:8000'),
-                'support_email': getattr(settings, 'SUPPORT_EMAIL', settings.DEFAULT_FROM_EMAIL),
-                'current_year': timezone.now().year
-            })
-            
-            # Render email content
-            try:
-                html_content = render_to_string(template_name, context)
-                
-                # Create plain text version (simplified)
-                plain_text = NotificationService._html_to_plain_text(html_content)
-                
-            except Exception as template_error:
-                logger.error(f"Template rendering failed: {str(template_error)}")
-                # Fallback to simple text message
-                plain_text = NotificationService._create_fallback_message(subject, context)
-                html_content = None
-            
-            # Send email
-            if html_content:
-                send_mail(
-                    subject=subject,
-                    message=plain_text,
-                    from_email=settings.DEFAULT_FROM_EMAIL,
-                    recipient_list=[user.email],
-                    html_message=html_content,
-                    fail_silently=False
-                )
-            else:
-                send_mail(
-                    subject=subject,
-                    message=plain_text,
-                    from_email=settings.DEFAULT_FROM_EMAIL,
-                    recipient_list=[user.email],
-                    fail_silently=False
-                )
-            
+            NotificationOutbox.objects.create(
+                user=user,
+                notification_type=notification_type,
+                subject=subject[:255],
+                template_name=template_name,
+                context=NotificationService._serialize_context(context),
+            )
+            NotificationTaskManager.kick_dispatcher()
             return True
             
         except Exception as e:
-            logger.error(f"Failed to send email notification to {user.email}: {str(e)}")
+            logger.error(f"Failed to queue email notification for {user.email}: {str(e)}")
             return False
     
+    @staticmethod
+    def _serialize_context(context: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        Make a template context JSON-safe for the outbox.
+        
+        The recipient is re-attached at dispatch time; other model instances
+        are reduced to their id and display string.
+        """
+        serialized = {}
+        for key, value in context.items():
+            if key == 'user':
+                continue
+            if isinstance(value, models.Model):
+                value = {'id': value.pk, 'display': str(value)}
+            serialized[key] = value
+        return json.loads(json.dumps(serialized, cls=DjangoJSONEncoder))
+    
+    @staticmethod
+    def _common_context() -> Dict[str, Any]:
+        """Context variables shared by every notification template"""
+        return {
+            'site_name': getattr(settings, 'SITE_NAME', 'Ecommerce Platform'),
+            'site_url': getattr(settings, 'BASE_URL', 'http://localhost:8000'),
+            'support_email': getattr(settings, 'SUPPORT_EMAIL', settings.DEFAULT_FROM_EMAIL),
+            'current_year': timezone.now().year
+        }
+    
     @staticmethod
     def _html_to_plain_text(html_content: str) -> str:
         """Convert HTML content to plain text"""
@@ -404,68 +421,94 @@ class NotificationBatchService:
     
     @staticmethod
     def send_monthly_summaries(year: int, month: int) -> Dict[str, Any]:
-        """Send monthly wallet summaries to all active users"""
+        """
+        Queue monthly wallet summaries for all users with activity.
+        
+        Per-user totals come from one grouped aggregate query and the outbox
+        rows are bulk inserted; delivery is left to the outbox dispatcher.
+        """
         from datetime import datetime
-        import calendar
         
-        # Get all users with wallet activity
-        users_with_activity = User.objects.filter(
-            wallet_transactions__created_at__year=year,
-            wallet_transactions__created_at__month=month
-        ).distinct()
+        period_start = timezone.make_aware(datetime(year, month, 1))
+        # Up to the first instant of the next month, so the month's last second counts too
+        next_year, next_month = (year + 1, 1) if month == 12 else (year, month + 1)
+        period_end = timezone.make_aware(datetime(next_year, next_month, 1))
+        period = f'{year}-{month:02d}'
+        
+        def total(transaction_type):
+            return Sum('amount', filter=Q(transaction_type=transaction_type))
+        
+        monthly_totals = WalletTransaction.objects.filter(
+            created_at__gte=period_start,
+            created_at__lt=period_end
+        ).values(
+            'user_id',
+            'user__profile__available_balance',
+            'user__profile__activity_score',
+        ).annotate(
+            earnings=total('EARNING_CONFIRMED'),
+            withdrawals=total('WITHDRAWAL_CASH'),
+            spending=total('SPENDING_STORE'),
+            transaction_count=Count('id'),
+        ).order_by('user_id')
         
         results = {
-            'total_users': users_with_activity.count(),
-            'notifications_sent': 0,
+            'total_users': 0,
+            'notifications_queued': 0,
             'notifications_failed': 0,
             'errors': []
         }
         
-        period_start = datetime(year, month, 1)
-        period_end = datetime(year, month, calendar.monthrange(year, month)[1])
+        batch_size = getattr(settings, 'NOTIFICATION_OUTBOX_BATCH_SIZE', 200)
+        pending = []
         
-        for user in users_with_activity:
+        def flush():
+            NotificationOutbox.objects.bulk_create(pending, batch_size=batch_size)
+            results['notifications_queued'] += len(pending)
+            pending.clear()
+        
+        for row in monthly_totals.iterator(chunk_size=2000):
+            results['total_users'] += 1
             try:
-                # Calculate monthly summary
-                monthly_transactions = WalletTransaction.objects.filter(
-                    user=user,
-                    created_at__gte=period_start,
-                    created_at__lte=period_end
-                )
+                earnings = row['earnings'] or Decimal('0.00')
+                withdrawals = row['withdrawals'] or Decimal('0.00')
+                spending = row['spending'] or Decimal('0.00')
+                activity_score = row['user__profile__activity_score'] or Decimal('0.00')
                 
-                earnings = monthly_transactions.filter(
-                    transaction_type='EARNING_CONFIRMED'
-                ).aggregate(total=sum('amount'))['total'] or Decimal('0.00')
-                
-                withdrawals = monthly_transactions.filter(
-                    transaction_type='WITHDRAWAL_CASH'
-                ).aggregate(total=sum('amount'))['total'] or Decimal('0.00')
-                
-                spending = monthly_transactions.filter(
-                    transaction_type='SPENDING_STORE'
-                ).aggregate(total=sum('amount'))['total'] or Decimal('0.00')
-                
-                summary_data = {
-                    'period': f'{year}-{month:02d}',
-                    'earnings': earnings,
-                    'withdrawals': withdrawals,
-                    'spending': spending,
-                    'net_change': earnings - withdrawals - spending,
-                    'transaction_count': monthly_transactions.count()
+                context = {
+                    'summary_data': {
+                        'period': period,
+                        'earnings': earnings,
+                        'withdrawals': withdrawals,
+                        'spending': spending,
+                        'net_change': earnings - withdrawals - spending,
+                        'transaction_count': row['transaction_count']
+                    },
+                    'current_balance': row['user__profile__available_balance'],
+                    'activity_score': activity_score,
                 }
                 
-                # Send notification
-                if NotificationService.send_monthly_summary_notification(user, summary_data):
-                    results['notifications_sent'] += 1
-                else:
-                    results['notifications_failed'] += 1
+                pending.append(NotificationOutbox(
+                    user_id=row['user_id'],
+                    notification_type='MONTHLY_SUMMARY',
+                    subject=f"Monthly Wallet Summary - {period}",
+                    template_name='wallet/notifications/monthly_summary.html',
+                    context=NotificationService._serialize_context(context),
+                ))
+                if len(pending) >= batch_size:
+                    flush()
                     
             except Exception as e:
                 results['notifications_failed'] += 1
-                results['errors'].append(f"{user.email}: {str(e)}")
-                logger.error(f"Failed to send monthly summary to {user.email}: {str(e)}")
+                results['errors'].append(f"user {row['user_id']}: {str(e)}")
+                logger.error(f"Failed to queue monthly summary for user {row['user_id']}: {str(e)}")
+        
+        if pending:
+            flush()
+        
+        NotificationTaskManager.kick_dispatcher(force=True)
         
-        logger.info(f"Monthly summaries sent: {results['notifications_sent']}/{results['total_users']}")
+        logger.info(f"Monthly summaries queued: {results['notifications_queued']}/{results['total_users']}")
         return results
     
     @staticmethod
@@ -491,6 +534,7 @@ class NotificationBatchService:
                     user=admin,
                     subject=subject,
                     template_name='wallet/notifications/reconciliation_complete.html',
+                    notification_type='RECONCILIATION_COMPLETE',
                     context=context
                 )
             
@@ -502,6 +546,236 @@ class NotificationBatchService:
             return False
 
 
+class NotificationDispatcher:
+    """
+    Drains the notification outbox in batches.
+    
+    Each batch is claimed with SELECT ... FOR UPDATE SKIP LOCKED so several
+    dispatchers can run side by side, rendered with templates compiled once
+    per dispatcher, and delivered over a single reused mail connection.
+    Failed deliveries are retried with exponential backoff until
+    max_attempts is reached.
+    """
+    
+    RETRY_BASE_SECONDS = 60
+    RETRY_MAX_SECONDS = 6 * 3600
+    STALE_LOCK_MINUTES = 10
+    
+    def __init__(self, batch_size: Optional[int] = None, connection=None):
+        self.batch_size = batch_size or getattr(settings, 'NOTIFICATION_OUTBOX_BATCH_SIZE', 200)
+        self.connection = connection
+        self._templates = {}
+    
+    def _get_template(self, template_name: str):
+        """Compile each template once; remember missing templates too"""
+        if template_name not in self._templates:
+            try:
+                self._templates[template_name] = get_template(template_name) if template_name else None
+            except TemplateDoesNotExist:
+                logger.warning(f"Notification template {template_name} not found, using plain text fallback")
+                self._templates[template_name] = None
+        return self._templates[template_name]
+    
+    def claim_batch(self) -> List[NotificationOutbox]:
+        """Lock and mark the next batch of due notifications as sending"""
+        now = timezone.now()
+        
+        # Rows left in SENDING by a crashed dispatcher become due again
+        NotificationOutbox.objects.filter(
+            status='SENDING',
+            locked_at__lt=now - timedelta(minutes=self.STALE_LOCK_MINUTES)
+        ).update(status='PENDING', locked_at=None)
+        
+        with transaction.atomic():
+            ids = list(
+                NotificationOutbox.objects.select_for_update(skip_locked=True).filter(
+                    status='PENDING',
+                    next_attempt_at__lte=now
+                ).order_by('next_attempt_at').values_list('id', flat=True)[:self.batch_size]
+            )
+            if not ids:
+                return []
+            NotificationOutbox.objects.filter(id__in=ids).update(status='SENDING', locked_at=now)
+        
+        return list(
+            NotificationOutbox.objects.filter(id__in=ids).select_related('user', 'user__profile')
+        )
+    
+    def build_message(self, notification: NotificationOutbox, connection) -> EmailMultiAlternatives:
+        """Render an outbox row into an email message"""
+        user = notification.user
+        context = dict(notification.context)
+        context.update(NotificationService._common_context())
+        context['user'] = user
+        
+        html_content = None
+        template = self._get_template(notification.template_name)
+        if template is not None:
+            try:
+                html_content = template.render(context)
+                plain_text = NotificationService._html_to_plain_text(html_content)
+            except Exception as template_error:
+                logger.error(f"Template rendering failed: {str(template_error)}")
+                html_content = None
+        
+        if html_content is None:
+            plain_text = notification.plain_text or NotificationService._create_fallback_message(
+                notification.subject, context
+            )
+        
+        message = EmailMultiAlternatives(
+            subject=notification.subject,
+            body=plain_text,
+            from_email=settings.DEFAULT_FROM_EMAIL,
+            to=[user.email],
+            connection=connection
+        )
+        if html_content:
+            message.attach_alternative(html_content, 'text/html')
+        return message
+    
+    def _retry_delay(self, attempts: int) -> timedelta:
+        return timedelta(seconds=min(self.RETRY_BASE_SECONDS * (2 ** (attempts - 1)), self.RETRY_MAX_SECONDS))
+    
+    def dispatch_batch(self) -> Dict[str, Any]:
+        """
+        Deliver one batch of due notifications
+        
+        Returns:
+            Dict with per-batch throughput metrics
+        """
+        started = time.monotonic()
+        batch = self.claim_batch()
+        metrics = {'claimed': len(batch), 'sent': 0, 'retried': 0, 'failed': 0}
+        if not batch:
+            metrics['elapsed_seconds'] = round(time.monotonic() - started, 3)
+            return metrics
+        
+        connection = self.connection or get_connection(fail_silently=False)
+        opened = connection.open()
+        
+        sent, retry = [], []
+        try:
+            for notification in batch:
+                now = timezone.now()
+                notification.attempts += 1
+                notification.locked_at = None
+                try:
+                    connection.send_messages([self.build_message(notification, connection)])
+                    notification.status = 'SENT'
+                    notification.sent_at = now
+                    notification.last_error = ''
+                    sent.append(notification)
+                except Exception as e:
+                    notification.last_error = str(e)[:2000]
+                    if notification.attempts >= notification.max_attempts:
+                        notification.status = 'FAILED'
+                        metrics['failed'] += 1
+                    else:
+                        notification.status = 'PENDING'
+                        notification.next_attempt_at = now + self._retry_delay(notification.attempts)
+                        metrics['retried'] += 1
+                    retry.append(notification)
+                    logger.warning(f"Notification #{notification.id} to {notification.user.email} failed: {str(e)}")
+                    
+                    # A broken SMTP session would fail every remaining message
+                    try:
+                        connection.close()
+                        connection.open()
+                    except Exception:
+                        pass
+        finally:
+            if opened:
+                connection.close()
+        
+        fields = ['status', 'attempts', 'locked_at', 'sent_at', 'last_error', 'next_attempt_at']
+        NotificationOutbox.objects.bulk_update(sent + retry, fields, batch_size=self.batch_size)
+        
+        elapsed = time.monotonic() - started
+        metrics['sent'] = len(sent)
+        metrics['elapsed_seconds'] = round(elapsed, 3)
+        metrics['messages_per_second'] = round(len(batch) / elapsed, 1) if elapsed else None
+        logger.info(
+            f"📬 Notification batch: {metrics['sent']}/{metrics['claimed']} sent, {metrics['retried']} retrying, "
+            f"{metrics['failed']} failed in {elapsed:.2f}s ({metrics['messages_per_second']} msg/s)"
+        )
+        return metrics
+    
+    def drain(self, time_budget: float = 45.0, max_batches: Optional[int] = None) -> Dict[str, Any]:
+        """Dispatch batches until the outbox is empty or the time budget is spent"""
+        started = time.monotonic()
+        totals = {'batches': 0, 'claimed': 0, 'sent': 0, 'retried': 0, 'failed': 0, 'batch_metrics': []}
+        
+        while time.monotonic() - started < time_budget:
+            if max_batches is not None and totals['batches'] >= max_batches:
+                break
+            metrics = self.dispatch_batch()
+            if not metrics['claimed']:
+                break
+            totals['batches'] += 1
+            totals['batch_metrics'].append(metrics)
+            for key in ('claimed', 'sent', 'retried', 'failed'):
+                totals[key] += metrics[key]
+        
+        totals['elapsed_seconds'] = round(time.monotonic() - started, 3)
+        return totals
+
+
+class NotificationTaskManager:
+    """Manager for notification outbox tasks"""
+    
+    KICK_DEBOUNCE_SECONDS = 5
+    
+    @staticmethod
+    def kick_dispatcher(force: bool = False) -> None:
+        """
+        Ask a worker to drain the outbox once the current transaction commits.
+        
+        Kicks are debounced per process; the every-minute schedule
+        (``manage.py notification_outbox --schedule``) picks up anything a
+        skipped kick leaves behind, including retries waiting out their backoff.
+        """
+        if not force and not cache.add('notification_outbox_kick', 1, NotificationTaskManager.KICK_DEBOUNCE_SECONDS):
+            return
+        
+        def enqueue():
+            from django_q.tasks import async_task
+            try:
+                async_task(
+                    'users.tasks.dispatch_notification_outbox_task',
+                    group='notification_outbox',
+                    timeout=60
+                )
+            except Exception as e:
+                logger.warning(f"Could not queue notification dispatcher: {str(e)}")
+        
+        transaction.on_commit(enqueue)
+    
+    @staticmethod
+    def schedule_dispatcher() -> Optional[str]:
+        """
+        Schedule the outbox dispatcher to run every minute
+        
+        Returns:
+            str: Scheduled task ID, or None when already scheduled
+        """
+        from django_q.tasks import schedule
+        from django_q.models import Schedule
+        
+        if Schedule.objects.filter(name='dispatch_notification_outbox').exists():
+            return None
+        task_id = schedule(
+            'users.tasks.dispatch_notification_outbox_task',
+            schedule_type=Schedule.MINUTES,
+            minutes=1,
+            name='dispatch_notification_outbox',
+            repeats=-1  # Repeat indefinitely
+        )
+        
+        logger.info(f"📅 Scheduled notification dispatcher: {task_id}")
+        return task_id
+
+
 # Utility functions for integration with existing services
 def notify_earning_confirmed(user: User, amount: Decimal, transaction: WalletTransaction) -> None:
     """Convenience function to send earning notification and check thresholds"""
@@ -0,0 +1,417 @@
+import threading
+import time
+import uuid
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from datetime import timedelta
+from decimal import Decimal
+from typing import Dict, Any, Optional
+import logging
+
+import redis
+from django.conf import settings
+from django.db import connection, transaction
+from django.db.models import Q
+from django.utils import timezone
+
+from ecommerce_platform.utils import get_redis_connection
+from .models import PayoutRequest
+from .mock_payout_service import MockPayoutService, PayoutProcessor
+
+logger = logging.getLogger(__name__)
+
+
+# Requests per second and burst size allowed against each payout provider.
+# Override with settings.PAYOUT_PROVIDER_RATE_LIMITS.
+DEFAULT_PROVIDER_RATE_LIMITS = {
+    'stripe_bank': {'rate': 20.0, 'burst': 20, 'workers': 8},
+    'paypal': {'rate': 10.0, 'burst': 10, 'workers': 4},
+    'check': {'rate': 50.0, 'burst': 50, 'workers': 2},
+    'other': {'rate': 5.0, 'burst': 5, 'workers': 2},
+}
+
+PROGRESS_KEY = 'payout_batch_progress:{batch_id}'
+TASK_BATCH_KEY = 'payout_batch_task:{task_id}'
+PROGRESS_TTL = 24 * 3600
+
+
+class TokenBucket:
+    """Thread-safe token bucket used to rate limit calls to a payout provider"""
+
+    def __init__(self, rate: float, capacity: Optional[int] = None):
+        self.rate = float(rate)
+        self.capacity = float(capacity or max(1, int(rate)))
+        self._tokens = self.capacity
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _refill(self):
+        now = time.monotonic()
+        self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def acquire(self) -> float:
+        """
+        Block until a token is available
+
+        Returns:
+            float: Seconds spent waiting for the token
+        """
+        waited = 0.0
+        while True:
+            with self._lock:
+                self._refill()
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return waited
+                wait = (1 - self._tokens) / self.rate
+            time.sleep(wait)
+            waited += wait
+
+
+class BatchProgress:
+    """
+    Aggregated batch progress stored in Redis so the admin dashboard
+    (ajax_task_status) can poll it from any web worker.
+    """
+
+    def __init__(self, batch_id: str):
+        self.batch_id = batch_id
+        self.key = PROGRESS_KEY.format(batch_id=batch_id)
+        try:
+            self.redis = redis.Redis(**get_redis_connection())
+        except Exception as e:
+            logger.warning(f"Batch progress tracking disabled for {batch_id}: {str(e)}")
+            self.redis = None
+
+    def start(self, total: int, providers: Dict[str, int]):
+        mapping = {
+            'status': 'running',
+            'total': total,
+            'processed': 0,
+            'successful': 0,
+            'failed': 0,
+            'skipped': 0,
+            'started_at': timezone.now().isoformat(),
+        }
+        for provider, count in providers.items():
+            mapping[f'provider:{provider}:total'] = count
+        self._write(mapping)
+
+    def record(self, provider: str, outcome: str):
+        if not self.redis:
+            return
+        try:
+            pipe = self.redis.pipeline()
+            pipe.hincrby(self.key, 'processed', 1)
+            pipe.hincrby(self.key, outcome, 1)
+            pipe.hincrby(self.key, f'provider:{provider}:{outcome}', 1)
+            pipe.expire(self.key, PROGRESS_TTL)
+            pipe.execute()
+        except Exception as e:
+            logger.warning(f"Could not record batch progress for {self.batch_id}: {str(e)}")
+
+    def finish(self, elapsed: float):
+        self._write({
+            'status': 'completed',
+            'elapsed_seconds': round(elapsed, 3),
+            'finished_at': timezone.now().isoformat(),
+        })
+
+    def _write(self, mapping: Dict[str, Any]):
+        if not self.redis:
+            return
+        try:
+            pipe = self.redis.pipeline()
+            for field, value in mapping.items():
+                pipe.hset(self.key, field, value)
+            pipe.expire(self.key, PROGRESS_TTL)
+            pipe.execute()
+        except Exception as e:
+            logger.warning(f"Could not write batch progress for {self.batch_id}: {str(e)}")
+
+
+def get_batch_progress(batch_id: str) -> Optional[Dict[str, Any]]:
+    """Read aggregated progress for a payout batch, or None if unknown"""
+    try:
+        r = redis.Redis(**get_redis_connection())
+        data = r.hgetall(PROGRESS_KEY.format(batch_id=batch_id))
+    except Exception as e:
+        logger.warning(f"Could not read batch progress for {batch_id}: {str(e)}")
+        return None
+
+    if not data:
+        return None
+
+    progress = {'batch_id': batch_id, 'providers': defaultdict(dict)}
+    for field, value in data.items():
+        if value.lstrip('-').isdigit():
+            value = int(value)
+        if field.startswith('provider:'):
+            _, provider, metric = field.split(':', 2)
+            progress['providers'][provider][metric] = value
+        else:
+            progress[field] = value
+    progress['providers'] = dict(progress['providers'])
+    return progress
+
+
+def remember_batch_task(task_id: str, batch_id: str):
+    """Map a django-q task id to the batch id its progress is stored under"""
+    try:
+        r = redis.Redis(**get_redis_connection())
+        r.setex(TASK_BATCH_KEY.format(task_id=task_id), PROGRESS_TTL, batch_id)
+    except Exception as e:
+        logger.warning(f"Could not store batch id for task {task_id}: {str(e)}")
+
+
+def get_batch_id_for_task(task_id: str) -> Optional[str]:
+    try:
+        r = redis.Redis(**get_redis_connection())
+        return r.get(TASK_BATCH_KEY.format(task_id=task_id))
+    except Exception as e:
+        logger.warning(f"Could not read batch id for task {task_id}: {str(e)}")
+        return None
+
+
+class PayoutBatchExecutor:
+    """
+    Fan-out executor for payout batches.
+
+    Approved payouts are split into one work queue per payout provider. Each
+    queue runs through its own bounded thread pool and token bucket, so a slow
+    or rate-limited provider never holds up the others. Threads across all
+    providers share a budget of database connections (see _thread_budget);
+    with none to spare the batch runs serially on the caller's. Every payout is
+    claimed with a conditional UPDATE (approved -> processing) before the
+    provider is called, and the provider call carries an idempotency key, so
+    overlapping batches and task retries can never pay the same request twice.
+    """
+
+    def __init__(self, payout_ids, batch_id: Optional[str] = None, rate_limits: Optional[Dict[str, Dict]] = None,
+                 payout_service=MockPayoutService, service_options: Optional[Dict[str, Any]] = None):
+        self.payout_ids = list(payout_ids)
+        self.batch_id = batch_id or uuid.uuid4().hex
+        self.rate_limits = rate_limits or getattr(settings, 'PAYOUT_PROVIDER_RATE_LIMITS', DEFAULT_PROVIDER_RATE_LIMITS)
+        self.payout_service = payout_service
+        self.service_options = service_options or {}
+        self.progress = BatchProgress(self.batch_id)
+        self._results_lock = threading.Lock()
+
+    def _limits_for(self, provider: str) -> Dict[str, Any]:
+        return self.rate_limits.get(provider) or self.rate_limits.get('other') or DEFAULT_PROVIDER_RATE_LIMITS['other']
+
+    @staticmethod
+    def idempotency_key(payout: PayoutRequest) -> str:
+        """Stable key for one processing attempt of a payout"""
+        return f"payout-{payout.id}-attempt-{payout.retry_count}"
+
+    @staticmethod
+    def claim(payout: PayoutRequest) -> bool:
+        """
+        Atomically move a payout from approved to processing.
+
+        Only one worker can win the claim; payouts that already carry an
+        external transaction id were paid before and are never claimed again.
+        """
+        now = timezone.now()
+        claimed = PayoutRequest.objects.filter(
+            Q(external_transaction_id__isnull=True) | Q(external_transaction_id=''),
+            id=payout.id,
+            status='approved',
+        ).update(status='processing', processed_at=now, updated_at=now)
+
+        if claimed:
+            payout.status = 'processing'
+            payout.processed_at = now
+        return bool(claimed)
+
+    @staticmethod
+    def release_stale_claims(older_than_seconds: Optional[int] = None) -> list:
+        """
+        Move payouts claimed longer than PAYOUT_CLAIM_TIMEOUT_SECONDS ago back to approved.
+
+        A worker that dies between claim and result leaves its payout in
+        processing. Releasing it is safe: retry_count is unchanged, so the
+        next attempt reuses the idempotency key and the provider returns the
+        original result if the dead worker's call went through.
+
+        Returns:
+            list: Ids of the released payouts
+        """
+        older_than_seconds = older_than_seconds or getattr(settings, 'PAYOUT_CLAIM_TIMEOUT_SECONDS', 1800)
+        stale = PayoutRequest.objects.filter(
+            Q(external_transaction_id__isnull=True) | Q(external_transaction_id=''),
+            status='processing',
+            processed_at__lt=timezone.now() - timedelta(seconds=older_than_seconds),
+        )
+        with transaction.atomic():
+            # Locked so a result being recorded right now is not undone
+            payout_ids = list(stale.select_for_update(skip_locked=True).values_list('id', flat=True))
+            PayoutRequest.objects.filter(id__in=payout_ids).update(
+                status='approved', processed_at=None, updated_at=timezone.now()
+            )
+        if payout_ids:
+            logger.warning(f"⚠️ Released {len(payout_ids)} payouts stuck in processing: {payout_ids}")
+        return payout_ids
+
+    def _process_one(self, payout: PayoutRequest, bucket: TokenBucket) -> Dict[str, Any]:
+        provider = payout.payout_method
+        try:
+            if not self.claim(payout):
+                self.progress.record(provider, 'skipped')
+                return {
+                    'success': False,
+                    'skipped': True,
+                    'payout_id': payout.id,
+                    'status': 'skipped',
+                    'error_message': 'Payout already claimed or paid',
+                }
+
+            bucket.acquire()
+            try:
+                service_result = self.payout_service.process_payout(
+                    payout,
+                    idempotency_key=self.idempotency_key(payout),
+                    **self.service_options
+                )
+                result = PayoutProcessor.apply_service_result(payout, service_result)
+            except Exception as e:
+                result = PayoutProcessor.handle_processing_error(payout, e)
+
+            self.progress.record(provider, 'successful' if result['success'] else 'failed')
+            return result
+        except Exception as e:
+            logger.error(f"Error processing payout {payout.id}: {str(e)}")
+            return {
+                'success': False,
+                'payout_id': payout.id,
+                'error_message': str(e),
+                'can_retry': True,
+            }
+
+    def _process_in_thread(self, payout: PayoutRequest, bucket: TokenBucket, db_slots) -> Dict[str, Any]:
+        with db_slots:
+            try:
+                return self._process_one(payout, bucket)
+            finally:
+                # Worker threads hold their own connections; release them per job
+                connection.close()
+
+    def _thread_budget(self) -> int:
+        """
+        Worker threads the batch may run at once.
+
+        Each thread holds a database connection next to the caller's, so with
+        a connection pool configured (settings.DATABASE_POOL_SIZES) the budget
+        is the pool's MAX_SIZE less one, capped by PAYOUT_BATCH_MAX_THREADS.
+        """
+        budget = getattr(settings, 'PAYOUT_BATCH_MAX_THREADS', 8)
+        pool = connection.settings_dict.get('POOL')
+        if pool:
+            budget = min(budget, pool.get('MAX_SIZE', 4) - 1)
+        return budget
+
+    def _run_threaded(self, queues, results: Dict[str, Any], db_slots):
+        pools = []
+        futures = {}
+        try:
+            for provider, queue in queues.items():
+                limits = self._limits_for(provider)
+                bucket = TokenBucket(limits['rate'], limits.get('burst'))
+                pool = ThreadPoolExecutor(
+                    max_workers=max(1, min(limits.get('workers', 4), len(queue))),
+                    thread_name_prefix=f'payout-{provider}'
+                )
+                pools.append(pool)
+                results['providers'][provider] = {'queued': len(queue), 'successful': 0, 'failed': 0, 'skipped': 0}
+                for payout in queue:
+                    futures[pool.submit(self._process_in_thread, payout, bucket, db_slots)] = payout
+
+            for future in as_completed(futures):
+                self._add_result(results, futures[future], future.result())
+        finally:
+            for pool in pools:
+                pool.shutdown(wait=True)
+
+    def _add_result(self, results: Dict[str, Any], payout: PayoutRequest, payout_result: Dict[str, Any]):
+        provider_stats = results['providers'][payout.payout_method]
+        with self._results_lock:
+            results['details'].append(payout_result)
+            if payout_result.get('skipped'):
+                results['skipped'] += 1
+                provider_stats['skipped'] += 1
+                return
+
+            results['total_processed'] += 1
+            results['summary']['total_amount'] += payout.amount
+            if payout_result['success']:
+                results['successful'] += 1
+                provider_stats['successful'] += 1
+                results['summary']['successful_amount'] += payout.amount
+                results['summary']['total_fees'] += payout_result.get('processing_fee', Decimal('0.00'))
+            else:
+                results['failed'] += 1
+                provider_stats['failed'] += 1
+                results['summary']['failed_amount'] += payout.amount
+
+    def run(self) -> Dict[str, Any]:
+        """
+        Process the batch
+
+        Returns:
+            Dict containing batch processing results (same shape as
+            PayoutProcessor.batch_process_payouts plus per-provider stats)
+        """
+        started = time.monotonic()
+
+        queues = defaultdict(list)
+        payouts = PayoutRequest.objects.filter(
+            id__in=self.payout_ids,
+            status='approved'
+        ).select_related('user', 'wallet_transaction').order_by('requested_at')
+        for payout in payouts:
+            queues[payout.payout_method].append(payout)
+
+        total = sum(len(queue) for queue in queues.values())
+        logger.info(f"🔄 Starting concurrent batch {self.batch_id}: {total} payouts across {len(queues)} providers")
+        self.progress.start(total, {provider: len(queue) for provider, queue in queues.items()})
+
+        results = {
+            'batch_id': self.batch_id,
+            'total_processed': 0,
+            'successful': 0,
+            'failed': 0,
+            'skipped': 0,
+            'details': [],
+            'providers': {},
+            'summary': {
+                'total_amount': Decimal('0.00'),
+                'successful_amount': Decimal('0.00'),
+                'failed_amount': Decimal('0.00'),
+                'total_fees': Decimal('0.00'),
+            }
+        }
+
+        budget = self._thread_budget()
+        if budget < 1:
+            # No pooled connection to spare for worker threads: run in this one
+            logger.info(f"Batch {self.batch_id} runs serially: no spare database connections for worker threads")
+            for provider, queue in queues.items():
+                limits = self._limits_for(provider)
+                bucket = TokenBucket(limits['rate'], limits.get('burst'))
+                results['providers'][provider] = {'queued': len(queue), 'successful': 0, 'failed': 0, 'skipped': 0}
+                for payout in queue:
+                    self._add_result(results, payout, self._process_one(payout, bucket))
+        else:
+            self._run_threaded(queues, results, threading.BoundedSemaphore(budget))
+
+        elapsed = time.monotonic() - started
+        results['elapsed_seconds'] = round(elapsed, 3)
+        self.progress.finish(elapsed)
+
+        logger.info(
+            f"✅ Concurrent batch {self.batch_id} complete: {results['successful']}/{results['total_processed']} "
+            f"successful, {results['skipped']} skipped in {elapsed:.2f}s"
+        )
+        return results
@@ -282,6 +282,96 @@ class ReferralCodeService:
         
         return allocations
     
+    @staticmethod
+    def compute_purchase_allocation(user_id):
+        """
+        Compute the purchase-time allocation for a user in one query.
+        
+        Shares are split equally between the user and every code whose
+        promotion is active with code entry still open; disbursements go to
+        the subset whose purchase period is also open. valid_until is the
+        next window boundary at which the result changes.
+        """
+        from users.models import UserReferralCode
+        
+        now = timezone.now()
+        entry_open = list(UserReferralCode.objects.filter(
+            user_id=user_id,
+            is_active=True,
+            referral_code__promotion__is_active=True,
+            referral_code__promotion__code_entry_deadline__gte=now,
+        ).values(
+            'referral_code_id',
+            'referral_code__owner_id',
+            'referral_code__promotion__code_entry_deadline',
+            'referral_code__promotion__end_date',
+        ).order_by('referral_code_id'))
+        
+        if not entry_open:
+            return {'user_percentage': Decimal('100.00'), 'codes': [], 'valid_until': None}
+        
+        percentage = 100.0 / (len(entry_open) + 1)  # +1 for user's share
+        codes = []
+        boundaries = []
+        for row in entry_open:
+            end_date = row['referral_code__promotion__end_date']
+            boundaries.append(row['referral_code__promotion__code_entry_deadline'])
+            if end_date and end_date >= now:
+                boundaries.append(end_date)
+                codes.append({
+                    'referral_code_id': row['referral_code_id'],
+                    'recipient_user_id': row['referral_code__owner_id'],
+                    'percentage': str(percentage),
+                })
+        
+        return {
+            'user_percentage': Decimal(str(percentage)).quantize(Decimal('0.01')),
+            'codes': codes,
+            'valid_until': min(boundaries),
+        }
+    
+    @staticmethod
+    def refresh_user_allocation(user_id):
+        """Recompute and store a user's materialized referral allocation"""
+        from users.models import UserReferralAllocation
+        
+        allocation, _ = UserReferralAllocation.objects.update_or_create(
+            user_id=user_id,
+            defaults=ReferralCodeService.compute_purchase_allocation(user_id)
+        )
+        return allocation
+    
+    @staticmethod
+    def refresh_allocations_for_referral_code(referral_code_id):
+        """Recompute allocations for every user holding a referral code"""
+        from users.models import UserReferralCode
+        
+        user_ids = UserReferralCode.objects.filter(
+            referral_code_id=referral_code_id,
+            is_active=True
+        ).values_list('user_id', flat=True).distinct()
+        
+        count = 0
+        for user_id in user_ids.iterator():
+            ReferralCodeService.refresh_user_allocation(user_id)
+            count += 1
+        return count
+    
+    @staticmethod
+    def get_purchase_allocation(user):
+        """
+        Allocation to apply to a purchase happening now.
+        
+        Reads the materialized row; it is only recomputed inline when missing
+        or past its window boundary (the scheduler normally gets there first).
+        """
+        from users.models import UserReferralAllocation
+        
+        allocation = UserReferralAllocation.objects.filter(user_id=user.id).first()
+        if allocation is None or allocation.is_stale:
+            allocation = ReferralCodeService.refresh_user_allocation(user.id)
+        return allocation
+    
     @staticmethod
     def add_user_referral_code(user, referral_code, allocation_percentage=None):
         """Add a referral code to user's active codes with automatic allocation calculation"""
@@ -1,6 +1,6 @@
-from django.db.models.signals import post_save
+from django.db.models.signals import post_save, post_delete
 from django.dispatch import receiver
-from .models import User, UserProfile
+from .models import User, UserProfile, UserReferralCode, Promotion
 
 @receiver(post_save, sender=User)
 def create_user_profile(sender, instance, created, **kwargs):
@@ -10,4 +10,15 @@ def create_user_profile(sender, instance, created, **kwargs):
 @receiver(post_save, sender=User)
 def save_user_profile(sender, instance, **kwargs):
     if hasattr(instance, 'profile'):
-        instance.profile.save()
\ No newline at end of file
+        instance.profile.save()
+
+@receiver(post_save, sender=UserReferralCode)
+@receiver(post_delete, sender=UserReferralCode)
+def refresh_referral_allocation(sender, instance, **kwargs):
+    from .services import ReferralCodeService
+    ReferralCodeService.refresh_user_allocation(instance.user_id)
+
+@receiver(post_save, sender=Promotion)
+def refresh_promotion_allocations(sender, instance, **kwargs):
+    from .services import ReferralCodeService
+    ReferralCodeService.refresh_allocations_for_referral_code(instance.referral_code_id)
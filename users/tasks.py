@@ -3,9 +3,13 @@ from django.utils import timezone
 from django.db import models
 from datetime import timedelta
 import logging
+import uuid
 
 from .models import PayoutRequest, User
 from .mock_payout_service import PayoutProcessor, MockPayoutService
+from .payout_executor import (
+    PayoutBatchExecutor, get_batch_progress, get_batch_id_for_task, remember_batch_task
+)
 
 logger = logging.getLogger(__name__)
 
@@ -50,12 +54,16 @@ def process_single_payout_task(payout_id: int) -> dict:
         }
 
 
-def batch_process_payouts_task(payout_ids: list) -> dict:
+def batch_process_payouts_task(payout_ids: list, batch_id: str = None) -> dict:
     """
     Django Q task to process multiple payouts in batch
     
+    Payouts are fanned out per provider through PayoutBatchExecutor, so the
+    batch runs concurrently within each provider's rate limit.
+    
     Args:
         payout_ids: List of payout request IDs to process
+        batch_id: Key under which batch progress is published
         
     Returns:
         dict: Batch processing results
@@ -63,7 +71,7 @@ def batch_process_payouts_task(payout_ids: list) -> dict:
     logger.info(f"🎯 Processing batch payout task for {len(payout_ids)} payouts")
     
     try:
-        result = PayoutProcessor.batch_process_payouts(payout_ids)
+        result = PayoutBatchExecutor(payout_ids, batch_id=batch_id).run()
         
         logger.info(f"✅ Batch payout task completed: {result['successful']}/{result['total_processed']} successful")
         return result
@@ -78,6 +86,21 @@ def batch_process_payouts_task(payout_ids: list) -> dict:
         }
 
 
+def recover_stale_payout_claims_task() -> dict:
+    """
+    Django Q task to requeue payouts left in processing by a crashed worker
+    
+    Returns:
+        dict: Released payout ids and the batch task processing them
+    """
+    payout_ids = PayoutBatchExecutor.release_stale_claims()
+    task_id = PayoutTaskManager.queue_batch_processing(payout_ids) if payout_ids else None
+    return {
+        'released': payout_ids,
+        'task_id': task_id
+    }
+
+
 def retry_failed_payout_task(payout_id: int) -> dict:
     """
     Django Q task to retry a failed payout
@@ -212,6 +235,58 @@ def cleanup_old_tasks() -> dict:
     }
 
 
+def dispatch_notification_outbox_task(batch_size: int = None, time_budget: float = 45.0) -> dict:
+    """
+    Django Q task to deliver queued notifications from the outbox
+    
+    Args:
+        batch_size: Notifications per batch (defaults to NOTIFICATION_OUTBOX_BATCH_SIZE)
+        time_budget: Seconds to keep draining before yielding to the next run
+        
+    Returns:
+        dict: Delivery totals and per-batch throughput metrics
+    """
+    from .notifications import NotificationDispatcher
+    
+    totals = NotificationDispatcher(batch_size=batch_size).drain(time_budget=time_budget)
+    
+    if totals['claimed']:
+        logger.info(
+            f"📬 Outbox drained: {totals['sent']}/{totals['claimed']} sent in {totals['batches']} batches "
+            f"({totals['elapsed_seconds']}s)"
+        )
+    return totals
+
+
+def refresh_referral_allocation_windows_task(batch_size: int = 500) -> dict:
+    """
+    Scheduled Django Q task that recomputes referral allocations whose
+    promotion window (code entry or purchase period) has opened or closed
+    
+    Returns:
+        dict: Number of allocations refreshed
+    """
+    from .models import UserReferralAllocation
+    from .services import ReferralCodeService
+    
+    refreshed = 0
+    while True:
+        due_user_ids = list(
+            UserReferralAllocation.objects.filter(
+                valid_until__lt=timezone.now()
+            ).order_by('valid_until').values_list('user_id', flat=True)[:batch_size]
+        )
+        if not due_user_ids:
+            break
+        for user_id in due_user_ids:
+            ReferralCodeService.refresh_user_allocation(user_id)
+        refreshed += len(due_user_ids)
+    
+    if refreshed:
+        logger.info(f"🔁 Refreshed {refreshed} referral allocations after promotion window changes")
+    return {'refreshed': refreshed}
+
+
 # Helper functions for task management
 class PayoutTaskManager:
     """Manager for payout-related async tasks"""
@@ -256,13 +331,16 @@ class PayoutTaskManager:
         Returns:
             str: Task ID
         """
+        batch_id = uuid.uuid4().hex
         task_id = async_task(
             'users.tasks.batch_process_payouts_task',
             payout_ids,
+            batch_id=batch_id,
             group='batch_payout_processing',
             timeout=900,  # 15 minutes for batch
             priority='high'
         )
+        remember_batch_task(task_id, batch_id)
         
         logger.info(f"📤 Queued batch processing task {task_id} for {len(payout_ids)} payouts")
         return task_id
@@ -282,7 +360,16 @@ class PayoutTaskManager:
             task_result = result(task_id)
             
             if task_result is None:
-                return {'status': 'pending', 'message': 'Task is still running'}
+                status = {'status': 'pending', 'message': 'Task is still running'}
+                
+                # Batch tasks publish aggregated progress while they run
+                batch_id = get_batch_id_for_task(task_id)
+                progress = get_batch_progress(batch_id) if batch_id else None
+                if progress:
+                    status['progress'] = progress
+                    status['message'] = f"Processed {progress.get('processed', 0)}/{progress.get('total', 0)} payouts"
+                
+                return status
             
             return {
                 'status': 'completed',
@@ -317,6 +404,30 @@ class PayoutTaskManager:
         logger.info(f"📅 Scheduled auto-retry task: {task_id}")
         return task_id
     
+    @staticmethod
+    def schedule_stale_claim_recovery() -> str:
+        """
+        Schedule the stale payout claim recovery every 5 minutes
+        
+        Returns:
+            str: Scheduled task ID, or None when already scheduled
+        """
+        from django_q.tasks import schedule
+        from django_q.models import Schedule
+        
+        if Schedule.objects.filter(name='recover_stale_payout_claims').exists():
+            return None
+        task_id = schedule(
+            'users.tasks.recover_stale_payout_claims_task',
+            schedule_type=Schedule.MINUTES,
+            minutes=5,
+            name='recover_stale_payout_claims',
+            repeats=-1  # Repeat indefinitely
+        )
+        
+        logger.info(f"📅 Scheduled stale payout claim recovery: {task_id}")
+        return task_id
+    
     @staticmethod
     def schedule_cleanup() -> str:
         """
@@ -335,4 +446,26 @@ class PayoutTaskManager:
         )
         
         logger.info(f"📅 Scheduled cleanup task: {task_id}")
-        return task_id 
\ No newline at end of file
+        return task_id 
+    
+    @staticmethod
+    def schedule_referral_allocation_refresh() -> str:
+        """
+        Schedule the promotion-window allocation refresh every 5 minutes
+        
+        Returns:
+            str: Scheduled task ID
+        """
+        from django_q.tasks import schedule
+        from django_q.models import Schedule
+        
+        task_id = schedule(
+            'users.tasks.refresh_referral_allocation_windows_task',
+            schedule_type=Schedule.MINUTES,
+            minutes=5,
+            name='refresh_referral_allocation_windows',
+            repeats=-1  # Repeat indefinitely
+        )
+        
+        logger.info(f"📅 Scheduled referral allocation refresh: {task_id}")
+        return task_id
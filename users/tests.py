@@ -1,3 +1,268 @@
-from django.test import TestCase
+from django.test import TestCase, TransactionTestCase
+from decimal import Decimal
+from unittest.mock import patch
+from django.utils import timezone
+from users.models import User, PayoutRequest
+from users.mock_payout_service import MockPayoutService
+from users.payout_executor import PayoutBatchExecutor, TokenBucket
 
-# Create your tests here.
+
+class TestPayoutBatchExecutor(TransactionTestCase):
+    def setUp(self):
+        self.user = User.objects.create(email='payouts@example.com')
+        self.payouts = PayoutRequest.objects.bulk_create([
+            PayoutRequest(
+                user=self.user,
+                amount=Decimal('20.00'),
+                status='approved',
+                payout_method=method,
+                recipient_email=self.user.email,
+            )
+            for method in ['stripe_bank', 'paypal', 'check', 'paypal']
+        ])
+        self.payout_ids = [payout.id for payout in self.payouts]
+
+    def test_batch_fans_out_per_provider(self):
+        with patch.dict(MockPayoutService.SUCCESS_RATES, {'stripe_bank': 1, 'paypal': 1, 'check': 1}):
+            result = PayoutBatchExecutor(self.payout_ids, service_options={'latency': 0}).run()
+
+        self.assertEqual(result['total_processed'], 4)
+        self.assertEqual(result['successful'], 4)
+        self.assertEqual(result['providers']['paypal']['queued'], 2)
+        self.assertEqual(PayoutRequest.objects.filter(status='completed').count(), 4)
+
+    def test_batch_fits_a_single_connection_pool(self):
+        from django.db import connection
+
+        # The caller's connection is the only one: the batch must not start threads
+        with patch.dict(connection.settings_dict, {'POOL': {'MAX_SIZE': 1}}), \
+                patch.dict(MockPayoutService.SUCCESS_RATES, {'stripe_bank': 1, 'paypal': 1, 'check': 1}), \
+                patch('users.payout_executor.ThreadPoolExecutor') as thread_pool:
+            result = PayoutBatchExecutor(self.payout_ids, service_options={'latency': 0}).run()
+
+        thread_pool.assert_not_called()
+        self.assertEqual(result['successful'], 4)
+        self.assertEqual(PayoutRequest.objects.filter(status='completed').count(), 4)
+
+    def test_threads_share_the_pool_budget(self):
+        from django.db import connection
+
+        executor = PayoutBatchExecutor(self.payout_ids)
+        with patch.dict(connection.settings_dict, {'POOL': {'MAX_SIZE': 3}}):
+            self.assertEqual(executor._thread_budget(), 2)
+        with self.settings(PAYOUT_BATCH_MAX_THREADS=4), patch.dict(connection.settings_dict, {'POOL': {'MAX_SIZE': 20}}):
+            self.assertEqual(executor._thread_budget(), 4)
+
+    def test_replayed_batch_never_pays_twice(self):
+        PayoutBatchExecutor(self.payout_ids, service_options={'latency': 0}).run()
+        paid = dict(PayoutRequest.objects.values_list('id', 'external_transaction_id'))
+
+        replay = PayoutBatchExecutor(self.payout_ids, service_options={'latency': 0}).run()
+
+        self.assertEqual(replay['total_processed'], 0)
+        self.assertEqual(dict(PayoutRequest.objects.values_list('id', 'external_transaction_id')), paid)
+
+    def test_claim_is_exclusive(self):
+        payout = PayoutRequest.objects.get(id=self.payout_ids[0])
+        stale_copy = PayoutRequest.objects.get(id=self.payout_ids[0])
+
+        self.assertTrue(PayoutBatchExecutor.claim(payout))
+        self.assertFalse(PayoutBatchExecutor.claim(stale_copy))
+
+
+    def test_stale_claims_are_released_for_a_retry(self):
+        from datetime import timedelta
+
+        stale, recent, paid = self.payout_ids[:3]
+        for payout_id in (stale, recent, paid):
+            self.assertTrue(PayoutBatchExecutor.claim(PayoutRequest.objects.get(id=payout_id)))
+        PayoutRequest.objects.filter(id__in=[stale, paid]).update(processed_at=timezone.now() - timedelta(hours=1))
+        PayoutRequest.objects.filter(id=paid).update(external_transaction_id='po_123')
+
+        self.assertEqual(PayoutBatchExecutor.release_stale_claims(older_than_seconds=600), [stale])
+        self.assertEqual(
+            dict(PayoutRequest.objects.filter(id__in=[stale, recent, paid]).values_list('id', 'status')),
+            {stale: 'approved', recent: 'processing', paid: 'processing'},
+        )
+        self.assertTrue(PayoutBatchExecutor.claim(PayoutRequest.objects.get(id=stale)))
+
+    def test_idempotency_keys_are_bounded(self):
+        from collections import OrderedDict
+
+        payout = PayoutRequest.objects.get(id=self.payout_ids[0])
+        with patch.object(MockPayoutService, '_idempotent_results', OrderedDict()), \
+                patch.object(MockPayoutService, 'IDEMPOTENCY_KEYS_KEPT', 2):
+            for key in ('a', 'b', 'c'):
+                MockPayoutService.process_payout(payout, latency=0, idempotency_key=key)
+
+            self.assertEqual(list(MockPayoutService._idempotent_results), ['b', 'c'])
+
+
+class TestTokenBucket(TestCase):
+    def test_burst_then_throttle(self):
+        bucket = TokenBucket(rate=50, capacity=2)
+        self.assertEqual(bucket.acquire(), 0.0)
+        self.assertEqual(bucket.acquire(), 0.0)
+        self.assertGreater(bucket.acquire(), 0.0)
+
+
+class TestNotificationOutbox(TestCase):
+    def setUp(self):
+        self.user = User.objects.create(email='outbox@example.com')
+
+    def test_notifications_are_queued_then_dispatched_in_batches(self):
+        from django.core import mail
+        from users.models import NotificationOutbox
+        from users.notifications import NotificationService, NotificationDispatcher
+
+        for amount in ('1.00', '2.00', '3.00'):
+            NotificationService.send_withdrawal_failed_notification(self.user, Decimal(amount), 'paypal', 'test')
+
+        self.assertEqual(len(mail.outbox), 0)
+        self.assertEqual(NotificationOutbox.objects.filter(status='PENDING').count(), 3)
+
+        totals = NotificationDispatcher(batch_size=2).drain()
+
+        self.assertEqual(totals['batches'], 2)
+        self.assertEqual(totals['sent'], 3)
+        self.assertEqual(len(mail.outbox), 3)
+        self.assertEqual(NotificationOutbox.objects.filter(status='SENT').count(), 3)
+
+    def test_failed_delivery_is_retried_with_backoff(self):
+        from users.models import NotificationOutbox
+        from users.notifications import NotificationDispatcher
+
+        notification = NotificationOutbox.objects.create(
+            user=self.user, notification_type='GENERIC', subject='Hello', plain_text='Hi'
+        )
+        with patch('django.core.mail.backends.locmem.EmailBackend.send_messages', side_effect=OSError('smtp down')):
+            metrics = NotificationDispatcher().dispatch_batch()
+
+        notification.refresh_from_db()
+        self.assertEqual(metrics['retried'], 1)
+        self.assertEqual(notification.status, 'PENDING')
+        self.assertEqual(notification.attempts, 1)
+        self.assertGreater(notification.next_attempt_at, timezone.now())
+
+
+    def test_monthly_summaries_are_queued_then_delivered(self):
+        from django.core import mail
+        from users.models import NotificationOutbox, WalletTransaction
+        from users.notifications import NotificationBatchService, NotificationDispatcher
+
+        for transaction_type, amount in (('EARNING_CONFIRMED', '10.00'), ('WITHDRAWAL_CASH', '4.00')):
+            WalletTransaction.objects.create(
+                user=self.user, transaction_type=transaction_type, status='CONFIRMED', amount=Decimal(amount),
+                balance_before=Decimal('0.00'), balance_after=Decimal('0.00'),
+            )
+        now = timezone.now()
+
+        results = NotificationBatchService.send_monthly_summaries(now.year, now.month)
+
+        self.assertEqual((results['total_users'], results['notifications_queued']), (1, 1))
+        summary = NotificationOutbox.objects.get(notification_type='MONTHLY_SUMMARY')
+        self.assertEqual(summary.subject, f"Monthly Wallet Summary - {now.year}-{now.month:02d}")
+        self.assertEqual(Decimal(str(summary.context['summary_data']['net_change'])), Decimal('6.00'))
+
+        NotificationDispatcher().drain()
+
+        self.assertEqual([message.subject for message in mail.outbox], [summary.subject])
+
+    def test_monthly_summary_covers_the_whole_last_second(self):
+        from datetime import datetime
+        from users.models import NotificationOutbox, WalletTransaction
+        from users.notifications import NotificationBatchService
+
+        for created_at, amount in ((datetime(2025, 12, 31, 23, 59, 59, 500000), '10.00'),
+                                   (datetime(2026, 1, 1), '99.00')):
+            transaction = WalletTransaction.objects.create(
+                user=self.user, transaction_type='EARNING_CONFIRMED', status='CONFIRMED', amount=Decimal(amount),
+                balance_before=Decimal('0.00'), balance_after=Decimal('0.00'),
+            )
+            WalletTransaction.objects.filter(pk=transaction.pk).update(created_at=timezone.make_aware(created_at))
+
+        results = NotificationBatchService.send_monthly_summaries(2025, 12)
+
+        self.assertEqual(results['notifications_queued'], 1)
+        summary = NotificationOutbox.objects.get(notification_type='MONTHLY_SUMMARY')
+        self.assertEqual(Decimal(str(summary.context['summary_data']['earnings'])), Decimal('10.00'))
+
+    def test_dispatcher_schedule_is_created_once(self):
+        from io import StringIO
+        from django.core.management import call_command
+        from django_q.models import Schedule
+
+        for _ in range(2):
+            call_command('notification_outbox', '--schedule', stdout=StringIO())
+
+        self.assertEqual(Schedule.objects.filter(name='dispatch_notification_outbox').count(), 1)
+
+
+class TestStreamingExports(TestCase):
+    def setUp(self):
+        self.user = User.objects.create(email='exports@example.com')
+        PayoutRequest.objects.bulk_create([
+            PayoutRequest(user=self.user, amount=Decimal('15.00'), payout_method='paypal', recipient_email=self.user.email)
+            for _ in range(3)
+        ])
+
+    def test_csv_export_streams_all_rows(self):
+        from ecommerce_platform.exports import streaming_export_response
+
+        response = streaming_export_response('payouts', chunk_size=2)
+        lines = b''.join(response.streaming_content).decode().splitlines()
+
+        self.assertTrue(response.streaming)
+        self.assertEqual(len(lines), 4)
+        self.assertIn('PayPal', lines[1])
+
+    def test_gzip_jsonl_export(self):
+        import gzip
+        import json
+        from ecommerce_platform.exports import streaming_export_response
+
+        response = streaming_export_response('payouts', fmt='jsonl', compress=True)
+        records = [json.loads(line) for line in gzip.decompress(b''.join(response.streaming_content)).splitlines()]
+
+        self.assertEqual(response['Content-Type'], 'application/gzip')
+        self.assertEqual(len(records), 3)
+        self.assertEqual(records[0]['user__email'], 'exports@example.com')
+
+
+class TestReferralAllocation(TestCase):
+    def setUp(self):
+        from users.models import ReferralCode, Promotion, UserReferralCode
+
+        self.user = User.objects.create(email='shopper@example.com')
+        self.org = User.objects.create(email='org@example.com')
+        self.org.profile.is_organization = True
+        self.org.profile.save()
+
+        code = ReferralCode.objects.create(code='GIVE1234', owner=self.org)
+        self.promotion = Promotion.objects.create(
+            organization=self.org, referral_code=code, start_date=timezone.now(), is_active=True
+        )
+        UserReferralCode.objects.create(user=self.user, referral_code=code, allocation_percentage=Decimal('50.00'))
+
+    def test_allocation_is_materialized_when_code_is_added(self):
+        from users.models import UserReferralAllocation
+
+        allocation = UserReferralAllocation.objects.get(user=self.user)
+
+        self.assertEqual(allocation.user_percentage, Decimal('50.00'))
+        self.assertEqual(len(allocation.codes), 1)
+        self.assertEqual(allocation.codes[0]['recipient_user_id'], self.org.id)
+        self.assertEqual(allocation.valid_until, self.promotion.code_entry_deadline)
+
+    def test_window_refresh_drops_closed_promotions(self):
+        from users.models import UserReferralAllocation, Promotion
+        from users.tasks import refresh_referral_allocation_windows_task
+
+        past = timezone.now() - timezone.timedelta(days=1)
+        Promotion.objects.filter(id=self.promotion.id).update(code_entry_deadline=past, end_date=past)
+        UserReferralAllocation.objects.filter(user=self.user).update(valid_until=past)
+
+        self.assertEqual(refresh_referral_allocation_windows_task()['refreshed'], 1)
+        allocation = UserReferralAllocation.objects.get(user=self.user)
+        self.assertEqual(allocation.codes, [])
+        self.assertEqual(allocation.user_percentage, Decimal('100.00'))
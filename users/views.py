@@ -9,7 +9,8 @@ from django.views.decorators.csrf import csrf_exempt, ensure_csrf_cookie
 from datetime import timedelta, datetime
 from decimal import Decimal
 import json
-import csv
+
+from ecommerce_platform.exports import streaming_export_response
 
 from .models import User, UserProfile, PayoutRequest, WalletTransaction
 from .services import WalletService
@@ -551,28 +552,9 @@ def handle_batch_processing(request, payouts):
 
 
 def export_payouts_csv(request, payouts):
-    """Export selected payouts to CSV"""
-    response = HttpResponse(content_type='text/csv')
-    response['Content-Disposition'] = 'attachment; filename="payouts_export.csv"'
-    
-    writer = csv.writer(response)
-    writer.writerow([
-        'ID', 'User Email', 'Amount', 'Status', 'Method', 'Priority',
-        'Requested Date', 'Approved Date', 'Completed Date', 'External Transaction ID'
-    ])
-    
-    for payout in payouts:
-        writer.writerow([
-            payout.id,
-            payout.user.email,
-            payout.amount,
-            payout.status,
-            payout.get_payout_method_display(),
-            payout.priority,
-            payout.requested_at.strftime('%Y-%m-%d %H:%M'),
-            payout.approved_at.strftime('%Y-%m-%d %H:%M') if payout.approved_at else '',
-            payout.completed_at.strftime('%Y-%m-%d %H:%M') if payout.completed_at else '',
-            payout.external_transaction_id or ''
-        ])
-    
-    return response
+    """Stream selected payouts as CSV"""
+    return streaming_export_response(
+        'payouts',
+        queryset=payouts,
+        compress=request.POST.get('gzip') == '1'
+    )